@@ -7,6 +7,7 @@
 # For license information, see LICENSE.TXT
 
 import sys
+import array
 from itertools import izip
 
 from nltk.metrics import scores
@@ -18,6 +19,9 @@ from api import *
 import distance_measures
 import align_util
 
+# number of distances remembered by a memoising aligner before they are forgotten
+MEMO_SIZE = 2 ** 16
+
 # Based on Gale & Church 1993, "A Program for Aligning Sentences in Bilingual Corpora"
 # This is a Python version of the C implementation by Mike Riley presented in the appendix
 # of the paper. The documentation in the C program is retained where applicable.
@@ -51,7 +55,8 @@ class AlignmentExtended(object):
 ##//////////////////////////////////////////////////////
 
 class GaleChurchAligner(AlignerI):
-    def __init__(self, dist_funct, alignment_type, output_format, print_flag=False):
+    def __init__(self, dist_funct, alignment_type, output_format, print_flag=False, 
+                 band_width=None, memoise=True):
         self.dist_funct = dist_funct
         # either 'original' or 'extended'
         self.alignment_type = alignment_type
@@ -67,6 +72,14 @@ class GaleChurchAligner(AlignerI):
         # in formats such as ARCADE and TEI (also can read TEI files as input)
         # also coming later is printing in unicode - sorry about that
         self.print_flag = print_flag
+        # when band_width is set, only alignments which are at most band_width sentences
+        # of the longer region away from the diagonal are considered, so that the time
+        # and memory needed to align a region grow linearly with its number of sentences
+        if (band_width is not None and band_width < 1):
+            raise ValueError("band_width should be at least 1")
+        self.band_width = band_width
+        # remembers the distances of sentence lengths which occur repeatedly
+        self.memoise = memoise
     
     def get_delimited_regions(self, base_type, input_file1, input_file2, hard_delimiter, soft_delimiter):
         lines1 = align_util.readlines(input_file1)
@@ -143,169 +156,7 @@ class GaleChurchAligner(AlignerI):
         respectively.  align[].d gives the distance for that pairing.
                 
         """
-        distances = []
-        path_x = []
-        path_y = [] 
-        
-        first_len = nx + 1
-        second_len = ny + 1
-        
-        distances = [[0] * second_len for c in range(first_len)]         
-        path_x = [[0] * second_len for c in range(first_len)]              
-        path_y = [[0] * second_len for c in range(first_len)]
-                  
-        d1 = d2 = d3 = d4 = d5 = d6 = sys.maxint
-        
-        for j in range(0, ny + 1):    
-            for i in range(0, nx + 1):            
-                if (i > 0 and j > 0):		
-                    #/* substitution */
-                    d1 = distances[i-1][j-1] + \
-                        self.dist_funct(x[i-1], y[j-1], 0, 0)
-                else:
-                    d1 = sys.maxint
-                    
-                if (i > 0):	
-                    #/* deletion */
-                    d2 = distances[i-1][j] + \
-                        self.dist_funct(x[i-1], 0, 0, 0)
-                else:
-                    d2 = sys.maxint
-                    
-                if (j > 0):		
-                    #/* insertion */
-                    d3 = distances[i][j-1] + \
-                        self.dist_funct(0, y[j-1], 0, 0)
-                else:
-                    d3 = sys.maxint
-                    
-                if (i > 1 and j > 0):		
-                    #/* contraction */
-                    d4 = distances[i-2][j-1] + \
-                        self.dist_funct(x[i-2], y[j-1], x[i-1], 0)
-                else:
-                    d4 = sys.maxint
-                    
-                if (i > 0 and j > 1):		
-                    #/* expansion */
-                    d5 = distances[i-1][j-2] + \
-                        self.dist_funct(x[i-1], y[j-2], 0, y[j-1])
-                else:
-                    d5 = sys.maxint
-                    
-                if (i > 1 and j > 1):		
-                    #/* melding */
-                    d6 = distances[i-2][j-2] + \
-                        self.dist_funct(x[i-2], y[j-2], x[i-1], y[j-1])
-                else:
-                    d6 = sys.maxint
-     
-                dmin = min(d1, d2, d3, d4, d5, d6)
-                
-                if (dmin == sys.maxint):
-                    distances[i][j] = 0
-                elif (dmin == d1):
-                    distances[i][j] = d1                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j - 1              
-                elif (dmin == d2):
-                    distances[i][j] = d2                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j                
-                elif (dmin == d3):
-                    distances[i][j] = d3                
-                    path_x[i][j] = i
-                    path_y[i][j] = j - 1                
-                elif (dmin == d4):
-                    distances[i][j] = d4                
-                    path_x[i][j] = i - 2
-                    path_y[i][j] = j - 1                 
-                elif (dmin == d5):
-                    distances[i][j] = d5                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j - 2
-                else:			
-                    # /* dmin == d6 */ {
-                    distances[i][j] = d6                
-                    path_x[i][j] = i - 2
-                    path_y[i][j] = j - 2
-        n = 0
-        
-        ralign_dict = {}
-        
-        i = nx
-        j = ny
-        while (i > 0 or j > 0):                
-            oi = path_x[i][j]       
-            oj = path_y[i][j]
-            di = i - oi
-            dj = j - oj
-            
-            ralign = Alignment()
-                          
-            if (di == 1 and dj == 1):
-                #/* substitution */            
-                ralign.x1 = x[i-1]
-                ralign.y1 = y[j-1]
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.d = distances[i][j] - distances[i-1][j-1] 
-                ralign.category = '1 - 1'
-                
-            elif (di == 1 and dj == 0):
-                #/* deletion */
-                ralign.x1 = x[i-1]
-                ralign.y1 = 0
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.d = distances[i][j] - distances[i-1][j]
-                ralign.category = '1 - 0'
-            elif (di == 0 and dj == 1):
-                #/* insertion */
-                ralign.x1 = 0
-                ralign.y1 = y[j-1]
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.d = distances[i][j] - distances[i][j-1]        
-                ralign.category = '0 - 1'
-            elif (dj == 1):
-                #/* contraction */
-                ralign.x1 = x[i-2]
-                ralign.y1 = y[j-1]
-                ralign.x2 = x[i-1]
-                ralign.y2 = 0
-                ralign.d = distances[i][j] - distances[i-2][j-1]     
-                ralign.category = '2 - 1'
-            elif (di == 1):
-                #/* expansion */
-                ralign.x1 = x[i-1]
-                ralign.y1 = y[j-2]
-                ralign.x2 = 0
-                ralign.y2 = y[j-1]
-                ralign.d = distances[i][j] - distances[i-1][j-2]    
-                ralign.category = '1 - 2'
-            else: 
-                #/* di == 2 and dj == 2 */ { /* melding */
-                ralign.x1 = x[i-2]
-                ralign.y1 = y[j-2]
-                ralign.x2 = x[i-1]
-                ralign.y2 = y[j-1]
-                ralign.d = distances[i][j] - distances[i-2][j-2]
-                ralign.category = '2 - 2'
-                               
-            ralign_dict[n] = ralign
-            
-            n = n + 1
-            
-            i = oi
-            j = oj
-           
-        align_dict = {}
-            
-        for e in range(0, n):
-            align_dict[n-e-1] = ralign_dict[e] 
-               
-        return align_dict
+        return self._banded_seq_align(x, y, nx, ny, ORIGINAL_MOVES, Alignment)
         
     def _seq_align_extended(self, x, y, nx, ny):    
         """        
@@ -330,285 +181,141 @@ class GaleChurchAligner(AlignerI):
         respectively.  align[].d gives the distance for that pairing.
                 
         """
-        distances = []
-        path_x = []
-        path_y = [] 
+        return self._banded_seq_align(x, y, nx, ny, EXTENDED_MOVES, AlignmentExtended)
         
-        first_len = nx + 1
-        second_len = ny + 1
+    def _banded_seq_align(self, x, y, nx, ny, moves, bead_class):
+        """
+        Sequence alignment routine shared by _seq_align and _seq_align_extended.
         
-        distances = [[0] * second_len for c in range(first_len)]         
-        path_x = [[0] * second_len for c in range(first_len)]              
-        path_y = [[0] * second_len for c in range(first_len)]
-                  
-        d1 = d2 = d3 = d4 = d5 = d6 = d7 = d8 = d9 = d10 = d11 = sys.maxint
+        moves is the list of (number of x, number of y, arguments) of the possible moves, where
+        arguments(x, y, i, j) returns the arguments of dist_funct for the move which ends after
+        x[i-1] and y[j-1]. The first move with the smallest distance is chosen.
         
-        for j in range(0, ny + 1):    
-            for i in range(0, nx + 1):            
-                if (i > 0 and j > 0):		
-                    #/* substitution */          /* 1-1 */
-                    d1 = distances[i-1][j-1] + \
-                        self.dist_funct(x[i-1], y[j-1], 0, 0, 0, 0)
-                else:
-                    d1 = sys.maxint
-                    
-                if (i > 0):	
-                    #/* deletion */              /* 1-0 */
-                    d2 = distances[i-1][j] + \
-                        self.dist_funct(x[i-1], 0, 0, 0, 0, 0)
-                else:
-                    d2 = sys.maxint
-                    
-                if (j > 0):		
-                    #/* insertion */             /* 0-1 */
-                    d3 = distances[i][j-1] + \
-                        self.dist_funct(0, y[j-1], 0, 0, 0, 0)
-                else:
-                    d3 = sys.maxint
-                    
-                if (i > 1 and j > 0):		
-                    #/* contraction */           /* 2-1 */
-                    d4 = distances[i-2][j-1] + \
-                        self.dist_funct(x[i-2], y[j-1], x[i-1], 0, 0, 0)
-                else:
-                    d4 = sys.maxint
-                    
-                if (i > 0 and j > 1):		     
-                    #/* expansion */             /* 1-2 */
-                    d5 = distances[i-1][j-2] + \
-                        self.dist_funct(x[i-1], y[j-2], 0, y[j-1], 0, 0)
-                else:
-                    d5 = sys.maxint
-                    
-                if (i > 1 and j > 1):		
-                    #/* melding */               /* 2-2 */
-                    d6 = distances[i-2][j-2] + \
-                        self.dist_funct(x[i-2], y[j-2], x[i-1], y[j-1], 0, 0)
-                else:
-                    d6 = sys.maxint
-                    
-                if (i > 2 and j > 0):		
-                    #/* contraction */           /* 3-1 */
-                    d7 = distances[i-3][j-1] + \
-                        self.dist_funct(x[i-3], y[j-1], x[i-2], 0, x[i-1], 0)
-                else:
-                    d7 = sys.maxint
-                    
-                if (i > 2 and j > 1):		
-                    #/* contraction */           /* 3-2 */
-                    d8 = distances[i-3][j-2] + \
-                        self.dist_funct(x[i-3], y[j-1], x[i-2], y[j-2], x[i-1], 0)
-                else:
-                    d8 = sys.maxint
-                    
-                if (i > 0 and j > 2):		
-                    #/* expansion */             /* 1-3 */
-                    d9 = distances[i-1][j-3] + \
-                        self.dist_funct(x[i-1], y[j-3], 0, y[j-2], 0, y[j-1])
-                else:
-                    d9 = sys.maxint
-                    
-                if (i > 1 and j > 2):		
-                    #/* expansion */             /* 2-3 */
-                    d10 = distances[i-2][j-3] + \
-                        self.dist_funct(x[i-3], y[j-3], x[i-2], y[j-2], 0, y[j-1])
-                else:
-                    d10 = sys.maxint
-                                                        
-                if (i > 2 and j > 2):		
-                    #/* melding */               /* 3-3 */
-                    d11 = distances[i-3][j-3] + \
-                        self.dist_funct(x[i-3], y[j-3], x[i-2], y[j-2], x[i-1], y[j-1])
-                else:
-                    d11 = sys.maxint
-     
-                dmin = min(d1, d2, d3, d4, d5, d6, d7, d8, d9, d10, d11)
+        The cells of each column j are stored in typed arrays, distances[j] for the distances
+        and moves_taken[j] for the indices of the moves, from the cell bounds[j][0] onwards.
+        Only the cells within the band are computed when band_width is set.
+        """
+        dist_funct = self.dist_funct
+        # distances of the arguments seen so far, when memoising
+        known_distances = {}
+        
+        bounds = band_bounds(nx, ny, self.band_width)
+        distances = []
+        moves_taken = []
+        
+        for j in range(0, ny + 1):
+            low, high = bounds[j]
+            column_distances = array.array('d')
+            column_moves = array.array('b')
+            for i in range(low, high + 1):
+                dmin = sys.maxint
+                move_min = -1
+                for move in range(len(moves)):
+                    di, dj, arguments = moves[move]
+                    if (i < di or j < dj):
+                        continue
+                    if (dj == 0):
+                        if (i - di < low):
+                            continue
+                        previous = column_distances[i - di - low]
+                    else:
+                        previous_low, previous_high = bounds[j - dj]
+                        if (i - di < previous_low or i - di > previous_high):
+                            continue
+                        previous = distances[j - dj][i - di - previous_low]
+                    lengths = arguments(x, y, i, j)
+                    distance = known_distances.get(lengths)
+                    if (distance is None):
+                        distance = dist_funct(*lengths)
+                        if (self.memoise):
+                            if (len(known_distances) >= MEMO_SIZE):
+                                known_distances.clear()
+                            known_distances[lengths] = distance
+                    d = previous + distance
+                    if (d < dmin):
+                        dmin = d
+                        move_min = move
                 
-                if (dmin == sys.maxint):
-                    distances[i][j] = 0
-                elif (dmin == d1):
-                    distances[i][j] = d1                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j - 1              
-                elif (dmin == d2):
-                    distances[i][j] = d2                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j                
-                elif (dmin == d3):
-                    distances[i][j] = d3                
-                    path_x[i][j] = i
-                    path_y[i][j] = j - 1                
-                elif (dmin == d4):
-                    distances[i][j] = d4                
-                    path_x[i][j] = i - 2
-                    path_y[i][j] = j - 1                 
-                elif (dmin == d5):
-                    distances[i][j] = d5                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j - 2
-                elif (dmin == d6):			                   
-                    distances[i][j] = d6                
-                    path_x[i][j] = i - 2
-                    path_y[i][j] = j - 2
-                elif (dmin == d7):
-                    distances[i][j] = d7                
-                    path_x[i][j] = i - 3
-                    path_y[i][j] = j - 1               
-                elif (dmin == d8):
-                    distances[i][j] = d8                
-                    path_x[i][j] = i - 3
-                    path_y[i][j] = j - 2                
-                elif (dmin == d9):
-                    distances[i][j] = d9                
-                    path_x[i][j] = i - 1
-                    path_y[i][j] = j - 3                 
-                elif (dmin == d10):
-                    distances[i][j] = d10                
-                    path_x[i][j] = i - 2
-                    path_y[i][j] = j - 3
-                elif (dmin == d11):			                   
-                    distances[i][j] = d11                
-                    path_x[i][j] = i - 3
-                    path_y[i][j] = j - 3
-        n = 0
+                if (move_min == -1):
+                    dmin = 0
+                column_distances.append(dmin)
+                column_moves.append(move_min)
+            distances.append(column_distances)
+            moves_taken.append(column_moves)
         
-        ralign_dict = {}
+        ralign_list = []
         
         i = nx
         j = ny
-        while (i > 0 or j > 0):                
-            oi = path_x[i][j]       
-            oj = path_y[i][j]
-            di = i - oi
-            dj = j - oj
-            
-            ralign = AlignmentExtended()
-                          
-            if (di == 1 and dj == 1):
-                #/* substitution */            
-                ralign.x1 = x[i-1]
-                ralign.y1 = y[j-1]
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-1][j-1] 
-                ralign.category = '1 - 1'                
-            elif (di == 1 and dj == 0):
-                #/* deletion */
-                ralign.x1 = x[i-1]
-                ralign.y1 = 0
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-1][j]
-                ralign.category = '1 - 0'
-            elif (di == 0 and dj == 1):
-                #/* insertion */
-                ralign.x1 = 0
-                ralign.y1 = y[j-1]
-                ralign.x2 = 0
-                ralign.y2 = 0
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i][j-1]        
-                ralign.category = '0 - 1'
-            elif (dj == 1):
-                #/* contraction */
-                ralign.x1 = x[i-2]
-                ralign.y1 = y[j-1]
-                ralign.x2 = x[i-1]
-                ralign.y2 = 0
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-2][j-1]     
-                ralign.category = '2 - 1'
-            elif (di == 1):
-                #/* expansion */
-                ralign.x1 = x[i-1]
-                ralign.y1 = y[j-2]
-                ralign.x2 = 0
-                ralign.y2 = y[j-1]
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-1][j-2]    
-                ralign.category = '1 - 2'
-            elif (di == 2 and dj == 2): 
-                #/* di == 2 and dj == 2 */ { /* melding */
-                ralign.x1 = x[i-2]
-                ralign.y1 = y[j-2]
-                ralign.x2 = x[i-1]
-                ralign.y2 = y[j-1]
-                ralign.x3 = 0
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-2][j-2]
-                ralign.category = '2 - 2'
-            elif (di == 3 and dj == 1):
-                #/* deletion */
-                ralign.x1 = x[i-3]
-                ralign.y1 = y[j-1]
-                ralign.x2 = x[i-2]
-                ralign.y2 = 0
-                ralign.x3 = x[i-1]
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-3][j-1]
-                ralign.category = '3 - 1'
-            elif (di == 3 and dj == 2):
-                #/* insertion */
-                ralign.x1 = x[i-3]
-                ralign.y1 = y[j-1]
-                ralign.x2 = x[i-2]
-                ralign.y2 = y[j-2]
-                ralign.x3 = x[i-1]
-                ralign.y3 = 0
-                ralign.d = distances[i][j] - distances[i-3][j-2]        
-                ralign.category = '3 - 2'
-            elif (di == 1 and dj == 3):
-                #/* deletion */
-                ralign.x1 = x[i-1]
-                ralign.y1 = y[j-3]
-                ralign.x2 = 0
-                ralign.y2 = y[j-2]
-                ralign.x3 = 0
-                ralign.y3 = y[j-1]
-                ralign.d = distances[i][j] - distances[i-1][j-3]
-                ralign.category = '1 - 3'
-            elif (di == 2 and dj == 3):
-                #/* insertion */
-                ralign.x1 = x[i-3]
-                ralign.y1 = y[j-3]
-                ralign.x2 = x[i-2]
-                ralign.y2 = y[j-2]
-                ralign.x3 = 0
-                ralign.y3 = y[j-1]
-                ralign.d = distances[i][j] - distances[i-2][j-3]        
-                ralign.category = '2 - 3'
-            elif (di == 3 and dj == 3): 
-                ralign.x1 = x[i-3]
-                ralign.y1 = y[j-3]
-                ralign.x2 = x[i-2]
-                ralign.y2 = y[j-2]
-                ralign.x3 = x[i-1]
-                ralign.y3 = y[j-1]
-                ralign.d = distances[i][j] - distances[i-3][j-3]
-                ralign.category = '3 - 3'
-                               
-            ralign_dict[n] = ralign
+        while (i > 0 or j > 0):
+            move = moves_taken[j][i - bounds[j][0]]
+            if (move == -1):
+                break
+            di, dj, arguments = moves[move]
             
-            n = n + 1
+            ralign = bead_class()
+            values = arguments(x, y, i, j)
+            ralign.x1, ralign.y1, ralign.x2, ralign.y2 = values[:4]
+            if (len(values) == 6):
+                ralign.x3, ralign.y3 = values[4:]
+            ralign.d = distances[j][i - bounds[j][0]] - distances[j - dj][i - di - bounds[j - dj][0]]
+            ralign.category = '%d - %d' % (di, dj)
             
-            i = oi
-            j = oj
-           
-        align_dict = {}
+            ralign_list.append(ralign)
             
-        for e in range(0, n):
-            align_dict[n-e-1] = ralign_dict[e] 
-               
-        return align_dict
+            i = i - di
+            j = j - dj
+        
+        ralign_list.reverse()
+        
+        return dict(enumerate(ralign_list))
         
     
+def band_bounds(nx, ny, band_width):
+    """
+    Returns the first and last i of the cells (i, j) of each column j which are
+    at most band_width sentences of the longer sequence away from the diagonal,
+    ie. abs(i * ny - j * nx) <= band_width * max(nx, ny). Every cell within a band
+    of width 1 or more can be reached from (0, 0) by insertions and deletions
+    within the band.
+    """
+    if (band_width is None or nx == 0 or ny == 0):
+        return [(0, nx)] * (ny + 1)
+    width = band_width * max(nx, ny)
+    bounds = []
+    for j in range(0, ny + 1):
+        low = max(0, -int((width - j * nx) // ny))
+        high = min(nx, int((j * nx + width) // ny))
+        bounds.append((low, high))
+    return bounds
+    
+# The moves of the sequence alignment routines, the number of x and y objects and a
+# function which returns the arguments of the distance function, which are also the
+# values of the alignment bead
+
+ORIGINAL_MOVES = [
+    (1, 1, lambda x, y, i, j: (x[i-1], y[j-1], 0, 0)),           #/* substitution */
+    (1, 0, lambda x, y, i, j: (x[i-1], 0, 0, 0)),                #/* deletion */
+    (0, 1, lambda x, y, i, j: (0, y[j-1], 0, 0)),                #/* insertion */
+    (2, 1, lambda x, y, i, j: (x[i-2], y[j-1], x[i-1], 0)),      #/* contraction */
+    (1, 2, lambda x, y, i, j: (x[i-1], y[j-2], 0, y[j-1])),      #/* expansion */
+    (2, 2, lambda x, y, i, j: (x[i-2], y[j-2], x[i-1], y[j-1])), #/* melding */
+]
+
+EXTENDED_MOVES = [
+    (1, 1, lambda x, y, i, j: (x[i-1], y[j-1], 0, 0, 0, 0)),                     #/* 1-1 */
+    (1, 0, lambda x, y, i, j: (x[i-1], 0, 0, 0, 0, 0)),                          #/* 1-0 */
+    (0, 1, lambda x, y, i, j: (0, y[j-1], 0, 0, 0, 0)),                          #/* 0-1 */
+    (2, 1, lambda x, y, i, j: (x[i-2], y[j-1], x[i-1], 0, 0, 0)),                #/* 2-1 */
+    (1, 2, lambda x, y, i, j: (x[i-1], y[j-2], 0, y[j-1], 0, 0)),                #/* 1-2 */
+    (2, 2, lambda x, y, i, j: (x[i-2], y[j-2], x[i-1], y[j-1], 0, 0)),           #/* 2-2 */
+    (3, 1, lambda x, y, i, j: (x[i-3], y[j-1], x[i-2], 0, x[i-1], 0)),           #/* 3-1 */
+    (3, 2, lambda x, y, i, j: (x[i-3], y[j-1], x[i-2], y[j-2], x[i-1], 0)),      #/* 3-2 */
+    (1, 3, lambda x, y, i, j: (x[i-1], y[j-3], 0, y[j-2], 0, y[j-1])),           #/* 1-3 */
+    (2, 3, lambda x, y, i, j: (x[i-3], y[j-3], x[i-2], y[j-2], 0, y[j-1])),      #/* 2-3 */
+    (3, 3, lambda x, y, i, j: (x[i-3], y[j-3], x[i-2], y[j-2], x[i-1], y[j-1])), #/* 3-3 */
+]
+
 ##//////////////////////////////////////////////////////
 ##  Demonstration code
 ##//////////////////////////////////////////////////////
@@ -75,25 +75,26 @@ def get_character_lengths(region):
         
     return character_lengths
 
-def print_alignment_text_mapping(alignment_mapping):
+def print_alignment_text_mapping(alignment_mapping, output=None):
+    # output is a file to print to, standard output when it is None
     entry_num = 0
     for entry in alignment_mapping:
-        print "--------------------------------"
-        print "Entry: %d" % entry_num
+        print >>output, "--------------------------------"
+        print >>output, "Entry: %d" % entry_num
         entry_num = entry_num + 1
-        print "%s" % str(entry[0])
-        print "%s" % str(entry[1])
+        print >>output, "%s" % str(entry[0])
+        print >>output, "%s" % str(entry[1])
         
-def print_alignment_index_mapping(alignment_mapping_indices):
+def print_alignment_index_mapping(alignment_mapping_indices, output=None):
     entry_num = 0
     for entry in alignment_mapping_indices:
-        print "--------------------------------"
-        print "Indices Entry: %d" % entry_num
+        print >>output, "--------------------------------"
+        print >>output, "Indices Entry: %d" % entry_num
         entry_num = entry_num + 1
         source = entry[0]
         target = entry[1]
-        print "%s" % str(source)
-        print "%s" % str(target) 
+        print >>output, "%s" % str(source)
+        print >>output, "%s" % str(target) 
         
 def print_alignments(alignments, hard_region1, hard_region2):
     hard1_key = 0
@@ -0,0 +1,292 @@
+# Natural Language Toolkit: Batch Alignment of Document Pairs
+#
+# Copyright (C) 2001-2011 NLTK Project
+# URL: <http://nltk.org/>
+# For license information, see LICENSE.TXT
+
+"""
+Aligns the document pairs listed in a manifest with a L{GaleChurchAligner
+<align.GaleChurchAligner>}, in a pool of processes.
+
+Each line of a manifest names a source and a target file, and optionally the file
+the alignment is written to, separated by tabs. Empty lines and lines starting
+with C{#} are ignored.
+
+The hard regions of the documents are independent, so each of them is aligned as
+a separate task and the regions of a large document are aligned by several
+processes. The alignment of a document is written, in the C{index_tuples} or
+C{text_tuples} format of the aligner, as soon as all its regions are aligned,
+and a line reporting the number of sentences aligned per second, or the reason
+the document could not be aligned, is written to the report. A document which
+fails does not stop the batch.
+"""
+
+import os
+import sys
+import copy
+import time
+import itertools
+import multiprocessing
+
+import align
+import align_util
+import distance_measures
+
+OUTPUT_SUFFIX = '.align'
+
+# the aligner of the worker processes, see _set_aligner
+_aligner = None
+
+##//////////////////////////////////////////////////////
+##  Manifests and documents
+##//////////////////////////////////////////////////////
+
+def read_manifest(manifest_file, output_dir):
+    """
+    Returns an iterator over the (source file, target file, output file) entries of
+    a manifest. When a line does not name the output file, the alignment is written
+    to C{output_dir}, in a file named after the source and target files.
+
+    @type manifest_file: C{string}
+    @param manifest_file: the path of the manifest
+
+    @type output_dir: C{string}
+    @param output_dir: the directory of the output files which are not named in the manifest
+
+    @rtype: iterator of C{tuple}
+    """
+    manifest = open(manifest_file, 'r')
+    try:
+        for line in manifest:
+            line = line.strip()
+            if (not line or line.startswith('#')):
+                continue
+            fields = line.split('\t')
+            if (len(fields) == 2):
+                name = '%s-%s%s' % (os.path.basename(fields[0]), os.path.basename(fields[1]), OUTPUT_SUFFIX)
+                fields.append(os.path.join(output_dir, name))
+            elif (len(fields) != 3):
+                raise ValueError("manifest line should have 2 or 3 tab separated fields: %s" % line)
+            yield tuple(fields)
+    finally:
+        manifest.close()
+
+def read_document(source_file, target_file, base_type, hard_delimiter, soft_delimiter):
+    """
+    Returns the hard regions of the source and target files, see
+    L{GaleChurchAligner.get_delimited_regions <align.GaleChurchAligner.get_delimited_regions>}.
+
+    @raise ValueError: if the files do not have the same number of hard regions
+    """
+    regions = []
+    for input_file in (source_file, target_file):
+        lines = align_util.readlines(input_file)
+        if (base_type == 'token'):
+            regions.append(align_util.get_regions(lines, hard_delimiter, soft_delimiter))
+        elif (base_type == 'sentence'):
+            regions.append(align_util.get_paragraphs_sentences(lines, hard_delimiter, soft_delimiter))
+        else:
+            raise ValueError("base_type should be 'token' or 'sentence'")
+
+    if (len(regions[0]) != len(regions[1])):
+        raise ValueError("%s has %d and %s has %d hard regions" % \
+                         (source_file, len(regions[0]), target_file, len(regions[1])))
+    return regions
+
+def write_alignment(alignments, output_format, output_file):
+    """
+    Writes the alignment of each hard region of a document, as it is printed by the
+    aligner, to C{output_file}.
+    """
+    output = open(output_file, 'w')
+    try:
+        for alignment in alignments:
+            if (output_format == 'text_tuples'):
+                align_util.print_alignment_text_mapping(alignment, output)
+            else:
+                align_util.print_alignment_index_mapping(alignment, output)
+    finally:
+        output.close()
+
+##//////////////////////////////////////////////////////
+##  Batch alignment
+##//////////////////////////////////////////////////////
+
+class Document(object):
+    """
+    The progress of the alignment of a document pair.
+    """
+    def __init__(self, source_file, target_file, output_file):
+        self.source_file = source_file
+        self.target_file = target_file
+        self.output_file = output_file
+        # the alignments of the hard regions, until they are written
+        self.alignments = []
+        self.remaining = 0
+        # the number of soft regions of the source file
+        self.sentences = 0
+        # seconds spent aligning the regions, by all processes
+        self.seconds = 0.0
+        self.error = None
+
+    def report(self):
+        if (self.error is not None):
+            return "FAILED %s %s: %s" % (self.source_file, self.target_file, self.error)
+        return "%s %s: %d sentences in %.2fs (%.1f sentences/s)" % \
+               (self.source_file, self.target_file, self.sentences,
+                self.seconds, self.sentences / max(self.seconds, 1e-6))
+
+def align_manifest(aligner, manifest_file, output_dir, base_type='token',
+                   hard_delimiter='.EOP', soft_delimiter='.EOS', processes=None,
+                   window=100, report=sys.stdout):
+    """
+    Aligns the document pairs listed in a manifest and writes their alignments.
+
+    The manifest is read C{window} documents at a time, so that only the regions of
+    those documents are held in memory, and the regions of the documents in a window
+    are aligned in any order by the pool of processes.
+
+    @type aligner: L{GaleChurchAligner <align.GaleChurchAligner>}
+    @param aligner: the aligner, its output_format should be 'index_tuples' or 'text_tuples'
+
+    @type manifest_file: C{string}
+    @param manifest_file: the path of the manifest, see L{read_manifest}
+
+    @type output_dir: C{string}
+    @param output_dir: the directory of the output files which are not named in the manifest
+
+    @type processes: C{int}
+    @param processes: the number of worker processes, the number of CPUs when None;
+        the regions are aligned in this process when it is 1
+
+    @type window: C{int}
+    @param window: the number of documents read from the manifest at a time
+
+    @type report: C{file}
+    @param report: the file the progress of each document is reported to
+
+    @return: the number of documents aligned and the number of documents that failed
+    @rtype: C{tuple} of C{int}
+    """
+    if (aligner.output_format not in ('index_tuples', 'text_tuples')):
+        raise ValueError("output_format of the aligner should be 'index_tuples' or 'text_tuples'")
+    if (window < 1):
+        raise ValueError("window should be at least 1")
+
+    pool = None
+    if (processes != 1):
+        pool = multiprocessing.Pool(processes, _set_aligner, (aligner,))
+    else:
+        _set_aligner(aligner)
+
+    aligned = failed = sentences = 0
+    start = time.time()
+    try:
+        entries = read_manifest(manifest_file, output_dir)
+        while True:
+            documents = [Document(*entry) for entry in itertools.islice(entries, window)]
+            if (not documents):
+                break
+
+            tasks = []
+            for index, document in enumerate(documents):
+                try:
+                    (regions1, regions2) = read_document(document.source_file, document.target_file,
+                                                         base_type, hard_delimiter, soft_delimiter)
+                except (IOError, ValueError), e:
+                    _fail(document, e, report)
+                    continue
+                document.alignments = [None] * len(regions1)
+                document.remaining = len(regions1)
+                document.sentences = sum([len(region) for region in regions1])
+                tasks.extend([(index, region, regions1[region], regions2[region])
+                              for region in range(len(regions1))])
+                if (document.remaining == 0):
+                    _finish(document, aligner.output_format, report)
+
+            if (pool is not None):
+                results = pool.imap_unordered(_align_region, tasks)
+            else:
+                results = itertools.imap(_align_region, tasks)
+            for (index, region, alignment, seconds, error) in results:
+                document = documents[index]
+                if (document.error is not None):
+                    continue
+                if (error is not None):
+                    _fail(document, error, report)
+                    continue
+                document.alignments[region] = alignment
+                document.seconds += seconds
+                document.remaining -= 1
+                if (document.remaining == 0):
+                    _finish(document, aligner.output_format, report)
+
+            for document in documents:
+                if (document.error is None):
+                    aligned += 1
+                    sentences += document.sentences
+                else:
+                    failed += 1
+    finally:
+        if (pool is not None):
+            pool.terminate()
+            pool.join()
+
+    seconds = time.time() - start
+    print >>report, "%d documents aligned, %d failed, %d sentences in %.2fs (%.1f sentences/s)" % \
+                    (aligned, failed, sentences, seconds, sentences / max(seconds, 1e-6))
+    return (aligned, failed)
+
+def _finish(document, output_format, report):
+    try:
+        write_alignment(document.alignments, output_format, document.output_file)
+    except IOError, e:
+        _fail(document, e, report)
+        return
+    document.alignments = None
+    print >>report, document.report()
+
+def _fail(document, error, report):
+    document.error = error
+    document.alignments = None
+    print >>report, document.report()
+
+def _set_aligner(aligner):
+    global _aligner
+    _aligner = copy.copy(aligner)
+    # the alignments are written by align_manifest
+    _aligner.print_flag = False
+
+def _align_region(task):
+    """
+    Aligns a hard region, returning the alignment and the seconds it took, or the
+    error which stopped it, so that a failure does not stop the pool.
+    """
+    (index, region, hard_region1, hard_region2) = task
+    start = time.time()
+    try:
+        alignment = _aligner.align(hard_region1, hard_region2)
+    except Exception, e:
+        return (index, region, None, 0.0, "%s: %s" % (e.__class__.__name__, e))
+    return (index, region, alignment, time.time() - start, None)
+
+##//////////////////////////////////////////////////////
+##  Command line
+##//////////////////////////////////////////////////////
+
+if __name__=='__main__':
+    # usage: python batch.py manifest output_dir [processes [output_format [alignment_type]]]
+    if (len(sys.argv) < 3):
+        sys.exit('Usage: arg1 - manifest arg2 - output directory [arg3 - number of processes ' +
+                 'arg4 - index_tuples or text_tuples arg5 - original or extended]')
+
+    arguments = sys.argv[3:] + [None, 'index_tuples', 'original'][len(sys.argv) - 3:]
+    processes = arguments[0] and int(arguments[0])
+    if (arguments[2] == 'extended'):
+        dist_funct = distance_measures.three_side_distance
+    else:
+        dist_funct = distance_measures.two_side_distance
+
+    gc = align.GaleChurchAligner(dist_funct, arguments[2], arguments[1])
+    (aligned, failed) = align_manifest(gc, sys.argv[1], sys.argv[2], processes=processes)
+    sys.exit(failed and 1 or 0)
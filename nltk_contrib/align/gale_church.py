@@ -12,6 +12,11 @@ import math
 
 from util import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Based on Gale & Church 1993, 
 # "A Program for Aligning Sentences in Bilingual Corpora"
 
@@ -42,6 +47,33 @@ def norm_cdf(x):
     return 1 - 0.5 * erfcc(x / math.sqrt(2))
 
 
+def log_erfcc(x, log = math.log, exp = math.exp):
+    """Logarithm of the complementary error function L{erfcc}.
+
+    For positive arguments the logarithm is computed from the terms of the
+    approximation, so that it does not underflow to M{-∞} for large arguments.
+    C{log} and C{exp} can be replaced by their C{numpy} versions to compute it
+    for arrays.
+    """
+    z = abs(x)
+    t = 1 / (1 + 0.5 * z)
+    log_r = log(t) - z * z - 1.26551223 + t * \
+            (1.00002368 + t *
+             (.37409196 + t *
+              (.09678418 + t *
+               (-.18628806 + t *
+                (.27886807 + t *
+                 (-1.13520398 + t *
+                  (1.48851587 + t *
+                   (-.82215223 + t * .17087277))))))))
+    if numpy is not None and isinstance(x, numpy.ndarray):
+        return numpy.where(x >= 0., log_r, log(2. - exp(log_r)))
+    if (x >= 0.):
+        return log_r
+    else:
+        return log(2. - exp(log_r))
+
+
 class LanguageIndependent(object):
     # These are the language-independent probabilities and parameters
     # given in Gale & Church
@@ -61,14 +93,20 @@ class LanguageIndependent(object):
 
 
 def trace(backlinks, source, target):
+    """Follows the C{backlinks}, a function which returns the alignment type which
+    leads to a cell, from the cell of all source and target sentences back to the
+    cell of no sentences.
+
+    @returns: The sentence alignments, a list of index pairs.
+    """
     links = []
-    pos = (len(source) - 1, len(target) - 1)
+    pos = (len(source), len(target))
 
-    while pos != (-1, -1):
-        s, t = backlinks[pos]
+    while pos != (0, 0) and pos[0] >= 0 and pos[1] >= 0:
+        s, t = backlinks(pos)
         for i in range(s):
             for j in range(t):
-                links.append((pos[0] - i, pos[1] - j))
+                links.append((pos[0] - 1 - i, pos[1] - 1 - j))
         pos = (pos[0] - s, pos[1] - t)
 
     return links[::-1]
@@ -100,56 +138,201 @@ def align_probability(i, j, source_sentences, target_sentences, alignment, param
     return 2 * (1 - norm_cdf(delta)) * params.PRIORS[alignment]
 
 
-def align_blocks(source_sentences, target_sentences, params = LanguageIndependent):
+def align_log_probability(i, j, source_sentences, target_sentences, alignment, params):
+    """Returns the logarithm of the probability of the source sentences before C{i}
+    being aligned with the target sentences before C{j} with a specific C{alignment},
+    the argument of L{erfcc} is the same as in L{align_probability}.
+
+    @param i: The number of source sentences, the offset of the sentence after the alignment.
+    @param j: The number of target sentences, the offset of the sentence after the alignment.
+    """
+    l_s = sum(source_sentences[i - 1 - offset] for offset in range(alignment[0]))
+    l_t = sum(target_sentences[j - 1 - offset] for offset in range(alignment[1]))
+    try:
+        m = (l_s + l_t / params.AVERAGE_CHARACTERS) / 2
+        delta = (l_t - l_s * params.AVERAGE_CHARACTERS) / math.sqrt(m * params.VARIANCE_CHARACTERS)
+    except ZeroDivisionError:
+        return -infinity
+
+    return log_erfcc(delta / math.sqrt(2)) + math.log(params.PRIORS[alignment])
+
+
+def in_band(i, j, source_sentences, target_sentences, band):
+    """Returns whether the cell of C{i} source and C{j} target sentences is at most
+    C{band} target sentences away from the diagonal of the block."""
+    return band is None or \
+           abs(j * len(source_sentences) - i * len(target_sentences)) <= band * len(source_sentences)
+
+
+def alignment_types_of(params):
+    """The alignment types in the order in which they win ties, larger types first."""
+    return sorted(params.PRIORS.keys(), reverse = True)
+
+
+def align_blocks(source_sentences, target_sentences, params = LanguageIndependent, band = None):
     """Creates the sentence alignment of two blocks of texts (usually paragraphs).
 
+    The alignment maximises the sum of the logarithms of the probabilities of the
+    alignments, which do not underflow in long blocks like their products do.
+    When C{numpy} is available the cells of each anti-diagonal of the dynamic
+    program are computed at once, as they only depend on earlier anti-diagonals.
+
     @param source_sentences: The list of source sentence lengths.
     @param target_sentences: The list of target sentence lengths.
     @param params: the sentence alignment parameters.
+    @param band: the maximum distance, in target sentences, of an alignment from the
+        diagonal of the block, or C{None} to consider all alignments. Limiting the
+        distance makes the alignment of long blocks take linear time. When no
+        alignment of all sentences stays within the band, the band is widened.
 
     @return: The sentence alignments, a list of index pairs.
     """
-    alignment_types = list(params.PRIORS.keys())
+    if band is not None and band < 1:
+        raise ValueError("band should be at least 1")
+    if len(source_sentences) == 0 or len(target_sentences) == 0:
+        return []
+    if numpy is not None:
+        return align_blocks_by_diagonals(source_sentences, target_sentences, params, band)
+    return _align_within_band(_align_rows, source_sentences, target_sentences, params, band)
+
+
+def _align_within_band(dynamic_program, source_sentences, target_sentences, params, band):
+    """Runs the C{dynamic_program} within the C{band} and traces back its alignment.
+
+    The cell of all sentences is on the diagonal, but it cannot be reached when the
+    sentences of a narrow band are too unevenly distributed, e.g. when the band is 1 and
+    a source sentence is aligned with ten target sentences. The band is then doubled
+    until the cell is reached, or until it covers the whole block.
+
+    @param dynamic_program: a function with the parameters of L{align_blocks}, which
+        returns the log probability of the best alignment of all sentences and the
+        backlinks, see L{trace}.
+    """
+    while True:
+        log_probability, backlinks = dynamic_program(source_sentences, target_sentences,
+                                                     params, band)
+        if log_probability > -infinity or band is None:
+            return trace(backlinks, source_sentences, target_sentences)
+        band *= 2
+        if band >= len(target_sentences):
+            band = None
 
-    # there are always three rows in the history (with the last of them being filled)
-    # and the rows are always |target_text| + 2, so that we never have to do
-    # boundary checks
-    D = [(len(target_sentences) + 2) * [0] for x in range(2)]
 
-    # for the first sentence, only substitution, insertion or deletion are
-    # allowed, and they are all equally likely ( == 1)
+def _align_rows(source_sentences, target_sentences, params, band):
+    """The dynamic program of L{align_blocks} without C{numpy}, which computes the
+    cells row by row.
 
-    D.append([0, 1])
-    D[-2][2] = 1
-    D[-2][1] = 1
+    @return: The log probability of the best alignment of all sentences and the backlinks.
+    """
+    alignment_types = alignment_types_of(params)
 
+    # D[i][j] is the log probability of the best alignment of the first i source
+    # and the first j target sentences
+    D = []
     backlinks = {}
 
-    for i in range(len(source_sentences)):
-        for j in range(len(target_sentences)):
-            m = []
-            for a in alignment_types:
-                k = D[-(1 + a[0])][j + 2 - a[1]]
-                if k > 0:
-                    p = k * \
-                      align_probability(i, j, source_sentences, target_sentences, a, params)
-                    m.append((p, a))
-
-            if len(m) > 0:
-                v = max(m)
-                backlinks[(i, j)] = v[1]
-                D[-1].append(v[0])
-            else:
-                backlinks[(i, j)] = (1, 1)
-                D[-1].append(0)
-
-        D.pop(0)
-        D.append([0, 0])
+    for i in range(len(source_sentences) + 1):
+        D.append([])
+        for j in range(len(target_sentences) + 1):
+            if (i, j) == (0, 0):
+                D[i].append(0.)
+                continue
+            best, best_type = -infinity, (1, 1)
+            if in_band(i, j, source_sentences, target_sentences, band):
+                for a in alignment_types:
+                    if i < a[0] or j < a[1] or D[i - a[0]][j - a[1]] == -infinity:
+                        continue
+                    p = D[i - a[0]][j - a[1]] + \
+                      align_log_probability(i, j, source_sentences, target_sentences, a, params)
+                    if p > best:
+                        best, best_type = p, a
+            backlinks[(i, j)] = best_type
+            D[i].append(best)
+
+    return D[-1][-1], backlinks.get
+
+
+def align_blocks_by_diagonals(source_sentences, target_sentences, params = LanguageIndependent, band = None):
+    """The C{numpy} version of L{align_blocks}, which has the same parameters.
+
+    The cells of the anti-diagonal C{d} are the cells of C{i} source and C{d - i}
+    target sentences, they are stored in arrays indexed by C{i}. The index of the
+    alignment type which leads to each cell is stored as an C{int8}.
+    """
+    if band is not None and band < 1:
+        raise ValueError("band should be at least 1")
+    return _align_within_band(_align_diagonals, source_sentences, target_sentences, params, band)
 
-    return trace(backlinks, source_sentences, target_sentences)
 
+def _align_diagonals(source_sentences, target_sentences, params, band):
+    """The dynamic program of L{align_blocks_by_diagonals}.
 
-def align_texts(source_blocks, target_blocks, params = LanguageIndependent):
+    @return: The log probability of the best alignment of all sentences and the backlinks.
+    """
+    alignment_types = alignment_types_of(params)
+    fallback = alignment_types.index((1, 1))
+    history = max([a[0] + a[1] for a in alignment_types])
+    num_source, num_target = len(source_sentences), len(target_sentences)
+    source_ends = numpy.concatenate(([0], numpy.cumsum(source_sentences))).astype(float)
+    target_ends = numpy.concatenate(([0], numpy.cumsum(target_sentences))).astype(float)
+    log_priors = [math.log(params.PRIORS[a]) for a in alignment_types]
+
+    # the arrays of the last anti-diagonals are offset by the largest number of source
+    # sentences in an alignment, so that cells with fewer source sentences are -inf
+    offset = max([a[0] for a in alignment_types])
+    empty = numpy.empty(num_source + 1 + offset)
+    empty.fill(-infinity)
+    diagonals = [empty] * history
+    bounds, backlinks = [], []
+
+    old_settings = numpy.seterr(divide = 'ignore', invalid = 'ignore', over = 'ignore')
+    try:
+        for d in range(num_source + num_target + 1):
+            low, high = max(0, d - num_target), min(num_source, d)
+            if band is not None:
+                # i * (num_source + num_target) is within band * num_source of d * num_source
+                low = max(low, -int((band - d) * num_source // (num_source + num_target)))
+                high = min(high, int((d + band) * num_source // (num_source + num_target)))
+            diagonal = empty.copy()
+            bounds.append(low)
+            if high < low:
+                backlinks.append(numpy.zeros(0, numpy.int8))
+                diagonals = diagonals[1:] + [diagonal]
+                continue
+            i = numpy.arange(low, high + 1)
+            j = d - i
+            candidates = numpy.empty((len(alignment_types), len(i)))
+            for index, a in enumerate(alignment_types):
+                previous = diagonals[-(a[0] + a[1])][i - a[0] + offset]
+                l_s = source_ends[i] - source_ends[numpy.maximum(i - a[0], 0)]
+                l_t = target_ends[j] - target_ends[numpy.maximum(j - a[1], 0)]
+                m = (l_s + l_t / params.AVERAGE_CHARACTERS) / 2
+                delta = (l_t - l_s * params.AVERAGE_CHARACTERS) / numpy.sqrt(m * params.VARIANCE_CHARACTERS)
+                delta[m == 0] = infinity
+                log_p = log_erfcc(delta / math.sqrt(2), numpy.log, numpy.exp) + log_priors[index]
+                candidates[index] = numpy.where(j >= a[1], previous + log_p, -infinity)
+            best_types = numpy.argmax(candidates, axis = 0)
+            best = candidates[best_types, numpy.arange(len(i))]
+            if d == 0:
+                best[0] = 0.
+            best_types[best == -infinity] = fallback
+            diagonal[i + offset] = best
+            backlinks.append(best_types.astype(numpy.int8))
+            diagonals = diagonals[1:] + [diagonal]
+    finally:
+        numpy.seterr(**old_settings)
+
+    def backlink(pos):
+        d = pos[0] + pos[1]
+        index = pos[0] - bounds[d]
+        if index < 0 or index >= len(backlinks[d]):
+            return alignment_types[fallback]
+        return alignment_types[backlinks[d][index]]
+
+    return diagonals[-1][num_source + offset], backlink
+
+
+def align_texts(source_blocks, target_blocks, params = LanguageIndependent, band = None):
     """Creates the sentence alignment of two texts.
 
     Texts can consist of several blocks. Block boundaries cannot be crossed by sentence 
@@ -161,13 +344,14 @@ def align_texts(source_blocks, target_blocks, params = LanguageIndependent):
     @param source_blocks: The list of blocks in the source text.
     @param target_blocks: The list of blocks in the target text.
     @param params: the sentence alignment parameters.
+    @param band: the maximum distance of an alignment from the diagonal of a block, see L{align_blocks}.
 
     @returns: A list of sentence alignment lists
     """
     if len(source_blocks) != len(target_blocks):
         raise ValueError("Source and target texts do not have the same number of blocks.")
     
-    return [align_blocks(source_block, target_block, params) 
+    return [align_blocks(source_block, target_block, params, band) 
             for source_block, target_block in zip(source_blocks, target_blocks)]
 
 
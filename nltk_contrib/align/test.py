@@ -118,6 +118,29 @@ def demo():
     for alignment in top_down_alignments:
         print "Top down align: %s" % alignment
 
+def benchmark(sizes=[100, 200, 400, 800], band_width=10):
+    """
+    Compares the time taken to align synthetic hard regions of each of the sizes
+    without a band and memoisation, as the aligner used to, with memoisation, and
+    with a band of band_width sentences and memoisation.
+    """
+    import random
+    import time
+    
+    random.seed(0)
+    settings = [('full', None, False), ('memoised', None, True), ('banded', band_width, True)]
+    for size in sizes:
+        x = [random.randint(20, 200) for i in range(size)]
+        y = [max(1, int(random.gauss(length, 0.1 * length))) for length in x]
+        timings = []
+        for (name, width, memoise) in settings:
+            gc = align.GaleChurchAligner(distance_measures.two_side_distance, 'original', 
+                                            'bead_objects', band_width=width, memoise=memoise)
+            start = time.time()
+            gc._seq_align(x, y, size, size)
+            timings.append("%s %.2fs" % (name, time.time() - start))
+        print "%d sentences: %s" % (size, ', '.join(timings))
+
 def madame_bovary_test(source_file, target_file, source_pickle_file, target_pickle_file):
     
     source_plaintext_reader = plaintext.PlaintextCorpusReader('', 
@@ -144,6 +167,10 @@ def madame_bovary_test(source_file, target_file, source_pickle_file, target_pick
     top_down_alignments = std.recursive_align(source_chapter, target_chapter, [])  
         
 if __name__=='__main__':
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+        sys.exit()
+    
     demo()    
     
     # usage: python test2.py data/chapter1_madame_bovary_fr.txt data/chapter1_madame_bovary_en.txt fr en
@@ -35,11 +35,29 @@ class Classifier:
             instances.convert_to_float(self.attributes.continuous_attribute_indices())
         
     def validate_training(self):
-        if not self.training.are_valid(self.klass, self.attributes): 
+        self.validate(self.training)
+        
+    def validate(self, training):
+        if not training.are_valid(self.klass, self.attributes): 
             raise inv.InvalidDataError('Training data invalid.')
         if not self.can_handle_continuous_attributes() and self.attributes.has_continuous(): 
             raise inv.InvalidDataError('One or more attributes are continuous.')
     
+    def update(self, training):
+        """
+        Continues training with another chunk of training instances, only supported
+        by classifiers which can be trained incrementally
+        """
+        if not self.can_train_incrementally():
+            raise ise.IllegalStateError(self.__class__.__name__ + ' cannot be trained incrementally')
+        self.convert_continuous_values_to_numbers(training)
+        if not self.do_not_validate:
+            self.validate(training)
+        self.add_training(training)
+    
+    def add_training(self, training):
+        raise NotImplementedError('add_training called on abstract class')
+    
     @check_if_trained
     def test(self, test_instances):
         self.convert_continuous_values_to_numbers(test_instances)
@@ -60,25 +78,87 @@ class Classifier:
     def is_trained(self):
         AssertionError('is_trained called on abstract class')
     
+    def model(self):
+        """
+        Returns the state of the trained classifier, which is needed to classify instances,
+        as a dictionary of built in types, the training instances are not part of the model
+        unless they are needed to classify
+        """
+        raise NotImplementedError('model called on abstract class')
+        
+    def restore(self, model):
+        """
+        Sets the state of the classifier from a @param model returned by model, the classifier
+        can classify instances once it has been restored
+        """
+        raise NotImplementedError('restore called on abstract class')
+    
     @classmethod
     def can_handle_continuous_attributes(klass):
         return False
     
+    @classmethod
+    def can_train_incrementally(klass):
+        return False
+    
     def set_options(self, options):
         self.options = options
 
+def train_incrementally(algorithm, chunks, attributes, klass):
+    """
+    Trains a classifier on training instances which are read in chunks, eg: from a file which
+    does not fit in memory. Each chunk is used once and can be discarded afterwards.
+    @param algorithm: a classifier class which can be trained incrementally
+    """
+    chunks = iter(chunks)
+    try:
+        first = chunks.next()
+    except StopIteration:
+        raise inv.InvalidDataError('No training instances found.')
+    classifier = algorithm(first, attributes, klass)
+    classifier.train()
+    for chunk in chunks:
+        classifier.update(chunk)
+    classifier.training = None
+    return classifier
+
 def split_ignore_space(comma_sep_string):
     return [name.strip() for name in comma_sep_string.split(',')]
 
 def min_entropy_breakpoint(values):
+    """
+    Returns the position after which @param values should be split so that the sum of
+    the entropies of both parts is minimum, along with that sum. The counts of values
+    in each part are updated as the position moves, so the values are only read once.
+    """
     position, min_entropy = 0, None
+    first, second = {}, {}
+    for value in values:
+        second[value] = second.get(value, 0) + 1
     for index in range(len(values) -1):
-        first, second = values[:index + 1], values[index + 1:]
-        e = entropy(first) + entropy(second)
+        value = values[index]
+        first[value] = first.get(value, 0) + 1
+        second[value] -= 1
+        e = entropy_of_counts(first.values()) + entropy_of_counts(second.values())
         if min_entropy is None: min_entropy = e
         if e < min_entropy: min_entropy, position = e, index
     return [position, min_entropy]
     
+def entropy_of_counts(counts):
+    """
+    Returns the same entropy as entropy_of_freq_dist for a frequency distribution
+    with the given counts of samples
+    """
+    counts = [count for count in counts if count != 0]
+    counts.sort(reverse=True)
+    total, sum = 0, 0
+    for count in counts: total += count
+    for count in counts:
+        freq = float(count) / total
+        sum += (freq * math.log(freq, 2))
+    if sum == 0: return 0
+    return sum *  -1
+    
 def entropy(values):
     freq_dist = prob.FreqDist()
     for value in values: freq_dist.inc(value)
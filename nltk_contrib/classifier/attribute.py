@@ -58,9 +58,51 @@ class Attribute:
     def __hash__(self):
         return hash(self.name) + hash(self.index)        
             
+class ValueDictionary:
+    """
+    Codes the values of a discrete attribute or of the class as integers.
+    Declared values get the codes 0 to n-1 in order of declaration, other
+    values get codes as they are encountered.
+    """
+    def __init__(self, values):
+        self.values = list(values)
+        self.declared = len(self.values)
+        self.codes = dict([(self.values[index], index) for index in range(len(self.values))])
+        
+    def code(self, value):
+        if value not in self.codes:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return self.codes[value]
+    
+    def codes_of(self, values):
+        get = self.codes.get
+        codes = [get(value) for value in values]
+        if None in codes:
+            codes = [self.code(value) for value in values]
+        return codes
+        
+    def value(self, code):
+        return self.values[code]
+    
+    def has_declared(self, values):
+        return self.values[:self.declared] == list(values)
+
 class Attributes(UserList.UserList):
     def __init__(self, attributes = []):
         self.data = attributes
+        self.dictionaries = {}
+        
+    def value_dictionary(self, name, values):
+        """
+        Returns the dictionary which codes the values of the attribute called @param name,
+        the class values are coded by the dictionary with the name None.
+        Dictionaries are shared by all the instances stored in columns using these attributes,
+        a new one is created when the values have changed, eg: after discretisation
+        """
+        if name not in self.dictionaries or not self.dictionaries[name].has_declared(values):
+            self.dictionaries[name] = ValueDictionary(values)
+        return self.dictionaries[name]
 
     def has_values(self, test_values):
         if len(test_values) != len(self): return False
@@ -7,7 +7,7 @@
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
 from nltk_contrib.classifier.exceptions import filenotfounderror as fnf, invaliddataerror as inv
-import os, os.path
+import os, os.path, mmap
 
 DOT = '.'
 
@@ -16,16 +16,28 @@ class File:
         self.path = path + DOT + extension
         
     def for_each_line(self, method):
+        return [method(line) for line in self.lines()]
+    
+    def lines(self, use_mmap = False):
+        """
+        Iterates over the lines which are not empty once comments are removed,
+        the file can be memory mapped instead of being read through a buffer
+        """
         self.__check_for_existence()
-        fil = open(self.path, 'r')
-        returned = []
-        for line in fil:
-            filtered = filter_comments(line)
-            if len(filtered) == 0:
-                continue
-            returned.append(method(filtered))
-        fil.close()
-        return returned
+        fil, mapped = open(self.path, 'r'), None
+        try:
+            source = fil
+            if use_mmap and os.path.getsize(self.path) > 0:
+                mapped = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ)
+                source = iter(mapped.readline, '')
+            for line in source:
+                filtered = filter_comments(line)
+                if len(filtered) == 0:
+                    continue
+                yield filtered
+        finally:
+            if mapped is not None: mapped.close()
+            fil.close()
 
     def __check_for_existence(self):
         if not os.path.isfile(self.path): 
@@ -42,9 +54,9 @@ class File:
         fil = open(self.path, 'w')
         fil.close()
         
-    def write(self, lines):
+    def write(self, lines, append = False):
         self.__check_for_existence()
-        fil = open(self.path, 'w')
+        fil = open(self.path, append and 'a' or 'w')
         for line in lines:
             fil.write(line)
             fil.write('\n')
@@ -1,5 +1,5 @@
 from nltk_contrib.classifier import commandline as cl
-from nltk_contrib.classifier import oner, zeror, decisiontree, format, naivebayes, knn
+from nltk_contrib.classifier import oner, zeror, decisiontree, format, naivebayes, knn, parallel, model, columnar, train_incrementally
 import sys
 
 a_help = "Selects the classification algorithm                  " \
@@ -56,9 +56,34 @@ w_help = "Writes resulting gold file with a modified base name  " \
 c_help = "Classify by using a cross validation dataset with the " \
          "specified fold.                                       "
          
+s_help = "Reads the training, test or gold files in chunks of the " \
+         "specified number of instances and trains in a single " \
+         "pass, for files which do not fit in memory. Only for  " \
+         "0R, 1R and NB, cannot be used with cross validation. "
+
+M_help = "Memory maps the files which are read in chunks, used  " \
+         "with the chunk size option. Takes no value.           "
+
+m_help = "Writes the model of the trained classifier to the     " \
+         "specified file, so that it can classify instances    " \
+         "without being trained again.                          "
+
+i_help = "Reads the model of a trained classifier from the      " \
+         "specified file instead of training a classifier. The " \
+         "algorithm and training file are taken from the model." \
+         "Cannot be used with cross validation.                 "
+
 o_help = "Classifier options                                    " \
-         " Decision Tree: IG - Max Information Gain             " \
-         "                GR - Max Gain Ratio                   "
+         " Decision Tree: comma separated list of               " \
+         "      IG    - Max Information Gain                    " \
+         "      GR    - Max Gain Ratio                          " \
+         "      D<n>  - Maximum depth of the tree               " \
+         "      L<n>  - Minimum instances to split a branch     " \
+         " IB1: comma separated list of                         " \
+         "      <k> - Number of nearest neighbours              " \
+         "      W   - Weight votes by inverse distance          " \
+         "      N   - Normalise continuous attributes           " \
+         "      KD  - Use a kd-tree for continuous attributes   "
 
 ZERO_R = '0R'
 ONE_R = '1R'
@@ -77,6 +102,10 @@ PRECISION='precision'
 RECALL='recall'
 WRITE='write'
 CROSS_VALIDATION='cross_validation'
+CHUNK_SIZE='chunk_size'
+MEMORY_MAP='memory_map'
+MODEL_OUT='model_out'
+MODEL_IN='model_in'
 
 class Classify(cl.CommandLineInterface):    
     def __init__(self):
@@ -89,26 +118,52 @@ class Classify(cl.CommandLineInterface):
         self.add_option("-r", "--recall", dest=RECALL, action="store_true", default=False, help=r_help)
         self.add_option("-w", "--write", dest=WRITE, action="store_true", default=False, help=r_help)
         self.add_option("-c", "--cross-validation-fold", dest=CROSS_VALIDATION, type="string", help=c_help)
+        self.add_option("-s", "--chunk-size", dest=CHUNK_SIZE, type="int", help=s_help)
+        self.add_option("-M", "--memory-map", dest=MEMORY_MAP, action="store_true", default=False, help=M_help)
+        self.add_option("-m", "--model-out", dest=MODEL_OUT, type="string", help=m_help)
+        self.add_option("-i", "--model-in", dest=MODEL_IN, type="string", help=i_help)
+        self.add_jobs_option()
         
     def execute(self):
         cl.CommandLineInterface.execute(self)
-        self.validate_basic_arguments_are_present()
+        model_in, model_out = self.get_value(MODEL_IN), self.get_value(MODEL_OUT)
+        if model_in is None:
+            self.validate_basic_arguments_are_present()
         self.validate_files_arg_is_exclusive()
+        self.validate_jobs()
         cross_validation_fold = self.get_value(CROSS_VALIDATION)
+        if model_in is not None or model_out is not None:
+            self.validate_model_arguments(model_in, cross_validation_fold)
         if cross_validation_fold is None and self.files is None and self.test_path is None and self.gold_path is None:
             self.required_arguments_not_present_error()
         if self.test_path is not None and self.gold_path is not None:
             self.error('Invalid arguments. Test and gold files are mutually exclusive.')
         if self.files is None and self.test_path is not None and self.get_value(VERIFY):
             self.error('Invalid arguments. Cannot verify classification for test data.')
+        if self.algorithm == DECISION_TREE and self.options is not None and not DecisionTreeOptions(self.options).valid():
+            self.error('Invalid arguments. Cannot parse the decision tree options ' + self.options + '.')
         
         file_strategy = get_file_strategy(self.files, self.training_path, self.test_path, self.gold_path, self.get_value(VERIFY))
         self.training_path, self.test_path, self.gold_path = file_strategy.values()
         
-        training, attributes, klass, test, gold = self.get_instances(self.training_path, self.test_path, self.gold_path, cross_validation_fold is not None)
-        classifier = ALGORITHM_MAPPINGS[self.algorithm](training, attributes, klass)
-        classification_strategy = self.get_classification_strategy(classifier, test, gold, training, cross_validation_fold, attributes, klass)
-        classification_strategy.train()
+        classifier = None
+        if model_in is not None:
+            classifier = self.load_model(model_in)
+        chunk_size = self.get_value(CHUNK_SIZE)
+        if chunk_size is not None:
+            self.validate_chunked_arguments(chunk_size, cross_validation_fold, classifier is None)
+            classification_strategy = self.get_chunked_strategy(chunk_size, classifier)
+        elif classifier is not None:
+            test, gold = self.get_test_and_gold(self.test_path, self.gold_path, self.columnar_metadata(classifier))
+            classification_strategy = self.get_classification_strategy(classifier, test, gold, None, None, classifier.attributes, classifier.klass)
+        else:
+            training, attributes, klass, test, gold = self.get_instances(self.training_path, self.test_path, self.gold_path, cross_validation_fold is not None, cross_validation_fold is not None)
+            classifier = ALGORITHM_MAPPINGS[self.algorithm](training, attributes, klass)
+            classification_strategy = self.get_classification_strategy(classifier, test, gold, training, cross_validation_fold, attributes, klass)
+        if model_in is None:
+            classification_strategy.train()
+        if model_out is not None:
+            self.save_model(classification_strategy.classifier, model_out)
         self.log_common_params('Classification')
         classification_strategy.classify()
         classification_strategy.print_results(self.log, self.get_value(ACCURACY), self.get_value(ERROR), self.get_value(F_SCORE), self.get_value(PRECISION), self.get_value(RECALL))
@@ -118,22 +173,60 @@ class Classify(cl.CommandLineInterface):
     def get_classification_strategy(self, classifier, test, gold, training, cross_validation_fold, attributes, klass):
         if self.algorithm == DECISION_TREE: 
             classifier_options = DecisionTreeOptions(self.options)
+        elif self.algorithm == IB1 and self.options is not None:
+            classifier_options = IB1Options(self.options)
         else:
             classifier_options = NoOptions()
         
         if cross_validation_fold is not None:
-            return CrossValidationStrategy(self.algorithm, attributes, klass, training, cross_validation_fold, self.training_path, classifier_options)
+            return CrossValidationStrategy(self.algorithm, attributes, klass, training, cross_validation_fold, self.training_path, classifier_options, self.jobs)
         if test is not None:
             return TestStrategy(classifier, test, self.test_path, classifier_options)
         return VerifyStrategy(classifier, gold, self.gold_path, classifier_options)
 
+    def get_chunked_strategy(self, chunk_size, classifier = None):
+        return ChunkedStrategy(self.algorithm, self.data_format, self.training_path, self.test_path, self.gold_path, \
+                               chunk_size, self.get_value(MEMORY_MAP), self.get_value(WRITE), '-c_' + self.algorithm, classifier)
+
+    def validate_chunked_arguments(self, chunk_size, cross_validation_fold, is_trained_on_chunks = True):
+        if chunk_size < 1:
+            self.error('Invalid arguments. Chunk size should be a positive number.')
+        if cross_validation_fold is not None:
+            self.error('Invalid arguments. Cross validation cannot be performed on chunks.')
+        if is_trained_on_chunks and not ALGORITHM_MAPPINGS[self.algorithm].can_train_incrementally():
+            self.error('Invalid arguments. ' + self.algorithm + ' cannot be trained on chunks.')
+            
+    def validate_model_arguments(self, model_in, cross_validation_fold):
+        if cross_validation_fold is not None:
+            self.error('Invalid arguments. Models cannot be used with cross validation.')
+        if model_in is not None and self.training_path is not None:
+            self.error('Invalid arguments. A training file cannot be used with a model.')
+            
+    def load_model(self, path):
+        """
+        Loads the classifier from the model at @param path, the algorithm is the one of the model
+        """
+        classifier = model.load(path)
+        for algorithm in ALGORITHM_MAPPINGS:
+            if ALGORITHM_MAPPINGS[algorithm] is classifier.__class__:
+                self.algorithm = algorithm
+        return classifier
+        
+    def save_model(self, classifier, path):
+        model.save(classifier, path)
+        print >>self.log, 'Model written to ' + path + ' file.'
+        
+    def columnar_metadata(self, classifier):
+        if columnar.numpy is None: return None
+        return (classifier.attributes, classifier.klass)
+
 def get_file_strategy(files, training, test, gold, verify):
     if files is not None:
         return CommonBaseNameStrategy(files, verify)
     return ExplicitNamesStrategy(training, test, gold)    
 
 class CrossValidationStrategy:
-    def __init__(self, algorithm, attributes, klass, training, fold, training_path, classifier_options):
+    def __init__(self, algorithm, attributes, klass, training, fold, training_path, classifier_options, jobs = 1):
         self.algorithm = algorithm
         self.training = training
         self.fold = fold
@@ -143,15 +236,22 @@ class CrossValidationStrategy:
         self.attributes = attributes
         self.training_path = training_path
         self.classifier_options = classifier_options
+        self.jobs = jobs
 
     def classify(self):
+        """
+        The folds are verified in parallel when more than one job is used, the classifications
+        made by the worker processes are copied to the gold instances of each fold
+        """
         datasets = self.training.cross_validation_datasets(self.fold)
-        for each in datasets:
-            classifier = ALGORITHM_MAPPINGS[self.algorithm](each[0], self.attributes, self.klass)
-            self.classifier_options.set_options(classifier)
-            classifier.train()
-            self.confusion_matrices.append(classifier.verify(each[1]))
-            self.gold_instances.append(classifier.gold_instances)
+        results = parallel.run_tasks(verify_fold, (self, datasets), range(len(datasets)), self.jobs)
+        for index in range(len(datasets)):
+            confusion_matrix, classified_klasses = results[index]
+            gold = datasets[index][1]
+            for position in range(len(gold)):
+                gold[position].classified_klass = classified_klasses[position]
+            self.confusion_matrices.append(confusion_matrix)
+            self.gold_instances.append(gold)
         
     def print_results(self, log, accuracy, error, fscore, precision, recall):
         self.__print_value(log, accuracy, ACCURACY, 'Accuracy')
@@ -178,6 +278,15 @@ class CrossValidationStrategy:
         #do Nothing
         pass
 
+def verify_fold(shared, index):
+    strategy, datasets = shared
+    training, gold = datasets[index]
+    classifier = ALGORITHM_MAPPINGS[strategy.algorithm](training, strategy.attributes, strategy.klass)
+    strategy.classifier_options.set_options(classifier)
+    classifier.train()
+    confusion_matrix = classifier.verify(gold)
+    return confusion_matrix, [instance.classified_klass for instance in gold]
+
 class TestStrategy:
     def __init__(self, classifier, test, test_path, classifier_options):
         self.classifier = classifier
@@ -233,6 +342,62 @@ class VerifyStrategy:
     def train(self):
         self.classifier.train()
     
+class ChunkedStrategy:
+    """
+    Trains and classifies in a single pass over files which are read in chunks, classified
+    chunks are written out as soon as they are classified
+    """
+    def __init__(self, algorithm, data_format, training_path, test_path, gold_path, chunk_size, use_mmap, should_write, suffix, classifier = None):
+        """
+        @param classifier: a trained classifier, eg: loaded from a model, which is used instead
+        of training a new one
+        """
+        self.algorithm, self.data_format = algorithm, data_format
+        self.training_path, self.test_path, self.gold_path = training_path, test_path, gold_path
+        self.chunk_size, self.use_mmap = chunk_size, use_mmap
+        self.should_write, self.suffix = should_write, suffix
+        if classifier is None:
+            self.metadata = data_format.metadata(training_path)
+        else:
+            self.metadata = (classifier.attributes, classifier.klass)
+        self.classifier, self.confusion_matrix, self.written = classifier, None, None
+        
+    def train(self):
+        chunks = self.data_format.training_chunks(self.training_path, self.metadata, self.chunk_size, self.use_mmap)
+        self.classifier = train_incrementally(ALGORITHM_MAPPINGS[self.algorithm], chunks, *self.metadata)
+        
+    def classify(self):
+        if self.test_path is not None:
+            chunks = self.data_format.test_chunks(self.test_path, self.metadata, self.chunk_size, self.use_mmap)
+            for index, chunk in enumerate(chunks):
+                self.classifier.test(chunk)
+                self.written = self.data_format.write_test(chunk, self.test_path + self.suffix, append = index > 0)
+            return
+        chunks = self.data_format.gold_chunks(self.gold_path, self.metadata, self.chunk_size, self.use_mmap)
+        for index, chunk in enumerate(chunks):
+            confusion_matrix = self.classifier.verify(chunk)
+            if self.confusion_matrix is None: self.confusion_matrix = confusion_matrix
+            else: self.confusion_matrix.add(confusion_matrix)
+            if self.should_write:
+                self.written = self.data_format.write_gold(chunk, self.gold_path + self.suffix, append = index > 0)
+        
+    def print_results(self, log, accuracy, error, fscore, precision, recall):
+        if self.confusion_matrix is None: return
+        for is_true, attribute, str_repn in [(accuracy, ACCURACY, 'Accuracy'), (error, ERROR, 'Error'), (fscore, F_SCORE, 'F-score'), \
+                                             (precision, PRECISION, 'Precision'), (recall, RECALL, 'Recall')]:
+            if is_true: 
+                print >>log, str_repn + ': ' + getattr(self.confusion_matrix, attribute)().__str__()
+                
+    def write(self, log, should_write, data_format, suffix):
+        """
+        Chunks are written while they are classified
+        """
+        if self.written is None: return
+        if self.test_path is not None:
+            print >>log, 'Test classification written to ' + self.test_path + self.suffix + ' file.'
+        else:
+            print >>log, 'Gold classification written to ' + self.gold_path + self.suffix + ' file.'
+
 class CommonBaseNameStrategy:
     def __init__(self, files, verify):
         self.files = files
@@ -257,18 +422,57 @@ class ExplicitNamesStrategy:
                 
 class DecisionTreeOptions:
     VALID = {'IG': 'maximum_information_gain', 'GR': 'maximum_gain_ratio'}
+    LIMITS = {'D': 'max_depth', 'L': 'min_leaf'}
     
     def __init__(self, options):
         self.options = options
         
+    def values(self):
+        """
+        Returns the metric and a dictionary of the limits of the tree, eg: IG,D5,L10
+        The default metric is used when only limits are given. Returns None if
+        any of the options cannot be parsed.
+        """
+        metric, limits = None, {}
+        if self.options is None: return metric, limits
+        for option in [each.strip() for each in self.options.split(',')]:
+            if option in self.VALID:
+                metric = self.VALID[option]
+            elif option[:1] in self.LIMITS and option[1:].isdigit() and int(option[1:]) > 0:
+                limits[self.LIMITS[option[:1]]] = int(option[1:])
+            else:
+                return None
+        if metric is None:
+            metric = decisiontree.DecisionTree.DEFAULT_METRIC
+        return metric, limits
+        
     def valid(self):
-        if self.options not in self.VALID:
-            return False
-        return True
+        return self.options is not None and self.values() is not None
+        
+    def set_options(self, classifier):
+        if not self.valid(): return
+        metric, limits = self.values()
+        classifier.set_options(metric)
+        if len(limits) > 0:
+            classifier.set_limits(**limits)
+        
+class IB1Options:
+    VALID = {'W': 'weighted', 'N': 'normalise', 'KD': 'use_tree'}
+    
+    def __init__(self, options):
+        self.options = options
+        
+    def values(self):
+        values = {}
+        for option in [each.strip() for each in self.options.split(',')]:
+            if option.isdigit() and int(option) > 0:
+                values['k'] = int(option)
+            elif option in self.VALID:
+                values[self.VALID[option]] = True
+        return values
         
     def set_options(self, classifier):
-        if self.valid():
-            classifier.set_options(self.VALID[self.options])
+        classifier.set_options(self.values())
         
 class NoOptions:
         
@@ -0,0 +1,445 @@
+# Natural Language Toolkit - Columnar Instances
+#  Stores instances as columns of numbers instead of lists of strings
+#     Discrete values and classes are coded as integers using the value
+#     dictionaries shared through the attributes, continuous values are
+#     stored as floats. Instances are views on the rows of the columns, so
+#     that the algorithms can use them like any other instances.
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+
+from nltk_contrib.classifier import instance as ins, instances as inss, numrange as r, util
+from nltk_contrib.classifier.exceptions import systemerror as system, invaliddataerror as inv
+from nltk import probability as prob
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NONE = -1
+KLASS = None
+# number of rows converted at a time while loading
+CHUNK_SIZE = 10000
+
+class ColumnStore:
+    """
+    Holds the attribute values of a dataset in columns, one for each attribute,
+    along with a column of class codes
+    """
+    def __init__(self, attributes, klass):
+        if numpy is None:
+            raise system.SystemError('Columnar instances cannot be created as numpy is not installed.')
+        self.attributes = attributes
+        self.klass_dictionary = attributes.value_dictionary(KLASS, klass)
+        self.dictionaries = []
+        for attribute in attributes:
+            if attribute.is_continuous():
+                self.dictionaries.append(None)
+            else:
+                self.dictionaries.append(attributes.value_dictionary(attribute.name, attribute.values))
+        self.columns = [array.array(self.__type_code(dictionary)) for dictionary in self.dictionaries]
+        self.klass_column = array.array('i')
+        self.size = 0
+
+    def __type_code(self, dictionary):
+        if dictionary is None: return 'd'
+        return 'i'
+
+    def append(self, values, klass_value = None):
+        """
+        Adds a row of attribute values as read from a file
+        """
+        self.extend([values], [klass_value])
+
+    def extend(self, rows, klass_values):
+        """
+        Adds rows of attribute values, the values are converted a column at a time
+        """
+        for values in rows:
+            if len(values) != len(self.columns):
+                raise inv.InvalidDataError('Expected ' + str(len(self.columns)) + ' attribute values but found ' + str(len(values)) + ' in ' + ','.join(values))
+        if len(rows) == 0: return
+        columns = zip(*rows)
+        for index in range(len(self.columns)):
+            dictionary = self.dictionaries[index]
+            if dictionary is None:
+                self.columns[index].extend(map(float, columns[index]))
+            else:
+                self.columns[index].extend(dictionary.codes_of(columns[index]))
+        self.klass_column.extend([self.klass_code(klass_value) for klass_value in klass_values])
+        self.size += len(rows)
+
+    def close(self):
+        """
+        Converts the columns into arrays once all rows have been added
+        """
+        self.columns = [as_numpy(column) for column in self.columns]
+        self.klass_column = as_numpy(self.klass_column)
+        return self
+
+    def klass_code(self, klass_value):
+        if klass_value is None: return NONE
+        return self.klass_dictionary.code(klass_value)
+
+    def klass_value(self, code):
+        if code == NONE: return None
+        return self.klass_dictionary.value(code)
+
+    def value(self, row, index):
+        dictionary = self.dictionaries[index]
+        if dictionary is None:
+            return float(self.columns[index][row])
+        return dictionary.value(self.columns[index][row])
+
+    def values(self, rows, index):
+        """
+        Returns the values of the attribute at @param index for @param rows as a list
+        """
+        column = self.columns[index][rows]
+        dictionary = self.dictionaries[index]
+        if dictionary is None:
+            return column.tolist()
+        return [dictionary.values[code] for code in column]
+
+    def are_valid(self, rows, attributes, klass = None):
+        if len(attributes) != len(self.columns): return False
+        for index in range(len(self.columns)):
+            dictionary = self.dictionaries[index]
+            if dictionary is None: continue
+            if len(rows) > 0 and self.columns[index][rows].max() >= dictionary.declared: return False
+        if klass is not None:
+            codes = [self.klass_dictionary.codes[value] for value in klass if value in self.klass_dictionary.codes]
+            if not numpy.in1d(self.klass_column[rows], codes).all(): return False
+        return True
+
+    def discretise(self, discretised_attributes):
+        """
+        Replaces the continuous values of the discretised attributes by the codes
+        of the ranges they fall in. Each distinct value is mapped only once.
+        """
+        for discretised_attribute in discretised_attributes:
+            index = discretised_attribute.index
+            if self.dictionaries[index] is not None:
+                raise inv.InvalidDataError('Cannot discretise non continuous attribute ' + discretised_attribute.name)
+            dictionary = self.attributes.value_dictionary(discretised_attribute.name, discretised_attribute.values)
+            distinct, inverse = numpy.unique(self.columns[index], return_inverse = True)
+            codes = numpy.array([dictionary.code(discretised_attribute.mapping(value)) for value in distinct.tolist()], dtype=numpy.int32)
+            self.columns[index] = codes[inverse].astype(numpy.int32)
+            self.dictionaries[index] = dictionary
+
+    def remove_attributes(self, attributes):
+        to_be_removed = [attribute.index for attribute in attributes]
+        to_be_removed.sort()
+        to_be_removed.reverse()
+        for index in to_be_removed:
+            del self.columns[index]
+            del self.dictionaries[index]
+
+def as_numpy(column):
+    if column.typecode == 'd':
+        return numpy.frombuffer(column, dtype=numpy.float64).copy()
+    return numpy.frombuffer(column, dtype=numpy.dtype('i%d' % column.itemsize)).astype(numpy.int32)
+
+class InstanceView(object):
+    """
+    Thin object view of a row in a ColumnStore, values are decoded when asked for.
+    The classified class is stored in the instances the view belongs to.
+    """
+    def __init__(self, instances, position):
+        self.instances, self.position = instances, position
+
+    def __row(self):
+        return self.instances.rows[self.position]
+
+    def value(self, attribute):
+        return self.instances.store.value(self.__row(), attribute.index)
+
+    def values(self, attributes):
+        return [self.value(attribute) for attribute in attributes]
+
+    def __attrs(self):
+        store, row = self.instances.store, self.__row()
+        return [store.value(row, index) for index in range(len(store.columns))]
+    attrs = property(__attrs)
+
+    def __klass_value(self):
+        store = self.instances.store
+        return store.klass_value(store.klass_column[self.__row()])
+    klass_value = property(__klass_value)
+
+    def __get_classified_klass(self):
+        return self.instances.store.klass_value(self.instances.classified[self.position])
+
+    def __set_classified_klass(self, klass_value):
+        self.instances.classified[self.position] = self.instances.store.klass_code(klass_value)
+    classified_klass = property(__get_classified_klass, __set_classified_klass)
+
+    def __str__(self):
+        return ins.Instance.__str__(self)
+
+    def convert_to_float(self, indices):
+        """
+        Continuous values are always stored as floats
+        """
+
+    def discretise(self, discretised_attributes):
+        raise system.SystemError('Instances stored in columns can only be discretised all at once.')
+
+    def remove_attributes(self, attributes):
+        raise system.SystemError('Attributes of instances stored in columns can only be removed all at once.')
+
+class TrainingInstanceView(InstanceView, ins.TrainingInstance):
+    pass
+
+class TestInstanceView(InstanceView, ins.TestInstance):
+    pass
+
+class GoldInstanceView(InstanceView, ins.GoldInstance):
+    pass
+
+class InstanceViews:
+    """
+    The sequence of instance views which serves as the data of columnar instances
+    """
+    def __init__(self, instances):
+        self.instances = instances
+
+    def __len__(self):
+        return len(self.instances.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[each] for each in range(*index.indices(len(self)))]
+        if index < 0: index += len(self)
+        if index < 0 or index >= len(self): raise IndexError(index)
+        return self.instances.VIEW(self.instances, index)
+
+    def __getslice__(self, start, stop):
+        return self[max(0, start):max(0, stop):]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.instances.VIEW(self.instances, index)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+class ColumnarInstances:
+    """
+    Instances which are views on the rows of a ColumnStore. Several instances can share
+    the same store, eg: the training and gold instances of cross validation datasets.
+    """
+    VIEW = None
+
+    def __init__(self, store, rows = None):
+        self.store = store
+        if rows is None: rows = numpy.arange(store.size)
+        self.set_rows(rows)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.classified = numpy.zeros(len(rows), dtype=numpy.int32) + NONE
+        self.data = InstanceViews(self)
+
+    def are_valid(self, klass, attributes):
+        return self.store.are_valid(self.rows, attributes)
+
+    def column(self, attribute):
+        """
+        Returns the floats or the dictionary codes of the values of @param attribute
+        """
+        return self.store.columns[attribute.index][self.rows]
+
+    def klass_codes(self):
+        return self.store.klass_column[self.rows]
+
+    def discretise(self, discretised_attributes):
+        """
+        Discretises the whole store, including rows shared with other instances
+        """
+        self.store.discretise(discretised_attributes)
+
+    def remove_attributes(self, attributes):
+        self.store.remove_attributes(attributes)
+
+    def convert_to_float(self, indices):
+        """
+        Continuous values are always stored as floats
+        """
+
+class ColumnarTrainingInstances(ColumnarInstances, inss.TrainingInstances):
+    VIEW = TrainingInstanceView
+
+    def __init__(self, store, rows = None):
+        ColumnarInstances.__init__(self, store, rows)
+        self.prior_probabilities = None
+
+    def are_valid(self, klass, attributes):
+        return self.store.are_valid(self.rows, attributes, klass)
+
+    def filter(self, attribute, attr_value):
+        column = self.column(attribute)
+        if attribute.is_continuous():
+            return ColumnarTrainingInstances(self.store, self.rows[column == attr_value])
+        dictionary = self.store.dictionaries[attribute.index]
+        if attr_value not in dictionary.codes:
+            return ColumnarTrainingInstances(self.store, self.rows[:0])
+        return ColumnarTrainingInstances(self.store, self.rows[column == dictionary.codes[attr_value]])
+
+    def partition(self, attribute):
+        """
+        Returns a view for each value of a discrete @param attribute which occurs in the
+        rows, the rows are grouped by a single stable sort of their codes
+        """
+        column = self.column(attribute)
+        if attribute.is_continuous():
+            return dict([(value, self.filter(attribute, value)) for value in numpy.unique(column)])
+        order = numpy.argsort(column, kind='mergesort')
+        codes, starts = numpy.unique(column[order], return_index=True)
+        bounds = list(starts[1:]) + [len(order)]
+        values = self.store.dictionaries[attribute.index].values
+        return dict([(values[codes[index]], ColumnarTrainingInstances(self.store, self.rows[order[starts[index]:bounds[index]]])) \
+                     for index in range(len(codes))])
+
+    def value_ranges(self, attributes):
+        ranges = []
+        for attribute in attributes:
+            if not attribute.is_continuous():
+                raise inv.InvalidDataError('Cannot discretise non continuous attribute ' + attribute.name)
+        for attribute in attributes:
+            column = self.column(attribute)
+            ranges.append(r.Range(float(column.min()), float(column.max()), True))
+        return ranges
+
+    def values_grouped_by_attribute(self, attributes):
+        return [self.store.values(self.rows, attribute.index) for attribute in attributes]
+
+    def klass_values(self):
+        codes = self.klass_codes()
+        return [self.store.klass_value(code) for code in codes]
+
+    def attribute_values(self, attribute):
+        return self.store.values(self.rows, attribute.index)
+
+    def sort_by(self, attribute):
+        column = self.column(attribute)
+        dictionary = self.store.dictionaries[attribute.index]
+        if dictionary is not None:
+            column = value_ranks(dictionary.values)[column]
+        self.set_rows(self.rows[numpy.argsort(column, kind='mergesort')])
+
+    def stratified_bunches(self, fold):
+        self.set_rows(self.rows[numpy.argsort(value_ranks(self.store.klass_dictionary.values)[self.klass_codes()], kind='mergesort')])
+        return [list(self[index::fold]) for index in range(fold)]
+
+    def cross_validation_datasets(self, fold):
+        """
+        The training and gold instances of each dataset are views on the rows of the
+        same store, only their classifications are kept separately
+        """
+        if fold > len(self): fold = len(self) / 2
+        self.stratified_bunches(fold)
+        bunches = [self.rows[index::fold] for index in range(fold)]
+        datasets = []
+        for index in range(len(bunches)):
+            gold = ColumnarGoldInstances(self.store, bunches[index])
+            training = ColumnarTrainingInstances(self.store, numpy.concatenate(bunches[:index] + bunches[index + 1:]))
+            datasets.append((training, gold))
+        return datasets
+
+    def posterior_probablities(self, attributes, klass_values):
+        freq_dists = attributes.empty_freq_dists()
+        for attribute in attributes:
+            for value in attribute.values:
+                for klass_value in klass_values:
+                    freq_dists[attribute][value].inc(klass_value) #Laplacian smoothing
+        stat_list_values = {}
+        klass_codes = self.klass_codes()
+        for attribute in attributes:
+            if attribute.is_continuous():
+                column = self.column(attribute)
+                stat_list_values[attribute] = {}
+                for klass_value in klass_values:
+                    stat_list_values[attribute][klass_value] = util.StatList(column[klass_codes == self.store.klass_code(klass_value)].tolist())
+                continue
+            for value, klass_value, count in self.__value_klass_counts(attribute, klass_codes):
+                freq_dists[attribute][value].inc(klass_value, count)
+        return inss.PosteriorProbabilities(freq_dists, stat_list_values)
+
+    def __value_klass_counts(self, attribute, klass_codes):
+        """
+        Returns (attribute value, class value, count) triples for the combinations which occur
+        """
+        dictionary, klass_dictionary = self.store.dictionaries[attribute.index], self.store.klass_dictionary
+        num_klass_values = len(klass_dictionary.values)
+        counts = numpy.bincount(self.column(attribute) * num_klass_values + klass_codes, minlength = len(dictionary.values) * num_klass_values)
+        return [(dictionary.values[code / num_klass_values], klass_dictionary.values[code % num_klass_values], int(counts[code])) for code in numpy.flatnonzero(counts)]
+
+    def update_decision_stumps(self, decision_stumps):
+        klass_codes = self.klass_codes()
+        for decision_stump in decision_stumps:
+            if decision_stump.attribute.is_continuous():
+                for instance in self.data:
+                    decision_stump.update_count(instance)
+                continue
+            for value, klass_value, count in self.__value_klass_counts(decision_stump.attribute, klass_codes):
+                decision_stump.add_count(value, klass_value, count)
+
+    def class_freq_dist(self):
+        class_freq_dist = prob.FreqDist()
+        counts = numpy.bincount(self.klass_codes(), minlength = len(self.store.klass_dictionary.values))
+        for code in numpy.flatnonzero(counts):
+            class_freq_dist.inc(self.store.klass_value(code), int(counts[code]))
+        return class_freq_dist
+
+class ColumnarTestInstances(ColumnarInstances, inss.TestInstances):
+    VIEW = TestInstanceView
+
+class ColumnarGoldInstances(ColumnarInstances, inss.GoldInstances):
+    VIEW = GoldInstanceView
+
+def value_ranks(values):
+    """
+    Returns an array which maps codes to the rank of their values in sorted order
+    """
+    ranks = numpy.zeros(len(values), dtype=numpy.int32)
+    order = sorted(range(len(values)), key=lambda code: values[code])
+    ranks[order] = numpy.arange(len(values))
+    return ranks
+
+def training(rows, attributes, klass):
+    """
+    Returns training instances stored in columns
+    @param rows: an iterable of lists of attribute values with the class value at the end
+    """
+    return ColumnarTrainingInstances(load(rows, attributes, klass, True))
+
+def test(rows, attributes, klass):
+    return ColumnarTestInstances(load(rows, attributes, klass, False))
+
+def gold(rows, attributes, klass):
+    return ColumnarGoldInstances(load(rows, attributes, klass, True))
+
+def load(rows, attributes, klass, with_klass, chunk_size = CHUNK_SIZE):
+    store, chunk = ColumnStore(attributes, klass), []
+    for values in rows:
+        chunk.append(values)
+        if len(chunk) == chunk_size:
+            add_chunk(store, chunk, with_klass)
+            chunk = []
+    add_chunk(store, chunk, with_klass)
+    return store.close()
+
+def add_chunk(store, chunk, with_klass):
+    if with_klass:
+        store.extend([values[:-1] for values in chunk], [values[-1] for values in chunk])
+    else:
+        store.extend(chunk, [None] * len(chunk))
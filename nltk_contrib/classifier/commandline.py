@@ -6,13 +6,16 @@
 # This software is distributed under GPL, for license information see LICENSE.TXT
 from optparse import OptionParser
 from nltk_contrib.classifier.exceptions import filenotfounderror as fnf, invaliddataerror as inv
-from nltk_contrib.classifier import format
+from nltk_contrib.classifier import format, columnar
 import time
 
 D_help = "Used to specify the data format.                      " \
         + "Options: C45 for C4.5 format.                        " \
         + "Default: C45.                                        "
 l_help = "Used to specify the log file.                         "
+j_help = "Number of processes used to evaluate cross validation " \
+        + "folds or attribute subsets in parallel.              " \
+        + "Default: 1.                                          "
 
 
 ALGORITHM = 'algorithm'
@@ -23,6 +26,7 @@ GOLD = 'gold'
 DATA_FORMAT = 'data_format'
 LOG_FILE = 'log_file'
 OPTIONS = 'options'
+JOBS = 'jobs'
 
 C45_FORMAT = 'c45' 
 
@@ -43,6 +47,13 @@ class CommandLineInterface(OptionParser):
         self.add_option("-l", "--log-file", dest=LOG_FILE, type="string", help=l_help)
         self.add_option("-o", "--options", dest=OPTIONS, type="string", help=o_help)
         
+    def add_jobs_option(self):
+        """
+        Adds the jobs option, for the commands which run cross validation folds or
+        attribute subsets in parallel
+        """
+        self.add_option("-j", "--jobs", dest=JOBS, type="int", default=1, help=j_help)
+        
     def get_value(self, name):
         return self.values.ensure_value(name, None)
     
@@ -62,6 +73,7 @@ class CommandLineInterface(OptionParser):
         self.test_path = self.get_value(TEST)
         self.gold_path = self.get_value(GOLD)
         self.options = self.get_value(OPTIONS)
+        self.jobs = self.get_value(JOBS)
         self.data_format = DATA_FORMAT_MAPPINGS[self.get_value(DATA_FORMAT)]
         log_file = self.get_value(LOG_FILE)
         self.log = None
@@ -86,22 +98,40 @@ class CommandLineInterface(OptionParser):
         if self.files is not None and (self.training_path is not None or self.test_path is not None or self.gold_path is not None):
             self.error("Invalid arguments. The files argument cannot exist with training, test or gold arguments.")
 
-    def get_instances(self, training_path, test_path, gold_path, ignore_missing = False):
-        test = gold = None
-        training = self.data_format.training(training_path)
+    def validate_jobs(self):
+        if self.jobs is None or self.jobs < 1:
+            self.error("Invalid arguments. The number of jobs should be a positive number.")
+
+    def get_instances(self, training_path, test_path, gold_path, ignore_missing = False, as_columns = False):
+        """
+        @param as_columns: stores the instances in columns when numpy is available, so that
+        cross validation folds are views on the same rows instead of copies
+        """
         attributes, klass = self.data_format.metadata(training_path)
-        test = self.__get_instance(self.data_format.test, test_path, ignore_missing)
-        gold = self.__get_instance(self.data_format.gold, gold_path, ignore_missing)
+        metadata = None
+        if as_columns and columnar.numpy is not None:
+            metadata = (attributes, klass)
+        training = self.data_format.training(training_path, metadata)
+        test, gold = self.get_test_and_gold(test_path, gold_path, metadata, ignore_missing)
         return (training, attributes, klass, test, gold)
     
-    def __get_instance(self, method, path, ignore_if_missing):
+    def get_test_and_gold(self, test_path, gold_path, metadata = None, ignore_missing = False):
+        """
+        @param metadata: the tuple of attributes and class values, the instances are stored
+        in columns when it is given
+        """
+        test = self.__get_instance(self.data_format.test, test_path, ignore_missing, metadata)
+        gold = self.__get_instance(self.data_format.gold, gold_path, ignore_missing, metadata)
+        return (test, gold)
+    
+    def __get_instance(self, method, path, ignore_if_missing, metadata = None):
         if path is not None:
             if ignore_if_missing:
                 try:
-                    return method(path)
+                    return method(path, metadata)
                 except fnf.FileNotFoundError:
                     return None
-            return method(path)
+            return method(path, metadata)
         return None
 
     def required_arguments_not_present_error(self):
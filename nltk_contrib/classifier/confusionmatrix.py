@@ -19,6 +19,14 @@ class ConfusionMatrix:
     def count(self, actual, predicted):
         self.matrix[self.index[actual]][self.index[predicted]] += 1
         
+    def add(self, other):
+        """
+        Adds the counts of a confusion matrix for the same classes, eg: one for another chunk of gold instances
+        """
+        for actual in self.index:
+            for predicted in self.index:
+                self.matrix[self.index[actual]][self.index[predicted]] += other.matrix[other.index[actual]][other.index[predicted]]
+        
     def accuracy(self, index = 0):
         return self.__div(self.tp(index) + self.tn(index), self.tp(index) + self.fp(index) + self.fn(index) + self.tn(index))
         
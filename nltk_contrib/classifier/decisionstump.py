@@ -32,9 +32,12 @@ class DecisionStump:
             self.counts[value] = dictionary_of_values(klass)
             
     def update_count(self, instance):
-        attr_value = instance.value(self.attribute)
-        self.counts[attr_value][instance.klass_value] += 1
-        self.root[instance.klass_value] += 1
+        self.add_count(instance.value(self.attribute), instance.klass_value)
+        
+    def add_count(self, attr_value, klass_value, count = 1):
+        self.counts[attr_value][klass_value] += count
+        self.root[klass_value] += count
+        self.__safe_default = None
     
     def error(self):
         count_for_each_attr_value = self.counts.values()
@@ -116,6 +119,25 @@ class DecisionStump:
             _str += child.__str__()
         return _str
         
+    def state(self):
+        """
+        Returns the index of the attribute, the counts and the states of the children
+        as built in types, see model
+        """
+        children = dict([(value, child.state()) for value, child in self.children.items()])
+        return (self.attribute.index, self.counts, self.root, children)
+        
+def from_state(state, attributes, klass):
+    """
+    Creates the decision stump, and its children, from the @param state returned by DecisionStump.state
+    """
+    index, counts, root, children = state
+    stump = DecisionStump(attributes[index], klass)
+    stump.counts, stump.root = counts, root
+    for value in children:
+        stump.children[value] = from_state(children[value], attributes, klass)
+    return stump
+        
 def total_counts(dictionary_of_klass_freq):
     return sum([count for count in dictionary_of_klass_freq.values()])
         
@@ -6,28 +6,51 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import oner
+from nltk_contrib.classifier import oner, columnar, decisionstump as ds, Classifier
 
 class DecisionTree(oner.OneR):
+    """
+    The training instances are stored in columns when numpy is available, the counts
+    of the decision stumps at each node are then computed from histograms of the codes
+    of the instances which reach the node. The instances at a node are partitioned by
+    the values of the selected attribute in a single pass.
+    """
     DEFAULT_METRIC = 'maximum_information_gain'
     
-    def __init__(self, training, attributes, klass):
+    def __init__(self, training, attributes, klass, max_depth = None, min_leaf = 1):
         oner.OneR.__init__(self, training, attributes, klass)
         self.root = None
+        self.max_depth, self.min_leaf = max_depth, min_leaf
+        
+    def set_limits(self, max_depth = None, min_leaf = 1):
+        """
+        @param max_depth: the maximum number of levels of decision stumps, unlimited if None
+        @param min_leaf: the minimum number of instances an attribute value should have
+        for its branch to be split further
+        """
+        self.max_depth, self.min_leaf = max_depth, min_leaf
         
     def train(self):
-        oner.OneR.train(self)
-        self.root = self.build_tree(self.training, [])
+        Classifier.train(self)
+        self.root = self.build_tree(self.node_instances(self.training), [])
+        
+    def node_instances(self, training):
+        if columnar.numpy is None or hasattr(training, 'column'):
+            return training
+        return columnar.training([instance.attrs + [instance.klass_value] for instance in training], self.attributes, self.klass)
         
-    def build_tree(self, instances, used_attributes):
+    def build_tree(self, instances, used_attributes, depth = 0):
         decision_stump = self.best_decision_stump(instances, used_attributes, self.options or DecisionTree.DEFAULT_METRIC)
         if len(self.attributes) - len(used_attributes) == 1: return decision_stump
+        if self.max_depth is not None and depth + 1 >= self.max_depth: return decision_stump
         used_attributes.append(decision_stump.attribute)
+        partitions = instances.partition(decision_stump.attribute)
         for attr_value in decision_stump.attribute.values:
             if decision_stump.entropy(attr_value) == 0:
                 continue
-            new_instances = instances.filter(decision_stump.attribute, attr_value)
-            new_child = self.build_tree(new_instances, used_attributes)
+            if ds.total_counts(decision_stump.counts[attr_value]) < self.min_leaf:
+                continue
+            new_child = self.build_tree(partitions[attr_value], used_attributes, depth + 1)
             if new_child is not None: decision_stump.children[attr_value] = new_child
         return decision_stump
     
@@ -48,6 +71,17 @@ class DecisionTree(oner.OneR):
             if new > highest: highest, max_stump = new, decision_stump
         return max_stump
     
+    def model(self):
+        return {'root': self.root.state(), 'max_depth': self.max_depth, 'min_leaf': self.min_leaf}
+    
+    def restore(self, model):
+        self.root = ds.from_state(model['root'], self.attributes, self.klass)
+        self.set_limits(model['max_depth'], model['min_leaf'])
+    
+    @classmethod
+    def can_train_incrementally(self):
+        return False
+    
     def is_trained(self):
         return self.root is not None
         
@@ -6,7 +6,7 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 from nltk_contrib.classifier import split_ignore_space
-from nltk_contrib.classifier import format, cfile, commandline as cl, attribute as attr, classify as cy
+from nltk_contrib.classifier import format, cfile, commandline as cl, attribute as attr, classify as cy, parallel
 from nltk_contrib.classifier.exceptions import invaliddataerror as inv
 import copy
 
@@ -59,11 +59,13 @@ MIN_FOLD=2
 class FeatureSelect(cl.CommandLineInterface):
     def __init__(self):
         cl.CommandLineInterface.__init__(self, ALGORITHM_MAPPINGS.keys(), RANK, a_help, f_help, t_help, T_help, g_help, o_help)        
+        self.add_jobs_option()
         
     def execute(self):
         cl.CommandLineInterface.execute(self)
         self.validate_basic_arguments_are_present()
         self.validate_files_arg_is_exclusive()
+        self.validate_jobs()
         if self.options is None:
             self.required_arguments_not_present_error()
         self.split_options = split_ignore_space(self.options)
@@ -77,9 +79,9 @@ class FeatureSelect(cl.CommandLineInterface):
         if self.files is not None:
             self.training_path, self.test_path, self.gold_path = [self.files] * 3
             ignore_missing = True
-        training, attributes, klass, test, gold = self.get_instances(self.training_path, self.test_path, self.gold_path, ignore_missing)
+        training, attributes, klass, test, gold = self.get_instances(self.training_path, self.test_path, self.gold_path, ignore_missing, self.algorithm != RANK)
         self.log_common_params('FeatureSelection')
-        feature_sel = FeatureSelection(training, attributes, klass, test, gold, self.split_options)
+        feature_sel = FeatureSelection(training, attributes, klass, test, gold, self.split_options, self.jobs)
         getattr(feature_sel, ALGORITHM_MAPPINGS[self.algorithm])()
         
         files_written = self.write_to_file(self.get_suffix(), training, attributes, klass, test, gold, False)
@@ -93,9 +95,14 @@ class FeatureSelect(cl.CommandLineInterface):
         return suf
 
 class FeatureSelection:
-    def __init__(self, training, attributes, klass, test, gold, options):
+    def __init__(self, training, attributes, klass, test, gold, options, jobs = 1):
+        """
+        @param jobs: the number of processes used to evaluate the candidate attribute subsets
+        of the wrapper methods
+        """
         self.training, self.attributes, self.klass, self.test, self.gold = training, attributes, klass, test, gold
         self.options = options
+        self.jobs = jobs
         
     def by_rank(self):
         if self.attributes.has_continuous():
@@ -107,9 +114,7 @@ class FeatureSelection:
     
     def find_attributes_by_ranking(self, method, number):
         decision_stumps = self.attributes.empty_decision_stumps([], self.klass)
-        for decision_stump in decision_stumps:
-            for instance in self.training:
-                decision_stump.update_count(instance)
+        self.training.update_decision_stumps(decision_stumps)
         decision_stumps.sort(lambda x, y: cmp(getattr(x, method)(), getattr(y, method)()))
         
         if number > len(decision_stumps): number = len(decision_stumps)
@@ -134,14 +139,16 @@ class FeatureSelection:
         if selected is None or len(selected) == 0 or len(selected) == 1: return selected
         max_at_level, selections_with_max_acc, fold = -1, None, self.get_fold()
         datasets = self.training.cross_validation_datasets(fold)
-        selected_for_iter = selected[:]
-        for attribute in selected_for_iter:
-            selected.remove(attribute)
-            avg_accuracy = self.avg_accuracy_by_cross_validation(datasets, fold, attr.Attributes(selected))
-            if avg_accuracy > max_at_level:
-                max_at_level = avg_accuracy
-                selections_with_max_acc = selected[:]
-            selected.append(attribute)
+        candidates, remaining = [], selected[:]
+        for attribute in selected:
+            remaining.remove(attribute)
+            candidates.append(remaining[:])
+            remaining.append(attribute)
+        accuracies = self.avg_accuracies_by_cross_validation(datasets, fold, candidates)
+        for index in range(len(candidates)):
+            if accuracies[index] > max_at_level:
+                max_at_level = accuracies[index]
+                selections_with_max_acc = candidates[index]
         if max_at_level - max < delta: return selected
         return self.__eliminate_attributes(max_at_level, selections_with_max_acc, delta)
     
@@ -161,13 +168,11 @@ class FeatureSelection:
         if others is None or len(others) == 0: return selected
         max_at_level, attr_with_max_acc, fold = -1, None, self.get_fold()
         datasets = self.training.cross_validation_datasets(fold)
-        for attribute in others:
-            selected.append(attribute)
-            avg_accuracy = self.avg_accuracy_by_cross_validation(datasets, fold, attr.Attributes(selected))
-            if avg_accuracy > max_at_level:
-                max_at_level = avg_accuracy
-                attr_with_max_acc = attribute
-            selected.remove(attribute)
+        accuracies = self.avg_accuracies_by_cross_validation(datasets, fold, [selected + [attribute] for attribute in others])
+        for index in range(len(others)):
+            if accuracies[index] > max_at_level:
+                max_at_level = accuracies[index]
+                attr_with_max_acc = others[index]
         if max_at_level - max < delta: return selected
         
         selected.append(attr_with_max_acc)
@@ -182,6 +187,13 @@ class FeatureSelection:
             specified_fold = len(self.training) / 2
         return specified_fold
 
+    def avg_accuracies_by_cross_validation(self, datasets, fold, candidates):
+        """
+        Returns the average accuracy of each of the @param candidates, lists of attributes,
+        the candidates are evaluated in parallel when more than one job is used
+        """
+        return parallel.run_tasks(avg_accuracy_of_candidate, (self, datasets, fold, candidates), range(len(candidates)), self.jobs)
+    
     def avg_accuracy_by_cross_validation(self, datasets, fold, attributes):
         total_accuracy = 0
         for index in range(fold):
@@ -199,6 +211,10 @@ class FeatureSelection:
         if self.gold is not None: self.gold.remove_attributes(attributes)
         self.attributes.remove_attributes(attributes)
 
+def avg_accuracy_of_candidate(shared, index):
+    feature_selection, datasets, fold, candidates = shared
+    return feature_selection.avg_accuracy_by_cross_validation(datasets, fold, attr.Attributes(candidates[index]))
+
 def rank_options_invalid(options):
     return len(options) != 2 or not options[0] in OPTION_MAPPINGS or not options[1].isdigit()
 
@@ -234,12 +250,12 @@ def batch_filter_select(base_path, suffixes, number_of_attributes, log_path, has
             filter_suffixes.append(each + feat_sel.get_suffix())
     return filter_suffixes
 
-def batch_wrapper_select(base_path, suffixes, classifier, fold, delta, log_path):
+def batch_wrapper_select(base_path, suffixes, classifier, fold, delta, log_path, jobs = 1):
     wrapper_suffixes = []
     for each in suffixes:
         for alg in [FORWARD_SELECTION, BACKWARD_ELIMINATION]:
             feat_sel = FeatureSelect()
-            params = ['-a', alg, '-f', base_path + each, '-o', classifier + ',' + str(fold) + ',' + str(delta), '-l', log_path]
+            params = ['-a', alg, '-f', base_path + each, '-o', classifier + ',' + str(fold) + ',' + str(delta), '-l', log_path, '-j', str(jobs)]
             print "Params " + str(params)
             feat_sel.run(params)
             wrapper_suffixes.append(each + feat_sel.get_suffix())
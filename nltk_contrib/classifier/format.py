@@ -1,5 +1,5 @@
-from nltk_contrib.classifier import cfile, item, attribute as a, instance as ins, instances as inss
-from nltk_contrib.classifier.exceptions import systemerror as se, filenotfounderror as fnf
+from nltk_contrib.classifier import cfile, item, attribute as a, instance as ins, instances as inss, columnar
+from nltk_contrib.classifier.exceptions import systemerror as se, filenotfounderror as fnf, invaliddataerror as inv
 
 class FormatI:    
     def __init__(self, name):
@@ -11,21 +11,21 @@ class FormatI:
         """
         return AssertionError()
     
-    def training(self, file_path):
+    def training(self, file_path, metadata = None):
         """
-        Returns training instances
+        Returns training instances, stored in columns if @param metadata is given
         """
         return AssertionError()
     
-    def test(self, file_path):
+    def test(self, file_path, metadata = None):
         """
-        Returns test instances
+        Returns test instances, stored in columns if @param metadata is given
         """
         return AssertionError()
     
-    def gold(self, file_path):
+    def gold(self, file_path, metadata = None):
         """
-        Returns gold instances
+        Returns gold instances, stored in columns if @param metadata is given
         """
         return AssertionError()
         
@@ -35,13 +35,31 @@ class FormatI:
         """
         return AssertionError()
     
-    def write_test(self, test, file_path, including_classification=True):
+    def training_chunks(self, file_path, metadata, chunk_size, use_mmap = False):
+        """
+        Returns an iterator over chunks of training instances
+        """
+        return AssertionError()
+    
+    def test_chunks(self, file_path, metadata, chunk_size, use_mmap = False):
+        """
+        Returns an iterator over chunks of test instances
+        """
+        return AssertionError()
+    
+    def gold_chunks(self, file_path, metadata, chunk_size, use_mmap = False):
+        """
+        Returns an iterator over chunks of gold instances
+        """
+        return AssertionError()
+        
+    def write_test(self, test, file_path, including_classification=True, append=False):
         """
         Writes test instances to file system
         """
         return AssertionError()
 
-    def write_gold(self, gold, file_path, including_classification=True):
+    def write_gold(self, gold, file_path, including_classification=True, append=False):
         """
         Writes gold instances to file system
         """
@@ -74,15 +92,25 @@ class C45Format(FormatI):
                 index += 1
         return (a.Attributes(attributes), klass_values)
     
-    def training(self, file_path):
+    def training(self, file_path, metadata = None):
+        """
+        Returns training instances, they are stored in columns when @param metadata,
+        the tuple of attributes and class values, is given
+        """
+        if metadata is not None:
+            return columnar.training(self.__iter_values(file_path, self.DATA), *metadata)
         all_values = self.__get_all_values(file_path, self.DATA)
         return inss.TrainingInstances([ins.TrainingInstance(values[:-1], values[-1]) for values in all_values if values is not None])
     
-    def test(self, file_path):
+    def test(self, file_path, metadata = None):
+        if metadata is not None:
+            return columnar.test(self.__iter_values(file_path, self.TEST), *metadata)
         all_values = self.__get_all_values(file_path, self.TEST)
         return inss.TestInstances([ins.TestInstance(values) for values in all_values if values is not None])
     
-    def gold(self, file_path):
+    def gold(self, file_path, metadata = None):
+        if metadata is not None:
+            return columnar.gold(self.__iter_values(file_path, self.GOLD), *metadata)
         all_values = self.__get_all_values(file_path, self.GOLD)
         return inss.GoldInstances([ins.GoldInstance(values[:-1], values[-1]) for values in all_values if values is not None])
     
@@ -90,18 +118,73 @@ class C45Format(FormatI):
         lines = self.__get_lines(file_path, ext)
         return [self.__get_comma_sep_values(line) for line in lines]        
     
+    def __iter_values(self, file_path, ext, use_mmap = False):
+        if file_path is None:
+            raise se.SystemError('Cannot open file. File name not specified.')
+        for line in cfile.File(file_path, ext).lines(use_mmap):
+            values = self.__get_comma_sep_values(line)
+            if values is not None: yield values
+    
+    def training_chunks(self, file_path, metadata, chunk_size = columnar.CHUNK_SIZE, use_mmap = False):
+        """
+        Iterates over the training instances in chunks of at most @param chunk_size instances,
+        so that files which do not fit in memory can be processed. Each chunk is validated
+        against @param metadata, the tuple of attributes and class values, as it is read.
+        Chunks are stored in columns when numpy is available.
+        """
+        return self.__chunks(file_path, self.DATA, metadata, chunk_size, use_mmap, True, columnar.training, \
+                             lambda all_values: inss.TrainingInstances([ins.TrainingInstance(values[:-1], values[-1]) for values in all_values]))
+    
+    def test_chunks(self, file_path, metadata, chunk_size = columnar.CHUNK_SIZE, use_mmap = False):
+        return self.__chunks(file_path, self.TEST, metadata, chunk_size, use_mmap, False, columnar.test, \
+                             lambda all_values: inss.TestInstances([ins.TestInstance(values) for values in all_values]))
+    
+    def gold_chunks(self, file_path, metadata, chunk_size = columnar.CHUNK_SIZE, use_mmap = False):
+        return self.__chunks(file_path, self.GOLD, metadata, chunk_size, use_mmap, True, columnar.gold, \
+                             lambda all_values: inss.GoldInstances([ins.GoldInstance(values[:-1], values[-1]) for values in all_values]))
+    
+    def __chunks(self, file_path, ext, metadata, chunk_size, use_mmap, has_klass, create_columnar, create):
+        if chunk_size < 1:
+            raise se.SystemError('Chunk size should be a positive number.')
+        attributes, klass = metadata
+        chunk, position = [], 0
+        for values in self.__iter_values(file_path, ext, use_mmap):
+            chunk.append(values)
+            if len(chunk) == chunk_size:
+                yield self.__validated_chunk(chunk, position, file_path + cfile.DOT + ext, metadata, has_klass, create_columnar, create)
+                chunk, position = [], position + chunk_size
+        if len(chunk) > 0:
+            yield self.__validated_chunk(chunk, position, file_path + cfile.DOT + ext, metadata, has_klass, create_columnar, create)
+    
+    def __validated_chunk(self, chunk, position, path, metadata, has_klass, create_columnar, create):
+        attributes, klass = metadata
+        error = inv.InvalidDataError('Invalid data in instances ' + str(position + 1) + ' to ' + str(position + len(chunk)) + ' of ' + path)
+        expected = len(attributes) + (has_klass and 1 or 0)
+        for values in chunk:
+            if len(values) != expected: raise error
+        try:
+            if columnar.numpy is not None:
+                instances = create_columnar(chunk, attributes, klass)
+            else:
+                instances = create(chunk)
+                instances.convert_to_float(attributes.continuous_attribute_indices())
+        except ValueError:
+            raise error
+        if not instances.are_valid(klass, attributes): raise error
+        return instances
+    
     def write_training(self, instances, file_path):
         return self.write_to_file(file_path, self.DATA, instances, lambda instance: instance.str_attrs() + ',' + str(instance.klass_value))
         
-    def write_test(self, instances, file_path, including_classification=True):
+    def write_test(self, instances, file_path, including_classification=True, append=False):
         if not including_classification:
-            return self.write_to_file(file_path, self.TEST, instances, lambda instance: instance.str_attrs())
-        return self.write_to_file(file_path, self.TEST, instances, lambda instance: instance.str_attrs() + ',' + str(instance.classified_klass))
+            return self.write_to_file(file_path, self.TEST, instances, lambda instance: instance.str_attrs(), append)
+        return self.write_to_file(file_path, self.TEST, instances, lambda instance: instance.str_attrs() + ',' + str(instance.classified_klass), append)
 
-    def write_gold(self, instances, file_path, including_classification=True):
+    def write_gold(self, instances, file_path, including_classification=True, append=False):
         if not including_classification:
-            return self.write_to_file(file_path, self.GOLD, instances, lambda instance: instance.str_attrs() + ',' + str(instance.klass_value))
-        return self.write_to_file(file_path, self.GOLD, instances, lambda instance: instance.str_attrs() + ',' + str(instance.klass_value) + ',' + str(instance.classified_klass))
+            return self.write_to_file(file_path, self.GOLD, instances, lambda instance: instance.str_attrs() + ',' + str(instance.klass_value), append)
+        return self.write_to_file(file_path, self.GOLD, instances, lambda instance: instance.str_attrs() + ',' + str(instance.klass_value) + ',' + str(instance.classified_klass), append)
         
     def write_metadata(self, attributes, klass, file_path):
         new_file = self.create_file(file_path, self.NAMES)
@@ -111,9 +194,16 @@ class C45Format(FormatI):
         new_file.write(lines)
         return file_path + cfile.DOT + self.NAMES
         
-    def write_to_file(self, file_path, extension, instances, method):
-        new_file = self.create_file(file_path, extension)
-        new_file.write([method(instance) for instance in instances])
+    def write_to_file(self, file_path, extension, instances, method, append = False):
+        """
+        Writes the instances to a new file, or appends them to an existing file, eg: when
+        writing instances which are processed in chunks
+        """
+        if append:
+            new_file = cfile.File(file_path, extension)
+        else:
+            new_file = self.create_file(file_path, extension)
+        new_file.write([method(instance) for instance in instances], append)
         return file_path + cfile.DOT + extension
     
     def create_file(self, file_path, extension):
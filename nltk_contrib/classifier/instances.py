@@ -91,7 +91,19 @@ class TrainingInstances(Instances):
         return [instance.value(attribute) for instance in self.data]
     
     def sort_by(self, attribute):
-        self.data.sort(lambda x, y: cmp(x.value(attribute), y.value(attribute)))
+        self.data.sort(key=lambda instance: instance.value(attribute))
+        
+    def partition(self, attribute):
+        """
+        Returns a dictionary of training instances for each value of @param attribute,
+        equivalent to filtering the instances by each value, in a single pass
+        """
+        partitions = {}
+        for instance in self.data:
+            value = instance.value(attribute)
+            if value not in partitions: partitions[value] = TrainingInstances([])
+            partitions[value].append(instance)
+        return partitions
         
     def cross_validation_datasets(self, fold):
         """
@@ -136,6 +148,11 @@ class TrainingInstances(Instances):
                     freq_dists[attribute][instance.value(attribute)].inc(instance.klass_value)
         return PosteriorProbabilities(freq_dists, stat_list_values)
                 
+    def update_decision_stumps(self, decision_stumps):
+        for decision_stump in decision_stumps:
+            for instance in self.data:
+                decision_stump.update_count(instance)
+                
     def class_freq_dist(self):
         class_freq_dist = prob.FreqDist()
         for instance in self.data:
@@ -258,6 +275,26 @@ class PosteriorProbabilities(UserDict.UserDict):
         self.freq_dists = freq_dists
         self.stat_list_values = stat_list_values
         
+    def merge(self, other):
+        """
+        Adds the counts and statistics of @param other, which was created from a different
+        set of training instances with the same attributes and class values
+        """
+        for attribute in self.freq_dists:
+            for value in self.freq_dists[attribute]:
+                freq_dist = other.freq_dists[attribute][value]
+                for klass_value in freq_dist:
+                    self.freq_dists[attribute][value].inc(klass_value, freq_dist[klass_value] - 1) #Laplacian smoothing is only done once
+        for attribute in self.stat_list_values:
+            for klass_value in self.stat_list_values[attribute]:
+                moments = self.stat_list_values[attribute][klass_value]
+                if not isinstance(moments, util.Moments):
+                    moments = self.stat_list_values[attribute][klass_value] = util.Moments(moments)
+                other_moments = other.stat_list_values[attribute][klass_value]
+                if not isinstance(other_moments, util.Moments):
+                    other_moments = util.Moments(other_moments)
+                moments.merge(other_moments)
+        
     def value(self, attribute, value, klass_value):
         if attribute.is_continuous():
             stat_list = self.stat_list_values[attribute][klass_value]
@@ -5,25 +5,84 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import instances as ins, Classifier, distancemetric as dm
+from nltk_contrib.classifier import instances as ins, instance as inst, Classifier, distancemetric as dm
 from nltk import probability as prob
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# number of test instance x training instance distances computed at a time
+BLOCK_SIZE = 2 ** 20
+KD_TREE_MAX_DIMENSIONS = 10
+KD_TREE_LEAF_SIZE = 16
 
 class IB1(Classifier):
-    def __init__(self, training, attributes, klass):
+    """
+    Instance based learner, classifies a test instance with the class of the
+    k nearest training instances. All training instances which are as near as
+    the k-th nearest one take part in the vote.
+    When numpy is available the training instances are encoded into arrays once
+    and distances are computed for blocks of test instances at a time.
+    """
+    def __init__(self, training, attributes, klass, k = 1, weighted = False, normalise = False, use_tree = False):
         Classifier.__init__(self, training, attributes, klass)
-                
+        self.k, self.weighted, self.normalise, self.use_tree = k, weighted, normalise, use_tree
+        self.vectorised = numpy is not None
+        self.__engine = None
+
+    def set_options(self, options):
+        """
+        @param options: a dictionary which can contain the keys k, weighted, normalise and use_tree
+        """
+        Classifier.set_options(self, options)
+        for key in ['k', 'weighted', 'normalise', 'use_tree']:
+            if key in options:
+                setattr(self, key, options[key])
+        self.__engine = None
+
     def classify(self, instances):
+        if self.vectorised:
+            self.engine().classify(instances)
+            return
+        scale = None
+        if self.normalise:
+            scale = range_scale(self.training, self.attributes)
         for each_test in instances:
             id = InstanceDistances()
             for each_training in self.training:
-                dist = dm.euclidean_distance(each_test, each_training, self.attributes)
+                dist = normalised_euclidean_distance(each_test, each_training, self.attributes, scale)
                 id.distance(dist, each_training)
-            each_test.classified_klass = id.klass(majority_klass_vote)
-    
+            each_test.classified_klass = id.nearest_klass(self.vote, self.k)
+
+    def vote(self, instances, distances):
+        if self.weighted:
+            return weighted_klass_vote(instances, distances)
+        return majority_klass_vote(instances)
+
+    def engine(self):
+        if self.__engine is None:
+            self.__engine = NearestNeighbours(self.training, self.attributes, self.k, self.vote, self.normalise, self.use_tree)
+        return self.__engine
+
+    def model(self):
+        """
+        The training instances are the model of an instance based learner
+        """
+        return {'training': [each.attrs + [each.klass_value] for each in self.training], \
+                'k': self.k, 'weighted': self.weighted, 'normalise': self.normalise, 'use_tree': self.use_tree}
+
+    def restore(self, model):
+        self.training = ins.TrainingInstances([inst.TrainingInstance(values[:-1], values[-1]) for values in model['training']])
+        self.k, self.weighted, self.normalise, self.use_tree = model['k'], model['weighted'], model['normalise'], model['use_tree']
+        self.__engine = None
+
     @classmethod
     def can_handle_continuous_attributes(self):
         return True
-    
+
     def is_trained(self):
         return True
 
@@ -33,24 +92,262 @@ class InstanceDistances:
     """
     def __init__(self):
         self.distances = {}
-        
+
     def distance(self, value, instance):
         if value in self.distances:
             self.distances[value].append(instance)
-        else: 
+        else:
             self.distances[value] = [instance]
-            
+
     def minimum_distance_instances(self):
         keys = self.distances.keys()
         keys.sort()
         return self.distances[keys[0]]
-    
+
+    def nearest(self, k):
+        """
+        Returns the k nearest instances and their distances, along with all
+        other instances which are as near as the k-th nearest instance
+        """
+        keys = self.distances.keys()
+        keys.sort()
+        instances, distances = [], []
+        for key in keys:
+            if len(instances) >= k: break
+            instances.extend(self.distances[key])
+            distances.extend([key] * len(self.distances[key]))
+        return instances, distances
+
     def klass(self, strategy):
         return strategy(self.minimum_distance_instances())
-        
+
+    def nearest_klass(self, strategy, k):
+        """
+        Invokes @param strategy with the nearest instances and their distances
+        """
+        return strategy(*self.nearest(k))
+
 def majority_klass_vote(instances):
     fd = prob.FreqDist()
     for each in instances:
         fd.inc(each.klass_value)
     return fd.max()
- 
+
+def weighted_klass_vote(instances, distances):
+    """
+    Each instance votes with the inverse of its distance, instances which
+    are at a distance of zero outvote all the others
+    """
+    exact = [instances[index] for index in range(len(instances)) if distances[index] == 0]
+    if len(exact) > 0:
+        return majority_klass_vote(exact)
+    fd = prob.FreqDist()
+    for index in range(len(instances)):
+        fd.inc(instances[index].klass_value, 1.0 / distances[index])
+    return fd.max()
+
+def continuous_attributes(attributes):
+    return [attribute for attribute in attributes if attribute.is_continuous()]
+
+def range_scale(instances, attributes):
+    """
+    Returns the factors which normalise the values of the continuous attributes
+    in @param instances to the unit range
+    """
+    scale = []
+    for values in instances.values_grouped_by_attribute(continuous_attributes(attributes)):
+        lower, upper = min(values), max(values)
+        if upper > lower: scale.append(1.0 / (upper - lower))
+        else: scale.append(1.0)
+    return scale
+
+def normalised_euclidean_distance(instance1, instance2, attributes, scale = None):
+    if scale is None:
+        return dm.euclidean_distance(instance1, instance2, attributes)
+    total, continuous = 0, 0
+    for attribute in attributes:
+        d = dm.distance(instance1.value(attribute), instance2.value(attribute), attribute.is_continuous())
+        if attribute.is_continuous():
+            d *= scale[continuous]
+            continuous += 1
+        total += d * d
+    return math.sqrt(total)
+
+def code(mapping, value, attribute):
+    """
+    Returns the code of @param value in @param mapping. Values which were not
+    declared are added to the mapping with negative codes of their own, so that
+    two different undeclared values do not overlap, as with the distance metric
+    """
+    if value not in mapping:
+        mapping[value] = len(attribute.values) - len(mapping) - 1
+    return mapping[value]
+
+class EncodedInstances:
+    """
+    Dense array representation of instances. Continuous attributes are stored
+    as floats, discrete attributes as integer codes from the value dictionaries
+    which are shared with the training instances, so that the overlap between
+    discrete values can be computed by comparing codes. The columns of columnar
+    instances are used as they are, their codes of declared values are the same.
+    """
+    def __init__(self, instances, attributes, codes):
+        self.columns = []
+        for attribute in attributes:
+            if hasattr(instances, 'column'):
+                column = instances.column(attribute)
+            elif attribute.is_continuous():
+                column = numpy.array([instance.value(attribute) for instance in instances], dtype=float)
+            else:
+                mapping = codes[attribute.index]
+                column = numpy.array([code(mapping, instance.value(attribute), attribute) for instance in instances], dtype=numpy.int32)
+            self.columns.append(column)
+        self.continuous = [attribute.is_continuous() for attribute in attributes]
+        self.size = len(instances)
+
+    def points(self):
+        """
+        Returns the columns as a matrix with one row per instance
+        """
+        return numpy.column_stack(self.columns).astype(float)
+
+    def distances(self, other, start, stop, scale = None):
+        """
+        Returns the euclidean distances between the instances from @param start to
+        @param stop and all instances in @param other as a matrix.
+        Attributes are accumulated in the order of their definition and
+        differences are scaled before squaring them, so that the distances are
+        identical to the ones computed one instance at a time
+        """
+        total, continuous = numpy.zeros((stop - start, other.size)), 0
+        for index in range(len(self.columns)):
+            column = self.columns[index][start:stop, numpy.newaxis]
+            if self.continuous[index]:
+                difference = column - other.columns[index]
+                if scale is not None:
+                    difference *= scale[continuous]
+                continuous += 1
+                total += difference * difference
+            else:
+                total += column != other.columns[index]
+        return numpy.sqrt(total)
+
+class NearestNeighbours:
+    """
+    Finds the nearest training instances of test instances using numpy
+    """
+    def __init__(self, training, attributes, k, strategy, normalise = False, use_tree = False):
+        self.training, self.attributes, self.k, self.strategy = training, attributes, k, strategy
+        self.codes = {}
+        for attribute in attributes:
+            if not attribute.is_continuous():
+                self.codes[attribute.index] = dict([(attribute.values[index], index) for index in range(len(attribute.values))])
+        self.scale = None
+        if normalise:
+            self.scale = range_scale(training, attributes)
+        self.encoded = self.encode(training)
+        self.tree = None
+        if use_tree and KDTree.is_suitable(attributes):
+            self.tree = KDTree(self.encoded.points(), self.scale)
+
+    def encode(self, instances):
+        return EncodedInstances(instances, self.attributes, self.codes)
+
+    def classify(self, instances):
+        if len(instances) == 0 or len(self.training) == 0: return
+        encoded = self.encode(instances)
+        if self.tree is not None:
+            points = encoded.points()
+            for index in range(len(instances)):
+                nearest, distances = self.tree.nearest(points[index], self.k)
+                instances[index].classified_klass = self.vote(nearest, distances)
+            return
+        block = max(1, BLOCK_SIZE / self.encoded.size)
+        for start in range(0, len(instances), block):
+            stop = min(start + block, len(instances))
+            distances = encoded.distances(self.encoded, start, stop, self.scale)
+            for row in range(stop - start):
+                nearest = k_nearest(distances[row], self.k)
+                instances[start + row].classified_klass = self.vote(nearest, distances[row][nearest])
+
+    def vote(self, nearest, distances):
+        return self.strategy([self.training[index] for index in nearest], list(distances))
+
+def k_nearest(distances, k):
+    """
+    Returns the indices of the k smallest distances, along with the indices
+    of all other distances equal to the k-th smallest one, in ascending order
+    of index
+    """
+    if k >= len(distances):
+        return numpy.arange(len(distances))
+    kth = numpy.partition(distances, k - 1)[k - 1]
+    return numpy.flatnonzero(distances <= kth)
+
+class KDTree:
+    """
+    A kd-tree over the rows of a matrix, used for nearest neighbour searches on
+    data with a few continuous attributes. Subtrees are only pruned when they
+    are strictly farther away than the current k-th nearest point, so that
+    searches return the same ties as an exhaustive search.
+    """
+    def __init__(self, points, scale = None, leaf_size = KD_TREE_LEAF_SIZE):
+        self.points, self.leaf_size = points, leaf_size
+        self.scale = scale or [1.0] * points.shape[1]
+        self.root = self.__build(numpy.arange(len(points)))
+
+    @classmethod
+    def is_suitable(klass, attributes):
+        return len(attributes) <= KD_TREE_MAX_DIMENSIONS and len(continuous_attributes(attributes)) == len(attributes)
+
+    def __build(self, indices):
+        """
+        Nodes are either a leaf array of indices or a tuple of
+        (dimension, split value, left subtree, right subtree)
+        """
+        if len(indices) <= self.leaf_size:
+            return indices
+        points = self.points[indices]
+        dimension = numpy.argmax((points.max(axis=0) - points.min(axis=0)) * self.scale)
+        values = points[:, dimension]
+        split = numpy.median(values)
+        left = values <= split
+        if left.all():
+            left = values < split
+            if not left.any():
+                return indices
+            split = values[left].max()
+        return (dimension, split, self.__build(indices[left]), self.__build(indices[~left]))
+
+    def nearest(self, point, k):
+        """
+        Returns the indices of the k nearest points in ascending order of index,
+        along with the indices of points as near as the k-th nearest one, and
+        the corresponding distances
+        """
+        self.__candidates, self.__distances, self.__bound = numpy.zeros(0, dtype=int), numpy.zeros(0), numpy.inf
+        self.__search(self.root, point, k)
+        order = numpy.argsort(self.__candidates, kind='mergesort')
+        return self.__candidates[order], self.__distances[order]
+
+    def __search(self, node, point, k):
+        if not isinstance(node, tuple):
+            total = numpy.zeros(len(node))
+            for dimension in range(self.points.shape[1]):
+                difference = (point[dimension] - self.points[node, dimension]) * self.scale[dimension]
+                total += difference * difference
+            candidates = numpy.concatenate((self.__candidates, node))
+            distances = numpy.concatenate((self.__distances, numpy.sqrt(total)))
+            if len(candidates) >= k:
+                self.__bound = numpy.partition(distances, k - 1)[k - 1]
+                within = distances <= self.__bound
+                candidates, distances = candidates[within], distances[within]
+            self.__candidates, self.__distances = candidates, distances
+            return
+        dimension, split, left, right = node
+        difference = point[dimension] - split
+        near, far = left, right
+        if difference > 0: near, far = right, left
+        self.__search(near, point, k)
+        if abs(difference) * self.scale[dimension] <= self.__bound:
+            self.__search(far, point, k)
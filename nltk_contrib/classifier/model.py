@@ -0,0 +1,83 @@
+# Natural Language Toolkit - Model
+#  Saves trained classifiers to files and loads them without training again
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+from nltk_contrib.classifier import instances as ins, attribute as attr, discretisedattribute as da, numrange as r
+from nltk_contrib.classifier import zeror, oner, decisiontree, naivebayes, knn
+from nltk_contrib.classifier.exceptions import invaliddataerror as inv, illegalstateerror as ise, filenotfounderror as fnf
+import cPickle
+
+FORMAT = 'nltk_contrib.classifier.model'
+# increased whenever the state returned by the model method of a classifier changes,
+# models with a newer version than this one are not loaded
+VERSION = 1
+
+CLASSIFIERS = dict([(algorithm.__name__, algorithm) for algorithm in [zeror.ZeroR, oner.OneR, decisiontree.DecisionTree, naivebayes.NaiveBayes, knn.IB1]])
+
+def save(classifier, path):
+    """
+    Writes the model of the trained @param classifier to the file at @param path. The model
+    is a dictionary of built in types which is pickled with the highest protocol, it contains
+    the attributes, including the ranges of discretised attributes, the class values, the
+    options and the state of the classifier
+    """
+    if not classifier.is_trained(): raise ise.IllegalStateError("Classifier not trained")
+    name = classifier.__class__.__name__
+    if name not in CLASSIFIERS:
+        raise inv.InvalidDataError('Models of ' + name + ' classifiers cannot be saved.')
+    model = {'format': FORMAT, 'version': VERSION, 'classifier': name, 'attributes': attributes_state(classifier.attributes), \
+             'klass': list(classifier.klass), 'options': classifier.options, 'state': classifier.model()}
+    model_file = open(path, 'wb')
+    try:
+        cPickle.dump(model, model_file, cPickle.HIGHEST_PROTOCOL)
+    finally:
+        model_file.close()
+    return path
+
+def load(path):
+    """
+    Returns a trained classifier created from the model in the file at @param path
+    """
+    try:
+        model_file = open(path, 'rb')
+    except IOError:
+        raise fnf.FileNotFoundError(path)
+    try:
+        try:
+            model = cPickle.load(model_file)
+        except (cPickle.UnpicklingError, EOFError, ValueError, ImportError, AttributeError):
+            model = None
+    finally:
+        model_file.close()
+    if not isinstance(model, dict) or model.get('format') != FORMAT:
+        raise inv.InvalidDataError(path + ' is not a classifier model.')
+    if model['version'] > VERSION:
+        raise inv.InvalidDataError('Version ' + str(model['version']) + ' of the model in ' + path + ' is not supported.')
+    attributes = attributes_from_state(model['attributes'])
+    classifier = CLASSIFIERS[model['classifier']](ins.TrainingInstances([]), attributes, model['klass'])
+    classifier.options = model['options']
+    classifier.restore(model['state'])
+    return classifier
+
+def attributes_state(attributes):
+    """
+    Returns the name, values, index and ranges, which are None for attributes that
+    are not discretised, of each of the @param attributes
+    """
+    state = []
+    for attribute in attributes:
+        ranges = None
+        if isinstance(attribute, da.DiscretisedAttribute):
+            ranges = [(each.lower, each.upper) for each in attribute.ranges]
+        state.append((attribute.name, list(attribute.values), attribute.index, ranges))
+    return state
+
+def attributes_from_state(state):
+    attributes = []
+    for name, values, index, ranges in state:
+        if ranges is None:
+            attributes.append(attr.Attribute(name, values, index))
+        else:
+            attributes.append(da.DiscretisedAttribute(name, [r.Range(lower, upper) for lower, upper in ranges], index))
+    return attr.Attributes(attributes)
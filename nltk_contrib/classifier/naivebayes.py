@@ -6,25 +6,77 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import instances as ins, decisionstump as ds, Classifier
+from nltk_contrib.classifier import instances as ins, decisionstump as ds, knn, util, Classifier
 from nltk_contrib.classifier.exceptions import invaliddataerror as inv
+from nltk import probability as prob
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class NaiveBayes(Classifier):
+    """
+    When numpy is available, test instances are classified in a batch by
+    adding up logarithms of the probabilities, which are looked up in tables
+    computed once after training. Products of many small probabilities
+    underflow to zero, their logarithms do not.
+    """
     def __init__(self, training, attributes, klass):
         Classifier.__init__(self, training, attributes, klass)
         self.post_probs, self.class_freq_dist = None, None
+        self.__klass_counts = None
+        self.vectorised = numpy is not None
+        self.__log_probs = None
         
     def train(self):
         Classifier.train(self)
-        self.post_probs = self.training.posterior_probablities(self.attributes, self.klass)
-        self.class_freq_dist = self.training.class_freq_dist()
+        self.post_probs, self.__klass_counts = None, prob.FreqDist()
+        self.add_training(self.training)
+        
+    def add_training(self, training):
+        post_probs = training.posterior_probablities(self.attributes, self.klass)
+        if self.post_probs is None:
+            self.post_probs = post_probs
+        else:
+            self.post_probs.merge(post_probs)
+        counts = training.class_freq_dist()
+        for klass_value in counts:
+            self.__klass_counts.inc(klass_value, counts[klass_value])
+        self.class_freq_dist = prob.FreqDist()
+        for klass_value in self.__klass_counts:
+            self.class_freq_dist.inc(klass_value, self.__klass_counts[klass_value])
         for klass_value in self.klass:
             self.class_freq_dist.inc(klass_value)#laplacian smoothing
+        self.__log_probs = None
             
     def classify(self, instances):
+        if self.vectorised:
+            for instance, klass_value in zip(instances, self.estimate_klasses(instances)):
+                instance.classified_klass = klass_value
+            return
         for instance in instances:
             instance.classified_klass = self.estimate_klass(instance)
 
+    def estimate_klasses(self, instances):
+        """
+        Returns the class value with the highest log score for each of the instances,
+        ties are won by the class value which is declared last, as in estimate_klass
+        """
+        scores = self.log_scores(instances)[:, ::-1]
+        last = len(self.klass) - 1
+        return [self.klass[last - index] for index in numpy.argmax(scores, axis=1)]
+    
+    def log_scores(self, instances):
+        """
+        Returns a matrix with a row for each instance and a column for each class value
+        which contains the logarithm of the class conditional probability
+        """
+        if self.__log_probs is None:
+            self.__log_probs = LogProbabilities(self)
+        return self.__log_probs.scores(instances)
+
     def estimate_klass(self, instance):
         estimates_using_prob = {}
         for klass_value in self.klass:
@@ -48,10 +100,114 @@ class NaiveBayes(Classifier):
         class_cond_prob *= self.prior_probability(klass_value)
         return class_cond_prob
     
+    def model(self):
+        """
+        The counts of the values of each attribute and the mean and variance of the values
+        of each continuous attribute, for each class value, as well as the class counts
+        """
+        counts, moments = {}, {}
+        for attribute in self.attributes:
+            freq_dists = self.post_probs.freq_dists[attribute]
+            counts[attribute.index] = dict([(value, dict(freq_dists[value])) for value in freq_dists])
+            if attribute.is_continuous():
+                stat_lists = self.post_probs.stat_list_values[attribute]
+                moments[attribute.index] = dict([(klass_value, as_moments(stat_lists[klass_value]).state()) for klass_value in stat_lists])
+        return {'counts': counts, 'moments': moments, 'klass_counts': dict(self.__klass_counts), \
+                'class_freq_dist': dict(self.class_freq_dist)}
+    
+    def restore(self, model):
+        freq_dists, stat_list_values = {}, {}
+        for attribute in self.attributes:
+            counts = model['counts'][attribute.index]
+            freq_dists[attribute] = dict([(value, freq_dist(counts[value])) for value in counts])
+            if attribute.is_continuous():
+                states = model['moments'][attribute.index]
+                stat_list_values[attribute] = {}
+                for klass_value in states:
+                    stat_list_values[attribute][klass_value] = util.Moments()
+                    stat_list_values[attribute][klass_value].restore(states[klass_value])
+        self.post_probs = ins.PosteriorProbabilities(freq_dists, stat_list_values)
+        self.__klass_counts = freq_dist(model['klass_counts'])
+        self.class_freq_dist = freq_dist(model['class_freq_dist'])
+        self.__log_probs = None
+    
     @classmethod
     def can_handle_continuous_attributes(self):
         return True
+    
+    @classmethod
+    def can_train_incrementally(self):
+        return True
         
     def is_trained(self):
-        return self.post_probs is not None and self.class_freq_dist is not None    
+        return self.post_probs is not None and self.class_freq_dist is not None
+
+def as_moments(stat_list):
+    if isinstance(stat_list, util.Moments): return stat_list
+    return util.Moments(stat_list)
+
+def freq_dist(counts):
+    freq_dist = prob.FreqDist()
+    for key in counts:
+        freq_dist.inc(key, counts[key])
+    return freq_dist
+
+class LogProbabilities:
+    """
+    Logarithms of the prior probabilities and of the posterior probabilities of
+    each value of each discrete attribute, for all class values. Continuous attributes
+    are represented by the mean and standard deviation of their values for each
+    class value. Values which were not declared do not change the scores.
+    """
+    def __init__(self, classifier):
+        self.attributes, self.klass = classifier.attributes, classifier.klass
+        self.priors = numpy.array([classifier.prior_probability(klass_value) for klass_value in self.klass])
+        self.codes, self.tables, self.means, self.std_devs = {}, {}, {}, {}
+        post_probs = classifier.post_probs
+        for attribute in self.attributes:
+            if attribute.is_continuous():
+                stat_lists = [post_probs.stat_list_values[attribute][klass_value] for klass_value in self.klass]
+                self.means[attribute.index] = numpy.array([stat_list.mean() for stat_list in stat_lists])
+                self.std_devs[attribute.index] = numpy.array([stat_list.std_dev() for stat_list in stat_lists])
+            else:
+                self.codes[attribute.index] = dict([(attribute.values[index], index) for index in range(len(attribute.values))])
+                table = numpy.zeros((len(attribute.values) + 1, len(self.klass)))
+                for index in range(len(attribute.values)):
+                    table[index] = [classifier.posterior_probability(attribute, attribute.values[index], klass_value) for klass_value in self.klass]
+                table[len(attribute.values)] = 1
+                self.tables[attribute.index] = table
+        old_settings = numpy.seterr(divide='ignore')
+        try:
+            self.priors = numpy.log(self.priors)
+            for index in self.tables:
+                self.tables[index] = numpy.log(self.tables[index])
+        finally:
+            numpy.seterr(**old_settings)
+        
+    def scores(self, instances):
+        encoded = knn.EncodedInstances(instances, self.attributes, self.codes)
+        scores = numpy.zeros((encoded.size, len(self.klass)))
+        old_settings = numpy.seterr(divide='ignore', invalid='ignore')
+        try:
+            for attribute, column in zip(self.attributes, encoded.columns):
+                if attribute.is_continuous():
+                    scores += self.log_density(attribute, column)
+                else:
+                    undeclared = len(attribute.values)
+                    codes = numpy.where((column < 0) | (column > undeclared), undeclared, column)
+                    scores += self.tables[attribute.index][codes]
+        finally:
+            numpy.seterr(**old_settings)
+        scores += self.priors
+        return scores
     
+    def log_density(self, attribute, column):
+        """
+        Logarithm of the density used by ins.calc_prob_based_on_distrbn, if the standard
+        deviation is zero the density is 1 at the mean and 0 elsewhere
+        """
+        mean, sd = self.means[attribute.index], self.std_devs[attribute.index]
+        values = column[:, numpy.newaxis]
+        safe_sd = numpy.where(sd == 0, 1, sd)
+        density = -0.5 * numpy.log(2 * math.pi * safe_sd) - (values - mean) ** 2 / (2 * safe_sd ** 2)
+        return numpy.where(sd == 0, numpy.where(values == mean, 0.0, -numpy.inf), density)
@@ -14,10 +14,16 @@ class OneR(Classifier):
     def __init__(self, training, attributes, klass):
         Classifier.__init__(self, training, attributes, klass)
         self.__best_decision_stump = None
+        self.__decision_stumps = None
         
     def train(self):
         Classifier.train(self)
-        self.__best_decision_stump = self.best_decision_stump(self.training)
+        self.__decision_stumps = self.possible_decision_stumps([], self.training)
+        self.__best_decision_stump = self.minimum_error(self.__decision_stumps)
+        
+    def add_training(self, training):
+        training.update_decision_stumps(self.__decision_stumps)
+        self.__best_decision_stump = self.minimum_error(self.__decision_stumps)
         
     def classify(self, instances):
         for instance in instances:
@@ -37,9 +43,7 @@ class OneR(Classifier):
         values.
         """
         decision_stumps = self.attributes.empty_decision_stumps(ignore_attributes, self.klass);
-        for stump in decision_stumps:
-            for instance in instances:
-                stump.update_count(instance)
+        instances.update_decision_stumps(decision_stumps)
         return decision_stumps
 
         
@@ -55,5 +59,20 @@ class OneR(Classifier):
                 min_error_stump = decision_stump
         return min_error_stump
     
+    def model(self):
+        """
+        All the decision stumps are part of the model so that training can be continued
+        """
+        return {'decision_stumps': [stump.state() for stump in self.__decision_stumps], \
+                'best': self.__decision_stumps.index(self.__best_decision_stump)}
+    
+    def restore(self, model):
+        self.__decision_stumps = [ds.from_state(state, self.attributes, self.klass) for state in model['decision_stumps']]
+        self.__best_decision_stump = self.__decision_stumps[model['best']]
+    
+    @classmethod
+    def can_train_incrementally(self):
+        return True
+    
     def is_trained(self):
         return self.__best_decision_stump is not None
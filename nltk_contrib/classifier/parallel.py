@@ -0,0 +1,46 @@
+# Natural Language Toolkit - Parallel
+#  Runs independent tasks, eg: cross validation folds, in a pool of processes
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+
+import multiprocessing, sys
+
+_shared = None
+
+def run_tasks(function, shared, tasks, jobs = 1):
+    """
+    Returns the results of calling @param function with @param shared and each of the
+    @param tasks, in the order of the tasks. When more than one job is requested the
+    tasks are run by a pool of worker processes which are forked after the shared data
+    has been set up, so that only the tasks and their results are pickled. The shared
+    data should not be changed by the function, changes are not seen by other tasks.
+    The error raised by the first failing task is raised again in the calling process.
+    @param function: a module level function which accepts the shared data and a task
+    @param jobs: the number of worker processes
+    """
+    tasks = list(tasks)
+    if jobs is None or jobs <= 1 or len(tasks) <= 1:
+        return [function(shared, task) for task in tasks]
+    global _shared
+    _shared = (function, shared)
+    pool = multiprocessing.Pool(min(jobs, len(tasks)))
+    try:
+        results = pool.map(_run, tasks, 1)
+    finally:
+        pool.close()
+        pool.join()
+        _shared = None
+    for failed, result in results:
+        if failed:
+            raise result[0], result[1]
+    return [result for failed, result in results]
+
+def _run(task):
+    function, shared = _shared
+    try:
+        return (False, function(shared, task))
+    except:
+        # the errors of the classifiers are old style classes, which are not caught by
+        # the pool and would kill the worker, leaving the pool waiting for the result
+        return (True, sys.exc_info()[:2])
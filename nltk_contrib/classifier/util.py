@@ -21,5 +21,52 @@ class StatList(UserList.UserList):
     def std_dev(self):
         return math.sqrt(self.variance())
 
+class Moments:
+    """
+    Mean and variance of values which are added in batches, the values themselves are
+    not kept. The statistics of a single batch are the same as those of a StatList.
+    """
+    def __init__(self, values=None):
+        self.count, self.__mean, self.__squares = 0, 0, 0
+        if values is not None: self.extend(values)
+        
+    def extend(self, values):
+        other = Moments()
+        other.count = len(values)
+        if other.count > 0:
+            other.__mean = float(sum(values)) / other.count
+            other.__squares = float(sum([pow((each - other.__mean), 2) for each in values]))
+        self.merge(other)
+        
+    def merge(self, other):
+        """
+        Combines the statistics of two sets of values
+        """
+        if other.count == 0: return
+        if self.count == 0:
+            self.count, self.__mean, self.__squares = other.count, other.__mean, other.__squares
+            return
+        count = self.count + other.count
+        delta = other.__mean - self.__mean
+        self.__mean += delta * other.count / count
+        self.__squares += other.__squares + delta * delta * self.count * other.count / count
+        self.count = count
+    
+    def mean(self):
+        return self.__mean
+    
+    def variance(self):
+        if self.count < 2: return 0
+        return self.__squares / (self.count - 1)
+    
+    def std_dev(self):
+        return math.sqrt(self.variance())
+    
+    def state(self):
+        return (self.count, self.__mean, self.__squares)
+    
+    def restore(self, state):
+        self.count, self.__mean, self.__squares = state
+
 def int_array_to_string(int_array):
     return ','.join([str(each) for each in int_array])
@@ -18,6 +18,12 @@ class ZeroR(Classifier):
         Classifier.train(self)
         self.__majority_class = self.majority_class()
         
+    def add_training(self, training):
+        class_freq_dist = training.class_freq_dist()
+        for klass_value in class_freq_dist:
+            self.__klassCount[klass_value] = self.__klassCount.get(klass_value, 0) + class_freq_dist[klass_value]
+        self.__majority_class = self.__max()
+        
     def classify(self, instances):
         for instance in instances:
             instance.classified_klass = self.__majority_class
@@ -43,10 +49,20 @@ class ZeroR(Classifier):
                 klass_value = key
         return klass_value
     
+    def model(self):
+        return {'majority_class': self.__majority_class, 'klass_count': self.__klassCount}
+    
+    def restore(self, model):
+        self.__majority_class, self.__klassCount = model['majority_class'], model['klass_count']
+        
     @classmethod
     def can_handle_continuous_attributes(self):
         return True
     
+    @classmethod
+    def can_train_incrementally(self):
+        return True
+    
     def is_trained(self):
         return self.__majority_class is not None
     
@@ -27,6 +27,10 @@ class FileTestCase(unittest.TestCase):
         
     def test_filter_comments(self):
         f = cfile.File(datasetsDir(self) + 'test_phones' + SEP + 'phoney', format.c45.NAMES)
-            
+
+    def test_lines_read_with_memory_map_are_the_same(self):
+        f = cfile.File(datasetsDir(self) + 'test_phones' + SEP + 'phoney', format.c45.NAMES)
+        self.assertEqual(list(f.lines()), list(f.lines(True)))
+
     def printline(self, l):
         self.contents += l + '\n' # the \n is to simulate a new line
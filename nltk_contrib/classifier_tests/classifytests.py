@@ -4,8 +4,9 @@
 #
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
-from nltk_contrib.classifier import classify as c
+from nltk_contrib.classifier import classify as c, model, naivebayes
 from nltk_contrib.classifier_tests import *
+import tempfile, shutil
 
 class ClassifyTestCase(unittest.TestCase):
     def setUp(self):
@@ -123,6 +124,96 @@ class ClassifyTestCase(unittest.TestCase):
         self.assertTrue(dns.called)
         
         
+    def test_throws_error_if_chunks_are_used_with_cross_validation(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classify = StubClassify(DoNothingStrategy())
+        classify.parse(['-a', '1R', '-t', path, '-c', 5, '-s', '2'])
+        classify.execute()
+        self.assertTrue(classify.errorCalled)
+        self.assertEqual('Invalid arguments. Cross validation cannot be performed on chunks.', classify.message)
+
+    def test_throws_error_if_decision_tree_options_cannot_be_parsed(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classify = StubClassify(DoNothingStrategy())
+        classify.parse(['-a', 'DT', '-f', path, '-o', 'IG,X9'])
+        classify.execute()
+        self.assertTrue(classify.errorCalled)
+        self.assertEqual('Invalid arguments. Cannot parse the decision tree options IG,X9.', classify.message)
+
+    def test_throws_error_if_algorithm_cannot_be_trained_on_chunks(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classify = StubClassify(DoNothingStrategy())
+        classify.parse(['-a', 'DT', '-f', path, '-s', '2'])
+        classify.execute()
+        self.assertTrue(classify.errorCalled)
+        self.assertEqual('Invalid arguments. DT cannot be trained on chunks.', classify.message)
+
+    def test_throws_error_if_models_are_used_with_cross_validation(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classify = StubClassify(DoNothingStrategy())
+        classify.parse(['-a', '1R', '-t', path, '-c', 5, '-m', 'model'])
+        classify.execute()
+        self.assertTrue(classify.errorCalled)
+        self.assertEqual('Invalid arguments. Models cannot be used with cross validation.', classify.message)
+
+    def test_throws_error_if_training_file_is_used_with_a_model(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classify = StubClassify(DoNothingStrategy())
+        classify.parse(['-i', 'model', '-t', path, '-T', path])
+        classify.execute()
+        self.assertTrue(classify.errorCalled)
+        self.assertEqual('Invalid arguments. A training file cannot be used with a model.', classify.message)
+
+    def test_classifies_with_a_model_instead_of_training(self):
+        path = datasetsDir(self) + 'test_phones' + SEP + 'phoney'
+        directory = tempfile.mkdtemp()
+        try:
+            model_path, log_path = directory + SEP + 'model', directory + SEP + 'log'
+            c.Classify().run(['-a', 'NB', '-t', path, '-g', path, '-m', model_path, '-l', log_path])
+            classifier = model.load(model_path)
+            self.assertEqual(naivebayes.NaiveBayes, classifier.__class__)
+            
+            classify = c.Classify()
+            classify.parse(['-i', model_path, '-g', path])
+            self.assertEqual(classifier.__class__, classify.load_model(model_path).__class__)
+            self.assertEqual('NB', classify.algorithm)
+            
+            strategy = c.VerifyStrategy(classifier, gold(path), path, c.NoOptions())
+            strategy.classify()
+            self.assertEqual(1.0, strategy.confusion_matrix.accuracy())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_chunked_and_whole_classification_report_the_same_written_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for extension in ['names', 'data', 'gold']:
+                shutil.copy(datasetsDir(self) + 'test_phones' + SEP + 'phoney.' + extension, directory)
+            path, log_path = directory + SEP + 'phoney', directory + SEP + 'log'
+            c.Classify().run(['-a', 'NB', '-t', path, '-g', path, '-w', '-l', log_path])
+            c.Classify().run(['-a', 'NB', '-t', path, '-g', path, '-w', '-s', '2', '-l', log_path])
+            log = open(log_path)
+            written = [line for line in log if 'written to' in line]
+            log.close()
+            self.assertEqual(2, len(written))
+            self.assertEqual(written[0], written[1])
+            self.assertTrue(written[0].startswith('Gold classification written to ' + path))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_cross_validation_folds_are_verified_in_parallel(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        _attributes, _klass = metadata(path)
+        results = []
+        for jobs in [1, 2]:
+            strategy = c.CrossValidationStrategy('1R', _attributes, _klass, format.c45.training(path, metadata(path)), 4, path, c.NoOptions(), jobs)
+            strategy.classify()
+            results.append(([cm.accuracy() for cm in strategy.confusion_matrices], \
+                            [[instance.classified_klass for instance in gold] for gold in strategy.gold_instances]))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(4, len(results[1][1]))
+        self.assertFalse(None in results[1][1][0])
+
     def test_get_file_strategy(self):
         strategy = c.get_file_strategy('files', None, None, None, True)
         self.assertEqual(c.CommonBaseNameStrategy, strategy.__class__)
@@ -165,6 +256,25 @@ class ClassifyTestCase(unittest.TestCase):
         dto.set_options(dummy_classifier)
         self.assertEqual('maximum_gain_ratio', dummy_classifier.options)
         
+    def test_decision_tree_limits(self):
+        dto = c.DecisionTreeOptions('GR,D3,L5')
+        dummy_classifier = ClassifierStub()
+        dto.set_options(dummy_classifier)
+        self.assertEqual('maximum_gain_ratio', dummy_classifier.options)
+        self.assertEqual({'max_depth': 3, 'min_leaf': 5}, dummy_classifier.limits)
+        
+        dto = c.DecisionTreeOptions('D0')
+        dummy_classifier = ClassifierStub()
+        dto.set_options(dummy_classifier)
+        self.assertTrue(dummy_classifier.options is None)
+        self.assertTrue(dummy_classifier.limits is None)
+        
+        dto = c.DecisionTreeOptions('D5')
+        dummy_classifier = ClassifierStub()
+        dto.set_options(dummy_classifier)
+        self.assertEqual('maximum_information_gain', dummy_classifier.options)
+        self.assertEqual({'max_depth': 5}, dummy_classifier.limits)
+        
     def test_invalid_decision_tree_option_results_in_no_setting(self):
         dto = c.DecisionTreeOptions('foo')
         dummy_classifier = ClassifierStub()
@@ -172,15 +282,27 @@ class ClassifyTestCase(unittest.TestCase):
         dto.set_options(dummy_classifier)
         self.assertTrue(dummy_classifier.options is None)
         
+        for options in ['IG,X9', 'IG,D', 'GR,', 'D5,L-1']:
+            dto = c.DecisionTreeOptions(options)
+            self.assertFalse(dto.valid())
+            dummy_classifier = ClassifierStub()
+            dto.set_options(dummy_classifier)
+            self.assertTrue(dummy_classifier.options is None)
+            self.assertTrue(dummy_classifier.limits is None)
+        
 
         
 class ClassifierStub:
     def __init__(self):
         self.options = None
+        self.limits = None
     
     def set_options(self, options):
         self.options = options
         
+    def set_limits(self, **limits):
+        self.limits = limits
+        
 class StubClassify(c.Classify):
     def __init__(self, strategy):
         c.Classify.__init__(self)
@@ -194,10 +316,20 @@ class StubClassify(c.Classify):
         
     def get_classification_strategy(self, classifier, test, gold, training, cross_validation_fold, attributes, klass):
         return self.strategy
+    
+    def get_chunked_strategy(self, chunk_size, classifier = None):
+        return self.strategy
+    
+    def load_model(self, path):
+        self.model_in = path
+        
+    def save_model(self, classifier, path):
+        self.model_out = path
                     
 class DoNothingStrategy:
     def __init__(self):
         self.called = False
+        self.classifier = None
         
     def classify(self):
         #do nothing
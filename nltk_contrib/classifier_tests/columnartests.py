@@ -0,0 +1,129 @@
+# Natural Language Toolkit
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+
+from nltk_contrib.classifier import columnar, format, instance, attribute as a, discretisedattribute as da, numrange as nr
+from nltk_contrib.classifier import naivebayes, oner, decisiontree, knn, zeror
+from nltk_contrib.classifier.exceptions import systemerror as system
+from nltk_contrib.classifier_tests import *
+
+def columnar_training(path):
+    return format.c45.training(path, metadata(path))
+
+class ColumnarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        self.attributes, self.klass = metadata(self.path)
+        self.training = format.c45.training(self.path, (self.attributes, self.klass))
+
+    def test_value_dictionary_codes_declared_values_in_order(self):
+        dictionary = a.ValueDictionary(['sunny', 'overcast', 'rainy'])
+        self.assertEqual([1, 0, 2], dictionary.codes_of(['overcast', 'sunny', 'rainy']))
+        self.assertEqual(3, dictionary.code('snowy'))
+        self.assertEqual('snowy', dictionary.value(3))
+        self.assertEqual(3, dictionary.declared)
+        self.assertTrue(dictionary.has_declared(['sunny', 'overcast', 'rainy']))
+
+    def test_value_dictionaries_are_shared_through_attributes(self):
+        _test = format.c45.test(self.path, (self.attributes, self.klass))
+        self.assertTrue(self.training.store.dictionaries[0] is _test.store.dictionaries[0])
+        self.assertTrue(self.attributes.value_dictionary('outlook', self.attributes[0].values) is self.training.store.dictionaries[0])
+
+    def test_views_behave_like_instances(self):
+        self.assertEqual(9, len(self.training))
+        first = self.training[0]
+        self.assertTrue(isinstance(first, instance.TrainingInstance))
+        self.assertEqual(['sunny', 'hot', 'high', 'false'], first.attrs)
+        self.assertEqual('no', first.klass_value)
+        self.assertEqual('sunny', first.value(self.attributes[0]))
+        self.assertEqual(training(self.path)[8].attrs, self.training[-1].attrs)
+        self.assertEqual(str(training(self.path)), str(self.training))
+
+    def test_classified_klass_is_stored_per_instances(self):
+        _gold = format.c45.gold(self.path, (self.attributes, self.klass))
+        self.assertEqual(None, _gold[0].classified_klass)
+        _gold[0].classified_klass = 'yes'
+        self.assertEqual('yes', _gold[0].classified_klass)
+        self.assertEqual(None, _gold[1].classified_klass)
+
+    def test_continuous_values_are_stored_as_floats(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'weather'
+        _training = columnar_training(path)
+        attributes = attributes_of(path)
+        self.assertEqual(27.5, _training[0].value(attributes[1]))
+        self.assertEqual(training(path).value_ranges([attributes[1]])[0].upper, _training.value_ranges([attributes[1]])[0].upper)
+
+    def test_validity(self):
+        self.assertTrue(self.training.are_valid(self.klass, self.attributes))
+        path = datasetsDir(self) + 'test_faulty' + SEP + 'invalid_attributes'
+        self.assertFalse(columnar_training(path).are_valid(*reversed(metadata(path))))
+
+    def test_filter_is_a_view_on_the_same_store(self):
+        filtered = self.training.filter(self.attributes[0], 'sunny')
+        self.assertEqual(4, len(filtered))
+        self.assertTrue(filtered.store is self.training.store)
+        self.assertEqual(0, len(self.training.filter(self.attributes[0], 'snowy')))
+
+    def test_partition_matches_filter(self):
+        partitions = self.training.partition(self.attributes[0])
+        self.assertEqual(['overcast', 'rainy', 'sunny'], sorted(partitions.keys()))
+        for value in partitions:
+            self.assertTrue(partitions[value].store is self.training.store)
+            self.assertEqual(list(self.training.filter(self.attributes[0], value).rows), list(partitions[value].rows))
+
+    def test_sort_by_matches_instances(self):
+        _training = training(self.path)
+        _training.sort_by(self.attributes[1])
+        self.training.sort_by(self.attributes[1])
+        self.assertEqual([each.attrs for each in _training], [each.attrs for each in self.training])
+
+    def test_statistics_match_instances(self):
+        _training = training(self.path)
+        self.assertEqual(_training.class_freq_dist(), self.training.class_freq_dist())
+        expected = _training.posterior_probablities(self.attributes, self.klass)
+        actual = self.training.posterior_probablities(self.attributes, self.klass)
+        for attribute in self.attributes:
+            for value in attribute.values:
+                for klass_value in self.klass:
+                    self.assertEqual(expected.value(attribute, value, klass_value), actual.value(attribute, value, klass_value))
+
+    def test_cross_validation_datasets_match_instances(self):
+        expected = training(self.path).cross_validation_datasets(3)
+        actual = self.training.cross_validation_datasets(3)
+        self.assertEqual(3, len(actual))
+        for index in range(3):
+            self.assertEqual([each.attrs for each in expected[index][0]], [each.attrs for each in actual[index][0]])
+            self.assertEqual([each.klass_value for each in expected[index][1]], [each.klass_value for each in actual[index][1]])
+            self.assertTrue(isinstance(actual[index][1], columnar.ColumnarGoldInstances))
+
+    def test_discretise(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'weather'
+        attributes, klass = metadata(path)
+        _training = format.c45.training(path, (attributes, klass))
+        disc_attr = da.DiscretisedAttribute('temperature', nr.Range(0, 40).split(4), 1)
+        _training.discretise([disc_attr])
+        expected = training(path)
+        expected.convert_to_float([1])
+        expected.discretise([disc_attr])
+        self.assertEqual([each.attrs for each in expected], [each.attrs for each in _training])
+        self.assertRaises(system.SystemError, _training[0].discretise, [disc_attr])
+
+    def test_remove_attributes(self):
+        self.training.remove_attributes([self.attributes[1], self.attributes[3]])
+        self.assertEqual(['sunny', 'high'], self.training[0].attrs)
+
+    def test_classifiers_classify_like_with_instances(self):
+        for algorithm in [zeror.ZeroR, oner.OneR, decisiontree.DecisionTree, naivebayes.NaiveBayes, knn.IB1]:
+            classified = []
+            for instances in [training(self.path), self.training]:
+                classified.append([])
+                for _training, _gold in instances.cross_validation_datasets(3):
+                    classifier = algorithm(_training, self.attributes, self.klass)
+                    classifier.train()
+                    classifier.verify(_gold)
+                    classified[-1].extend([each.classified_klass for each in _gold])
+            self.assertEqual(classified[0], classified[1])
+
+def attributes_of(path):
+    return metadata(path)[0]
@@ -15,3 +15,30 @@ class CommandLineTestCase(unittest.TestCase):
         returned = cl.as_integers('Foo', '3,5, 7, 9')
         self.assertEqual([3, 5, 7, 9], returned)
         
+    def test_number_of_jobs_should_be_positive(self):
+        cli = CommandLineStub()
+        cli.parse(['-j', '0'])
+        cli.execute()
+        cli.validate_jobs()
+        self.assertEqual('Invalid arguments. The number of jobs should be a positive number.', cli.message)
+        
+        cli = CommandLineStub()
+        cli.parse([])
+        cli.execute()
+        self.assertEqual(1, cli.jobs)
+        cli.validate_jobs()
+        self.assertTrue(cli.message is None)
+        
+    def test_jobs_option_is_only_added_by_commands_which_run_in_parallel(self):
+        cli = CommandLineStub(False)
+        cli.parse(['-j', '2'])
+        self.assertEqual('no such option: -j', cli.message)
+        
+class CommandLineStub(cl.CommandLineInterface):
+    def __init__(self, jobs = True):
+        cl.CommandLineInterface.__init__(self, ['0R'], '0R', '', '', '', '', '', '')
+        if jobs: self.add_jobs_option()
+        self.message = None
+        
+    def error(self, message):
+        self.message = message
@@ -139,7 +139,7 @@ class DecisionStumpTestCase(unittest.TestCase):
         self.assertAlmostEqual(0.091091, stumps[2].information_gain(), 6)
         self.assertAlmostEqual(0.072780, stumps[3].information_gain(), 6)
 
-        stumps.sort(lambda x, y: cmp(getattr(x, 'information_gain'), getattr(y, 'information_gain')))
+        stumps.sort(lambda x, y: cmp(getattr(y, 'information_gain')(), getattr(x, 'information_gain')()))
 
         self.assertAlmostEqual(0.324409, stumps[0].information_gain(), 6)
         self.assertAlmostEqual(0.102187, stumps[1].information_gain(), 6)
@@ -173,3 +173,18 @@ class DecisionStumpTestCase(unittest.TestCase):
         windy_stump.update_count(instance.TrainingInstance(['rainy','mild','normal','false'],'yes'))
 
         self.assertTrue(self.outlook_stump.split_info() > windy_stump.split_info())
+
+    def test_stump_created_from_state_has_the_same_counts_and_children(self):
+        for each in self.instances:
+            self.outlook_stump.update_count(each)
+        windy_stump = ds.DecisionStump(self.attributes[3], self.klass)
+        windy_stump.update_count(self.instances[0])
+        self.outlook_stump.children['sunny'] = windy_stump
+        
+        stump = ds.from_state(self.outlook_stump.state(), self.attributes, self.klass)
+        self.assertEqual(self.outlook_attr, stump.attribute)
+        self.assertEqual(self.outlook_stump.counts, stump.counts)
+        self.assertEqual(self.outlook_stump.root, stump.root)
+        self.assertEqual(['sunny'], stump.children.keys())
+        self.assertEqual(self.attributes[3], stump.children['sunny'].attribute)
+        self.assertEqual('no', stump.klass(instance.TestInstance(['sunny', 'hot', 'high', 'false'])))
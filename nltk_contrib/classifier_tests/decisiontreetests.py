@@ -7,7 +7,7 @@
 
 from nltk_contrib.classifier_tests import *
 from nltk_contrib.classifier import decisiontree, decisionstump as ds, instances as ins, attribute as attr
-from nltk_contrib.classifier.exceptions import invaliddataerror as inv
+from nltk_contrib.classifier.exceptions import invaliddataerror as inv, illegalstateerror as ise
 
 class DecisionTreeTestCase(unittest.TestCase):
     def test_tree_creation(self):
@@ -84,5 +84,39 @@ class DecisionTreeTestCase(unittest.TestCase):
             self.fail('should have thrown an error')
         except inv.InvalidDataError:
             pass
-            
-        
+
+    def test_cannot_be_trained_incrementally(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        dt = decisiontree.DecisionTree(training(path), attributes(path), klass(path))
+        dt.train()
+        try:
+            dt.update(training(path))
+            self.fail('should throw illegal state error')
+        except ise.IllegalStateError:
+            pass
+
+    def test_tree_is_the_same_for_instances_stored_in_columns(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        a, c = metadata(path)
+        tree = decisiontree.DecisionTree(format.c45.training(path, (a, c)), a, c)
+        tree.train()
+        self.assertEqual('outlook', tree.root.attribute.name)
+        self.assertEqual('temperature', tree.root.children['sunny'].attribute.name)
+        self.assertEqual('windy', tree.root.children['rainy'].attribute.name)
+
+    def test_depth_of_tree_can_be_limited(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        a, c = metadata(path)
+        tree = decisiontree.DecisionTree(training(path), a, c, max_depth = 1)
+        tree.train()
+        self.assertEqual('outlook', tree.root.attribute.name)
+        self.assertEqual(0, len(tree.root.children))
+
+    def test_branches_with_few_instances_are_not_split(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        a, c = metadata(path)
+        tree = decisiontree.DecisionTree(training(path), a, c)
+        tree.set_limits(min_leaf = 4)
+        tree.train()
+        self.assertEqual(['sunny'], tree.root.children.keys())
+        self.assertEqual(0, len(tree.root.children['sunny'].children))
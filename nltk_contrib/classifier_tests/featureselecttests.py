@@ -236,6 +236,18 @@ class FeatureSelectTestCase(unittest.TestCase):
         self.assertAlmostEqual(0.7916666, accuracies['outlook', 'temperature'], 6)
         self.assertAlmostEqual(0.4166666, accuracies[('temperature','humidity')], 6)
         
+    def test_wrapper_selection_is_the_same_with_parallel_jobs(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        for method in ['forward_selection', 'backward_elimination']:
+            selected = []
+            for jobs in [1, 2]:
+                _training = format.c45.training(path, metadata(path))
+                _attributes, _klass = metadata(path)
+                feat_sel = fs.FeatureSelection(_training, _attributes, _klass, None, None, ['1R', '4', '0.1'], jobs)
+                getattr(feat_sel, method)()
+                selected.append([attribute.name for attribute in _attributes])
+            self.assertEqual(selected[0], selected[1])
+
     def test_get_suffix_replaces_decimal_point_in_options_with_hyphen(self):
         feat_sel = FeatureSelectStub()
         feat_sel.run(['-a', 'RNK', '-f', 'path', '-o', 'IG,4'])
@@ -6,6 +6,8 @@
 # This software is distributed under GPL, for license information see LICENSE.TXT
 from nltk_contrib.classifier_tests import *
 from nltk_contrib.classifier import format, instance as ins, attribute as a
+from nltk_contrib.classifier.exceptions import invaliddataerror as inv
+import tempfile, shutil
 
 class FormatTestCase(unittest.TestCase):
     def test_get_c45_name(self):
@@ -68,6 +70,39 @@ class FormatTestCase(unittest.TestCase):
         fmt.write_test(_test, '/dummy/path', False)
         self.assertEqual(['overcast,25.4,high,true'], fmt.dummy_file.lines_written)
 
+    def test_training_chunks(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'person'
+        chunks = list(format.c45.training_chunks(path, metadata(path), 4))
+        self.assertEqual([4, 2], [len(chunk) for chunk in chunks])
+        self.assertEqual(65000.0, chunks[0][0].value(metadata(path)[0][6]))
+        self.assertEqual('no', chunks[1][1].klass_value)
+
+    def test_chunks_read_with_memory_map_are_the_same(self):
+        path = datasetsDir(self) + 'test_phones' + SEP + 'phoney'
+        chunks = list(format.c45.gold_chunks(path, metadata(path), 3))
+        mapped = list(format.c45.gold_chunks(path, metadata(path), 3, True))
+        self.assertEqual([3, 3, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual([[str(instance) for instance in chunk] for chunk in chunks], [[str(instance) for instance in chunk] for chunk in mapped])
+
+    def test_chunks_are_validated_as_they_are_read(self):
+        path = datasetsDir(self) + 'test_faulty' + SEP + 'invalid_attributes'
+        chunks = format.c45.training_chunks(path, metadata(path), 2)
+        try:
+            list(chunks)
+            self.fail('should throw invalid data error')
+        except inv.InvalidDataError:
+            pass
+
+    def test_write_appends_to_existing_file(self):
+        _test = test(datasetsDir(self) + 'numerical' + SEP + 'weather')
+        path = tempfile.mkdtemp() + SEP + 'weather'
+        try:
+            format.c45.write_test(_test, path, False)
+            format.c45.write_test(_test, path, False, True)
+            self.assertEqual(['overcast,25.4,high,true', 'overcast,25.4,high,true'], [line.strip() for line in open(path + '.test')])
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
 if __name__ == '__main__':
     runner = unittest.TextTestRunner()
     runner.run(unittest.TestSuite(unittest.makeSuite(FormatTestCase)))
@@ -84,5 +119,5 @@ class LinesFile:
     def __init__(self):
         self.lines_written = None
     
-    def write(self, lines):
+    def write(self, lines, append = False):
         self.lines_written = lines
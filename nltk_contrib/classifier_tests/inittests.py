@@ -23,6 +23,18 @@ class InitTestCase(unittest.TestCase):
         self.assertEqual(4, position)
         self.assertEqual(-1 * (4.0/5 * math.log(4.0/5, 2) + 1.0/5 * math.log(1.0/5, 2)), min_ent)
         
+    def test_min_entropy_breakpoint_is_the_same_as_splitting_at_each_position(self):
+        values = ['a', 'b', 'a', 'c', 'c', 'b', 'a', 'a', 'c', 'b', 'b', 'a']
+        entropies = [entropy(values[:index + 1]) + entropy(values[index + 1:]) for index in range(len(values) - 1)]
+        position, min_ent = min_entropy_breakpoint(values)
+        self.assertEqual(entropies.index(min(entropies)), position)
+        self.assertEqual(min(entropies), min_ent)
+        
+    def test_entropy_of_counts(self):
+        self.assertEqual(entropy(['yes', 'yes', 'no']), entropy_of_counts([2, 0, 1]))
+        self.assertEqual(0, entropy_of_counts([3, 0]))
+        self.assertEqual(0, entropy_of_counts([]))
+        
     def test_entropy_function(self):
         dictionary_of_klass_counts = {}
         dictionary_of_klass_counts['yes'] = 2
@@ -56,6 +56,16 @@ class InstancesTestCase(unittest.TestCase):
         self.assertEqual(3, len(filtered))
         self.assertEqual(7, len(_training))
 
+    def test_partition_is_the_same_as_filtering_by_each_value(self):
+        path = datasetsDir(self) + 'test_phones' + SEP + 'phoney'
+        _training = training(path)
+        _attributes = attributes(path)
+        partitions = _training.partition(_attributes[1])
+        for value in partitions:
+            self.assertEqual(_training.filter(_attributes[1], value), partitions[value])
+        self.assertEqual(3, len(partitions['big']))
+        self.assertEqual(7, sum([len(each) for each in partitions.values()]))
+
     def test_ranges_of_attribute_values(self):
         path = datasetsDir(self) + 'numerical' + SEP + 'weather'
         _training = training(path)
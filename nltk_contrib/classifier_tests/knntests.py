@@ -57,4 +57,58 @@ class KNNTestCase(unittest.TestCase):
         test_instance = ins.TestInstance(['sunny','hot','high','false'])
         classifier.test(inss.TestInstances([test_instance]))
         self.assertEqual('no', test_instance.classified_klass)
-        
+
+    def test_instance_distances_nearest_includes_ties_of_kth_instance(self):
+        id = self.setup_instance_distances_with_6_instances()
+        instances, distances = id.nearest(4)
+        self.assertEqual(5, len(instances))
+        self.assertEqual([1.0, 1.0, 1.0, 2.0, 2.0], distances)
+        self.assertEqual(instances, id.nearest(3)[0] + instances[3:])
+
+    def test_weighted_klass_vote(self):
+        self.assertEqual('b', knn.weighted_klass_vote([self.ins1, self.ins2, self.ins3], [2.0, 2.0, 0.5]))
+        self.assertEqual('a', knn.weighted_klass_vote([self.ins1, self.ins2, self.ins3], [2.0, 0.0, 0.5]))
+
+    def test_ib1_with_k_nearest_neighbours(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classifier = knn.IB1(training(path), *metadata(path))
+        classifier.set_options({'k': 9})
+        test_instance = ins.TestInstance(['sunny','hot','high','false'])
+        classifier.test(inss.TestInstances([test_instance]))
+        self.assertEqual('yes', test_instance.classified_klass)
+
+    def test_vectorised_ib1_classifies_like_ib1(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'person'
+        for options in [{}, {'k': 3, 'weighted': True}, {'normalise': True}, {'k': 2, 'use_tree': True}]:
+            classified = []
+            for vectorised in [False, True]:
+                classifier = knn.IB1(training(path), *metadata(path))
+                classifier.set_options(options)
+                classifier.vectorised = vectorised
+                _test = test(path)
+                classifier.test(_test)
+                classified.append([each.classified_klass for each in _test])
+            self.assertEqual(classified[0], classified[1])
+
+    def test_kd_tree_finds_same_neighbours_as_exhaustive_search(self):
+        import numpy
+        points = numpy.array([[x % 7, x % 5] for x in range(100)], dtype=float)
+        tree = knn.KDTree(points, leaf_size = 4)
+        for query in [[0.0, 0.0], [3.5, 2.0], [6.0, 4.5]]:
+            distances = numpy.sqrt(((points - query) ** 2).sum(axis=1))
+            for k in [1, 3, 10]:
+                nearest, tree_distances = tree.nearest(numpy.array(query), k)
+                self.assertEqual(list(knn.k_nearest(distances, k)), list(nearest))
+
+    def test_kd_tree_is_only_suitable_for_few_continuous_attributes(self):
+        self.assertFalse(knn.KDTree.is_suitable(attributes(datasetsDir(self) + 'numerical' + SEP + 'person')))
+
+    def test_vectorised_distance_between_undeclared_values_is_as_distance_metric(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        _attributes = attributes(path)
+        engine = knn.NearestNeighbours(inss.TrainingInstances([ins.TrainingInstance(['foggy','hot','high','false'], 'no')]), _attributes, 1, knn.majority_klass_vote)
+        _test = inss.TestInstances([ins.TestInstance(['misty','hot','high','false']), ins.TestInstance(['foggy','hot','high','false'])])
+        distances = engine.encode(_test).distances(engine.encoded, 0, 2)
+        for index in range(2):
+            self.assertEqual(knn.normalised_euclidean_distance(_test[index], engine.training[0], _attributes), distances[index][0])
+        self.assertEqual([1.0, 0.0], [each[0] for each in distances])
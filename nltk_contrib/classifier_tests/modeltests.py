@@ -0,0 +1,104 @@
+# Natural Language Toolkit
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+
+from nltk_contrib.classifier_tests import *
+from nltk_contrib.classifier import model, zeror, oner, decisiontree, naivebayes, knn, discretisedattribute as da, numrange as r
+from nltk_contrib.classifier.exceptions import invaliddataerror as inv, illegalstateerror as ise
+import nltk_contrib.classifier as cl
+import tempfile, shutil, cPickle
+
+class ModelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + SEP + 'model'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_same_classification(self, algorithm, path):
+        classifier = algorithm(training(path), attributes(path), klass(path))
+        classifier.train()
+        model.save(classifier, self.path)
+        loaded = model.load(self.path)
+        self.assertEqual(algorithm, loaded.__class__)
+        self.assertEqual(classifier.klass, loaded.klass)
+        expected, actual = gold(path), gold(path)
+        self.assertEqual(classifier.verify(expected).accuracy(), loaded.verify(actual).accuracy())
+        self.assertEqual([instance.classified_klass for instance in expected], [instance.classified_klass for instance in actual])
+        return loaded
+
+    def test_loaded_classifiers_classify_like_the_trained_ones(self):
+        phoney = datasetsDir(self) + 'test_phones' + SEP + 'phoney'
+        for algorithm in [zeror.ZeroR, oner.OneR, decisiontree.DecisionTree, naivebayes.NaiveBayes, knn.IB1]:
+            self.assert_same_classification(algorithm, phoney)
+
+    def test_classifiers_must_implement_model_and_restore(self):
+        phoney = datasetsDir(self) + 'test_phones' + SEP + 'phoney'
+        classifier = ClassifierWithoutModel(training(phoney), attributes(phoney), klass(phoney))
+        self.assertRaises(NotImplementedError, classifier.model)
+        self.assertRaises(NotImplementedError, classifier.restore, {})
+
+    def test_naive_bayes_model_with_continuous_attributes(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'weather'
+        classifier = naivebayes.NaiveBayes(training(path), attributes(path), klass(path))
+        classifier.train()
+        model.save(classifier, self.path)
+        loaded = model.load(self.path)
+        for klass_value in classifier.klass:
+            self.assertAlmostEqual(classifier.class_conditional_probability(test(path)[0], klass_value), \
+                                   loaded.class_conditional_probability(test(path)[0], klass_value))
+
+    def test_training_of_loaded_classifier_can_be_continued(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classifier = naivebayes.NaiveBayes(training(path), attributes(path), klass(path))
+        classifier.train()
+        model.save(classifier, self.path)
+        loaded = model.load(self.path)
+        classifier.update(training(path))
+        loaded.update(training(path))
+        self.assertEqual(classifier.class_freq_dist.freq('yes'), loaded.class_freq_dist.freq('yes'))
+        self.assertEqual(classifier.posterior_probability(attributes(path)[0], 'sunny', 'no'), loaded.posterior_probability(loaded.attributes[0], 'sunny', 'no'))
+
+    def test_options_and_limits_are_part_of_the_model(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        tree = decisiontree.DecisionTree(training(path), attributes(path), klass(path), max_depth = 1)
+        tree.set_options('maximum_gain_ratio')
+        tree.train()
+        model.save(tree, self.path)
+        loaded = model.load(self.path)
+        self.assertEqual('maximum_gain_ratio', loaded.options)
+        self.assertEqual(1, loaded.max_depth)
+        self.assertEqual(tree.root.attribute, loaded.root.attribute)
+        self.assertEqual(0, len(loaded.root.children))
+
+    def test_ranges_of_discretised_attributes_are_saved(self):
+        discretised = da.DiscretisedAttribute('temperature', r.Range(0, 30, True).split(3), 1)
+        state = model.attributes_state([attributes(datasetsDir(self) + 'minigolf' + SEP + 'weather')[0], discretised])
+        loaded = model.attributes_from_state(state)
+        self.assertEqual(['sunny', 'overcast', 'rainy'], loaded[0].values)
+        self.assertTrue(isinstance(loaded[1], da.DiscretisedAttribute))
+        self.assertEqual(discretised, loaded[1])
+        self.assertEqual(discretised.ranges, loaded[1].ranges)
+        self.assertEqual('b', loaded[1].mapping(12.5))
+
+    def test_untrained_classifier_cannot_be_saved(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        classifier = oner.OneR(training(path), attributes(path), klass(path))
+        self.assertRaises(ise.IllegalStateError, model.save, classifier, self.path)
+
+    def test_files_which_are_not_models_are_not_loaded(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        self.assertRaises(inv.InvalidDataError, model.load, path + '.data')
+        model_file = open(self.path, 'wb')
+        cPickle.dump({'format': model.FORMAT, 'version': model.VERSION + 1}, model_file)
+        model_file.close()
+        self.assertRaises(inv.InvalidDataError, model.load, self.path)
+
+class ClassifierWithoutModel(cl.Classifier):
+    pass
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(unittest.TestSuite(unittest.makeSuite(ModelTestCase)))
@@ -5,8 +5,9 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import instances as ins, instance, attribute as a, naivebayes
+from nltk_contrib.classifier import instances as ins, instance, attribute as a, naivebayes, format, train_incrementally
 from nltk_contrib.classifier_tests import *
+import math
 
 class NaiveBayesTestCase(unittest.TestCase):
     def setUp(self):
@@ -73,3 +74,44 @@ class NaiveBayesTestCase(unittest.TestCase):
         nb.train()
         
         self.assertEqual('yes', nb.estimate_klass(_test[0]))
+
+    def test_training_incrementally_is_the_same_as_training_at_once(self):
+        for name in [['loan', 'loan'], ['numerical', 'weather']]:
+            path = datasetsDir(self) + SEP.join(name)
+            _attributes, _klass = metadata(path)
+            nb = naivebayes.NaiveBayes(training(path), _attributes, _klass)
+            nb.train()
+            incremental = train_incrementally(naivebayes.NaiveBayes, format.c45.training_chunks(path, metadata(path), 3), _attributes, _klass)
+            for klass_value in _klass:
+                self.assertAlmostEqual(nb.prior_probability(klass_value), incremental.prior_probability(klass_value), 6)
+            for instance in test(path):
+                instance.convert_to_float(_attributes.continuous_attribute_indices())
+                for klass_value in _klass:
+                    self.assertAlmostEqual(nb.class_conditional_probability(instance, klass_value), incremental.class_conditional_probability(instance, klass_value), 6)
+
+    def test_log_scores_are_logarithms_of_class_conditional_probabilities(self):
+        self.nb.train()
+        self._test.convert_to_float(self._attributes.continuous_attribute_indices())
+        scores = self.nb.log_scores(self._test)
+        self.assertEqual((1, 2), scores.shape)
+        for index in range(len(self.nb.klass)):
+            self.assertAlmostEqual(math.log(self.nb.class_conditional_probability(self._test[0], self.nb.klass[index])), scores[0][index], 6)
+
+    def test_batch_classification_is_the_same_as_classifying_each_instance(self):
+        path = datasetsDir(self) + 'numerical' + SEP + 'person'
+        _attributes, _klass = metadata(path)
+        nb = naivebayes.NaiveBayes(training(path), _attributes, _klass)
+        nb.train()
+        _training = training(path)
+        _training.convert_to_float(_attributes.continuous_attribute_indices())
+        self.assertEqual([nb.estimate_klass(instance) for instance in _training], nb.estimate_klasses(_training))
+
+    def test_batch_classification_does_not_underflow(self):
+        self.nb.train()
+        self._test.convert_to_float(self._attributes.continuous_attribute_indices())
+        self._test[0].attrs[2] = 1e9
+        self.assertEqual(0, self.nb.class_conditional_probability(self._test[0], 'no'))
+        self.assertEqual(0, self.nb.class_conditional_probability(self._test[0], 'yes'))
+        scores = self.nb.log_scores(self._test)
+        self.assertTrue(scores[0][0] > -1e300 and scores[0][1] > -1e300)
+        self.assertTrue(scores[0][0] != scores[0][1])
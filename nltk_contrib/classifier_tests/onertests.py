@@ -5,7 +5,7 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import oner, instances as ins, format
+from nltk_contrib.classifier import oner, instances as ins, format, train_incrementally
 from nltk_contrib.classifier_tests import *
 from nltk_contrib.classifier.exceptions import invaliddataerror as inv
 
@@ -50,8 +50,16 @@ class OneRTestCase(unittest.TestCase):
             self.fail('should have thrown error')
         except inv.InvalidDataError:
             pass
+
+    def test_training_incrementally_is_the_same_as_training_at_once(self):
+        path = self.WEATHER
+        classifier = train_incrementally(oner.OneR, format.c45.training_chunks(path, metadata(path), 4), attributes(path), klass(path))
+        classifier.test(test(path))
+        self.assertEqual('yes', classifier.test_instances[0].classified_klass)
+        cm = classifier.verify(gold(self.WEATHER))
+        self.assertEqual(0.5, cm.accuracy())
         
-        
+
 class OneRStub(oner.OneR):
     def __init__(self, instances, attributes, klass):
         oner.OneR.__init__(self, instances, attributes, klass)
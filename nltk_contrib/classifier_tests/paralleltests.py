@@ -0,0 +1,44 @@
+# Natural Language Toolkit - Parallel tests
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+from nltk_contrib.classifier_tests import *
+from nltk_contrib.classifier import parallel
+from nltk_contrib.classifier.exceptions import invaliddataerror as inv
+
+class ParallelTestCase(unittest.TestCase):
+    def test_runs_tasks_serially_with_one_job(self):
+        self.assertEqual([10, 11, 12], parallel.run_tasks(add, 10, [0, 1, 2]))
+        self.assertEqual([], parallel.run_tasks(add, 10, []))
+        
+    def test_runs_tasks_in_worker_processes_in_order(self):
+        shared = range(100)
+        self.assertEqual([shared[index] + index for index in range(20)], parallel.run_tasks(add_item, shared, range(20), 3))
+        
+    def test_changes_to_shared_data_are_not_seen_by_the_caller(self):
+        shared = [0]
+        parallel.run_tasks(change, shared, range(4), 2)
+        self.assertEqual([0], shared)
+        
+    def test_errors_raised_by_tasks_are_raised_in_the_caller(self):
+        self.assertRaises(inv.InvalidDataError, parallel.run_tasks, fail, 2, range(4), 1)
+        self.assertRaises(inv.InvalidDataError, parallel.run_tasks, fail, 2, range(4), 2)
+        self.assertRaises(TypeError, parallel.run_tasks, add, 'a', range(4), 2)
+        
+def add(shared, task):
+    return shared + task
+
+def add_item(shared, task):
+    return shared[task] + task
+
+def change(shared, task):
+    shared.append(task)
+
+def fail(shared, task):
+    if task == shared:
+        raise inv.InvalidDataError('Task ' + str(task) + ' failed.')
+    return task
+        
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(unittest.TestSuite(unittest.makeSuite(ParallelTestCase)))
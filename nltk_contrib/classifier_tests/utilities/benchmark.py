@@ -0,0 +1,56 @@
+# Natural Language Toolkit
+#
+# URL: <http://www.nltk.org/>
+# This software is distributed under GPL, for license information see LICENSE.TXT
+
+import os
+import os.path
+import time
+from nltk_contrib.classifier import format as fmt, naivebayes
+import sys
+
+def datasets(root_path):
+    """
+    Returns the base paths of all datasets with metadata under @param root_path
+    """
+    paths = []
+    for dir_name, dirs, files in os.walk(root_path):
+        for file in files:
+            if file.endswith('.' + fmt.c45.NAMES):
+                paths.append(dir_name + os.path.sep + file[:-len(fmt.c45.NAMES) - 1])
+    paths.sort()
+    return paths
+
+def naive_bayes(root_path, repeat = 3):
+    """
+    Times the classification of the training instances of each dataset by Naive Bayes,
+    one instance at a time and in a batch using logarithms of the probabilities.
+    The number of instances which are classified differently is reported as well.
+    """
+    print '%-30s %8s %12s %12s %8s %10s' % ('Dataset', 'Size', 'Instance(s)', 'Batch(s)', 'Speedup', 'Different')
+    for path in datasets(root_path):
+        attributes, klass = fmt.c45.metadata(path)
+        classifier = naivebayes.NaiveBayes(fmt.c45.training(path), attributes, klass)
+        classifier.train()
+        instance_time, instance_klasses = best_time(classifier, path, False, repeat)
+        batch_time, batch_klasses = best_time(classifier, path, True, repeat)
+        different = len([index for index in range(len(instance_klasses)) if instance_klasses[index] != batch_klasses[index]])
+        print '%-30s %8d %12.4f %12.4f %8.1f %10d' % (path[len(root_path):].strip(os.path.sep), len(instance_klasses), instance_time, batch_time, \
+                                                     instance_time / max(batch_time, 1e-6), different)
+
+def best_time(classifier, path, vectorised, repeat):
+    classifier.vectorised, best = vectorised, None
+    for each in range(repeat):
+        instances = fmt.c45.training(path)
+        instances.convert_to_float(classifier.attributes.continuous_attribute_indices())
+        start = time.time()
+        classifier.classify(instances)
+        elapsed = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    return best, [instance.classified_klass for instance in instances]
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        naive_bayes(sys.argv[1])
+    else:
+        naive_bayes(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ucidatasets'))
@@ -5,7 +5,7 @@
 # URL: <http://www.nltk.org/>
 # This software is distributed under GPL, for license information see LICENSE.TXT
 
-from nltk_contrib.classifier import zeror as z, instances as ins
+from nltk_contrib.classifier import zeror as z, instances as ins, format, train_incrementally
 from nltk_contrib.classifier.exceptions import invaliddataerror as inv
 from nltk_contrib.classifier_tests import *
 
@@ -60,8 +60,18 @@ class ZeroRTestCase(unittest.TestCase):
         zeror = z.ZeroR(training(path), attributes(path), klass(path))
         zeror.train()
         zeror.verify(gold(path))
-        
-        
-        
 
-        
+    def test_training_incrementally_is_the_same_as_training_at_once(self):
+        path = datasetsDir(self) + 'minigolf' + SEP + 'weather'
+        zeror = train_incrementally(z.ZeroR, format.c45.training_chunks(path, metadata(path), 2), attributes(path), klass(path))
+        self.assertEqual(None, zeror.training)
+        _test = test(path)
+        zeror.test(_test)
+        self.assertEqual('yes', _test[0].classified_klass)
+
+    def test_training_incrementally_requires_training_instances(self):
+        try:
+            train_incrementally(z.ZeroR, [], None, None)
+            self.fail('should throw invalid data error')
+        except inv.InvalidDataError:
+            pass
@@ -11,6 +11,18 @@
 """
 
 from operator import itemgetter
+from itertools import islice
+import multiprocessing
+
+from nltk.probability import DictionaryProbDist
+
+# number of samples classified together by the batch methods
+BATCH_SIZE = 100
+
+# the classifier of the worker processes of the batch methods, it is set
+# before the processes are forked so the trained model is shared with them
+# copy-on-write rather than pickled
+_shared_classifier = None
 
 class ClassifyI:
 
@@ -49,6 +61,49 @@ class ClassifyI:
         @ret: dictionary of class names to probability
         """
         raise NotImplementedError()
+
+    def batch_get_class(self, samples, processes=1):
+        """
+        @param samples: iterable of samples to be classified
+        @param processes: number of processes classifying the samples
+        @ret: iterator over the most probable class name of each sample
+        """
+        return _batch(self, 'get_class', samples, processes)
+
+    def batch_get_class_list(self, samples, processes=1):
+        """
+        @param samples: iterable of samples to be classified
+        @param processes: number of processes classifying the samples
+        @ret: iterator over the lists of classes of each sample,
+              see get_class_list
+        """
+        return _batch(self, 'get_class_list', samples, processes)
+
+    def batch_get_class_probs(self, samples, processes=1):
+        """
+        @param samples: iterable of samples to be classified
+        @param processes: number of processes classifying the samples
+        @ret: iterator over the DictionaryProbDist of each sample,
+              see get_class_probs
+        """
+        return _batch(self, 'get_class_probs', samples, processes)
+
+    def batch_get_class_tuples(self, samples, processes=1):
+        """
+        @param samples: iterable of samples to be classified
+        @param processes: number of processes classifying the samples
+        @ret: iterator over the class tuples of each sample,
+              see get_class_tuples
+        """
+        return _batch(self, 'get_class_tuples', samples, processes)
+
+    def _classify_chunk(self, method, samples):
+        """
+        @param method: name of the method classifying a sample
+        @param samples: list of samples to be classified
+        @ret: list of the results of the method for each sample
+        """
+        return [getattr(self, method)(sample) for sample in samples]
         
         
 
@@ -65,25 +120,21 @@ class AbstractClassify(ClassifyI):
         @param text: sample to be classified
         @ret: most probable class
         """
-        (cls, prob) = self.get_class_tuples(text)[0]
-        return cls
+        return self._class(self.get_class_dict(text))
 
     def get_class_list(self, text):
         """
         @param text: sample to be classified 
         @ret: ordered list of classification results
         """
-        tuplelist = self.get_class_tuples(text)
-        return [cls for (cls,prob) in tuplelist]
+        return self._class_list(self.get_class_dict(text))
 
     def get_class_tuples(self, text):
         """
         @param text: sample to be classified
         @ret: an ordered list of tuples
         """
-        tmp = self.get_class_dict(text)
-        return sorted([(cls, tmp[cls]) for cls in tmp],
-                      key=itemgetter(1), reverse=True)
+        return self._class_tuples(self.get_class_dict(text))
 
     def get_class_probs(self, text):
         """
@@ -92,7 +143,38 @@ class AbstractClassify(ClassifyI):
         see probability.py
         """
     
-        return DictionaryProbDist(self.get_class_dict(text), normalize=True)
+        return self._class_probs(self.get_class_dict(text))
+
+    def _class(self, class_dict):
+        (cls, prob) = self._class_tuples(class_dict)[0]
+        return cls
+
+    def _class_list(self, class_dict):
+        return [cls for (cls,prob) in self._class_tuples(class_dict)]
+
+    def _class_tuples(self, class_dict):
+        return sorted([(cls, class_dict[cls]) for cls in class_dict],
+                      key=itemgetter(1), reverse=True)
+
+    def _class_probs(self, class_dict):
+        return DictionaryProbDist(class_dict, normalize=True)
+
+    def _classify_chunk(self, method, samples):
+        """
+        @param method: name of the method classifying a sample
+        @param samples: list of samples to be classified
+        @ret: list of the results of the method for each sample,
+              computed from the dictionaries of batch_get_class_dict
+        """
+        convert = getattr(self, method.replace('get_', '_', 1))
+        return [convert(class_dict) for class_dict in self.batch_get_class_dict(samples)]
+
+    def batch_get_class_dict(self, samples):
+        """
+        @param samples: samples to be classified
+        @ret: a list of dictionaries (class to probability), one for each sample
+        """
+        return [self.get_class_dict(sample) for sample in samples]
     
 
 
@@ -101,14 +183,56 @@ class AbstractClassify(ClassifyI):
 ##//////////////////////////////////////////////////////
 
 
-def classifier_accuracy(classifier, gold):
+def classifier_accuracy(classifier, gold, processes=1):
     
+    classes = list(gold)
     correct = 0
-    for cls in gold:
-        if classifier.get_class(gold[cls]) == cls:
+    results = classifier.batch_get_class([gold[cls] for cls in classes], processes)
+    for (cls, result) in zip(classes, results):
+        if result == cls:
             correct += 1
     return float(correct) / len(gold)
 
+def _batch(classifier, method, samples, processes):
+    """
+    @param classifier: trained classifier
+    @param method: name of the method classifying a sample
+    @param samples: iterable of samples to be classified
+    @param processes: number of processes classifying the samples
+    @ret: iterator over the results of the method for each sample
+
+        samples are classified BATCH_SIZE at a time, by a pool of processes
+        forked with the classifier when processes is more than 1
+    """
+    global _shared_classifier
+    chunks = _chunks(samples, BATCH_SIZE)
+    if processes == 1:
+        for chunk in chunks:
+            for result in classifier._classify_chunk(method, chunk):
+                yield result
+        return
+
+    _shared_classifier = classifier
+    pool = multiprocessing.Pool(processes)
+    try:
+        for results in pool.imap(_classify_shared_chunk, ((method, chunk) for chunk in chunks)):
+            for result in results:
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _chunks(samples, size):
+    samples = iter(samples)
+    while True:
+        chunk = list(islice(samples, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _classify_shared_chunk((method, samples)):
+    return _shared_classifier._classify_chunk(method, samples)
+
 
 from cosine import *
 from naivebayes import *
@@ -15,6 +15,11 @@ from math import sqrt, pow
 from nltk.probability import *
 from nltk_contrib.classify import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class Cosine(AbstractClassify):
     """
     The Cosine Classifier uses the cosine distance algorithm to compute
@@ -32,11 +37,18 @@ class Cosine(AbstractClassify):
         holds a feature detector function
     _classes:
         holds a list of classes supplied during training
-    _cls_freq_dist:
-        holds a dictionary of Frequency Distributions,
-        this structure is defined in probabilty.py in nltk
-        this structure is indexed by class names and feature types
-        the frequency distributions are indexed by feature values
+    _feature_ids:
+        holds a dictionary of feature ids, shared by all the classes,
+        indexed by feature type and feature value
+    _cls_vectors:
+        holds the class vectors as a sparse matrix, a list indexed by
+        feature id of lists of (class index, frequency) tuples
+    _cls_vector_lens:
+        holds a dictionary of the squared lengths of the class vectors,
+        indexed by feature type, the lengths are lists indexed by class index
+    _cls_matrix:
+        holds the class vectors in numpy arrays when numpy is available,
+        see _build_matrix
 
     """
 
@@ -51,20 +63,58 @@ class Cosine(AbstractClassify):
     def train(self, gold):
         """     
         Train classifier using representative examples of classes;
-        creates frequency distributions of these classes
+        creates frequency distributions of these classes, which are stored
+        as sparse class vectors with their lengths
             
         @param gold: dictionary mapping class names to representative examples
         """
         self._classes = []
-        self._cls_freq_dist = {}
+        self._feature_ids = {}
+        self._cls_vectors = []
+        self._cls_vector_lens = {}
         for cls in gold:
             self._classes.append(cls)
-            for (fname, fvals) in self._feature_detector(gold[cls]):
-                self._cls_freq_dist[cls, fname] = FreqDist()
+        for index in range(len(self._classes)):
+            cls_freq_dist = {}
+            for (fname, fvals) in self._feature_detector(gold[self._classes[index]]):
+                cls_freq_dist[fname] = FreqDist()
                 for fval in fvals:
-                    self._cls_freq_dist[cls, fname].inc(fval)
+                    cls_freq_dist[fname].inc(fval)
+            for fname in cls_freq_dist:
+                lens = self._cls_vector_lens.setdefault(fname, [0] * len(self._classes))
+                for fval in cls_freq_dist[fname].samples():
+                    count = cls_freq_dist[fname].count(fval)
+                    #calculate the length of the class vector
+                    lens[index] += pow(count, 2)
+                    self._cls_vectors[self._feature_id(fname, fval)].append((index, count))
+        self._cls_matrix = self._build_matrix()
 
+    def _feature_id(self, fname, fval):
+        """
+        @return: the id of the feature, a new id if it is not known
+        """
+        fid = self._feature_ids.get((fname, fval))
+        if fid is None:
+            fid = self._feature_ids[fname, fval] = len(self._cls_vectors)
+            self._cls_vectors.append([])
+        return fid
 
+    def _build_matrix(self):
+        """
+        @return: the class vectors in numpy arrays, in compressed sparse rows
+        indexed by feature id: the classes and frequencies of feature id are
+        at pointers[id]:pointers[id + 1] of the class indices and frequencies;
+        None if numpy is not available
+        """
+        if numpy is None:
+            return None
+        lengths = numpy.array([len(vector) for vector in self._cls_vectors], dtype=int)
+        pointers = numpy.zeros(len(lengths) + 1, dtype=int)
+        numpy.cumsum(lengths, out=pointers[1:])
+        entries = [entry for vector in self._cls_vectors for entry in vector]
+        indices = numpy.array([index for (index, count) in entries], dtype=int)
+        counts = numpy.array([count for (index, count) in entries], dtype=float)
+        return (pointers, indices, counts)
 
     def get_class_dict(self, sample):
         """
@@ -74,55 +124,115 @@ class Cosine(AbstractClassify):
         """
         return self._cosine(sample)
 
-    def _cosine(self, sample):
+    def batch_get_class_dict(self, samples):
+        """
+        @param samples: samples to be classified
+        @return: a list of dictionaries (class to probability), one for each sample
+
+            the dot products of all the samples and classes are computed with
+            one product of the sparse sample and class matrices, when numpy
+            is available
+        """
+        if self._cls_matrix is None:
+            return AbstractClassify.batch_get_class_dict(self, samples)
+
+        vectors = [self._sample_vector(sample) for sample in samples]
+        rows = []
+        fids = []
+        counts = []
+        for row in range(len(vectors)):
+            for (fid, count) in vectors[row][0].iteritems():
+                rows.append(row)
+                fids.append(fid)
+                counts.append(count)
+        dot_prods = self._dot_products(numpy.array(rows, dtype=int), numpy.array(fids, dtype=int),
+                                       numpy.array(counts, dtype=float), len(vectors))
+        return [self._scores(dot_prods[row], vectors[row][1], vectors[row][2])
+                for row in range(len(vectors))]
+
+    def _dot_products(self, rows, fids, counts, nsamples):
+        """
+        @return: matrix of the dot products of the samples, given by the
+        rows, feature ids and frequencies of their known features, and
+        the classes
+        """
+        (pointers, indices, cls_counts) = self._cls_matrix
+        nclasses = len(self._classes)
+        starts = pointers[fids]
+        lengths = pointers[fids + 1] - starts
+        # expand each sample feature into the classes which have it
+        ends = numpy.cumsum(lengths)
+        entries = numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - (ends - lengths), lengths)
+        cells = numpy.repeat(rows, lengths) * nclasses + indices[entries]
+        products = numpy.repeat(counts, lengths) * cls_counts[entries]
+        return numpy.bincount(cells, products, nsamples * nclasses).reshape(nsamples, nclasses)
+
+    def _sample_vector(self, sample):
         """
         @param sample: sample to be classified
-        @return: Dictionary class to probability
-            
-            function uses sample to create a frequency distribution
-            cosine distance is computed between each of the class distribustions
-            and the sample's distribution
+        @return: tuple of the frequencies of the known features of the
+        sample, indexed by feature id, the squared length of the sample
+        vector and the feature types of the sample
         """
         sample_vector_len = 0
-        dot_prod = {}
-        score = {}
-
         sample_dist = {}
 
         for (fname, fvals) in self._feature_detector(sample):
             sample_dist[fname] = FreqDist()
             for fval in fvals:
                 sample_dist[fname].inc(fval)
-         
-        for cls in self._classes:
-            dot_prod[cls] = 0
 
+        vector = {}
         for fname in sample_dist:
             for fval in sample_dist[fname].samples():
+                count = sample_dist[fname].count(fval)
                 #calculate the length of the sample vector
-                sample_vector_len += pow(sample_dist[fname].count(fval), 2)
-
-                for cls in self._classes:
-                    if fval in self._cls_freq_dist[cls, fname].samples():
-                        #calculate the dot product of the sample to each class
-                        dot_prod[cls] += sample_dist[fname].count(fval) * self._cls_freq_dist[cls,fname].count(fval)
-
+                sample_vector_len += pow(count, 2)
+                fid = self._feature_ids.get((fname, fval))
+                if fid is not None:
+                    vector[fid] = count
+        return (vector, sample_vector_len, sample_dist.keys())
 
-        for cls in self._classes:
+    def _scores(self, dot_prod, sample_vector_len, fnames):
+        """
+        @return: Dictionary class to probability, from the dot products of
+        the sample and each class
+        """
+        score = {}
+        for index in range(len(self._classes)):
             cls_vector_len = 0
-            for fname in sample_dist:
-                for fval in self._cls_freq_dist[cls, fname].samples():
-                    #calculate the length of the class vector
-                    cls_vector_len += pow(self._cls_freq_dist[cls, fname].count(fval), 2)
-            
+            for fname in fnames:
+                if fname in self._cls_vector_lens:
+                    cls_vector_len += self._cls_vector_lens[fname][index]
+
             #calculate the final score for this class 
             if sample_vector_len == 0 or cls_vector_len == 0:
-                score[cls] = 0
+                score[self._classes[index]] = 0
             else :
-                score[cls] = float(dot_prod[cls]) / (sqrt(sample_vector_len) * sqrt(cls_vector_len))
-            
+                score[self._classes[index]] = float(dot_prod[index]) / (sqrt(sample_vector_len) * sqrt(cls_vector_len))
+
         return score
 
+    def _cosine(self, sample):
+        """
+        @param sample: sample to be classified
+        @return: Dictionary class to probability
+            
+            function uses sample to create a frequency distribution
+            cosine distance is computed between each of the class vectors
+            and the sample's distribution, only the classes which have a
+            feature of the sample are visited for that feature
+        """
+        (vector, sample_vector_len, fnames) = self._sample_vector(sample)
+        dot_prod = [0] * len(self._classes)
+
+        for (fid, count) in vector.iteritems():
+            for (index, cls_count) in self._cls_vectors[fid]:
+                #calculate the dot product of the sample to each class
+                dot_prod[index] += count * cls_count
+
+        return self._scores(dot_prod, sample_vector_len, fnames)
+
     def __repr__(self):
         return '<CosineClassifier: classes=%d>' % len(self._classes)  
 
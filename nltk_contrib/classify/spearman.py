@@ -40,6 +40,11 @@ class Spearman(AbstractClassify):
         the order of the list is deturnmined by:
         first ranked object is ordered first
         duplicate values are ordered in alphabetical order
+    _cls_rank_dict:
+        holds a dictionary of dictionaries mapping feature values to
+        their rank, indexed like _cls_rank
+    _cls_alphabetical:
+        holds a dictionary of the lists in _cls_rank in alphabetical order
     """
 
     def __init__(self, feature_detector, crop_data=100):
@@ -60,11 +65,14 @@ class Spearman(AbstractClassify):
 
             function takes representative examples of classes
             then creates ordered lists of ranked features
-            indexed by class name and feature type
+            indexed by class name and feature type,
+            with the rank of each feature and the features in alphabetical order
         """
 
         self._classes = []
         self._cls_rank = {}
+        self._cls_rank_dict = {}
+        self._cls_alphabetical = {}
 
         for cls in gold:
             self._classes.append(cls)
@@ -73,6 +81,8 @@ class Spearman(AbstractClassify):
                 for fval in fvals:
                     cls_freq_dist.inc(fval)
                 self._cls_rank[cls, fname] = self._get_ranks(cls_freq_dist)
+                self._cls_rank_dict[cls, fname] = self._get_rank_dict(self._cls_rank[cls, fname])
+                self._cls_alphabetical[cls, fname] = sorted(self._cls_rank[cls, fname])
 
 
     def get_class_dict(self, sample):
@@ -92,7 +102,9 @@ class Spearman(AbstractClassify):
             the spearman-rho formula is then applied to produce a correlation
             
             a union operation is used to create two lists of the same length for the formula
-            missing values are appended to each list in alphabetical order
+            missing values are appended to each list in alphabetical order,
+            the ranks of the class lists are computed during training so only
+            the union is computed here, without changing the class lists
         """
 
         rank_diff = {}
@@ -112,19 +124,29 @@ class Spearman(AbstractClassify):
             totalfvals[cls] = 0
     
         for fname in sample_rank:
+            smp_rank = self._get_rank_dict(sample_rank[fname])
+            smp_alphabetical = sorted(sample_rank[fname])
+
             for cls in self._classes:
-                tmp_clslist = self._cls_rank[cls, fname]
-                tmp_smplist = sample_rank[fname]
-                
-                # take the union of the the class and sample lists, append each in alphabetical order
-                
-                tmp_clslist.extend(list(set(tmp_smplist).difference(set(tmp_clslist))))
-                tmp_smplist.extend(list(set(tmp_clslist).difference(set(tmp_smplist))))            
-                
-                totalfvals[cls] += len(tmp_clslist)
-                
-                for fval in tmp_smplist:
-                    rank_diff[cls] += pow(tmp_smplist.index(fval) - tmp_clslist.index(fval), 2)
+                cls_rank = self._cls_rank_dict[cls, fname]
+
+                # sample values missing from the class list are ranked after the class values
+                missing_rank = len(cls_rank)
+                for fval in smp_alphabetical:
+                    if fval in cls_rank:
+                        rank_diff[cls] += pow(smp_rank[fval] - cls_rank[fval], 2)
+                    else:
+                        rank_diff[cls] += pow(smp_rank[fval] - missing_rank, 2)
+                        missing_rank += 1
+
+                totalfvals[cls] += missing_rank
+
+                # and class values missing from the sample list after the sample values
+                missing_rank = len(smp_rank)
+                for fval in self._cls_alphabetical[cls, fname]:
+                    if fval not in smp_rank:
+                        rank_diff[cls] += pow(missing_rank - cls_rank[fval], 2)
+                        missing_rank += 1
 
         for cls in self._classes:
             score[cls] = 1 - (float(6 * rank_diff[cls]) / (pow(totalfvals[cls], 3) - totalfvals[cls]))
@@ -132,6 +154,12 @@ class Spearman(AbstractClassify):
         return score
 
 
+    def _get_rank_dict(self, ordered_list):
+        """
+        @param ordered_list: ordered list of features
+        @ret: dictionary of features to their rank
+        """
+        return dict([(ordered_list[rank], rank) for rank in range(len(ordered_list))])
 
     def _get_ranks(self, sample_dist):
         """
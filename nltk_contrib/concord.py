@@ -9,18 +9,36 @@ from nltk.corpus import brown
 from math import *
 import re, string
 from nltk.probability import *
+import array, bisect, cPickle, heapq, itertools, struct, sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class SentencesIndex(object):
     """Class implementing an index of a collection of sentences.
 
     Given a list of sentences, where each sentence is a list of words,
     this class generates an index of the list. Each word should be a (word, POS
-    tag) pair. The index is stored as a dictionary, with the hashable items as
-    keys and a list of (sentence number, word number) tuples as values. This
-    class also generates a list of sentence lengths. 
+    tag) pair. Each distinct word is given an id, and the positions of its
+    occurrences are stored in a packed array of token numbers, which count the
+    words from the start of the first sentence. Token numbers are converted to
+    (sentence number, word number) pairs using the token numbers of the first
+    words of the sentences. The ids of the words of all the sentences are also
+    stored in a packed array, so that the context of a position can be read
+    from the index. This class also generates a list of sentence lengths.
+
+    More sentences can be added to an index with addSentences(). An index can
+    be saved to a file with save() and loaded with load(), which maps the file
+    into memory when numpy is available, so a prebuilt index opens without
+    reading it.
     """
-    
-    def __init__(self, sentences):
+
+    # first line of a saved index
+    _MAGIC = "nltk_contrib.concord.SentencesIndex 2\n"
+
+    def __init__(self, sentences=[]):
         """ Constructor. Takes the list of sentences to index.
 
         @type sentences:    list
@@ -28,27 +46,155 @@ class SentencesIndex(object):
                             lists of (string, string) pairs.
         """
 
-        sentenceCount = 0
-        self.index = {}
-        self.lengths = []
+        # the distinct words, in the order of their ids
+        self.words = []
+        self.ids = {}
+        self.lengths = array.array('i')
+        # token number of the first word of each sentence
+        self.starts = array.array('i')
+        self.tokens = 0
+        # word id of each token
+        self.sequence = array.array('i')
+        # token numbers of the occurrences of each word, by id
+        self._positions = []
+        # (pointers, positions) of a loaded index, where the token numbers of
+        # word id are positions[pointers[id]:pointers[id + 1]]
+        self._packed = None
+        # sorted keys of the words and their ids, see getKeyTable()
+        self._keyTable = ([], [])
+
+        self.addSentences(sentences)
+
+    def addSentences(self, sentences):
+        """ Adds sentences to the index, numbered after the sentences already
+        in it.
+
+        @type sentences:    list
+        @param sentences:   List of sentences to index. Sentences should be
+                            lists of (string, string) pairs.
+        """
+        if self._packed != None:
+            self._unpack()
 
+        ids = self.ids
+        positions = self._positions
+        sequence = self.sequence
+        token = self.tokens
         # for each sentence:
         for sentence in sentences:
             # add the sentences length to the list of sentence lengths
+            self.starts.append(token)
             self.lengths.append(len(sentence))
-            wordCount = 0
             for word in sentence:
-                self.index[word] = self.index.get(word, []) + [(sentenceCount, wordCount)]
-                wordCount += 1
-            sentenceCount += 1
+                id = ids.get(word)
+                if id == None:
+                    id = ids[word] = len(self.words)
+                    self.words.append(word)
+                    positions.append(array.array('i'))
+                positions[id].append(token)
+                sequence.append(id)
+                token += 1
+        self.tokens = token
 
     def getIndex(self):
-        """ Returns the index dictionary.
+        """ Returns the index dictionary, with the words as keys and lists of
+        (sentence number, word number) tuples as values.
+
+        The dictionary is built on each call, getWords() and getPositions()
+        use the index directly.
 
         @rtype:     dictionary
         @returns:   The dictionary containing the index.
         """
-        return self.index
+        return dict([(word, self.getPositions(word)) for word in self.words])
+
+    def getWords(self):
+        """ Returns the distinct words in the index.
+
+        @rtype:     list
+        @returns:   List of (string, string) pairs, in the order of their ids.
+        """
+        return self.words
+
+    def getKeyTable(self):
+        """ Returns the keys of the words, which are the lowercase word and
+        the POS tag joined with a '/', in sorted order, and the ids of the
+        words with those keys. The table is built again when words have been
+        added to the index.
+
+        @rtype:     tuple
+        @returns:   A (list of keys, list of word ids) pair.
+        """
+        keys, ids = self._keyTable
+        if len(keys) != len(self.words):
+            table = [("/".join([word[0].lower(), word[1]]), id)
+                     for id, word in enumerate(self.words)]
+            table.sort()
+            self._keyTable = keys, ids = [key for key, id in table], [id for key, id in table]
+        return keys, ids
+
+    def getTokens(self, id):
+        """ Returns the token numbers of the occurrences of a word.
+
+        @type id:       number
+        @param id:      Id of the word, its index in getWords().
+        @rtype:     sequence
+        @returns:   Increasing token numbers.
+        """
+        if self._packed != None:
+            pointers, positions = self._packed
+            return positions[pointers[id]:pointers[id + 1]]
+        return self._positions[id]
+
+    def getSequence(self):
+        """ Returns the ids of the words of all the sentences, so that the
+        word of token number t is getWords()[getSequence()[t]].
+
+        @rtype:     sequence
+        @returns:   Word ids, one for each token.
+        """
+        return self.sequence
+
+    def getPositions(self, word):
+        """ Returns the positions of the occurrences of a word.
+
+        @type word:     tuple
+        @param word:    (string, string) pair to look up.
+        @rtype:     list
+        @returns:   List of (sentence number, word number) tuples, empty if
+                    the word is not in the index.
+        """
+        id = self.ids.get(word)
+        if id == None:
+            return []
+        return self.locate(self.getTokens(id))
+
+    def locate(self, tokens):
+        """ Converts token numbers to (sentence number, word number) tuples.
+
+        @type tokens:   sequence
+        @param tokens:  Token numbers, counted from the start of the first
+                        sentence.
+        @rtype:     list
+        @returns:   List of (sentence number, word number) tuples.
+        """
+        starts = self.starts
+        if numpy != None and isinstance(tokens, numpy.ndarray):
+            sentences = numpy.searchsorted(starts, tokens, 'right') - 1
+            return zip(sentences.tolist(), (tokens - numpy.asarray(starts)[sentences]).tolist())
+        locations = []
+        for token in tokens:
+            sentence = bisect.bisect_right(starts, token) - 1
+            locations.append((sentence, token - starts[sentence]))
+        return locations
+
+    def getSentenceStarts(self):
+        """ Returns the token numbers of the first words of the sentences.
+
+        @rtype:     sequence
+        @returns:   Token numbers, one for each sentence.
+        """
+        return self.starts
 
     def getSentenceLengths(self):
         """ Returns the list of sentence lengths.
@@ -61,6 +207,156 @@ class SentencesIndex(object):
         """
         return self.lengths
 
+    def save(self, path):
+        """ Saves the index to a file, which can be loaded with load().
+
+        The file starts with a header holding the words, followed by the
+        sentence lengths, the token numbers of the first words of the
+        sentences, the word ids of the tokens and the positions of the words,
+        as arrays of C ints.
+
+        @type path:     string
+        @param path:    Name of the file to write.
+        """
+        if self._packed != None:
+            self._unpack()
+        pointers = array.array('i', [0])
+        for positions in self._positions:
+            pointers.append(pointers[-1] + len(positions))
+
+        header = cPickle.dumps({'words': self.words, 'sentences': len(self.lengths),
+                'tokens': self.tokens, 'byteorder': sys.byteorder,
+                'itemsize': pointers.itemsize}, cPickle.HIGHEST_PROTOCOL)
+        output = open(path, 'wb')
+        try:
+            output.write(self._MAGIC)
+            output.write(struct.pack('<I', len(header)))
+            output.write(header)
+            # align the arrays, so they can be mapped into memory
+            output.write('\0' * (-output.tell() % 8))
+            self.lengths.tofile(output)
+            self.starts.tofile(output)
+            self.sequence.tofile(output)
+            pointers.tofile(output)
+            for positions in self._positions:
+                positions.tofile(output)
+        finally:
+            output.close()
+
+    def load(cls, path):
+        """ Loads an index saved by save().
+
+        When numpy is available, the word ids of the tokens and the positions
+        of the words are mapped into memory rather than read, and are only
+        copied if sentences are added to the index.
+
+        @type path:     string
+        @param path:    Name of the file to read.
+        @rtype:     SentencesIndex
+        @returns:   The index.
+        """
+        input = open(path, 'rb')
+        try:
+            if input.read(len(cls._MAGIC)) != cls._MAGIC:
+                raise ValueError("%s is not a saved SentencesIndex" % path)
+            size = struct.unpack('<I', input.read(4))[0]
+            header = cPickle.loads(input.read(size))
+            if header['byteorder'] != sys.byteorder or \
+                    header['itemsize'] != array.array('i').itemsize:
+                raise ValueError("%s was saved on an incompatible platform" % path)
+            offset = input.tell() + (-input.tell() % 8)
+
+            words = header['words']
+            counts = [header['sentences'], header['sentences'], header['tokens'],
+                      len(words) + 1, header['tokens']]
+            arrays = []
+            if numpy != None:
+                data = numpy.memmap(path, dtype=numpy.intc, mode='r',
+                        offset=offset, shape=(sum(counts),))
+                # plain array views of the map are faster to index
+                for count in counts:
+                    arrays.append(numpy.asarray(data[:count]))
+                    data = data[count:]
+            else:
+                input.seek(offset)
+                for count in counts:
+                    arrays.append(array.array('i'))
+                    arrays[-1].fromfile(input, count)
+        finally:
+            input.close()
+
+        index = cls()
+        index.words = words
+        index.ids = dict([(word, id) for id, word in enumerate(words)])
+        # the arrays of the sentences are small and searched often, so they
+        # are copied
+        index.lengths = index._copy(arrays[0])
+        index.starts = index._copy(arrays[1])
+        index.sequence = arrays[2]
+        index.tokens = header['tokens']
+        index._packed = (arrays[3], arrays[4])
+        return index
+    load = classmethod(load)
+
+    def _unpack(self):
+        """ Private method that copies the arrays of a loaded index, so that
+        sentences can be added to it.
+        """
+        self.lengths = self._copy(self.lengths)
+        self.starts = self._copy(self.starts)
+        self.sequence = self._copy(self.sequence)
+        self._positions = [self._copy(self.getTokens(id)) for id in range(len(self.words))]
+        self._packed = None
+
+    def _copy(self, values):
+        if isinstance(values, array.array):
+            return array.array('i', values)
+        return array.array('i', values.tostring())
+
+# compiled regular expressions, by pattern
+_compiled = {}
+# number of compiled regular expressions kept
+_MAX_COMPILED = 100
+# characters with a special meaning in regular expressions
+_SPECIAL = ".^$*+?{}[]\\|()"
+
+def _compile(regexp):
+    """ Returns the compiled regular expression, compiling it only if it is
+    not in the cache.
+    """
+    try:
+        return _compiled[regexp]
+    except KeyError:
+        if len(_compiled) >= _MAX_COMPILED:
+            _compiled.clear()
+        compiled = _compiled[regexp] = re.compile(regexp)
+        return compiled
+
+def _literalPrefix(regexp):
+    """ Returns the literal text that every string matched by the regexp
+    starts with, and whether the regexp matches every string starting with
+    that text. Strings are matched from their start, as by re.match().
+    """
+    if "|" in regexp:
+        return "", False
+    if regexp.startswith("^"):
+        regexp = regexp[1:]
+    prefix = []
+    i = 0
+    while i < len(regexp):
+        if regexp[i] == "\\" and i + 1 < len(regexp) and not regexp[i + 1].isalnum():
+            prefix.append(regexp[i + 1])
+            i += 2
+        elif regexp[i] in _SPECIAL:
+            # a quantifier applies to the character before it
+            if regexp[i] in "*+?{" and prefix:
+                return "".join(prefix[:-1]), False
+            break
+        else:
+            prefix.append(regexp[i])
+            i += 1
+    return "".join(prefix), regexp[i:] in ("", ".*")
+
 class IndexConcordance(object):
     """ Class that generates concordances from a list of sentences.
 
@@ -98,6 +394,8 @@ class IndexConcordance(object):
         @type sentences:    list
         @param sentences:   List of sentences to create a concordance for.
                             Sentences should be lists of (string, string) pairs.
+                            The context is read from the index, so this
+                            may be None if an index is provided.
         @type index:        SentencesIndex
         @param index:     SentencesIndex object to use as an index. If this is
                             not provided, one will be generated.
@@ -108,11 +406,17 @@ class IndexConcordance(object):
         # generate an index if one wasn't provided
         if self.index == None:
             self.index = SentencesIndex(self.sentences)
+        # ids of the target words matching each middle regexp, with the
+        # number of words in the index when they were found
+        self._targets = {}
+        # flattened 'word/POS ' strings of the words, by id
+        self._strings = []
 
     def formatted(self, leftRegexp=None, middleRegexp=".*", rightRegexp=None,
             leftContextLength=3, rightContextLength=3, contextInSentences=False,
             contextChars=50, maxKeyLength=0, showWord=True,
-            sort=0, showPOS=True, flipWordAndPOS=False, verbose=False):
+            sort=0, showPOS=True, flipWordAndPOS=False, verbose=False,
+            limit=None):
         """Generates and displays keyword-in-context formatted concordance data.
 
         This is a convenience method that combines raw() and display()'s
@@ -166,15 +470,18 @@ class IndexConcordance(object):
         @type verbose:          boolean
         @param verbose:       Displays some extra status information. Defaults
                                 to False.
+        @type limit:            number
+        @param limit:         Maximum number of lines to display. If None,
+                                displays every line. Defaults to None.
         """
             
         self.format(self.raw(leftRegexp, middleRegexp, rightRegexp, leftContextLength,
-                rightContextLength, contextInSentences, sort, verbose), contextChars,
+                rightContextLength, contextInSentences, sort, verbose, limit), contextChars,
                 maxKeyLength, showWord, showPOS, flipWordAndPOS, verbose)
 
     def raw(self, leftRegexp=None, middleRegexp=".*", rightRegexp=None,
             leftContextLength=3, rightContextLength=3, contextInSentences=False,
-            sort=0, verbose=False):
+            sort=0, verbose=False, limit=None):
         """ Generates and returns raw concordance data.
 
         Regular expressions supplied are evaluated over the appropriate part of
@@ -216,197 +523,82 @@ class IndexConcordance(object):
         @type verbose:          boolean
         @param verbose:       Displays some extra status information. Defaults
                                 to False.
+        @type limit:            number
+        @param limit:         Maximum number of lines to return. If None,
+                                returns every line. Defaults to None.
         @rtype:     list
         @return:    Raw concordance ouput. Returned as a list of
                     ([left context], target word, [right context], target word
                     sentence number) tuples.
         """
-        # compile the middle regexp.
-        reg = re.compile(middleRegexp)
-
-        if verbose:
-            print "Matching the following target words:"
-        wordLocs = []
-        # get list of (sentence, word) pairs to get context for
-        for item in self.index.getIndex().iteritems():
-            if reg.match("/".join([item[0][0].lower(), item[0][1]])):
-                if verbose:
-                    print "/".join(item[0])
-                wordLocs.append(item[1])
-                
-        print ""
-
-        items = []
-        # if context lengths are specified in words:
-        if contextInSentences == False:
-            # for each list of (sentence, word offset in sentence) pairs:
-            for wordList in wordLocs:
-                # for each (sentence, word offset in sentence) pair:
-                for sentenceNum, offset in wordList:
-                    # set pointers to the left- and rightmost sentences to be
-                    # looked at to the sentence the target word is in
-                    leftCorpusIndex = sentenceNum
-                    rightCorpusIndex = sentenceNum
-                    # number of words to include in the left context is
-                    # initially everything in the sentence up to the target
-                    leftLength = offset
-                    # number of words to include in the left context is
-                    # initially everything in the sentence after the target
-                    rightLength = self.index.getSentenceLengths()[sentenceNum] - offset - 1
-
-                    # while the length of the left context is less than what we
-                    # need, keep decreasing the left corpus index (ie adding
-                    # sentences to the left context).
-                    while leftLength < leftContextLength:
-                        leftCorpusIndex -= 1
-                        # if the new corpus index would fall off the end of the
-                        # list, stop at 0
-                        if(leftCorpusIndex < 0):
-                            leftCorpusIndex = 0
-                            break
-                        # adjust length and offset
-                        leftLength += self.index.getSentenceLengths()[leftCorpusIndex]
-                        offset += self.index.getSentenceLengths()[leftCorpusIndex]
-
-                    # while the length of the right context is less than what we
-                    # need, keep increasing the right corpus index (ie adding
-                    # sentences to the right context).
-                    while rightLength < rightContextLength:
-                        rightCorpusIndex += 1
-                        try:
-                            rightLength += self.index.getSentenceLengths()[rightCorpusIndex]
-                        # if the new corpus index falls off the end of the list,
-                        # stop at the end
-                        except IndexError:
-                            rightCorpusIndex -= 1
-                            break
-
-                    # grab all sentences from the left to right corpus indices,
-                    # then flatten them into a single list of words
-                    sents = self.sentences[leftCorpusIndex:rightCorpusIndex+1]
-                    words = []
-                    for sentence in sents:
-                        for word in sentence:
-                            words.append(word)
-
-                    # select the appropriate sections of context from the list
-                    # of words
-                    left = words[offset-leftContextLength:offset]
-                    target = words[offset]
-                    right = words[offset+1:offset+1+rightContextLength]
-                    items.append((left, target, right, sentenceNum))
-        # if context lengths are specified in sentences:
-        else:
-            # for each list of (sentence, word offset in sentence) pairs:
-            for wordList in wordLocs:
-                # for each list of (sentence, word offset in sentence) pairs:
-                for sentenceNum, offset in wordList:
-                    # set pointers to the left- and rightmost sentences to be
-                    # looked at to the sentence the target word is in
-                    leftCorpusIndex = sentenceNum
-                    rightCorpusIndex = sentenceNum
-                    # number of words to include in the left context is
-                    # initially everything in the sentence up to the target
-                    leftLength = offset
-                    # number of words to include in the left context is
-                    # initially everything in the sentence after the target
-                    rightLength = self.index.getSentenceLengths()[sentenceNum] - offset - 1
-                    # keep track of the number of sentences included in the
-                    # left/right context
-                    leftSents = 0;
-                    rightSents = 0;
-
-                    # while we don't have enough sentences in the left context,
-                    # keep decreasing the left corpus index
-                    while leftSents < leftContextLength:
-                        leftCorpusIndex -= 1
-                        # if the new corpus index would fall off the end of the
-                        # list, stop at 0
-                        if(leftCorpusIndex < 0):
-                            leftCorpusIndex = 0
-                            break
-                        leftLength += self.index.getSentenceLengths()[leftCorpusIndex]
-                        offset += self.index.getSentenceLengths()[leftCorpusIndex]
-                        leftSents += 1
-
-                    # while we don't have enough sentences in the right context,
-                    # keep increasing the right corpus index
-                    while rightSents < rightContextLength:
-                        rightCorpusIndex += 1
-                        try:
-                            rightLength += self.index.getSentenceLengths()[rightCorpusIndex]
-                            rightSents += 1
-                        # if the new corpus index falls off the end of the list,
-                        # stop at the end
-                        except IndexError:
-                            rightCorpusIndex -= 1
-                            break
-
-                    # grab all sentences from the left to right corpus indices,
-                    # then flatten them into a single list of words
-                    sents = self.sentences[leftCorpusIndex:rightCorpusIndex+1]
-                    words = []
-                    for sentence in sents:
-                        for word in sentence:
-                            words.append(word)
-
-                    # select the appropriate sections of context from the list
-                    # of words
-                    left = words[0:offset]
-                    target = words[offset]
-                    right = words[offset+1:]
-                    items.append((left, target, right, sentenceNum))
+        items = list(self.iterRaw(leftRegexp, middleRegexp, rightRegexp,
+                leftContextLength, rightContextLength, contextInSentences,
+                sort, verbose, limit))
 
         if verbose:
             print "Found %d matches for target word..." % len(items)
 
-        # sort the concordance
+        return items
+
+    def iterRaw(self, leftRegexp=None, middleRegexp=".*", rightRegexp=None,
+            leftContextLength=3, rightContextLength=3, contextInSentences=False,
+            sort=0, verbose=False, limit=None):
+        """ Generates raw concordance data lazily.
+
+        Takes the same arguments as raw() and generates the same lines, in the
+        same order. The target words are found with a binary search of the
+        sorted keys of the index for the literal text the middle regexp starts
+        with, and the regexp is only evaluated on the keys with that text, or
+        not at all if the regexp is a literal prefix. The positions of the
+        target words are then read from the index one at a time, and the left
+        and right regexps are evaluated on their contexts before a line is
+        built. All the lines are found before the first one is generated only
+        when sorting on the right context.
+
+        @rtype:     iterator
+        @return:    Iterator over ([left context], target word, [right
+                    context], target word sentence number) tuples.
+        """
+        index = self.index
+        words = index.getWords()
+        ids = self._targetIds(middleRegexp, verbose)
+
+        # order the target words or, when sorting by sentence number, merge
+        # their positions
         if sort == self.SORT_WORD:
             if verbose:
                 print "Sorting by target word..."
-            items.sort(key=lambda i:i[1][0].lower())
+            ids.sort(key=lambda id:words[id][0].lower())
         elif sort == self.SORT_POS:
             if verbose:
                 print "Sorting by target word POS tag..."
-            items.sort(key=lambda i:i[1][1].lower())
-        elif sort == self.SORT_NUM:
+            ids.sort(key=lambda id:words[id][1].lower())
+        if sort == self.SORT_NUM:
             if verbose:
                 print "Sorting by sentence number..."
-            items.sort(key=lambda i:i[3])
-        elif sort == self.SORT_RIGHT_CONTEXT:
+            tokens = heapq.merge(*[index.getTokens(id) for id in ids])
+        else:
+            tokens = itertools.chain(*[index.getTokens(id) for id in ids])
+
+        leftRe = None
+        rightRe = None
+        if leftRegexp != None:
+            if verbose:
+                print "Filtering on left context..."
+            leftRe = _compile(leftRegexp)
+        if rightRegexp != None:
+            if verbose:
+                print "Filtering on right context..."
+            rightRe = _compile(rightRegexp)
+
+        items = self._lines(tokens, leftRe, rightRe, leftContextLength,
+                rightContextLength, contextInSentences)
+        if sort == self.SORT_RIGHT_CONTEXT:
             if verbose:
                 print "Sorting by first word of right context..."
-            items.sort(key=lambda i:i[2][0][0])
-
-        # if any regular expressions have been given for the context, filter
-        # the concordance using them
-        filtered = []
-        filterBool = False
-        if leftRegexp != None or rightRegexp != None:
-            filterBool = True
-        if filterBool:    
-
-            leftRe=None
-            rightRe=None
-            if leftRegexp != None:
-                if verbose:
-                    print "Filtering on left context..."
-                leftRe = re.compile(leftRegexp)
-            if rightRegexp != None:
-                if verbose:
-                    print "Filtering on right context..."
-                rightRe = re.compile(rightRegexp)
-            
-            for item in items:
-                if self._matches(item, leftRe, rightRe):
-                    filtered.append(item)
-    
-        if filterBool:
-            source = filtered
-        else:
-            source = items
+            items = iter(sorted(items, key=lambda i:i[2] and i[2][0][0] or ""))
 
-        return source
+        return itertools.islice(items, limit)
 
     def format(self, source, contextChars=55, maxKeyLength=0, showWord=True,
             showPOS=True, flipWordAndPOS=False, verbose=False):
@@ -521,32 +713,85 @@ class IndexConcordance(object):
         if verbose:    
             print "\n" + repr(count) + " lines"
 
-    def _matches(self, item, leftRe, rightRe):
-        """ Private method that runs the given regexps over a raw concordance
-        item and returns whether they match it.
+    def _targetIds(self, middleRegexp, verbose):
+        """ Private method that returns the ids of the words whose keys match
+        the middle regexp. The ids are kept for later queries with the same
+        regexp, until words are added to the index.
         """
-        left = item[0]
-        right = item[2]
-
-        # flatten left and right contexts
-        leftString = ""
-        for token in left:
-            leftString += "/".join(token) + " "
-        rightString = ""
-        for token in right:
-            rightString += "/".join(token) + " "    
-
-        # see if regexps match    
-        ok = True
-        if leftRe != None and leftRe.match(leftString) == None:
-            ok = False
-        if rightRe != None and rightRe.match(rightString) == None:
-            ok = False
-                       
-        if ok:                
-            return True
+        words = self.index.getWords()
+        cached = self._targets.get(middleRegexp)
+        if cached != None and cached[0] == len(words):
+            ids = cached[1]
         else:
-            return False
+            keys, keyIds = self.index.getKeyTable()
+            prefix, matchesAll = _literalPrefix(middleRegexp)
+            reg = _compile(middleRegexp)
+            ids = []
+            # the keys starting with the prefix are next to each other
+            for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+                if not keys[i].startswith(prefix):
+                    break
+                if matchesAll or reg.match(keys[i]):
+                    ids.append(keyIds[i])
+            if len(self._targets) >= _MAX_COMPILED:
+                self._targets.clear()
+            self._targets[middleRegexp] = (len(words), ids)
+
+        if verbose:
+            print "Matching the following target words:"
+            for id in ids:
+                print "/".join(words[id])
+            print ""
+        return list(ids)
+
+    def _lines(self, tokens, leftRe, rightRe, leftContextLength,
+            rightContextLength, contextInSentences):
+        """ Private method that generates the raw concordance lines of the
+        given token numbers whose contexts match the left and right regexps.
+        The contexts are read from the word ids in the index.
+        """
+        index = self.index
+        words = index.getWords()
+        sequence = index.getSequence()
+        starts = index.getSentenceStarts()
+        lengths = index.getSentenceLengths()
+        if leftRe != None or rightRe != None:
+            strings = self._wordStrings()
+
+        for token in tokens:
+            token = int(token)
+            sentenceNum = bisect.bisect_right(starts, token) - 1
+            # token numbers of the first word of the left context and of the
+            # word after the right context
+            if contextInSentences:
+                first = starts[max(sentenceNum - leftContextLength, 0)]
+                last = min(sentenceNum + rightContextLength, len(lengths) - 1)
+                end = starts[last] + lengths[last]
+            else:
+                first = max(token - leftContextLength, 0)
+                end = min(token + 1 + rightContextLength, len(sequence))
+            left = sequence[first:token]
+            right = sequence[token + 1:end]
+
+            # flatten left and right contexts, and see if regexps match
+            if leftRe != None and \
+                    leftRe.match("".join([strings[id] for id in left])) == None:
+                continue
+            if rightRe != None and \
+                    rightRe.match("".join([strings[id] for id in right])) == None:
+                continue
+
+            yield ([words[id] for id in left], words[sequence[token]],
+                   [words[id] for id in right], sentenceNum)
+
+    def _wordStrings(self):
+        """ Private method that returns the words of the index flattened into
+        'word/POS ' strings, by id.
+        """
+        words = self.index.getWords()
+        for word in words[len(self._strings):]:
+            self._strings.append("/".join(word) + " ")
+        return self._strings
 
 class Aggregator(object):
     """ Class for aggregating and summarising corpus concordance data.
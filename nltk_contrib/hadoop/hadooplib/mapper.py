@@ -1,5 +1,5 @@
 from inputformat import TextLineInput
-from outputcollector import LineOutput
+from outputcollector import LineOutput, CombinerOutput
 
 
 class MapperBase:
@@ -16,6 +16,8 @@ class MapperBase:
         """
         self.inputformat = TextLineInput
         self.outputcollector = LineOutput
+        self.combiner = None
+        self.buffer_size = 100000
 
     def set_inputformat(self, format):
         """
@@ -35,6 +37,26 @@ class MapperBase:
 
         self.outputcollector = collector
 
+    def set_combiner(self, combiner, buffer_size=100000):
+        """
+        set the combiner for map task
+
+        the output of the map task is kept in memory, grouped by key,
+        and each group is passed to the combiner when C{buffer_size}
+        values are kept, so that fewer (key, value) pairs are collected.
+        The combiner is usually the reducer of the job, when its output
+        can be reduced again, as the sum of the word counts
+
+        @param combiner: the reducer which combines the values of a key,
+        or None to collect the output of the map task directly
+        @type combiner: L{ReducerBase<reducer.ReducerBase>}
+        @param buffer_size: the number of values kept in memory
+        @type buffer_size: C{int}
+        """
+
+        self.combiner = combiner
+        self.buffer_size = buffer_size
+
     def map(self, key, value):
         """
         do map operation on each (key, value) pair
@@ -55,12 +77,29 @@ class MapperBase:
 
         raise NotImplementedError('map() is not implemented in this class')
 
-    def call_map(self):
+    def call_map(self, file=None):
         """ 
         driver function for map task, you should call this method 
         instead of the map method in main function 
+
+        @param file: the lines of input, default to stdin
         """
 
-        data = self.inputformat.read_line()
-        for key, value in data:
-            self.map(key, value)
+        if file is None:
+            data = self.inputformat.read_line()
+        else:
+            data = self.inputformat.read_line(file)
+        if self.combiner is None:
+            for key, value in data:
+                self.map(key, value)
+            return
+
+        collector = self.outputcollector
+        self.outputcollector = CombinerOutput(self.combiner, collector,
+                                              self.buffer_size)
+        try:
+            for key, value in data:
+                self.map(key, value)
+            self.outputcollector.flush()
+        finally:
+            self.outputcollector = collector
@@ -21,3 +21,95 @@ class LineOutput:
         keystr = str(key)
         valuestr = str(value)
         print '%s%s%s' % (keystr, separator, valuestr)
+
+class FileOutput:
+    """
+    output key and value as (key, value) pairs separated
+    by separator to the lines of a file
+    """
+
+    def __init__(self, file, separator = '\t'):
+        """
+        @param file: the file to write the lines to
+        @type file: C{file}
+        @param separator: character to separate the key and value
+        @type separator: C{string}
+        """
+
+        self.file = file
+        self.separator = separator
+
+    def collect(self, key, value):
+        """
+        collect the key and value, write them to
+        a line separated by the separator
+
+        @param key: key part in (key, value) pair
+        @type key: C{string}
+        @param value: value part in (key, value) pair
+        @type value: C{string}
+        """
+
+        self.file.write('%s%s%s\n' % (key, self.separator, value))
+
+class CombinerOutput:
+    """
+    output class of a map task with a combiner, keep the (key, value)
+    pairs in memory, grouped by key, and pass each group to the
+    combiner, which outputs to the next collector, when the buffer is full
+
+    the combiner reduces the values of a key to fewer (key, value) pairs
+    before they are sorted and sent to the reduce task
+    """
+
+    def __init__(self, combiner, collector, buffer_size = 100000):
+        """
+        @param combiner: the reducer which combines the values of a key
+        @type combiner: L{ReducerBase<reducer.ReducerBase>}
+        @param collector: the output collector of the combined pairs
+        @param buffer_size: the number of values kept in memory
+        @type buffer_size: C{int}
+        """
+
+        self.combiner = combiner
+        self.collector = collector
+        self.buffer_size = buffer_size
+        self.buffer = {}
+        self.size = 0
+
+    def collect(self, key, value):
+        """
+        keep the key and value in the buffer, 
+        combine the buffer when it is full
+
+        @param key: key part in (key, value) pair
+        @type key: C{string}
+        @param value: value part in (key, value) pair
+        @type value: C{string}
+        """
+
+        # the combiner reads the strings the reducer would read
+        key = str(key)
+        try:
+            self.buffer[key].append(str(value))
+        except KeyError:
+            self.buffer[key] = [str(value)]
+        self.size += 1
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        pass the groups of the buffer to the combiner, in key order,
+        and empty the buffer
+        """
+
+        collector = self.combiner.outputcollector
+        self.combiner.set_outputcollector(self.collector)
+        try:
+            for key in sorted(self.buffer):
+                self.combiner.reduce(key, self.buffer[key])
+        finally:
+            self.combiner.set_outputcollector(collector)
+        self.buffer = {}
+        self.size = 0
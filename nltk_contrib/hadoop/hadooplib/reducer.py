@@ -67,12 +67,17 @@ class ReducerBase:
 
         raise NotImplementedError('reduce() is not implemented in this class')
 
-    def call_reduce(self):
+    def call_reduce(self, file=None):
         """
         driver function for reduce task, you should call this method 
         instead of the reduce method in main function 
+
+        @param file: the sorted lines of input, default to stdin
         """
 
-        data = self.inputformat.read_line()
+        if file is None:
+            data = self.inputformat.read_line()
+        else:
+            data = self.inputformat.read_line(file)
         for key, values in self.group_data(data):
             self.reduce(key, values)
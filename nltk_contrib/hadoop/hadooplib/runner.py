@@ -0,0 +1,338 @@
+"""
+run a map reduce job on the local machine, without hadoop
+
+the input files are cut into splits of lines, and each split is read by a
+map task. The output of a map task is partitioned by key, and sorted in
+memory and spilled to disk when the buffer is full, so that each map task
+leaves sorted runs of lines for each partition. The reduce task of a
+partition merges the runs of all the map tasks, on disk when there are
+too many to be merged at once, and passes the sorted lines to the reducer,
+which writes them to the part file of the partition in the output
+directory, as hadoop does.
+
+the map tasks and the reduce tasks are run by a pool of processes
+
+usage: python runner.py [options] mapper reducer output_dir input_file...
+
+mapper, reducer and the combiner are given as module.Class, the modules
+are imported from the current directory. The reducer can be NONE, the
+sorted output of the map tasks is written then
+"""
+
+import os
+import sys
+import copy
+import heapq
+import shutil
+import tempfile
+import itertools
+import multiprocessing
+
+from outputcollector import FileOutput
+
+# the job run by the worker processes, see _set_job
+_job = None
+
+class LocalRunner:
+    """
+    run the map tasks and the reduce tasks of a job in a pool of processes
+    """
+
+    def __init__(self, mapper, reducer=None, processes=None, partitions=None,
+                 split_size=16 * 1024 * 1024, sort_buffer=100000,
+                 merge_factor=100, work_dir=None):
+        """
+        @param mapper: the mapper of the job, with its combiner if any
+        @type mapper: L{MapperBase<mapper.MapperBase>}
+        @param reducer: the reducer of the job, or None to write
+        the sorted output of the map tasks
+        @type reducer: L{ReducerBase<reducer.ReducerBase>}
+        @param processes: the number of worker processes, default to the
+        number of CPUs, the tasks are run in this process when it is 1
+        @type processes: C{int}
+        @param partitions: the number of reduce tasks and output files,
+        default to the number of processes
+        @type partitions: C{int}
+        @param split_size: the number of bytes of input read by a map task
+        @type split_size: C{int}
+        @param sort_buffer: the number of lines of output a map task
+        sorts in memory before they are spilled to disk
+        @type sort_buffer: C{int}
+        @param merge_factor: the number of runs merged at once
+        @type merge_factor: C{int}
+        @param work_dir: the directory of the temporary files, default
+        to the temporary directory of the system
+        @type work_dir: C{string}
+        """
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if partitions is None:
+            partitions = processes
+        if merge_factor < 2:
+            raise ValueError("merge_factor should be at least 2")
+        self.mapper = mapper
+        self.reducer = reducer
+        self.processes = processes
+        self.partitions = partitions
+        self.split_size = split_size
+        self.sort_buffer = sort_buffer
+        self.merge_factor = merge_factor
+        self.work_dir = work_dir
+
+    def get_splits(self, input_files):
+        """
+        cut the input files into (file, start, end) splits of at most
+        split_size bytes, a split reads the lines starting in [start, end)
+
+        @param input_files: the input files
+        @type input_files: C{list}
+        """
+
+        splits = []
+        for filename in input_files:
+            size = os.path.getsize(filename)
+            for start in range(0, size, self.split_size):
+                splits.append((filename, start, min(start + self.split_size, size)))
+        return splits
+
+    def run(self, input_files, output_dir):
+        """
+        run the job over the input files and write its output to the
+        part files of the output directory
+
+        @param input_files: the input files
+        @type input_files: C{list}
+        @param output_dir: the output directory, created if needed
+        @type output_dir: C{string}
+        @return: the part files
+        @rtype: C{list}
+        """
+
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        work_dir = tempfile.mkdtemp(prefix='hadooplib-', dir=self.work_dir)
+        pool = None
+        if self.processes != 1:
+            pool = multiprocessing.Pool(self.processes, _set_job, (self,))
+            imap = pool.imap_unordered
+        else:
+            _set_job(self)
+            imap = itertools.imap
+        try:
+            map_tasks = [(index, filename, start, end, work_dir)
+                         for index, (filename, start, end)
+                         in enumerate(self.get_splits(input_files))]
+            runs = [[] for partition in range(self.partitions)]
+            for map_runs in imap(_map_task, map_tasks):
+                for partition in range(self.partitions):
+                    runs[partition].extend(map_runs[partition])
+
+            part_files = [os.path.join(output_dir, 'part-%05d' % partition)
+                          for partition in range(self.partitions)]
+            reduce_tasks = [(partition, runs[partition], part_files[partition], work_dir)
+                            for partition in range(self.partitions)]
+            for partition in imap(_reduce_task, reduce_tasks):
+                pass
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            shutil.rmtree(work_dir, True)
+        return part_files
+
+class SpillOutput:
+    """
+    output class of a map task, sort the lines of each partition in
+    memory and spill them to a run file when the buffer is full
+    """
+
+    def __init__(self, prefix, partitions, buffer_size, separator='\t'):
+        """
+        @param prefix: the path prefix of the run files
+        @param partitions: the number of partitions
+        @param buffer_size: the number of lines kept in memory
+        @param separator: character to separate the key and value
+        """
+
+        self.prefix = prefix
+        self.buffer_size = buffer_size
+        self.separator = separator
+        self.buffers = [[] for partition in range(partitions)]
+        self.runs = [[] for partition in range(partitions)]
+        self.size = 0
+
+    def collect(self, key, value):
+        """
+        keep the line of the key and value in the buffer of its partition,
+        spill the buffers when they are full
+
+        @param key: key part in (key, value) pair
+        @type key: C{string}
+        @param value: value part in (key, value) pair
+        @type value: C{string}
+        """
+
+        key = str(key)
+        self.buffers[hash(key) % len(self.buffers)].append(
+            '%s%s%s\n' % (key, self.separator, value))
+        self.size += 1
+        if self.size >= self.buffer_size:
+            self.spill()
+
+    def spill(self):
+        """
+        sort the lines of each partition and write them to a new run file
+        """
+
+        for partition, lines in enumerate(self.buffers):
+            if not lines:
+                continue
+            # the lines are sorted as the C locale sort of hadoop streaming,
+            # the tab after a key sorts before the characters of longer keys
+            lines.sort()
+            path = '%s-%05d-%05d' % (self.prefix, partition, len(self.runs[partition]))
+            run = open(path, 'w')
+            try:
+                run.writelines(lines)
+            finally:
+                run.close()
+            self.runs[partition].append(path)
+            del lines[:]
+        self.size = 0
+
+def read_split(filename, start, end):
+    """
+    yield the lines of a file starting in [start, end)
+    """
+
+    # binary, so that the positions are the lengths of the lines
+    file = open(filename, 'rb')
+    try:
+        position = 0
+        if start > 0:
+            # the line going on at start is read by the previous split
+            file.seek(start - 1)
+            position = start - 1 + len(file.readline())
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+    finally:
+        file.close()
+
+def merge_runs(runs, prefix, merge_factor):
+    """
+    merge the sorted run files, merge_factor at a time, into new run files
+    until at most merge_factor are left, the merged runs are removed
+
+    @return: the run files left
+    @rtype: C{list}
+    """
+
+    count = 0
+    while len(runs) > merge_factor:
+        merged = []
+        for i in range(0, len(runs), merge_factor):
+            group = runs[i:i + merge_factor]
+            if len(group) == 1:
+                merged.extend(group)
+                continue
+            path = '%s-merge-%05d' % (prefix, count)
+            count += 1
+            _write_merged(group, path)
+            merged.append(path)
+        runs = merged
+    return runs
+
+def _write_merged(runs, path):
+    files = [open(run, 'r') for run in runs]
+    try:
+        output = open(path, 'w')
+        try:
+            output.writelines(heapq.merge(*files))
+        finally:
+            output.close()
+    finally:
+        for file in files:
+            file.close()
+    for run in runs:
+        os.remove(run)
+
+def _set_job(runner):
+    global _job
+    _job = copy.copy(runner)
+    # the tasks set the output collectors of their own copies
+    _job.mapper = copy.copy(runner.mapper)
+    _job.reducer = copy.copy(runner.reducer)
+
+def _map_task(task):
+    """
+    run the mapper over a split, return the run files of each partition
+    """
+
+    (index, filename, start, end, work_dir) = task
+    output = SpillOutput(os.path.join(work_dir, 'map-%05d' % index),
+                         _job.partitions, _job.sort_buffer)
+    _job.mapper.set_outputcollector(output)
+    _job.mapper.call_map(read_split(filename, start, end))
+    output.spill()
+    return output.runs
+
+def _reduce_task(task):
+    """
+    merge the runs of a partition and run the reducer over them
+    """
+
+    (partition, runs, part_file, work_dir) = task
+    runs = merge_runs(runs, os.path.join(work_dir, 'reduce-%05d' % partition),
+                      _job.merge_factor)
+    files = [open(run, 'r') for run in runs]
+    try:
+        output = open(part_file, 'w')
+        try:
+            lines = heapq.merge(*files)
+            if _job.reducer is None:
+                output.writelines(lines)
+            else:
+                _job.reducer.set_outputcollector(FileOutput(output))
+                _job.reducer.call_reduce(lines)
+        finally:
+            output.close()
+    finally:
+        for file in files:
+            file.close()
+    return partition
+
+def _load(name):
+    """
+    import a class given as module.Class
+    """
+
+    module, name = name.rsplit('.', 1)
+    return getattr(__import__(module), name)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options] mapper reducer output_dir input_file...")
+    parser.add_option("-c", "--combiner", help="the combiner of the mapper, as module.Class")
+    parser.add_option("-p", "--processes", type="int", help="the number of processes")
+    parser.add_option("-r", "--partitions", type="int", help="the number of output files")
+    options, args = parser.parse_args()
+    if len(args) < 4:
+        parser.error("mapper, reducer, output directory and input files are required")
+
+    # the modules of the job and hadooplib
+    sys.path[:0] = [os.getcwd(), os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    mapper = _load(args[0])()
+    if options.combiner:
+        mapper.set_combiner(_load(options.combiner)())
+    reducer = None
+    if args[1] != 'NONE':
+        reducer = _load(args[1])()
+    runner = LocalRunner(mapper, reducer, options.processes, options.partitions)
+    for part_file in runner.run(args[3:], args[2]):
+        print part_file
@@ -23,4 +23,8 @@ class IDFMapper(MapperBase):
         self.outputcollector.collect(word + " All", 1)
 
 if __name__ == "__main__":
-    IDFMapper().call_map()
+    from idf_reduce import IDFReducer
+    mapper = IDFMapper()
+    # sum the counts of the map task before they are sorted
+    mapper.set_combiner(IDFReducer())
+    mapper.call_map()
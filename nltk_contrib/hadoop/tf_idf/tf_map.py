@@ -23,4 +23,8 @@ class TFMapper(MapperBase):
                 self.outputcollector.collect(word + " " + filename, 1)
 
 if __name__ == "__main__":
-    TFMapper().call_map()
+    from tf_reduce import TFReducer
+    mapper = TFMapper()
+    # sum the counts of the map task before they are sorted
+    mapper.set_combiner(TFReducer())
+    mapper.call_map()
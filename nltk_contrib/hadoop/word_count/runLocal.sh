@@ -0,0 +1,4 @@
+#!/bin/sh
+
+export PYTHONPATH=..
+python ../hadooplib/runner.py -c wordcount_reducer.WordCountReducer wordcount_mapper.WordCountMapper wordcount_reducer.WordCountReducer wordcount-out brown-ca01
@@ -18,4 +18,8 @@ class WordCountMapper(MapperBase):
             self.outputcollector.collect(word, 1)
 
 if __name__ == "__main__":
-    WordCountMapper().call_map()
+    from wordcount_reducer import WordCountReducer
+    mapper = WordCountMapper()
+    # sum the counts of the map task before they are sorted
+    mapper.set_combiner(WordCountReducer())
+    mapper.call_map()
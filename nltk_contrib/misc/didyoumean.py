@@ -3,23 +3,117 @@
 
 from nltk import PorterStemmer
 from nltk.corpus import brown
- 
+
 import sys
+import time
+import random
+import cPickle
 from collections import defaultdict
 import operator
- 
+
 def sortby(nlist ,n, reverse=0):
     nlist.sort(key=operator.itemgetter(n), reverse=reverse)
- 
+
 class mydict(dict):
     def __missing__(self, key):
         return 0
- 
+
+def deletes(word, distance):
+    """
+    Returns the set of the strings obtained by deleting at most distance
+    characters from word, word included.
+    """
+    result = set([word])
+    current = result
+    for i in range(distance):
+        shorter = set()
+        for s in current:
+            for j in range(len(s)):
+                shorter.add(s[:j] + s[j+1:])
+        current = shorter - result
+        result |= current
+    return result
+
+def edit_distance(s, t, limit):
+    """
+    Returns the number of insertions, deletions, substitutions and
+    transpositions of adjacent characters turning s into t, or limit + 1
+    as soon as it is known to be greater than limit.
+    """
+    if abs(len(s) - len(t)) > limit:
+        return limit + 1
+    # the common prefix and suffix do not change the distance
+    n = min(len(s), len(t))
+    start = 0
+    while start < n and s[start] == t[start]:
+        start += 1
+    suffix = 0
+    while suffix < n - start and s[-1 - suffix] == t[-1 - suffix]:
+        suffix += 1
+    s = s[start:len(s) - suffix]
+    t = t[start:len(t) - suffix]
+    if not s or not t:
+        return min(len(s) + len(t), limit + 1)
+
+    # only the cells at most limit away from the diagonal are computed,
+    # the others are greater than limit
+    big = limit + 1
+    before = None
+    previous = range(len(t) + 1)
+    for i in range(1, len(s) + 1):
+        current = [big] * (len(t) + 1)
+        if i <= limit:
+            current[0] = i
+        lowest = big
+        for j in range(max(1, i - limit), min(len(t), i + limit) + 1):
+            if s[i-1] == t[j-1]:
+                d = previous[j-1]
+            else:
+                d = previous[j-1]
+                if previous[j] < d:
+                    d = previous[j]
+                if current[j-1] < d:
+                    d = current[j-1]
+                if i > 1 and j > 1 and s[i-1] == t[j-2] and s[i-2] == t[j-1] \
+                       and before[j-2] < d:
+                    d = before[j-2]
+                d += 1
+                if d > big:
+                    d = big
+            current[j] = d
+            if d < lowest:
+                lowest = d
+        if lowest > limit:
+            return big
+        before, previous = previous, current
+    return previous[-1]
+
 class DidYouMean:
-    def __init__(self):
+    """
+    Suggests the learned words close to a token: the words sharing its
+    special hash, and the words within max_distance edits of it, found
+    with a symmetric delete index. The index maps the strings obtained by
+    deleting up to max_distance characters from the first prefix_length
+    characters of each learned word to the words, so that the candidates
+    of a token are looked up with the deletes of its own prefix.
+    """
+    def __init__(self, max_distance=2, prefix_length=7):
         self.stemmer = PorterStemmer()
- 
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.hashes = {}
+        self.learned = defaultdict(mydict)
+        self.frequencies = mydict()
+        self.index = {}
+
     def specialhash(self, s):
+        try:
+            return self.hashes[s]
+        except KeyError:
+            hashed = self.hashes[s] = self._specialhash(s)
+            return hashed
+
+    def _specialhash(self, s):
         s = s.lower()
         s = s.replace("z", "s")
         s = s.replace("h", "")
@@ -27,39 +121,139 @@ class DidYouMean:
             s = s.replace(i+i, i)
         s = self.stemmer.stem(s)
         return s
- 
+
+    def suggest(self, token):
+        """
+        Returns the (word, distance, frequency) tuples of the learned words
+        sharing the special hash of token or within max_distance edits of
+        it, the closest first and the most frequent first at equal distance.
+        """
+        word = token.lower()
+        suggestions = {}
+        for candidate in self.learned.get(self.specialhash(token), ()):
+            suggestions[candidate] = edit_distance(word, candidate,
+                                                   max(len(word), len(candidate)))
+        # a candidate is usually found with several deletes
+        seen = set(suggestions)
+        for key in deletes(word[:self.prefix_length], self.max_distance):
+            for candidate in self.index.get(key, ()):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    distance = edit_distance(word, candidate, self.max_distance)
+                    if distance <= self.max_distance:
+                        suggestions[candidate] = distance
+        suggestions = [(candidate, distance, self.frequencies[candidate])
+                       for (candidate, distance) in suggestions.iteritems()]
+        suggestions.sort(key=lambda (w, d, f): (d, -f, w))
+        return suggestions
+
     def test(self, token):
-        hashed = self.specialhash(token)
-        if hashed in self.learned:
-            words = self.learned[hashed].items()
-            sortby(words, 1, reverse=1)
-            if token in [i[0] for i in words]:
-                return 'This word seems OK'
-            else:
-                if len(words) == 1:
-                    return 'Did you mean "%s" ?' % words[0][0]
-                else:
-                    return 'Did you mean "%s" ? (or %s)' \
-                           % (words[0][0], ", ".join(['"'+i[0]+'"' \
-                                                      for i in words[1:]]))
+        if token in self.frequencies:
+            return 'This word seems OK'
+        words = self.suggest(token)
+        if len(words) == 1:
+            return 'Did you mean "%s" ?' % words[0][0]
+        elif words:
+            return 'Did you mean "%s" ? (or %s)' \
+                   % (words[0][0], ", ".join(['"'+i[0]+'"' \
+                                              for i in words[1:]]))
         return "I can't found similar word in my learned db"
- 
-    def learn(self, listofsentences=[], n=2000):
+
+    def learn(self, listofsentences=[], n=None):
+        """
+        Learns the words of the first n sentences, of all of them if n is
+        None, and indexes them.
+        """
         self.learned = defaultdict(mydict)
+        self.frequencies = mydict()
         if listofsentences == []:
             listofsentences = brown.sents()
         for i, sent in enumerate(listofsentences):
-            if i >= n: # Limit to the first nth sentences of the corpus
+            if n is not None and i >= n: # Limit to the first nth sentences of the corpus
                 break
             for word in sent:
-                self.learned[self.specialhash(word)][word.lower()] += 1
- 
+                self.frequencies[word.lower()] += 1
+        self.index = {}
+        for word, count in self.frequencies.iteritems():
+            self.learned[self.specialhash(word)][word] = count
+            for key in deletes(word[:self.prefix_length], self.max_distance):
+                self.index.setdefault(key, []).append(word)
+
+    def save(self, path):
+        """
+        Saves the learned words and their index to a file.
+        """
+        f = open(path, 'wb')
+        try:
+            cPickle.dump((self.max_distance, self.prefix_length, self.learned,
+                          self.frequencies, self.index), f, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+
+    def load(self, path):
+        """
+        Loads the learned words and their index saved to a file.
+        """
+        f = open(path, 'rb')
+        try:
+            (self.max_distance, self.prefix_length, self.learned,
+             self.frequencies, self.index) = cPickle.load(f)
+        finally:
+            f.close()
+
+def misspell(word, edits, rand):
+    for i in range(edits):
+        j = rand.randrange(len(word) + 1)
+        letter = rand.choice('abcdefghijklmnopqrstuvwxyz')
+        operation = rand.randrange(4)
+        if operation == 0 and j < len(word) and len(word) > 1:
+            word = word[:j] + word[j+1:]
+        elif operation == 1 and j < len(word):
+            word = word[:j] + letter + word[j+1:]
+        elif operation == 2 and j + 1 < len(word):
+            word = word[:j] + word[j+1] + word[j] + word[j+2:]
+        else:
+            word = word[:j] + letter + word[j:]
+    return word
+
 def demo():
     d = DidYouMean()
     d.learn()
     # choice of words to be relevant related to the brown corpus
     for i in "birdd, oklaoma, emphasise, bird, carot".split(", "):
         print i, "-", d.test(i)
- 
+
+def benchmark(listofsentences=[], n=None, lookups=5000, path='didyoumean.pickle'):
+    """
+    Learns the words of the sentences, saves and loads them, and prints the
+    number of lookups per second of misspellings of the learned words.
+    """
+    d = DidYouMean()
+    start = time.time()
+    d.learn(listofsentences, n)
+    print "learned %d words, %d index keys in %.2fs" \
+          % (len(d.frequencies), len(d.index), time.time() - start)
+    start = time.time()
+    d.save(path)
+    d = DidYouMean()
+    d.load(path)
+    print "saved and loaded in %.2fs" % (time.time() - start)
+
+    rand = random.Random(0)
+    words = [w for w in d.frequencies if w.isalpha() and len(w) > 2]
+    tokens = [misspell(rand.choice(words), rand.randint(1, 2), rand)
+              for i in range(lookups)]
+    start = time.time()
+    found = 0
+    for token in tokens:
+        if d.suggest(token):
+            found += 1
+    seconds = time.time() - start
+    print "%d lookups in %.2fs (%.0f lookups/s), %d with suggestions" \
+          % (lookups, seconds, lookups / max(seconds, 1e-6), found)
+
 if __name__ == "__main__":
-    demo()
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        demo()
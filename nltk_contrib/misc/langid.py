@@ -17,16 +17,29 @@ from nltk_contrib import classify
 from nltk import detect
 from nltk.corpus import udhr
 import string
+import time
+import multiprocessing
 
-def run(classifier, training_data, gold_data):
+def run(classifier, training_data, gold_data, processes=1):
     classifier.train(training_data)
     correct = 0
-    for lang in gold_data:
-        cls = classifier.get_class(gold_data[lang])
+    langs = list(gold_data)
+    results = classifier.batch_get_class([gold_data[lang] for lang in langs], processes)
+    for (lang, cls) in zip(langs, results):
         if cls == lang:
             correct += 1
     print correct, "in", len(gold_data), "correct"
 
+def throughput(classifier, samples, processes=1):
+    """
+    Returns the number of samples per second the trained classifier classifies,
+    with the given number of processes
+    """
+    start = time.time()
+    for cls in classifier.batch_get_class(samples, processes):
+        pass
+    return len(samples) / (time.time() - start)
+
 # features: character bigrams
 fd = detect.feature({"char-bigrams" : lambda t: [string.join(t)[n:n+2] for n in range(len(t)-1)]})
 
@@ -44,3 +57,16 @@ run(classify.NaiveBayes(fd), training_data, gold_data)
 
 print "Spearman classifier: ",
 run(classify.Spearman(fd), training_data, gold_data)
+
+# throughput: samples of 10 words of the gold data, classified one at a time
+# and in batches by 1 and by all the processors
+samples = [gold_data[lang][n:n+10] for lang in gold_data for n in range(0, 50, 10)] * 50
+for classifier in [classify.Cosine(fd), classify.NaiveBayes(fd), classify.Spearman(fd)]:
+    classifier.train(training_data)
+    start = time.time()
+    for sample in samples:
+        classifier.get_class(sample)
+    print "%r: %.1f samples/s one at a time" % (classifier, len(samples) / (time.time() - start)),
+    for processes in sorted(set([1, multiprocessing.cpu_count()])):
+        print ", %.1f samples/s with %d processes" % (throughput(classifier, samples, processes), processes),
+    print
@@ -6,14 +6,20 @@ import os
 
 from nltk_contrib.tiger.corpus import Corpus
 from nltk_contrib.tiger.indexer import graph_serializer
-from nltk_contrib.tiger.indexer.tiger_corpus_indexer import TigerCorpusIndexer, INDEX_VERSION
-from nltk_contrib.tiger.tigerxml import parse_tiger_corpus
+from nltk_contrib.tiger.indexer.graph_store import GraphStoreWriter, open_graph_store
+from nltk_contrib.tiger.indexer.index_updater import TigerIndexUpdater, copy_index
+from nltk_contrib.tiger.indexer.tiger_corpus_indexer import TigerCorpusIndexer, INDEX_VERSION, \
+     DEFAULT_BATCH_SIZE
+from nltk_contrib.tiger.tigerxml import parse_tiger_corpus, parse_tiger_corpus_parallel
 
 from nltk_contrib.tiger.utils.db import sqlite3
+from nltk_contrib.tiger.utils.parallel import use_parallel_processing
 
-__all__ = ("open_corpus_volatile", "open_corpus")
+__all__ = ("open_corpus_volatile", "open_corpus", "build_index", "update_index", 
+           "compact_index")
 
 GRAPH_INDEX_EXTENSION = ".tci"
+GRAPH_STORE_EXTENSION = ".tgs"
 
 def _connect(db_path):
     db = sqlite3.connect(db_path)
@@ -21,6 +27,10 @@ def _connect(db_path):
     return db
 
 
+def _get_index_id(db):
+    return dict(db.execute("SELECT key, value FROM index_metadata")).get("index_id")
+
+
 class DbProvider(object):
     def __init__(self, path):
         self._path = path
@@ -30,6 +40,11 @@ class DbProvider(object):
 
     def can_reconnect(self):
         return True
+    
+    def open_graph_store(self, db):
+        """Returns the graph store for the index `db`, or `None` if there is none."""
+        return open_graph_store(os.path.splitext(self._path)[0] + GRAPH_STORE_EXTENSION, 
+                                _get_index_id(db))
 
 
 class EmptyDbProvider(object):
@@ -38,6 +53,9 @@ class EmptyDbProvider(object):
     
     def can_reconnect(self):
         return False
+    
+    def open_graph_store(self, db):
+        return None
 
     
 def open_corpus_volatile(treebank_id, tigerxml_corpus_path, veeroot=True):
@@ -49,21 +67,143 @@ def open_corpus_volatile(treebank_id, tigerxml_corpus_path, veeroot=True):
 
 def open_corpus(treebank_id, tigerxml_corpus_path, index_always = False, veeroot=True):
     db_path = os.path.splitext(tigerxml_corpus_path)[0] + GRAPH_INDEX_EXTENSION
+    graph_store_path = os.path.splitext(tigerxml_corpus_path)[0] + GRAPH_STORE_EXTENSION
     
     if not os.path.exists(db_path):
         db = _connect(db_path)
-        _index_treebank(tigerxml_corpus_path, db, veeroot)
+        _index_treebank(tigerxml_corpus_path, db, veeroot, graph_store_path)
     else:
         db = _connect(db_path)
         if index_always or not _check_db(db):
             db.close()
             os.remove(db_path)
             db = _connect(db_path)
-            _index_treebank(tigerxml_corpus_path, db, veeroot)
+            _index_treebank(tigerxml_corpus_path, db, veeroot, graph_store_path)
             
     return Corpus(treebank_id, db, DbProvider(db_path))
     
     
+def build_index(tigerxml_corpus_path, veeroot = True, batch_size = DEFAULT_BATCH_SIZE,
+                num_workers = None, progress = False):
+    """Creates the index for a large TIGER-XML corpus.
+    
+    The graphs are written in batches of `batch_size` graphs, and each batch is committed
+    as a checkpoint. If an earlier call has been interrupted, indexing continues after the
+    last checkpoint. If `num_workers` is not 1, the corpus is parsed in `num_workers` 
+    worker processes, by default one per CPU if there is more than one.
+    
+    An existing, finished index is not changed. Afterwards, the corpus can be opened 
+    with `open_corpus`.
+    """
+    db_path = os.path.splitext(tigerxml_corpus_path)[0] + GRAPH_INDEX_EXTENSION
+    graph_store_path = os.path.splitext(tigerxml_corpus_path)[0] + GRAPH_STORE_EXTENSION
+    
+    db = _connect(db_path)
+    if _check_db(db):
+        db.close()
+        return
+    
+    resume = _has_checkpoint(db)
+    if not resume:
+        db.close()
+        os.remove(db_path)
+        db = _connect(db_path)
+    
+    try:
+        indexer = TigerCorpusIndexer(db, graph_serializer.GraphSerializer(), progress, 
+                                     always_veeroot = veeroot, 
+                                     graph_store = GraphStoreWriter(graph_store_path), 
+                                     batch_size = batch_size, checkpoints = True, 
+                                     resume = resume)
+        if num_workers == 1 or (num_workers is None and not use_parallel_processing()):
+            parse_tiger_corpus(tigerxml_corpus_path, indexer, indexer.parsed_graphs)
+        else:
+            parse_tiger_corpus_parallel(tigerxml_corpus_path, indexer, indexer.parsed_graphs,
+                                        num_workers)
+        indexer.finalize()
+    finally:
+        db.close()
+
+
+def update_index(tigerxml_corpus_path, update_path = None, delete_graphs = (), veeroot = True):
+    """Changes single graphs in the finished index of a TIGER-XML corpus.
+    
+    All graphs in the TIGER-XML file `update_path` are added to the index, graphs with the
+    same XML id as a graph in the index replace the old graph. Afterwards, the graphs with the
+    XML ids in `delete_graphs` are deleted. The changes are only written if all of them
+    succeed. Returns the number of added, replaced and deleted graphs.
+    
+    The corpus file itself is not changed, if it is indexed again, all updates are lost. 
+    Corpora opened on the index must be reopened to see the changes. See
+    `nltk_contrib.tiger.indexer.index_updater` for details.
+    """
+    db_path = os.path.splitext(tigerxml_corpus_path)[0] + GRAPH_INDEX_EXTENSION
+    db = _connect(db_path)
+    try:
+        if not _check_db(db):
+            raise RuntimeError, "'%s' is not a finished corpus index" % (db_path, )
+        updater = TigerIndexUpdater(db, graph_serializer.GraphSerializer(), 
+                                    always_veeroot = veeroot)
+        if update_path is not None:
+            parse_tiger_corpus(update_path, updater)
+        for xml_graph_id in delete_graphs:
+            updater.delete_graph(xml_graph_id)
+        updater.finalize()
+        return updater.added_graphs, updater.replaced_graphs, updater.deleted_graphs
+    finally:
+        db.close()
+
+
+def compact_index(tigerxml_corpus_path, progress = False):
+    """Rewrites the index of a corpus that has been changed with `update_index`.
+    
+    The graphs are renumbered without gaps, and the graph store and the selectivity 
+    estimates for query constraints are created again. The corpus file is not read.
+    """
+    base_path = os.path.splitext(tigerxml_corpus_path)[0]
+    db_path = base_path + GRAPH_INDEX_EXTENSION
+    new_db_path = base_path + ".compact" + GRAPH_INDEX_EXTENSION
+    new_graph_store_path = base_path + ".compact" + GRAPH_STORE_EXTENSION
+    
+    for path in (new_db_path, new_graph_store_path):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    db = _connect(db_path)
+    new_db = _connect(new_db_path)
+    try:
+        if not _check_db(db):
+            raise RuntimeError, "'%s' is not a finished corpus index" % (db_path, )
+        # the graphs in the index already have a single root
+        indexer = TigerCorpusIndexer(new_db, graph_serializer.GraphSerializer(), progress, 
+                                     always_veeroot = False, 
+                                     graph_store = GraphStoreWriter(new_graph_store_path))
+        copy_index(db, indexer)
+        indexer.finalize()
+    except:
+        new_db.close()
+        for path in (new_db_path, new_graph_store_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    finally:
+        db.close()
+    new_db.close()
+    
+    # a graph store is ignored as long as it does not belong to the index 
+    os.rename(new_graph_store_path, base_path + GRAPH_STORE_EXTENSION)
+    os.rename(new_db_path, db_path)
+
+
+def _has_checkpoint(db):
+    try: 
+        index_meta = dict(db.execute("SELECT key, value FROM index_metadata"))
+        return "checkpoint" in index_meta and \
+               index_meta.get("index_version", -1) == INDEX_VERSION
+    except sqlite3.OperationalError:
+        return False
+    
+
 def _check_db(db):
     try: 
         index_meta = dict(db.execute("SELECT key, value FROM index_metadata"))
@@ -73,8 +213,13 @@ def _check_db(db):
         return False
 
     
-def _index_treebank(corpus_path, db, veeroot=True):
-    indexer = TigerCorpusIndexer(db, graph_serializer.GraphSerializer(), always_veeroot=veeroot)
+def _index_treebank(corpus_path, db, veeroot=True, graph_store_path=None):
+    if graph_store_path is not None:
+        graph_store = GraphStoreWriter(graph_store_path)
+    else:
+        graph_store = None
+    indexer = TigerCorpusIndexer(db, graph_serializer.GraphSerializer(), always_veeroot=veeroot,
+                                 graph_store=graph_store)
     parse_tiger_corpus(corpus_path, indexer) 
     indexer.finalize()
     
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+# Licensed under the GNU GPLv2
+"""Benchmarks for the evaluation of TIGERSearch queries.
+
+The benchmark generates a synthetic TIGER-XML corpus with the `TreebankConverter` from
+`nltk_contrib.tiger.demo` and evaluates a catalogue of queries on it, once in this process
+and once with parallel evaluation. For each query and mode, the wall time, the peak
+resident set size and the statistics of the result builder are recorded.
+
+Each query is evaluated in a fresh process, so that the peak memory usage of one query
+does not hide the memory usage of the queries measured after it. The first evaluation
+of a query includes the compilation of the query and the start of the worker pool,
+it is reported separately from the best time of the remaining evaluations.
+
+The results are written as JSON and can be compared with the results of an earlier run:
+
+  python -m nltk_contrib.tiger.benchmark -o new.json -c old.json
+
+Results are only comparable if the corpus has been generated with the same size and
+seed, which is checked using the digest of the corpus file.
+"""
+from __future__ import with_statement
+
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from optparse import OptionParser
+
+from nltk.tree import Tree
+
+from nltk_contrib.tiger import open_corpus
+from nltk_contrib.tiger.demo import TreebankConverter
+
+__all__ = ["QUERIES", "generate_corpus", "run_benchmark", "compare_results"]
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_CORPUS_SIZE = 2000
+DEFAULT_SEED = 4711
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+SECEDGE_RATIO = 0.3
+MODES = ("serial", "parallel")
+
+STATS = ("checked_graphs", "pruned_graphs", "constraint_checks",
+         "node_cache_hits", "node_cache_misses")
+
+QUERIES = [
+    # (name, query)
+    ("node-only", '[cat="NP"]'),
+    ("dominance", '[cat="NP"] > [pos="NN"]'),
+    ("dominance-labeled", '[cat="S"] >SBJ [cat="NP"]'),
+    ("dominance-transitive", '[cat="S"] >* [pos="JJ"]'),
+    ("dominance-range", '[cat="VP"] >2,3 [pos="NN"]'),
+    ("dominance-negated", '[cat="NP"] !> [pos="JJ"]'),
+    ("corner", '[cat="NP"] >@l [pos="DT"]'),
+    ("precedence", '[pos="DT"] . [pos="JJ"]'),
+    ("precedence-transitive", '[pos="DT"] .* [pos="VBD"]'),
+    ("precedence-range", '[cat="NP"] .2,5 [cat="PP"]'),
+    ("sibling", '[cat="NP"] $ [cat="VP"]'),
+    ("sibling-ordered", '[pos="DT"] $.* [pos="NN"]'),
+    ("secedge", '[cat="VP"] >~ [cat="NP"]'),
+    ("secedge-labeled", '[cat="VP"] >~SB [cat="NP"]'),
+    ("predicate-root", '#s:[cat="S"] & root(#s)'),
+    ("predicate-arity", '#n:[cat="NP"] & arity(#n, 3) & #n > [pos="JJ"]'),
+    ("predicate-tokenarity", '#n:[cat="NP"] & tokenarity(#n, 4, 8) & #n >* [cat="PP"]'),
+    ("predicate-discontinuous", '#v:[cat="VP"] & discontinuous(#v) & #v > [cat="NP"]'),
+    ("regex", '[cat="NP"] > [word=/b.*/]'),
+    ("multi-constraint",
+     '#s:[cat="S"] >* #n:[cat="NP"] & #n >* [word="dog"] & #s > #v:[cat="VP"]'),
+    ("multi-precedence",
+     '#a:[cat="NP"] >* #b:[cat="PP"] & #b .* #c:[pos="VBD"]'),
+]
+
+_LEXICON = {
+    "DT": ["the", "a", "this", "every"],
+    "NN": ["dog", "cat", "park", "bone", "ball", "house", "garden"],
+    "NNS": ["dogs", "cats", "birds", "trees"],
+    "JJ": ["big", "old", "brown", "quick", "lazy"],
+    "VBD": ["saw", "chased", "liked", "found"],
+    "VBZ": ["sleeps", "barks", "runs"],
+    "IN": ["in", "on", "behind", "with"],
+    "RB": ["quickly", "often", "rarely"],
+    "CC": ["and", "or"],
+}
+
+
+class _SentenceGenerator(object):
+    """Generates random Penn-style sentence trees."""
+    def __init__(self, seed):
+        self._random = random.Random(seed)
+
+    def _leaf(self, pos):
+        return Tree(pos, [self._random.choice(_LEXICON[pos])])
+
+    def _np(self, depth = 0, label = ""):
+        r = self._random.random()
+        cat = "NP" + label
+        if depth < 3 and r < 0.25:
+            return Tree(cat, [self._np(depth + 1), self._pp(depth + 1)])
+        elif depth < 3 and r < 0.3:
+            return Tree(cat, [self._np(depth + 1), self._leaf("CC"), self._np(depth + 1)])
+        children = [self._leaf("DT")]
+        while self._random.random() < 0.3:
+            children.append(self._leaf("JJ"))
+        children.append(self._leaf(self._random.choice(["NN", "NNS"])))
+        return Tree(cat, children)
+
+    def _pp(self, depth):
+        return Tree("PP", [self._leaf("IN"), self._np(depth)])
+
+    def _vp(self, depth = 0):
+        if self._random.random() < 0.3:
+            children = [self._leaf("VBZ")]
+        else:
+            children = [self._leaf("VBD"), self._np(depth + 1)]
+        if self._random.random() < 0.2:
+            children.append(self._leaf("RB"))
+        if depth < 2 and self._random.random() < 0.2:
+            children.append(self._sbar(depth + 1))
+        elif self._random.random() < 0.3:
+            children.append(self._pp(depth + 1))
+        return Tree("VP", children)
+
+    def _sbar(self, depth):
+        return Tree("SBAR", [self._s(depth)])
+
+    def _s(self, depth = 0):
+        return Tree("S", [self._np(depth, "-SBJ"), self._vp(depth)])
+
+    def add_sentence(self, converter):
+        """Adds a random sentence with secondary edges to `converter`."""
+        graph = converter.add_sentence(self._s())
+        if self._random.random() < SECEDGE_RATIO:
+            nt_ids = graph.nonterminal_ids()
+            source, target = self._random.sample(nt_ids, 2)
+            converter.add_secedge(graph, source, self._random.choice(["SB", "OA", "RE"]), target)
+
+
+def generate_corpus(filename, size = DEFAULT_CORPUS_SIZE, seed = DEFAULT_SEED):
+    """Writes a synthetic TIGER-XML corpus with `size` graphs to `filename`.
+
+    The corpus only depends on `size` and `seed`.
+    """
+    converter = TreebankConverter()
+    generator = _SentenceGenerator(seed)
+    for i in xrange(size):
+        generator.add_sentence(converter)
+    converter.write(filename)
+
+
+def _get_digest(filename):
+    digest = hashlib.md5()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), ""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _peak_rss(who):
+    """Returns the peak resident set size in kilobytes."""
+    rss = resource.getrusage(who).ru_maxrss
+    # Mac OS X reports bytes, all other systems kilobytes
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _measure_query(corpus_path, query_str, parallel, repeat, result_queue):
+    """Evaluates a query and puts the measurements into `result_queue`.
+
+    Runs in a separate process.
+    """
+    try:
+        corpus = open_corpus("benchmark", corpus_path, veeroot = False)
+        evaluator = corpus.get_query_evaluator()
+        evaluator.set_allow_parallel(parallel)
+        base_rss = _peak_rss(resource.RUSAGE_SELF)
+
+        times = []
+        for i in xrange(repeat):
+            start = time.time()
+            query = evaluator.prepare_query(query_str)
+            result = query.evaluate()
+            times.append(time.time() - start)
+
+        measurement = {
+            "first_time": times[0],
+            "best_time": min(times[1:] or times),
+            "builder": query.__class__.__name__,
+            "graphs": len(result),
+            "matches": sum(len(matches) for graph, matches in result),
+        }
+        for name in STATS:
+            measurement[name] = getattr(query, name)
+
+        # the workers are terminated so that their peak RSS is included
+        corpus.close()
+        measurement["base_rss"] = base_rss
+        measurement["peak_rss"] = _peak_rss(resource.RUSAGE_SELF)
+        measurement["peak_rss_workers"] = _peak_rss(resource.RUSAGE_CHILDREN)
+        result_queue.put(measurement)
+    except Exception, e:
+        result_queue.put({"error": "%s: %s" % (e.__class__.__name__, e)})
+
+
+def _run_isolated(corpus_path, query_str, parallel, repeat):
+    result_queue = multiprocessing.Queue()
+    p = multiprocessing.Process(target = _measure_query,
+                                args = (corpus_path, query_str, parallel, repeat, result_queue))
+    p.start()
+    try:
+        return result_queue.get()
+    finally:
+        p.join()
+
+
+def run_benchmark(corpus_path, queries = QUERIES, modes = MODES, repeat = DEFAULT_REPEAT,
+                  log = None):
+    """Evaluates all `queries` on the corpus in `corpus_path`, in all `modes`.
+
+    Returns the benchmark results as a JSON-serializable dictionary.
+
+    *Parameters*:
+     * `corpus_path`: the path of a TIGER-XML corpus
+     * `queries`: a list of `(name, query)` tuples
+     * `modes`: a sequence with the modes ``serial`` and/or ``parallel``
+     * `repeat`: the number of times each query is evaluated
+     * `log`: a file object for progress messages, or `None`
+    """
+    start = time.time()
+    corpus = open_corpus("benchmark", corpus_path, index_always = True, veeroot = False)
+    index_time = time.time() - start
+    corpus_size = len(corpus)
+    corpus.close()
+
+    results = []
+    for name, query_str in queries:
+        for mode in modes:
+            measurement = _run_isolated(corpus_path, query_str, mode == "parallel", repeat)
+            measurement.update(name = name, query = query_str, mode = mode)
+            results.append(measurement)
+            if log is not None:
+                if "error" in measurement:
+                    log.write("%-24s %-8s  %s\n" % (name, mode, measurement["error"]))
+                else:
+                    log.write("%-24s %-8s %8.3fs %8.3fs %7i kB %6i graphs\n" % (
+                        name, mode, measurement["first_time"], measurement["best_time"],
+                        measurement["peak_rss"], measurement["graphs"]))
+
+    return {
+        "format_version": RESULT_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": multiprocessing.cpu_count(),
+        },
+        "corpus": {
+            "digest": _get_digest(corpus_path),
+            "graphs": corpus_size,
+            "index_time": index_time,
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_results(old, new, threshold = DEFAULT_THRESHOLD):
+    """Compares two benchmark results.
+
+    Returns a list of `(name, mode, old_time, new_time, ratio, flag)` tuples for all
+    measurements contained in both results. `flag` is ``"slower"`` or ``"faster"`` if
+    the best times differ by more than `threshold` (relative), ``"changed"`` if the
+    results of the query differ and the empty string otherwise.
+
+    A `ValueError` is raised if the results have been measured on different corpora.
+    """
+    if old["corpus"]["digest"] != new["corpus"]["digest"]:
+        raise ValueError, "benchmark results have been measured on different corpora"
+
+    old_results = dict(((r["name"], r["mode"]), r) for r in old["results"] if "error" not in r)
+    comparison = []
+    for r in new["results"]:
+        old_r = old_results.get((r["name"], r["mode"]))
+        if old_r is None or "error" in r:
+            continue
+        ratio = r["best_time"] / old_r["best_time"] if old_r["best_time"] > 0 else 1.0
+        if (r["graphs"], r["matches"]) != (old_r["graphs"], old_r["matches"]):
+            flag = "changed"
+        elif ratio > 1 + threshold:
+            flag = "slower"
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        else:
+            flag = ""
+        comparison.append((r["name"], r["mode"], old_r["best_time"], r["best_time"], ratio, flag))
+    return comparison
+
+
+def main():
+    op = OptionParser(usage = "%prog [options]")
+    op.add_option("-f", "--corpus-file", metavar = "FILE", default = "benchmark.xml",
+                  help = "The path of the synthetic corpus, generated if it does not exist.")
+    op.add_option("-n", "--size", type = "int", default = DEFAULT_CORPUS_SIZE,
+                  help = "The number of graphs in the synthetic corpus.")
+    op.add_option("-s", "--seed", type = "int", default = DEFAULT_SEED,
+                  help = "The seed for the corpus generator.")
+    op.add_option("-r", "--repeat", type = "int", default = DEFAULT_REPEAT,
+                  help = "The number of evaluations per query and mode.")
+    op.add_option("-m", "--mode", action = "append", choices = MODES, dest = "modes",
+                  help = "Only run the given mode (serial or parallel), may be repeated.")
+    op.add_option("-q", "--query", action = "append", dest = "queries", metavar = "NAME",
+                  help = "Only run the query with the given name, may be repeated.")
+    op.add_option("-o", "--output", metavar = "FILE",
+                  help = "Write the results as JSON to FILE.")
+    op.add_option("-c", "--compare", metavar = "FILE",
+                  help = "Compare the results with an earlier run stored in FILE.")
+    op.add_option("-t", "--threshold", type = "float", default = DEFAULT_THRESHOLD,
+                  help = "The relative difference reported as a regression.")
+    options, args = op.parse_args()
+
+    if not os.path.exists(options.corpus_file):
+        sys.stderr.write("Generating corpus with %i graphs...\n" % (options.size, ))
+        generate_corpus(options.corpus_file, options.size, options.seed)
+
+    queries = QUERIES
+    if options.queries:
+        queries = [(name, query) for name, query in QUERIES if name in options.queries]
+
+    results = run_benchmark(options.corpus_file, queries, options.modes or MODES,
+                            options.repeat, sys.stderr)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent = 1, sort_keys = True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            old = json.load(f)
+        regressions = 0
+        for name, mode, old_time, new_time, ratio, flag in compare_results(
+            old, results, options.threshold):
+            print "%-24s %-8s %8.3fs %8.3fs %6.2f %s" % (name, mode, old_time, new_time, ratio, flag)
+            if flag in ("slower", "changed"):
+                regressions += 1
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,7 @@ from nltk_contrib.tiger.indexer import graph_serializer
 from nltk_contrib.tiger.graph import NodeType
 from nltk_contrib.tiger.index import IndexNodeId
 from nltk_contrib.tiger.query import TsqlQueryEvaluator
+from nltk_contrib.tiger.query.plancache import QueryPlanCache
 
 __all__ = ("Corpus", )
 
@@ -19,6 +20,11 @@ class CorpusInfo(object):
     def __init__(self, db):
         self._cursor = db.cursor()
         self.corpus_size = self._cursor.execute("SELECT COUNT(*) FROM graphs").fetchone()[0]
+        # graph ordinals have gaps if graphs have been deleted from the index
+        self.graph_id_limit = self._cursor.execute(
+            "SELECT COALESCE(MAX(id) + 1, 0) FROM graphs").fetchone()[0]
+        self.index_id = dict(self._cursor.execute(
+            "SELECT key, value FROM index_metadata")).get("index_id")
         
     def get_feature_names(self, node_type):
         if node_type is NodeType.UNKNOWN:
@@ -54,6 +60,10 @@ class Corpus(object):
     the range ``[0..len(corpus)[``, and assigned by indexer that created the corpus. The Tiger
     corpus indexer assigns graph ids based on the order in the input file.
     
+    If graphs have been deleted with `nltk_contrib.tiger.update_index`, the ordinals have gaps
+    until the index is compacted, and `get_graph` raises a `KeyError` for deleted graphs.
+    New graphs are appended to the corpus.
+    
     XML ids and index ids
     =====================
     The `Corpus` class provides several methods to convert the internal index ids to the XML ids
@@ -66,6 +76,8 @@ class Corpus(object):
     Query Evaluation
     ================
     The method `get_query_evaluator` returns the TigerSearch query evaluator for this corpus.
+    Compiled queries are cached in the `plan_cache` of the corpus, which is cleared when the
+    corpus is reopened.
     """
     DEFAULT_DESERIALIZER = graph_serializer.GraphDeserializer
 
@@ -77,15 +89,19 @@ class Corpus(object):
         self._info = CorpusInfo(db)
         
         self._cursor = self._db.cursor()
+        self._create_deserializer()
         
+        self._evaluator = None
+        self._graph_store = db_provider.open_graph_store(db)
+        self.plan_cache = QueryPlanCache()
+
+    def _create_deserializer(self):
         self._deserializer = self.DEFAULT_DESERIALIZER(
             self._get_edge_label_rmap(),
             self._get_secedge_label_rmap(),
             self._get_feature_revmap(NodeType.TERMINAL),
             self._get_feature_revmap(NodeType.NONTERMINAL))
         
-        self._evaluator = None
-
     def _get_edge_label_rmap(self):
         return [unicode(r[0]) 
                 for r in self._cursor.execute("SELECT label FROM edge_labels ORDER BY id")]
@@ -144,23 +160,39 @@ class Corpus(object):
                                       (graph_ordinal,)).fetchone()
         return result[0]
     
-    def get_root_id(self, ordinal):
-        assert 0 <= ordinal < len(self)
-        result = self._cursor.execute("SELECT data FROM graphs WHERE id = ?", 
+    def _get_graph_row(self, ordinal):
+        assert 0 <= ordinal < self._info.graph_id_limit
+        result = self._cursor.execute("SELECT id, data FROM graphs WHERE id = ?", 
                                       (ordinal,)).fetchone()
-        return self._deserializer.get_root_id(result[0])
+        if result is None:
+            raise KeyError, ordinal
+        return result
+    
+    def get_root_id(self, ordinal):
+        return self._deserializer.get_root_id(self._get_graph_row(ordinal)[1])
         
     def get_graph(self, ordinal):
         """Returns the Tiger graph datastructure for the graph with number `ordinal`."""
-        assert 0 <= ordinal < len(self)
-        result = self._cursor.execute("SELECT id, data FROM graphs WHERE id = ?", 
-                                      (ordinal,)).fetchone()
+        result = self._get_graph_row(ordinal)
         return self._deserializer.deserialize_graph(result[0], result[1])
     
+    def get_graph_view(self, ordinal):
+        """Returns a lightweight view on the graph with number `ordinal`.
+        
+        The view reads the node data directly from the memory-mapped graph store, see
+        `nltk_contrib.tiger.indexer.graph_store`. If the corpus has no graph store, `None`
+        is returned.
+        """
+        assert 0 <= ordinal < self._info.graph_id_limit
+        if self._graph_store is None:
+            return None
+        return self._graph_store.get_graph_view(ordinal)
+    
     def get_query_evaluator(self):
         """Returns the TigerSearch query evaluator for this corpus."""
         if self._evaluator is None:
-            self._evaluator = TsqlQueryEvaluator(self._db, self._db_provider, self._info)
+            self._evaluator = TsqlQueryEvaluator(self._db, self._db_provider, self._info,
+                                                 self.plan_cache)
         return self._evaluator
         
     def close(self):
@@ -168,6 +200,11 @@ class Corpus(object):
         
         After a call to close, the corpus cannot be used any more.
         """
+        if self._evaluator is not None:
+            self._evaluator.close()
+        if self._graph_store is not None:
+            self._graph_store.close()
+            self._graph_store = None
         self._db.close()
         self._db = None
         self._cursor = None
@@ -176,11 +213,15 @@ class Corpus(object):
     def reopen(self):
         """Reopens the corpus.
         
-        If the database connection was open before, it will be closed first.
+        If the database connection was open before, it will be closed first. The index may
+        have been changed in the meantime, so all cached queries are discarded.
         """
         if self._db:
             self.close()
+        self.plan_cache.clear()
         self._db = self._db_provider.connect()
         self._cursor = self._db.cursor()
         self._info = CorpusInfo(self._db)
+        self._create_deserializer()
+        self._graph_store = self._db_provider.open_graph_store(self._db)
     
@@ -49,11 +49,12 @@ class Graph(object):
 
         self._terminals = ET.Element("terminals")
         self._nonterminals = ET.Element("nonterminals")
+        self._nodes = {}
     
     def add_terminal(self, word, pos):
         node_id = "s%i_%i" % (self._id, self._get_t_id())
 
-        ET.SubElement(self._terminals, "t", id=node_id, word=word, pos=pos)
+        self._nodes[node_id] = ET.SubElement(self._terminals, "t", id=node_id, word=word, pos=pos)
         return (self.DEFAULT_LABEL, node_id), pos
 
     def add_nonterminal(self, cat, children):
@@ -68,8 +69,18 @@ class Graph(object):
         nt = ET.SubElement(self._nonterminals, "nt", id=node_id, cat=real_cat)
         for child_lbl, child_id in children:
             ET.SubElement(nt, "edge", idref=child_id, label=child_lbl)
+        self._nodes[node_id] = nt
         return (lbl, node_id), real_cat
 
+    def add_secedge(self, source_id, label, target_id):
+        ET.SubElement(self._nodes[source_id], "secedge", idref=target_id, label=label)
+
+    def terminal_ids(self):
+        return [t.get("id") for t in self._terminals]
+
+    def nonterminal_ids(self):
+        return [nt.get("id") for nt in self._nonterminals]
+
     def get_xml(self, root_id):
         return E.s(
             E.graph(
@@ -107,6 +118,11 @@ class TreebankConverter(object):
         graph = Graph(self._next_s_id())
         lbl, root_id = self._get_children([sentence], graph)[0]
         self._graphs.append(graph.get_xml(root_id))
+        return graph
+
+    def add_secedge(self, graph, source_id, label, target_id):
+        graph.add_secedge(source_id, label, target_id)
+        self._secedge_labels.add(label)
     
     def _edgelabels(self):
         e = E.edgelabel()
@@ -114,6 +130,12 @@ class TreebankConverter(object):
             e.append(E.value("", name=lbl))
         return e
 
+    def _secedgelabels(self):
+        e = E.secedgelabel()
+        for lbl in self._secedge_labels:
+            e.append(E.value("", name=lbl))
+        return e
+
     def _list_feature(self, name, domain, feature_set):
         f = E.feature(name=name, domain=domain)
         for feature in feature_set:
@@ -126,7 +148,7 @@ class TreebankConverter(object):
             self._list_feature("pos", "T", self._pos_tags),
             self._list_feature("cat", "NT", self._cats),
             self._edgelabels(),
-            E.secedgelabel())
+            self._secedgelabels())
 
     def _get_header(self):
         return E.head(
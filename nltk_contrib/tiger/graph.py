@@ -51,6 +51,16 @@ class _TigerNode(object):
 
     def __ne__(self, other):
         return not (self == other)
+    
+    def __getstate__(self):
+        # TYPE is a class attribute in the subclasses and cannot be set on instances
+        return [(name, getattr(self, name)) 
+                for cls in type(self).__mro__ for name in getattr(cls, "__slots__", ())
+                if name != "TYPE"]
+    
+    def __setstate__(self, state):
+        for name, value in state:
+            setattr(self, name, value)
 
 
 class TerminalNode(_TigerNode):
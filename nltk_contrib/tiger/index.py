@@ -5,8 +5,10 @@
 """Classes and methods related to the TIGER corpus on-disk index."""
 import operator
 import array
+import zlib
 
-__all__ = ("IndexNodeId", "CONTINUOUS", "DISCONTINUOUS")
+__all__ = ("IndexNodeId", "CONTINUOUS", "DISCONTINUOUS", 
+           "encode_posting_list", "decode_posting_list")
 
 ID = 0
 EDGE_LABEL = 1
@@ -49,3 +51,20 @@ class IndexNodeId(tuple):
 
 def gorn2db(address_tuple):
     return buffer(array.array("b", address_tuple).tostring())
+
+def encode_posting_list(graph_ids):
+    """Returns the database representation of an ascending sequence of graph ids.
+    
+    The ids are stored as compressed differences between consecutive ids.
+    """
+    deltas = array.array("I", graph_ids)
+    for idx in xrange(len(deltas) - 1, 0, -1):
+        deltas[idx] -= deltas[idx - 1]
+    return buffer(zlib.compress(deltas.tostring()))
+
+def decode_posting_list(data):
+    """Returns the ascending array of graph ids stored in the posting list `data`."""
+    graph_ids = array.array("I", zlib.decompress(data))
+    for idx in xrange(1, len(graph_ids)):
+        graph_ids[idx] += graph_ids[idx - 1]
+    return graph_ids
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+# Licensed under the GNU GPLv2
+"""A columnar, memory-mapped store for the node data of a corpus.
+
+The graph store contains the same node data as the ``node_data`` table in the index, plus
+the parent and the feature values of each node, in fixed-width columns. Nodes are stored
+in the order of their index ids, and the position of a node is computed from the
+position of the first node of its graph and the node number inside the graph, so node
+data can be read without any lookup in the database.
+
+The store file is memory-mapped read-only, and all values are read directly from the
+mapped file. Processes that read the same store share its pages in the page cache.
+
+File layout
+===========
+The file starts with the magic string ``TGS1`` and the length of the header, followed by
+the pickled header and the columns. Each column starts at a multiple of 8 bytes. The
+header is a dictionary with the keys
+ * ``index_id``: the id of the index the store has been created for
+ * ``graphs``, ``nodes``: the number of graphs and nodes
+ * ``features``: the names of all features
+ * ``columns``: a dictionary that maps column names to ``(typecode, offset, length)``
+
+Node references (parents and corners) are stored as node numbers inside the graph,
+missing values as -1.
+"""
+import array
+import cPickle
+import mmap
+import os
+import shutil
+import struct
+
+from nltk_contrib.tiger.index import IndexNodeId
+
+__all__ = ("GraphStoreWriter", "GraphStore", "GraphView", "open_graph_store")
+
+MAGIC = "TGS1"
+_HEADER_LENGTH = struct.Struct("=I")
+_ALIGNMENT = 8
+
+NODE_COLUMNS = (
+    ("edge_label", "h"),
+    ("continuity", "b"),
+    ("left_corner", "h"),
+    ("right_corner", "h"),
+    ("token_order", "i"),
+    ("parent", "h"),
+)
+FEATURE_COLUMN_PREFIX = "feature:"
+FEATURE_TYPECODE = "i"
+
+_NONE = -1
+
+def _or_none(value):
+    return None if value == _NONE else value
+
+
+class GraphStoreWriter(object):
+    """Collects the node data of all graphs and writes the graph store file.
+
+    The writer is handed to the `TigerCorpusIndexer`, which adds all graphs to it.
+    Each column is appended to a separate part file in `flush`, so the writer only holds 
+    the data of the current batch in memory. The store file is assembled from the part 
+    files when the writer is closed.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._index_id = None
+        self._feature_value_maps = []
+        self._node_count = 0
+        self._gorn_length = 0
+        self._lengths = {}
+        self._columns = dict((name, array.array(typecode)) for name, typecode in NODE_COLUMNS)
+        self._columns["graph_offsets"] = array.array("I", [0])
+        self._columns["gorn_offsets"] = array.array("I", [0])
+        self._columns["gorn_addresses"] = array.array("b")
+
+    def set_index_id(self, index_id):
+        self._index_id = index_id
+
+    def add_feature_value_map(self, feature_name, value_map):
+        self._feature_value_maps.append((feature_name, value_map))
+        self._columns[FEATURE_COLUMN_PREFIX + feature_name] = array.array(FEATURE_TYPECODE)
+
+    def add_graph(self, graph, node_ids, nt_rows, t_rows):
+        """Adds the node data of a graph.
+
+        *Parameters*:
+         * `graph`: the graph, with the XML node ids
+         * `node_ids`: the map from XML node ids to index node ids
+         * `nt_rows`, `t_rows`: the rows for the nonterminals and terminals in the
+           ``node_data`` table
+        """
+        node_count = len(node_ids)
+        columns = dict((name, array.array(typecode, [_NONE]) * node_count)
+                       for name, typecode in NODE_COLUMNS)
+        gorn_addresses = [None] * node_count
+
+        def _node_number(node_id):
+            return _NONE if node_id is None else node_id & IndexNodeId.NODE_BITMASK
+
+        for (node_id, __, edge_label, gorn_address, continuity, __, __, left_corner,
+             right_corner, token_order) in nt_rows:
+            idx = _node_number(node_id)
+            columns["continuity"][idx] = continuity
+            columns["left_corner"][idx] = _node_number(left_corner)
+            columns["right_corner"][idx] = _node_number(right_corner)
+            columns["token_order"][idx] = token_order
+            columns["edge_label"][idx] = _NONE if edge_label is None else edge_label
+            gorn_addresses[idx] = gorn_address
+
+        for (node_id, __, edge_label, gorn_address, token_order) in t_rows:
+            idx = _node_number(node_id)
+            columns["continuity"][idx] = 0
+            columns["token_order"][idx] = token_order
+            columns["edge_label"][idx] = _NONE if edge_label is None else edge_label
+            gorn_addresses[idx] = gorn_address
+
+        for node in graph.nonterminals():
+            parent_idx = node_ids[node.id].node_id
+            for label, child_id in node.edges:
+                columns["parent"][node_ids[child_id].node_id] = parent_idx
+
+        for name, typecode in NODE_COLUMNS:
+            self._columns[name].extend(columns[name])
+
+        for feature_name, value_map in self._feature_value_maps:
+            values = array.array(FEATURE_TYPECODE, [_NONE]) * node_count
+            for xml_node_id, node in graph.nodes.iteritems():
+                if feature_name in node.features:
+                    values[node_ids[xml_node_id].node_id] = value_map[node.features[feature_name]]
+            self._columns[FEATURE_COLUMN_PREFIX + feature_name].extend(values)
+
+        gorn_offsets = self._columns["gorn_offsets"]
+        for gorn_address in gorn_addresses:
+            gorn_address = str(gorn_address)
+            self._columns["gorn_addresses"].fromstring(gorn_address)
+            self._gorn_length += len(gorn_address)
+            gorn_offsets.append(self._gorn_length)
+        self._node_count += node_count
+        self._columns["graph_offsets"].append(self._node_count)
+
+    def _get_part_path(self, column_name):
+        return "%s.%s.part" % (self._path, column_name.replace(":", "_"))
+
+    def flush(self):
+        """Appends the columns of all graphs added since the last flush to the part files."""
+        for name, column in self._columns.iteritems():
+            # stale part files from an earlier run are overwritten
+            f = open(self._get_part_path(name), "ab" if name in self._lengths else "wb")
+            try:
+                column.tofile(f)
+            finally:
+                f.close()
+            self._lengths[name] = self._lengths.get(name, 0) + len(column)
+            del column[:]
+
+    def get_state(self):
+        """Flushes all columns and returns the state of the writer for `restore`."""
+        self.flush()
+        return {"lengths": dict(self._lengths),
+                "sizes": dict((name, self._lengths[name] * column.itemsize)
+                              for name, column in self._columns.iteritems()),
+                "node_count": self._node_count,
+                "gorn_length": self._gorn_length}
+
+    def restore(self, state):
+        """Restores the state returned by `get_state`.
+
+        The part files are truncated to their state at the time `get_state` was called.
+        """
+        self._lengths = dict(state["lengths"])
+        self._node_count = state["node_count"]
+        self._gorn_length = state["gorn_length"]
+        for column in self._columns.itervalues():
+            del column[:]
+        for name, size in state["sizes"].iteritems():
+            f = open(self._get_part_path(name), "r+b")
+            try:
+                f.truncate(size)
+            finally:
+                f.close()
+
+    def close(self):
+        """Writes the store file and removes the part files.
+
+        The file is written under a temporary name first and renamed afterwards, so
+        processes that still have the old store mapped are not disturbed.
+        """
+        self.flush()
+        names = sorted(self._columns)
+        layout = {}
+        offset = 0
+        for name in names:
+            column = self._columns[name]
+            layout[name] = (column.typecode, offset, self._lengths[name])
+            offset += -(-self._lengths[name] * column.itemsize // _ALIGNMENT) * _ALIGNMENT
+
+        header = cPickle.dumps({
+            "index_id": self._index_id,
+            "graphs": self._lengths["graph_offsets"] - 1,
+            "nodes": self._node_count,
+            "features": [feature_name for feature_name, __ in self._feature_value_maps],
+            "columns": layout}, 2)
+        data_start = -(-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) // _ALIGNMENT) * _ALIGNMENT
+
+        tmp_path = self._path + ".tmp"
+        f = open(tmp_path, "wb")
+        try:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            for name in names:
+                f.seek(data_start + layout[name][1])
+                part = open(self._get_part_path(name), "rb")
+                try:
+                    shutil.copyfileobj(part, f)
+                finally:
+                    part.close()
+            f.truncate(data_start + offset)
+        finally:
+            f.close()
+        os.rename(tmp_path, self._path)
+        for name in names:
+            os.remove(self._get_part_path(name))
+        self._columns = None
+
+
+class _Column(object):
+    __slots__ = ("_data", "_offset", "_struct", "_size", "length")
+
+    def __init__(self, data, base_offset, typecode, offset, length):
+        self._data = data
+        self._offset = base_offset + offset
+        self._struct = struct.Struct("=" + typecode)
+        self._size = self._struct.size
+        self.length = length
+
+    def __getitem__(self, idx):
+        return self._struct.unpack_from(self._data, self._offset + idx * self._size)[0]
+
+
+class GraphStore(object):
+    """Read-only access to a graph store file.
+
+    The node data returned by `get_node_data` has the same layout as the rows from the
+    ``node_data`` table that are used in constraint checking, see `nltk_contrib.tiger.index`.
+    """
+    def __init__(self, path):
+        f = open(path, "rb")
+        try:
+            self._data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError, "'%s' is not a graph store" % (path, )
+        header_length = _HEADER_LENGTH.unpack_from(self._data, len(MAGIC))[0]
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = cPickle.loads(self._data[header_start:header_start + header_length])
+        data_start = -(-(header_start + header_length) // _ALIGNMENT) * _ALIGNMENT
+
+        self.index_id = header["index_id"]
+        self.graphs = header["graphs"]
+        self.nodes = header["nodes"]
+        self.features = header["features"]
+        self._columns = dict(
+            (name, _Column(self._data, data_start, typecode, offset, length))
+            for name, (typecode, offset, length) in header["columns"].iteritems())
+
+        self._graph_offsets = self._columns["graph_offsets"]
+        self._gorn_offsets = self._columns["gorn_offsets"]
+        self._gorn_start = self._columns["gorn_addresses"]._offset
+        self._edge_label = self._columns["edge_label"]
+        self._continuity = self._columns["continuity"]
+        self._left_corner = self._columns["left_corner"]
+        self._right_corner = self._columns["right_corner"]
+        self._token_order = self._columns["token_order"]
+
+    def close(self):
+        self._data.close()
+
+    def get_graph_view(self, graph_id):
+        """Returns a `GraphView` for the graph with the number `graph_id`."""
+        return GraphView(self, graph_id)
+
+    def _get_position(self, graph_id, node_number):
+        return self._graph_offsets[graph_id] + node_number
+
+    def _get_gorn_address(self, pos):
+        start = self._gorn_offsets[pos]
+        return buffer(self._data, self._gorn_start + start, self._gorn_offsets[pos + 1] - start)
+
+    def get_node_data(self, node_id):
+        """Returns the node data for the node with the integer index id `node_id`."""
+        graph_id = node_id >> IndexNodeId.NODE_BIT_WIDTH
+        graph_base = graph_id << IndexNodeId.NODE_BIT_WIDTH
+        pos = self._graph_offsets[graph_id] + (node_id & IndexNodeId.NODE_BITMASK)
+
+        left_corner = self._left_corner[pos]
+        if left_corner != _NONE:
+            left_corner += graph_base
+            right_corner = self._right_corner[pos] + graph_base
+        else:
+            left_corner = right_corner = None
+        return (node_id, _or_none(self._edge_label[pos]), self._continuity[pos],
+                left_corner, right_corner, self._token_order[pos],
+                self._get_gorn_address(pos))
+
+
+class GraphView(object):
+    """A lightweight view on a graph in the graph store.
+
+    All node data is read from the store when it is requested, no node objects are
+    created. Nodes are referenced by their number inside the graph.
+    """
+    __slots__ = ("_store", "_first", "graph_id", "node_count")
+
+    def __init__(self, store, graph_id):
+        self._store = store
+        self.graph_id = graph_id
+        self._first = store._graph_offsets[graph_id]
+        self.node_count = store._graph_offsets[graph_id + 1] - self._first
+
+    def __len__(self):
+        return self.node_count
+
+    def get_index_node_id(self, node_number):
+        return IndexNodeId(self.graph_id, node_number)
+
+    def is_terminal(self, node_number):
+        return self._store._continuity[self._first + node_number] == 0
+
+    def get_parent(self, node_number):
+        """Returns the number of the parent node, or `None` for the root node."""
+        return _or_none(self._store._columns["parent"][self._first + node_number])
+
+    def get_children(self, node_number):
+        """Returns the numbers of all children of a node, in the order of their edges."""
+        parents = self._store._columns["parent"]
+        children = [idx for idx in xrange(self.node_count)
+                    if parents[self._first + idx] == node_number]
+        children.sort(key = lambda idx: self.get_gorn_address(idx)[-1])
+        return children
+
+    def get_edge_label(self, node_number):
+        """Returns the id of the label of the incoming edge, or `None` for the root node."""
+        return _or_none(self._store._edge_label[self._first + node_number])
+
+    def get_corners(self, node_number):
+        """Returns the numbers of the left and right corner of a nonterminal."""
+        pos = self._first + node_number
+        return _or_none(self._store._left_corner[pos]), _or_none(self._store._right_corner[pos])
+
+    def get_token_order(self, node_number):
+        return self._store._token_order[self._first + node_number]
+
+    def get_gorn_address(self, node_number):
+        return array.array("b", str(self._store._get_gorn_address(self._first + node_number)))
+
+    def get_feature_value(self, feature_name, node_number):
+        """Returns the id of the value of a feature, or `None` if the node has no value."""
+        return _or_none(
+            self._store._columns[FEATURE_COLUMN_PREFIX + feature_name][self._first + node_number])
+
+
+def open_graph_store(path, index_id):
+    """Opens the graph store in `path`.
+
+    Returns `None` if there is no graph store or if it does not belong to the index with
+    the id `index_id`.
+    """
+    if index_id is None or not os.path.exists(path):
+        return None
+    store = GraphStore(path)
+    if store.index_id != index_id:
+        store.close()
+        return None
+    return store
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# Licensed under the GNU GPLv2
+"""This module contains classes for changing an existing corpus index.
+
+The `TigerIndexUpdater` adds, replaces and deletes single graphs in a finished index,
+without indexing the whole corpus again:
+
+ * a graph whose XML id is not in the index yet is appended to the corpus
+ * a graph whose XML id is already in the index replaces the old graph, and keeps its
+   graph ordinal
+ * deleted graphs leave a gap in the graph ordinals
+
+Feature values, edge labels and secondary edge labels that do not exist in the index yet
+are added to the index. New features cannot be added.
+
+The graph store and the constraint selectivities are not updated. The index gets a new
+id, so that the graph store (and all saved query plans) are not used any more.
+`copy_index` writes all graphs of an index into a new indexer, which removes the gaps in
+the graph ordinals and recreates the graph store and the selectivities.
+"""
+from collections import defaultdict, OrderedDict
+from itertools import count
+import array
+import uuid
+
+from nltk_contrib.tiger.graph import NodeType, TigerGraph
+from nltk_contrib.tiger.index import IndexNodeId, encode_posting_list
+from nltk_contrib.tiger.indexer.graph_serializer import GraphDeserializer
+from nltk_contrib.tiger.indexer.tiger_corpus_indexer import TigerCorpusIndexer
+
+__all__ = ("TigerIndexUpdater", "copy_index")
+
+# PRAGMA settings while graphs are updated, reset in finalize
+UPDATE_PRAGMAS = (("cache_size", 100000), ("temp_store", 2))
+
+
+def _get_graph_node_range(graph_id):
+    """Returns the smallest and largest possible node id in the graph `graph_id`."""
+    return graph_id << IndexNodeId.NODE_BIT_WIDTH, \
+           ((graph_id + 1) << IndexNodeId.NODE_BIT_WIDTH) - 1
+
+
+class TigerIndexUpdater(TigerCorpusIndexer):
+    """Adds, replaces and deletes graphs in a finished index.
+
+    The updater can be used as the target of a TIGER-XML parser, graphs in the file are
+    added or replace the graphs with the same XML id. All changes are written in a single
+    transaction when `finalize` is called.
+
+    *Parameters*:
+     * `db`: the database connection of the index
+     * `graph_serializer`: the serializer for the graph data
+     * `progress`: if `True`, progress information is printed
+     * `always_veeroot`: if `True`, all graphs get a virtual root node
+    """
+    LOAD_PRAGMAS = UPDATE_PRAGMAS
+
+    def __init__(self, db, graph_serializer, progress = False, always_veeroot = True):
+        self.added_graphs = 0
+        self.replaced_graphs = 0
+        self.deleted_graphs = 0
+        self._changed_postings = defaultdict(set)
+        super(TigerIndexUpdater, self).__init__(db, graph_serializer, progress, always_veeroot)
+
+    def _setup_tables(self):
+        """Loads the feature value and label maps from the index."""
+        self._graphs = self._cursor.execute(
+            "SELECT COALESCE(MAX(id) + 1, 0) FROM graphs").fetchone()[0]
+
+        self._value_descriptions = {}
+        for feature_id, name, domain, order_id in self._cursor.execute(
+            "SELECT id, name, domain, order_id FROM features ORDER BY id").fetchall():
+            values = self._cursor.execute(
+                "SELECT value, value_id FROM feature_values WHERE feature_id = ?",
+                (feature_id, )).fetchall()
+            next_id = max([value_id for value, value_id in values] or [-1]) + 1
+            value_map = defaultdict(count(next_id).next, values)
+            domain = NodeType.fromkey(domain)
+
+            self._open_list_features.append((feature_id, value_map))
+            self._stored_open_values[feature_id] = next_id
+            self._feature_value_maps[name] = (value_map, domain)
+            self._feature_ids[name] = feature_id
+            self._serializer.add_feature_value_map(name, domain, order_id, value_map)
+            self._create_feature_value_index(name)
+
+        self._edge_label_map, self._stored_edge_labels = self._load_labels("edge_labels")
+        self._serializer.set_edge_label_map(self._edge_label_map)
+        self._secedge_label_map, self._stored_secedge_labels = self._load_labels("secedge_labels")
+        self._serializer.set_secedge_label_map(self._secedge_label_map)
+        self._label_descriptions = {"edge_labels": {}, "secedge_labels": {}}
+
+    def _load_labels(self, table):
+        """Returns the label map of `table` and the next free label id."""
+        labels = self._cursor.execute("SELECT label, id FROM %s" % (table, )).fetchall()
+        next_id = max([label_id for label, label_id in labels] or [-1]) + 1
+        return defaultdict(count(next_id).next, labels), next_id
+
+    def _create_feature_value_index(self, feature_name):
+        feature_name = str(feature_name)
+        self._feature_iidx_stmts[feature_name] = "INSERT INTO feature_iidx_%s (node_id, value_id) VALUES (?, ?)" % (feature_name,)
+
+    def set_metadata(self, metadata):
+        pass
+
+    def add_feature(self, feature_name, domain, feature_values):
+        """Adds the declared values of a feature that are not in the index yet."""
+        if feature_name not in self._feature_value_maps:
+            raise RuntimeError, "cannot add new feature '%s' to an existing index" % (feature_name, )
+        value_map, index_domain = self._feature_value_maps[feature_name]
+        if index_domain is not domain:
+            raise RuntimeError, "feature '%s' has a different domain in the index" % (feature_name, )
+
+        feature_id = self._feature_ids[feature_name]
+        for value, description in feature_values.iteritems():
+            if value not in value_map:
+                self._value_descriptions[(feature_id, value_map[value])] = description
+        return feature_id
+
+    def _add_label_descriptions(self, table, label_map, labels):
+        for label, description in labels.iteritems():
+            if label not in label_map:
+                self._label_descriptions[table][label_map[label]] = description
+
+    def set_edge_labels(self, edge_labels):
+        self._add_label_descriptions("edge_labels", self._edge_label_map, edge_labels)
+
+    def set_secedge_labels(self, secedge_labels):
+        self._add_label_descriptions("secedge_labels", self._secedge_label_map, secedge_labels)
+
+    def _get_graph_id(self, xml_graph_id):
+        row = self._cursor.execute("SELECT id FROM graphs WHERE xml_graph_id = ?",
+                                   (xml_graph_id, )).fetchone()
+        return None if row is None else row[0]
+
+    def _index_feature_values(self, graph, node_ids):
+        super(TigerIndexUpdater, self)._index_feature_values(graph, node_ids)
+        for node in graph:
+            for feature_name, feature_value in node.features.iteritems():
+                self._changed_postings[feature_name].add(
+                    self._feature_value_maps[feature_name][0][feature_value])
+
+    def _delete_graph_rows(self, graph_id):
+        """Removes all rows of the graph `graph_id` from the index."""
+        # the pending rows might belong to the graph that is deleted
+        self._flush_batch()
+
+        node_range = _get_graph_node_range(graph_id)
+        for feature_name in self._feature_value_maps:
+            self._changed_postings[feature_name].update(row[0] for row in self._cursor.execute(
+                "SELECT DISTINCT value_id FROM feature_iidx_%s WHERE node_id BETWEEN ? AND ?" % (
+                    feature_name, ), node_range).fetchall())
+            self._cursor.execute(
+                "DELETE FROM feature_iidx_%s WHERE node_id BETWEEN ? AND ?" % (feature_name, ),
+                node_range)
+        self._cursor.execute("DELETE FROM node_data WHERE id BETWEEN ? AND ?", node_range)
+        self._cursor.execute("DELETE FROM secedges WHERE origin_id BETWEEN ? AND ?", node_range)
+        self._cursor.execute("DELETE FROM graphs WHERE id = ?", (graph_id, ))
+
+    def add_graph(self, graph):
+        """Adds `graph` to the index, or replaces the graph with the same XML id."""
+        self.parsed_graphs += 1
+        graph_id = self._get_graph_id(graph.id)
+        if graph_id is None:
+            if self._index_graph(graph, self._graphs):
+                self._graphs += 1
+                self.added_graphs += 1
+        else:
+            self._delete_graph_rows(graph_id)
+            if self._index_graph(graph, graph_id):
+                self.replaced_graphs += 1
+            else:
+                self.deleted_graphs += 1
+        if self.parsed_graphs % self._batch_size == 0:
+            self._flush_batch()
+
+    def delete_graph(self, xml_graph_id):
+        """Deletes the graph with the XML id `xml_graph_id` from the index.
+
+        Raises a `KeyError` if there is no such graph.
+        """
+        graph_id = self._get_graph_id(xml_graph_id)
+        if graph_id is None:
+            raise KeyError, xml_graph_id
+        self._delete_graph_rows(graph_id)
+        self.deleted_graphs += 1
+
+    def _store_new_labels(self, table, label_map, stored):
+        descriptions = self._label_descriptions[table]
+        self._cursor.executemany(
+            "INSERT INTO %s (id, label, description) VALUES (?, ?, ?)" % (table, ),
+            ((label_id, label, descriptions.get(label_id))
+             for label, label_id in label_map.iteritems() if label_id >= stored))
+
+    def _update_postings(self):
+        """Recomputes the posting lists of all feature values in changed graphs."""
+        for feature_name, value_ids in self._changed_postings.iteritems():
+            feature_id = self._feature_ids[feature_name]
+            for value_id in value_ids:
+                graph_ids = array.array("I")
+                for (graph_id, ) in self._db.execute(
+                    "SELECT node_id >> %i FROM feature_iidx_%s WHERE value_id = ? ORDER BY node_id" % (
+                        IndexNodeId.NODE_BIT_WIDTH, feature_name), (value_id, )):
+                    if not graph_ids or graph_ids[-1] != graph_id:
+                        graph_ids.append(graph_id)
+                if graph_ids:
+                    self._cursor.execute(
+                        "INSERT OR REPLACE INTO feature_postings (feature_id, value_id, graph_count, graphs) VALUES (?, ?, ?, ?)",
+                        (feature_id, value_id, len(graph_ids), encode_posting_list(graph_ids)))
+                else:
+                    self._cursor.execute(
+                        "DELETE FROM feature_postings WHERE feature_id = ? AND value_id = ?",
+                        (feature_id, value_id))
+        self._changed_postings.clear()
+
+    def finalize(self):
+        """Writes all changes to the index and commits them."""
+        self._flush_batch()
+        for feature_id, value_map in self._open_list_features:
+            stored = self._stored_open_values[feature_id]
+            self._cursor.executemany(
+                "INSERT INTO feature_values (feature_id, value_id, value, description) VALUES (?, ?, ?, ?)",
+                ((feature_id, value_id, value, self._value_descriptions.get((feature_id, value_id)))
+                 for value, value_id in value_map.iteritems() if value_id >= stored))
+        self._store_new_labels("edge_labels", self._edge_label_map, self._stored_edge_labels)
+        self._store_new_labels("secedge_labels", self._secedge_label_map,
+                               self._stored_secedge_labels)
+        self._update_postings()
+
+        # invalidates the graph store and all query plans compiled for the old index
+        self._cursor.execute("UPDATE index_metadata SET value = ? WHERE key = 'index_id'",
+                             (uuid.uuid4().hex, ))
+        self._db.commit()
+
+        for name, value in self._saved_pragmas:
+            self._db.execute("PRAGMA %s = %s" % (name, value))
+
+        self._db = None
+        self._cursor = None
+
+
+def _get_feature_values(db, feature_id):
+    rows = db.execute(
+        "SELECT value, description FROM feature_values WHERE feature_id = ? ORDER BY value_id",
+        (feature_id, )).fetchall()
+    return OrderedDict(rows)
+
+
+def _get_labels(db, table):
+    return OrderedDict(db.execute("SELECT label, description FROM %s ORDER BY id" % (table, )))
+
+
+def copy_index(db, indexer):
+    """Sends the header and all graphs of the index in `db` to `indexer`.
+
+    The graphs are sent in the order of their ordinals, the ids of feature values and
+    labels are kept.
+    """
+    indexer.set_metadata(dict(db.execute("SELECT key, value FROM corpus_metadata")))
+
+    feature_rmaps = {NodeType.TERMINAL: [], NodeType.NONTERMINAL: []}
+    for feature_id, name, domain in db.execute(
+        "SELECT id, name, domain FROM features ORDER BY order_id").fetchall():
+        domain = NodeType.fromkey(domain)
+        values = _get_feature_values(db, feature_id)
+        indexer.add_feature(name, domain, values)
+        feature_rmaps[domain].append((name, list(values)))
+
+    edge_labels = _get_labels(db, "edge_labels")
+    secedge_labels = _get_labels(db, "secedge_labels")
+    indexer.set_edge_labels(edge_labels)
+    indexer.set_secedge_labels(secedge_labels)
+
+    deserializer = GraphDeserializer(list(edge_labels), list(secedge_labels),
+                                     feature_rmaps[NodeType.TERMINAL],
+                                     feature_rmaps[NodeType.NONTERMINAL])
+
+    cursor = db.cursor()
+    for graph_id, xml_graph_id, data in db.execute(
+        "SELECT id, xml_graph_id, data FROM graphs ORDER BY id"):
+        xml_ids = dict(cursor.execute(
+            "SELECT id, xml_node_id FROM node_data WHERE id BETWEEN ? AND ?",
+            _get_graph_node_range(graph_id)))
+        indexer.add_graph(_restore_xml_ids(
+            deserializer.deserialize_graph(graph_id, data), xml_graph_id, xml_ids))
+
+
+def _restore_xml_ids(index_graph, xml_graph_id, xml_ids):
+    """Returns a copy of `index_graph` that uses the XML ids, like a freshly parsed graph."""
+    def _convert_edgelist(l):
+        return [(label, xml_ids[target_id.to_int()]) for label, target_id in l]
+
+    graph = TigerGraph(xml_graph_id)
+    graph.root_id = xml_ids[index_graph.root_id.to_int()]
+    for node_id, index_node in sorted(index_graph.nodes.iteritems()):
+        node = index_node.__class__(xml_ids[node_id.to_int()])
+        node.features = index_node.features
+        if index_node.secedges:
+            node.secedges = _convert_edgelist(index_node.secedges)
+        if node.TYPE is NodeType.NONTERMINAL:
+            node.edges = _convert_edgelist(index_node.edges)
+        else:
+            node.order = index_node.order
+        graph.nodes[node.id] = node
+    return graph
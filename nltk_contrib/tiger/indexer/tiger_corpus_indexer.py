@@ -4,14 +4,19 @@
 # Licensed under the GNU GPLv2
 
 from collections import defaultdict
-from itertools import count
+from itertools import count, chain, groupby
+from operator import itemgetter
+import array
+import cPickle
 import logging
+import uuid
 
 def get_version_string():
     import nltk
     return "nltk %s" % (nltk.__version__, )
 
-from nltk_contrib.tiger.index import IndexNodeId, CONTINUOUS, DISCONTINUOUS, gorn2db
+from nltk_contrib.tiger.index import IndexNodeId, CONTINUOUS, DISCONTINUOUS, gorn2db, \
+     encode_posting_list
 from nltk_contrib.tiger.graph import NodeType, veeroot_graph, DEFAULT_VROOT_EDGE_LABEL
 
 __all__ = ("TigerCorpusIndexer",)
@@ -21,7 +26,12 @@ __all__ = ("TigerCorpusIndexer",)
 
 # TODO: create proper progress reporter interface, hand in
 
-INDEX_VERSION = 3
+DEFAULT_BATCH_SIZE = 1000
+
+# PRAGMA settings while graphs are loaded, reset in finalize
+LOAD_PRAGMAS = (("synchronous", 0), ("cache_size", 100000), ("temp_store", 2))
+
+INDEX_VERSION = 5
 
 class _Tables(object):
     FEATURES = """CREATE TABLE features
@@ -57,27 +67,63 @@ class _Tables(object):
     SECEDGES = """CREATE TABLE secedges
     (origin_id INT, target_id INT, label_id INT)"""
 
+    FEATURE_POSTINGS = """CREATE TABLE feature_postings
+    (feature_id INTEGER NOT NULL, value_id INTEGER NOT NULL, graph_count INTEGER, graphs BLOB,
+    PRIMARY KEY (feature_id, value_id))"""
+
+    CONSTRAINT_SELECTIVITIES = """CREATE TABLE constraint_selectivities
+    (name TEXT PRIMARY KEY, selectivity REAL)"""
+
+
+class _Inserts(object):
+    NONTERMINALS = """INSERT INTO node_data 
+    (id, xml_node_id, edge_label, gorn_address, continuity, arity, tokenarity, left_corner, right_corner, token_order) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    
+    TERMINALS = "INSERT INTO node_data (id, xml_node_id, edge_label, gorn_address, token_order, continuity) VALUES (?, ?, ?, ?, ?, 0)"
+    
+    SECEDGES = "INSERT INTO secedges (origin_id, target_id, label_id) VALUES (?, ?, ?)"
+    
+    GRAPHS = "INSERT INTO graphs (id, xml_graph_id, data) VALUES (?, ?, ?)"
+
     
 class TigerCorpusIndexer(object):
-    def __init__(self, db, graph_serializer, progress = False, always_veeroot = True):
+    """Creates the index for a TIGER-XML corpus.
+    
+    Graphs are written to the database in batches of `batch_size` graphs. If `checkpoints`
+    is `True`, each batch is committed together with the state of the indexer. If 
+    indexing is interrupted, a new indexer created with `resume = True` on the same database 
+    continues after the last committed graph. The parser must skip the first 
+    `parsed_graphs` graphs of the corpus in this case.
+    
+    *Parameters*:
+     * `db`: the database connection for the index
+     * `graph_serializer`: the serializer for the graph data
+     * `progress`: if `True`, progress information is printed
+     * `always_veeroot`: if `True`, all graphs get a virtual root node
+     * `graph_store`: an optional `GraphStoreWriter`
+     * `batch_size`: the number of graphs written in a single batch
+     * `checkpoints`: commit after each batch and store the checkpoint state
+     * `resume`: continue an interrupted index with checkpoints in `db`
+    """
+    LOAD_PRAGMAS = LOAD_PRAGMAS
+    
+    def __init__(self, db, graph_serializer, progress = False, always_veeroot = True, 
+                 graph_store = None, batch_size = DEFAULT_BATCH_SIZE, checkpoints = False,
+                 resume = False):
         self._db = db
         self._cursor = db.cursor()
         self._progress = progress
         self._always_veeroot = always_veeroot
+        self._batch_size = batch_size
+        self._checkpoints = checkpoints or resume
+        self._resume = resume
         
         self._graphs = 0
-        
-        self._cursor.execute(_Tables.FEATURES)
-        self._cursor.execute(_Tables.FEATURE_VALUES)
-        self._cursor.execute(_Tables.EDGE_LABELS)
-        self._cursor.execute(_Tables.SECEDGE_LABELS)
-        self._cursor.execute(_Tables.GRAPHS)
-        self._cursor.execute(_Tables.METADATA)
-        self._cursor.execute(_Tables.INDEX_METADATA)
-        self._cursor.execute(_Tables.NODE_DATA)
-        self._cursor.execute(_Tables.SECEDGES)
+        self.parsed_graphs = 0
         
         self._serializer = graph_serializer
+        self._graph_store = graph_store
         self._open_list_features = []
         self._feature_count = {
             NodeType.TERMINAL: 0,
@@ -85,25 +131,121 @@ class TigerCorpusIndexer(object):
         
         self._feature_iidx_stmts = {}
         self._feature_value_maps = {}
+        self._feature_ids = {}
+        self._stored_open_values = {}
 
         self._insert_lists = defaultdict(list)
-        self._store_creator_metadata()
+        self._pair_counts = defaultdict(int)
+        
+        self._saved_pragmas = [(name, db.execute("PRAGMA %s" % (name, )).fetchone()[0])
+                               for name, value in self.LOAD_PRAGMAS]
+        for name, value in self.LOAD_PRAGMAS:
+            if name == "synchronous" and self._checkpoints:
+                # committed checkpoints should survive an OS crash
+                value = 1
+            db.execute("PRAGMA %s = %s" % (name, value))
+        
+        self._setup_tables()
+        
+    def _setup_tables(self):
+        if self._resume:
+            self._restore_checkpoint()
+        else:
+            for table in (_Tables.FEATURES, _Tables.FEATURE_VALUES, _Tables.EDGE_LABELS,
+                          _Tables.SECEDGE_LABELS, _Tables.GRAPHS, _Tables.METADATA,
+                          _Tables.INDEX_METADATA, _Tables.NODE_DATA, _Tables.SECEDGES,
+                          _Tables.FEATURE_POSTINGS, _Tables.CONSTRAINT_SELECTIVITIES):
+                self._cursor.execute(table)
+            self._store_creator_metadata()
         
     def _store_creator_metadata(self):
-        self._add_index_metadata(creator=get_version_string(), index_version=INDEX_VERSION)
+        index_id = uuid.uuid4().hex
+        self._add_index_metadata(creator=get_version_string(), index_version=INDEX_VERSION,
+                                 index_id=index_id)
+        if self._graph_store is not None:
+            self._graph_store.set_index_id(index_id)
+    
+    def _restore_checkpoint(self):
+        """Restores the indexer state from the last checkpoint in the database."""
+        index_meta = dict(self._cursor.execute("SELECT key, value FROM index_metadata"))
+        if "checkpoint" not in index_meta:
+            raise RuntimeError, "the index has no checkpoint to resume from"
+        
+        state = cPickle.loads(str(index_meta["checkpoint"]))
+        self._graphs = state["graphs"]
+        self.parsed_graphs = state["parsed_graphs"]
+        self._pair_counts.update(state["pair_counts"])
+        self._stored_open_values = state["stored_open_values"]
+        if self._graph_store is not None:
+            self._graph_store.set_index_id(str(index_meta["index_id"]))
+            self._graph_store.restore(state["graph_store"])
+    
+    def _store_checkpoint(self):
+        """Stores the indexer state in the current transaction and commits it."""
+        for feature_id, value_map in self._open_list_features:
+            stored = self._stored_open_values.get(feature_id, 0)
+            self._cursor.executemany(
+                "INSERT INTO feature_values (feature_id, value_id, value) VALUES (?, ?, ?)",
+                ((feature_id, value_id, value) 
+                 for value, value_id in value_map.iteritems() if value_id >= stored))
+            self._stored_open_values[feature_id] = len(value_map)
+        
+        state = {
+            "graphs": self._graphs,
+            "parsed_graphs": self.parsed_graphs,
+            "pair_counts": dict(self._pair_counts),
+            "stored_open_values": self._stored_open_values,
+            "graph_store": self._graph_store.get_state() if self._graph_store is not None else None
+        }
+        self._cursor.execute("INSERT OR REPLACE INTO index_metadata (key, value) VALUES (?, ?)",
+                             ("checkpoint", buffer(cPickle.dumps(state, 2))))
+        self._db.commit()
     
     def _add_index_metadata(self, **kwargs):
         self._cursor.executemany("INSERT INTO index_metadata (key, value) VALUES (?, ?)", 
                                  kwargs.iteritems())
         
     def set_metadata(self, metadata):
+        if self._resume:
+            return
         self._cursor.executemany("INSERT INTO corpus_metadata (key, value) VALUES (?, ?)", 
                                  metadata.iteritems())
                              
     
+    def _load_feature(self, feature_name, domain, feature_values):
+        """Returns the id and the value map of a feature from an index that is resumed."""
+        feature_id = self._cursor.execute(
+            "SELECT id FROM features WHERE name = ? AND domain = ?", 
+            (feature_name, domain.key)).fetchone()[0]
+        values = self._cursor.execute(
+            "SELECT value, value_id FROM feature_values WHERE feature_id = ?", 
+            (feature_id, )).fetchall()
+        if len(feature_values) > 0:
+            value_map = dict(values)
+        else:
+            value_map = defaultdict(count(len(values)).next, values)
+            self._open_list_features.append((feature_id, value_map))
+        return feature_id, value_map
+        
     def add_feature(self, feature_name, domain, feature_values):
         order_id = self._feature_count[domain]
         self._feature_count[domain] += 1
+        
+        if self._resume:
+            feature_id, value_map = self._load_feature(feature_name, domain, feature_values)
+        else:
+            feature_id, value_map = self._create_feature(feature_name, domain, order_id, 
+                                                         feature_values)
+        
+        self._feature_value_maps[feature_name] = (value_map, domain)
+        self._feature_ids[feature_name] = feature_id
+        self._serializer.add_feature_value_map(feature_name, domain, order_id, value_map)
+        if self._graph_store is not None:
+            self._graph_store.add_feature_value_map(feature_name, value_map)
+        self._create_feature_value_index(feature_name)
+        return feature_id
+    
+    def _create_feature(self, feature_name, domain, order_id, feature_values):
         self._cursor.execute("INSERT INTO features (order_id, name, domain) VALUES (?, ?, ?)", 
                              (order_id, feature_name, domain.key))
         feature_id = self._cursor.lastrowid
@@ -117,25 +259,23 @@ class TigerCorpusIndexer(object):
         else:
             value_map = defaultdict(count().next)
             self._open_list_features.append((feature_id, value_map))
-        
-        self._feature_value_maps[feature_name] = (value_map, domain)
-        self._serializer.add_feature_value_map(feature_name, domain, order_id, value_map)
-        self._create_feature_value_index(feature_name)
-        return feature_id
+        return feature_id, value_map
 
     
     def set_edge_labels(self, edge_labels):
         if self._always_veeroot:
             assert DEFAULT_VROOT_EDGE_LABEL in edge_labels, "no neutral edge label"
-            
-        self._cursor.executemany("INSERT INTO edge_labels (id, label, description) VALUES (?, ?, ?)", 
-                                 ((idx, e[0], e[1]) for idx, e in enumerate(edge_labels.iteritems())))
+        
+        if not self._resume:
+            self._cursor.executemany("INSERT INTO edge_labels (id, label, description) VALUES (?, ?, ?)", 
+                                     ((idx, e[0], e[1]) for idx, e in enumerate(edge_labels.iteritems())))
         self._edge_label_map = dict(self._cursor.execute("SELECT label, id FROM edge_labels"))
         self._serializer.set_edge_label_map(self._edge_label_map)
     
     def set_secedge_labels(self, secedge_labels):
-        self._cursor.executemany("INSERT INTO secedge_labels (id, label, description) VALUES (?, ?, ?)", 
-                                 ((idx, e[0], e[1]) for idx, e in enumerate(secedge_labels.iteritems())))
+        if not self._resume:
+            self._cursor.executemany("INSERT INTO secedge_labels (id, label, description) VALUES (?, ?, ?)", 
+                                     ((idx, e[0], e[1]) for idx, e in enumerate(secedge_labels.iteritems())))
         self._secedge_label_map = dict(self._cursor.execute("SELECT label, id FROM secedge_labels"))
         self._serializer.set_secedge_label_map(self._secedge_label_map)
     
@@ -143,7 +283,8 @@ class TigerCorpusIndexer(object):
         feature_name = str(feature_name)
         assert feature_name.isalpha()
         
-        self._cursor.execute(_Tables.FEATURE_IIDX_TEMPLATE % (feature_name,))
+        if not self._resume:
+            self._cursor.execute(_Tables.FEATURE_IIDX_TEMPLATE % (feature_name,))
         
         
         self._feature_iidx_stmts[feature_name] = "INSERT INTO feature_iidx_%s (node_id, value_id) VALUES (?, ?)" % (feature_name,)
@@ -160,16 +301,52 @@ class TigerCorpusIndexer(object):
                 node_ids[node.left_corner].to_int(), node_ids[node.right_corner].to_int(), 
                 node.children_type)
 
+    def _count_node_pairs(self, nonterminals, terminals):
+        """Counts the node pairs in a graph that are in a given relation.
+        
+        The counts are used to estimate the selectivity of the query constraints."""
+        node_count = len(nonterminals) + len(terminals)
+        token_count = len(terminals)
+        
+        self._pair_counts["nodes"] += node_count * node_count
+        self._pair_counts["tokens"] += token_count * token_count
+        self._pair_counts["dominance"] += sum(len(n.gorn_address) 
+                                              for n in chain(nonterminals, terminals))
+        self._pair_counts["dominance_immediate"] += node_count - 1
+        self._pair_counts["sibling"] += sum(nt.arity * (nt.arity - 1) for nt in nonterminals)
+        self._pair_counts["precedence"] += token_count * (token_count - 1) // 2
+        self._pair_counts["precedence_immediate"] += max(token_count - 1, 0)
+        self._pair_counts["corner"] += len(nonterminals)
+        
+    def _store_constraint_selectivities(self):
+        """Stores the fraction of node pairs for which a constraint holds.
+        
+        Precedence is estimated on terminals, all other constraints on all nodes.
+        """
+        node_pairs = max(self._pair_counts["nodes"], 1)
+        token_pairs = max(self._pair_counts["tokens"], 1)
+        selectivities = [
+            (name, self._pair_counts[name] / float(node_pairs))
+            for name in ("dominance", "dominance_immediate", "sibling", "corner", "secedge")]
+        selectivities.extend(
+            (name, self._pair_counts[name] / float(token_pairs))
+            for name in ("precedence", "precedence_immediate"))
+        self._cursor.executemany(
+            "INSERT INTO constraint_selectivities (name, selectivity) VALUES (?, ?)", 
+            selectivities)
+            
     def _store_node_data(self, graph, node_ids):
         nonterminals, terminals = graph.compute_node_information()
+        self._count_node_pairs(nonterminals, terminals)
         
-        self._cursor.executemany("""INSERT INTO node_data 
-        (id, xml_node_id, edge_label, gorn_address, continuity, arity, tokenarity, left_corner, right_corner, token_order) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                             (self.get_nonterminal_index_data(nt, node_ids) for nt in nonterminals))
+        nt_rows = [self.get_nonterminal_index_data(nt, node_ids) for nt in nonterminals]
+        t_rows = [self.get_terminal_index_data(t, node_ids) for t in terminals]
         
-        self._cursor.executemany("INSERT INTO node_data (id, xml_node_id, edge_label, gorn_address, token_order, continuity) VALUES (?, ?, ?, ?, ?, 0)",
-                                 (self.get_terminal_index_data(t, node_ids) for t in terminals))
+        self._insert_lists[_Inserts.NONTERMINALS].extend(nt_rows)
+        self._insert_lists[_Inserts.TERMINALS].extend(t_rows)
+        
+        if self._graph_store is not None:
+            self._graph_store.add_graph(graph, node_ids, nt_rows, t_rows)
         
     
     def _index_feature_values(self, graph, node_ids):
@@ -177,31 +354,38 @@ class TigerCorpusIndexer(object):
             for feature_name, feature_value in node.features.iteritems():
                 value_map, domain = self._feature_value_maps[feature_name]
                 assert node.TYPE is domain
-                self._insert_lists[feature_name].append((node_ids[node.id].to_int(), value_map[feature_value]))
-        
-        if self._graphs % 1000 == 0:
-            self._flush_node_feature_values()
+                value_id = value_map[feature_value]
+                self._insert_lists[self._feature_iidx_stmts[feature_name]].append(
+                    (node_ids[node.id].to_int(), value_id))
             
     def _index_secedges(self, graph, node_ids):
         for node in graph:
             if node.secedges is not None:
-                self._cursor.executemany(
-                    "INSERT INTO secedges (origin_id, target_id, label_id) VALUES (?, ?, ?)",
-                    ((node_ids[node.id].to_int(), node_ids[graph.nodes[target_node].id].to_int(), 
-                      self._secedge_label_map[label])
-                     for label, target_node in node.secedges))
+                self._pair_counts["secedge"] += len(node.secedges)
+                self._insert_lists[_Inserts.SECEDGES].extend(
+                    (node_ids[node.id].to_int(), node_ids[graph.nodes[target_node].id].to_int(), 
+                     self._secedge_label_map[label])
+                    for label, target_node in node.secedges)
                 
-    def _flush_node_feature_values(self):
-        for feature_name, values in self._insert_lists.iteritems():
-            self._cursor.executemany(self._feature_iidx_stmts[feature_name], values)
+    def _flush_batch(self):
+        """Writes all pending rows to the database.
+        
+        If checkpoints are enabled, the batch is committed together with the indexer state.
+        """
+        for stmt, rows in self._insert_lists.iteritems():
+            self._cursor.executemany(stmt, rows)
         self._insert_lists = defaultdict(list)
+        if self._graph_store is not None:
+            self._graph_store.flush()
+        if self._checkpoints:
+            self._store_checkpoint()
 
-    def _convert_ids(self, graph, node_ids): # split out into separate method
+    def _convert_ids(self, graph, node_ids, graph_id): # split out into separate method
         def _convert_edgelist(l):
             return [(label, node_ids[target_xml_id]) 
                     for label, target_xml_id in l]
       
-        graph.id = self._graphs
+        graph.id = graph_id
         graph.root_id = node_ids[graph.root_id]
         for xml_node_id in graph.nodes.keys():
             node = graph.nodes.pop(xml_node_id)
@@ -212,20 +396,24 @@ class TigerCorpusIndexer(object):
             if node.TYPE is NodeType.NONTERMINAL:
                 node.edges = _convert_edgelist(node.edges)
 
-    def add_graph(self, graph):
+    def _index_graph(self, graph, graph_id):
+        """Adds all data of `graph` to the pending rows, using the index graph id `graph_id`.
+        
+        Returns `False` if the graph is faulty and has not been added, `True` otherwise.
+        """
         try:
             roots = graph.get_roots()
         except KeyError, e:
             logging.error("Graph %s is faulty: node %s referenced more than once.",
                           graph.id, e.args[0])
-            return
+            return False
 
         if self._always_veeroot:
             veeroot_graph(graph, roots)
         else:
             assert len(roots) == 1, "No auto-veerooting, but several unconnected subgraphs %s in %s." % (roots, graph.id)
                 
-        node_ids = dict((xml_node_id, IndexNodeId(self._graphs, idx))
+        node_ids = dict((xml_node_id, IndexNodeId(graph_id, idx))
                         for idx, xml_node_id in enumerate(graph.nodes))
         
         xml_id = graph.id
@@ -233,25 +421,60 @@ class TigerCorpusIndexer(object):
         self._index_feature_values(graph, node_ids)
         self._index_secedges(graph, node_ids)
         
-        self._convert_ids(graph, node_ids)
+        self._convert_ids(graph, node_ids, graph_id)
+        
+        self._insert_lists[_Inserts.GRAPHS].append(
+            (graph_id, xml_id, buffer(self._serializer.serialize_graph(graph))))
+        return True
+        
+    def add_graph(self, graph):
+        self.parsed_graphs += 1
+        if not self._index_graph(graph, self._graphs):
+            return
         
-        self._cursor.execute("INSERT INTO graphs (id, xml_graph_id, data) VALUES (?, ?, ?)",
-                             (self._graphs, xml_id, buffer(self._serializer.serialize_graph(graph))))
         self._graphs += 1
         if self._progress and self._graphs % 100 == 0:
             print self._graphs
+        if self._graphs % self._batch_size == 0:
+            self._flush_batch()
     
+    def _get_postings(self, feature_name):
+        """Yields `(value_id, graph_ids)` for all values of a feature.
+        
+        The posting lists are read from the inverted index of the feature, which must
+        be indexed on the value id.
+        """
+        rows = self._db.execute(
+            "SELECT value_id, node_id >> %i FROM feature_iidx_%s ORDER BY value_id, node_id" % (
+                IndexNodeId.NODE_BIT_WIDTH, feature_name))
+        for value_id, value_rows in groupby(rows, itemgetter(0)):
+            graph_ids = array.array("I")
+            for __, graph_id in value_rows:
+                if not graph_ids or graph_ids[-1] != graph_id:
+                    graph_ids.append(graph_id)
+            yield value_id, graph_ids
+    
+    def _store_postings(self):
+        """Stores the ids of all graphs that contain a given feature value."""
+        for feature_name, feature_id in self._feature_ids.iteritems():
+            self._cursor.executemany(
+                "INSERT INTO feature_postings (feature_id, value_id, graph_count, graphs) VALUES (?, ?, ?, ?)",
+                ((feature_id, value_id, len(graph_ids), encode_posting_list(graph_ids))
+                 for value_id, graph_ids in self._get_postings(feature_name)))
+        
     def finalize(self, optimize = True):
         if self._progress:
             print "finalize"
-        self._flush_node_feature_values()
+        self._flush_batch()
         
         if self._progress:
             print "inserting feature values"
         for feature_id, feature_value_map in self._open_list_features:
+            stored = self._stored_open_values.get(feature_id, 0)
             self._cursor.executemany("INSERT INTO feature_values (feature_id, value_id, value) VALUES (?, ?, ?)",
                                      ((feature_id, value_id, value) 
-                                      for value, value_id in feature_value_map.iteritems()))
+                                      for value, value_id in feature_value_map.iteritems()
+                                      if value_id >= stored))
         del self._open_list_features
 
         if self._progress:
@@ -278,6 +501,16 @@ class TigerCorpusIndexer(object):
         self._cursor.execute("CREATE INDEX se_origin_idx ON secedges (origin_id)")
         self._cursor.execute("CREATE INDEX se_target_idx ON secedges (target_id)")
 
+        if self._progress:
+            print "storing feature value posting lists"
+        self._store_postings()
+        self._store_constraint_selectivities()
+        
+        if self._graph_store is not None:
+            if self._progress:
+                print "writing graph store"
+            self._graph_store.close()
+
         self._db.commit()
         
         if optimize:
@@ -285,8 +518,12 @@ class TigerCorpusIndexer(object):
                 print "Optimizing database"
             self._db.execute("VACUUM")
         
+        self._cursor.execute("DELETE FROM index_metadata WHERE key = 'checkpoint'")
         self._add_index_metadata(finished = True)
         self._db.commit()
         
+        for name, value in self._saved_pragmas:
+            self._db.execute("PRAGMA %s = %s" % (name, value))
+        
         self._db = None
         self._cursor = None
@@ -15,10 +15,12 @@
  * `factory`: factory classes for result builders
  * `nodesearcher`: class for loading nodes from the index based on TIGERSearch node descriptions
  * `node_variable`: classes for handling typed node variables in queries
+ * `plancache`: a cache for compiled queries
  * `predicates`: implementations of all node and node set predicates
  * `querybuilder`: a class for simple programmatic creation of TIGERSearch queries.
  * `result`: classes for building result sets for queries and constraint checkers
  * `tsqlparser`: a PyParsing parser for the TIGERSearch query language
+ * `workerpool`: a pool of worker processes for parallel query evaluation
 """
 from nltk_contrib.tiger.query.exceptions import *
 from nltk_contrib.tiger.query.evaluator import TsqlQueryEvaluator
@@ -17,6 +17,7 @@ from nltk_contrib.tiger.utils.enum import Enum, enum_member
 from nltk_contrib.tiger.utils.factory import FactoryBase
 
 DEFAULT_TYPES = (NodeType.UNKNOWN, NodeType.UNKNOWN)
+DEFAULT_SELECTIVITY = 0.1
 
 # WARNING: This module is still subject to heavy change!
 # FIXME: while the code is correct (well, the tests run through), it's 
@@ -48,7 +49,10 @@ class Direction(Enum):
 
 class Constraint(object):
     __converters__ = {}
-
+    
+    # the name of the selectivity estimate in the index, see get_selectivity
+    SELECTIVITY_KEY = None
+    selectivity = DEFAULT_SELECTIVITY
     
     @classmethod
     def setup_context(cls, context):
@@ -61,7 +65,9 @@ class Constraint(object):
             conv = cls.__converters__.get(modifier_name, lambda *x: x[0])
             kwargs[modifier_name] = conv(op_node.modifiers[modifier_name], cls, ctx)
             kwargs["types"] = var_types
-        return cls(**kwargs)
+        constraint = cls(**kwargs)
+        constraint.selectivity = constraint.get_selectivity(ctx.constraint_selectivities)
+        return constraint
     
     def __init__(self, types, *args):
         self._types = types
@@ -83,6 +89,26 @@ class Constraint(object):
     def __repr__(self):
         return "%s(%s)" % (self.__class__.__name__, ", ".join(str(x) for x in self._modifiers))
 
+    def __reduce__(self):
+        # the check methods are bound at construction time, so constraints 
+        # are pickled by their constructor arguments
+        return (self.__class__, (self._types, ) + self._modifiers, 
+                {"selectivity": self.selectivity})
+    
+    def get_selectivity(self, selectivities):
+        """Returns the estimated fraction of node pairs for which the constraint holds.
+        
+        `selectivities` is the dictionary of estimates computed by the indexer.
+        """
+        selectivity = selectivities.get(self.get_selectivity_key(), DEFAULT_SELECTIVITY)
+        if self._modifiers[-1]:
+            return 1.0 - selectivity
+        else:
+            return selectivity
+    
+    def get_selectivity_key(self):
+        return self.SELECTIVITY_KEY
+
     def get_predicates(self, left, right):
         return [], []
     
@@ -136,9 +162,13 @@ class PrecedenceConstraint(Constraint):
     def get_singlematch_direction(self):
         return self._direction
     
+    def get_selectivity_key(self):
+        return "precedence_immediate" if self._modifiers[0] == (1, 1) else "precedence"
+    
 
 class SiblingConstraint(Constraint):
     __attributes__ = ("ordered", "negated")
+    SELECTIVITY_KEY = "sibling"
 
     def __init__(self, types = DEFAULT_TYPES, ordered = False, negated = False):
         assert not (negated and ordered)
@@ -187,33 +217,39 @@ def _get_label_id(label, dct, domain):
     with convert_exception(KeyError, UndefinedNameError, lambda exc: (domain, exc.args[0])):
         return dct[label]
 
-class DominanceConstraint(Constraint):
-    class ChildrenTypePredicate(object):
-        def get_query_fragment(self):
-            return "node_data.token_order > 1"
-    
-        def __eq__(self, other):
-            return self.__class__ is other.__class__
+# The predicate classes are defined on module level so that they can be pickled.
+class ChildrenTypePredicate(object):
+    def get_query_fragment(self):
+        return "node_data.token_order > 1"
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__
 
-        def __ne__(self, other):
-            return not self.__eq__(other)
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    FOR_NODE = True
+
+
+class EdgeLabelPredicate(object):
+    def __init__(self, label_id):
+        self._label_id = label_id
     
-        FOR_NODE = True
+    def get_query_fragment(self):
+        return "edge_label = %i" % (self._label_id)
     
-    class EdgeLabelPredicate(object):
-        def __init__(self, label_id):
-            self._label_id = label_id
-        
-        def get_query_fragment(self):
-            return "edge_label = %i" % (self._label_id)
-        
-        def __eq__(self, other):
-            return self.__class__ == other.__class__ and self._label_id == other._label_id
-        
-        def __ne__(self, other):
-            return not self.__eq__(other)
-        
-        FOR_NODE = True
+    def __eq__(self, other):
+        return self.__class__ == other.__class__ and self._label_id == other._label_id
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    FOR_NODE = True
+
+
+class DominanceConstraint(Constraint):
+    ChildrenTypePredicate = ChildrenTypePredicate
+    EdgeLabelPredicate = EdgeLabelPredicate
 
     __attributes__ = ("label", "range", "negated")
     __converters__ = {
@@ -279,6 +315,9 @@ class DominanceConstraint(Constraint):
         return (r - l == 1 and buffer(right_op[GORN_ADDRESS][:l]) == left_op[GORN_ADDRESS] \
                 and right_op[EDGE_LABEL] == self._lbl) is self._negated
 
+    def get_selectivity_key(self):
+        return "dominance_immediate" if self._modifiers[1] == (1, 1) else "dominance"
+
     def get_predicates(self, left, right):
         l = []
         if right.var_type is NodeType.NONTERMINAL:
@@ -292,28 +331,32 @@ class DominanceConstraint(Constraint):
         return self._direction
 
 
-class SecEdgeConstraint(Constraint):
-    class SecEdgePredicate(object):
-        # secedges.label_id is not indexed, therefore it is cheaper to load 
-        # all secedges and then check for the correct labels later
-        ORIGIN = 0
-        TARGET = 1
-        _ID_NAMES = ["origin_id", "target_id"]
-        
-        def __init__(self, node):
-            self._node = node
-            
-        def get_query_fragment(self):
-            return "(SELECT COUNT(*) FROM secedges WHERE secedges.%s = node_data.id) > 0" % (
-                self._ID_NAMES[self._node], )
-        
-        def __eq__(self, other):
-            return self.__class__ == other.__class__ and self._node == other._node
-        
-        def __ne__(self, other):
-            return not self.__eq__(other)
+class SecEdgePredicate(object):
+    # secedges.label_id is not indexed, therefore it is cheaper to load 
+    # all secedges and then check for the correct labels later
+    ORIGIN = 0
+    TARGET = 1
+    _ID_NAMES = ["origin_id", "target_id"]
+    
+    def __init__(self, node):
+        self._node = node
         
-        FOR_NODE = True
+    def get_query_fragment(self):
+        return "(SELECT COUNT(*) FROM secedges WHERE secedges.%s = node_data.id) > 0" % (
+            self._ID_NAMES[self._node], )
+    
+    def __eq__(self, other):
+        return self.__class__ == other.__class__ and self._node == other._node
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    FOR_NODE = True
+
+
+class SecEdgeConstraint(Constraint):
+    SecEdgePredicate = SecEdgePredicate
+    SELECTIVITY_KEY = "secedge"
         
     __attributes__ = ("label", "negated")
     __converters__ = {
@@ -352,6 +395,7 @@ class SecEdgeConstraint(Constraint):
 class CornerConstraint(Constraint):
     _IDX = {"l": LEFT_CORNER,
             "r": RIGHT_CORNER}
+    SELECTIVITY_KEY = "corner"
 
     __attributes__ = ("corner", "negated")
     __converters__ = {
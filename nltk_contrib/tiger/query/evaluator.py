@@ -6,9 +6,11 @@
 """
 from nltk_contrib.tiger.query.factory import QueryFactory
 from nltk_contrib.tiger.query.nodesearcher import NodeSearcher
+from nltk_contrib.tiger.query.plancache import QueryPlanCache
 from nltk_contrib.tiger.query.querybuilder import QueryBuilder
-from nltk_contrib.tiger.query.result import ResultBuilder, ParallelResultBuilder
+from nltk_contrib.tiger.query.result import ResultBuilder, ParallelResultBuilder, QueryPlan
 from nltk_contrib.tiger.query.tsqlparser import TsqlParser
+from nltk_contrib.tiger.query.workerpool import QueryWorkerPool
 from nltk_contrib.tiger.utils.parallel import use_parallel_processing
 
 __all__ = ["TsqlQueryEvaluator"]
@@ -30,7 +32,12 @@ class TsqlQueryEvaluator(object):
             self.db = db
             self.db_provider = db_provider
             self._nodesearcher = None
+            self._worker_pool = None
+            self._constraint_selectivities = None
+            self._graph_store = None
+            self._graph_store_opened = False
             self.allow_parallel = True
+            self.use_worker_pool = True
             self.corpus_info = corpus_info
         
         def _use_parallel(self):
@@ -45,12 +52,49 @@ class TsqlQueryEvaluator(object):
             if self._nodesearcher is None:
                 self._nodesearcher = NodeSearcher(self.db)
             return self._nodesearcher
+        
+        @property
+        def constraint_selectivities(self):
+            """The selectivity estimates for constraints computed by the indexer."""
+            if self._constraint_selectivities is None:
+                self._constraint_selectivities = dict(
+                    self.db.execute("SELECT name, selectivity FROM constraint_selectivities"))
+            return self._constraint_selectivities
+        
+        @property
+        def graph_store(self):
+            """The memory-mapped graph store of the corpus, or `None` if there is none."""
+            if not self._graph_store_opened:
+                self._graph_store = self.db_provider.open_graph_store(self.db)
+                self._graph_store_opened = True
+            return self._graph_store
+        
+        @property
+        def worker_pool(self):
+            """The worker pool for parallel query evaluation.
+            
+            The pool is started on first access, and `None` if the use of the 
+            worker pool has been disabled.
+            """
+            if self._worker_pool is None and self.use_worker_pool:
+                self._worker_pool = QueryWorkerPool(self.db_provider)
+            return self._worker_pool
+        
+        def close(self):
+            """Shuts down the worker pool, if it has been started."""
+            if self._worker_pool is not None:
+                self._worker_pool.close()
+                self._worker_pool = None
+            if self._graph_store is not None:
+                self._graph_store.close()
+                self._graph_store = None
                 
         
-    def __init__(self, db, db_provider, corpus_info):
+    def __init__(self, db, db_provider, corpus_info, plan_cache = None):
         self._context = TsqlQueryEvaluator.Context(db, db_provider, corpus_info)
         self._parser = TsqlParser()
         self._query_factory = QueryFactory(self._context)
+        self.plan_cache = plan_cache if plan_cache is not None else QueryPlanCache()
 
     def new_builder(self):
         """Returns a new query builder.
@@ -63,12 +107,69 @@ class TsqlQueryEvaluator(object):
     def set_allow_parallel(self, value):
         """Allow or prohibit use of parallelized processing for the query evaluator."""
         self._context.allow_parallel = value
+    
+    def set_use_worker_pool(self, value):
+        """Use a persistent pool of worker processes for parallelized query evaluation.
+        
+        If disabled, new worker processes are started for each query. The pool is
+        enabled by default.
+        """
+        self._context.use_worker_pool = value
+        if not value:
+            self._context.close()
+    
+    def close(self):
+        """Shuts down the worker processes of the query evaluator."""
+        self._context.close()
         
     def prepare_query(self, query_str):
-        """Creates a query object from a TIGER query string."""
-        return self._query_factory.from_ast(
-            self._parser.parse_query(query_str))
+        """Creates a query object from a TIGER query string.
+        
+        The compiled query is stored in the plan cache, and only the result builder object
+        is created anew if the same query is prepared again.
+        """
+        compiled_query = self.plan_cache.get(query_str)
+        if compiled_query is None:
+            compiled_query = self._query_factory.compile(self._parser.parse_query(query_str))
+            self.plan_cache.put(query_str, compiled_query)
+        return self._query_factory.create_query(compiled_query)
+    
+    def save_plan_cache(self, path):
+        """Writes the compiled queries in the plan cache to the file `path`."""
+        self.plan_cache.save(path, self._context.corpus_info.index_id)
+    
+    def load_plan_cache(self, path):
+        """Loads compiled queries from the file `path` into the plan cache.
+        
+        Queries that have been compiled for a different index are not loaded. Returns
+        the number of loaded queries.
+        """
+        return self.plan_cache.load(path, self._context.corpus_info.index_id)
     
     def evaluate(self, query_str):
         """Immediately evaluates a TIGER query query."""
         return self.prepare_query(query_str).evaluate()
+    
+    def explain(self, query_str):
+        """Evaluates a TIGER query and returns its execution plan.
+        
+        The query is always evaluated in this process, so that the statistics for 
+        all graphs are available. The returned `QueryPlan` can be printed.
+        """
+        allow_parallel = self._context.allow_parallel
+        self._context.allow_parallel = False
+        try:
+            query = self.prepare_query(query_str)
+        finally:
+            self._context.allow_parallel = allow_parallel
+        query.evaluate()
+        return QueryPlan(query)
+    
+    def iter_evaluate(self, query_str, offset = 0, limit = None):
+        """Lazily evaluates a TIGER query.
+        
+        Returns an iterator over `(graph_number, results)` tuples, which skips the first
+        `offset` matching graphs and stops after `limit` graphs. Closing the iterator
+        before it is exhausted cancels the evaluation.
+        """
+        return self.prepare_query(query_str).iter_results(offset, limit)
@@ -233,10 +233,24 @@ class QueryFactory(ast_visitor.AstVisitor):
         The result builder class is injected using the `get_result_builder_class`
         on the evaluator context.
         """
+        return self.create_query(self.compile(query_ast))
+    
+    def compile(self, query_ast):
+        """Converts a query AST into the internal representation of the query.
+        
+        The internal representation is a tuple `(node_descriptions, predicates, constraints)`, 
+        which can be pickled.
+        """
         return self.run(query_ast)
     
+    def create_query(self, compiled_query):
+        """Returns a new result builder object for a compiled query."""
+        node_defs, predicates, constraints = compiled_query
+        return self._ev_context.get_result_builder_class(len(constraints) > 0)(
+            self._ev_context, node_defs, predicates, constraints)
+    
     def result(self, query_ast):
-        """Processes the collected items and returns the query object."""        
+        """Processes the collected items and returns the compiled query."""        
         predicates = defaultdict(list)
         
         for node_variable, node_desc in self.node_defs.iteritems():
@@ -252,5 +266,4 @@ class QueryFactory(ast_visitor.AstVisitor):
         constraints = self._process_constraints(predicates)
         self._add_type_predicates(predicates)
 
-        return self._ev_context.get_result_builder_class(len(constraints) > 0)(
-            self._ev_context, self.node_defs, predicates, constraints)
+        return self.node_defs, predicates, constraints
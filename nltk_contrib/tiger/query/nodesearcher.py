@@ -13,7 +13,7 @@ from itertools import count
 from functools import partial
 
 from nltk_contrib.tiger.graph import NodeType
-from nltk_contrib.tiger.index import IndexNodeId
+from nltk_contrib.tiger.index import IndexNodeId, decode_posting_list
 from nltk_contrib.tiger.query.node_variable import NodeVariable
 from nltk_contrib.tiger.query import ast
 from nltk_contrib.tiger.query.predicates import NodeTypePredicate
@@ -37,6 +37,10 @@ class NullGraphFilter(object):
         In this implementation, there are no filters.
         """
         return []
+    
+    def get_graph_range(self, corpus_size):
+        """Returns the range ``[first, last[`` of graph IDs selected by the filter."""
+        return 0, corpus_size
 
 
 class EqualPartitionsGraphFilter(object):
@@ -50,6 +54,15 @@ class EqualPartitionsGraphFilter(object):
         self._this_part = this_part
         self._part_count = part_count
 
+    def get_graph_range(self, corpus_size):
+        """Returns the range ``[first, last[`` of graph IDs selected by the filter."""
+        part_size = corpus_size // self._part_count
+        first = self._this_part * part_size
+        if self._this_part + 1 < self._part_count:
+            return first, first + part_size
+        else:
+            return first, corpus_size
+
     def get_initial_filters(self, corpus_size):
         """Returns the initial graph filter.
         
@@ -67,30 +80,92 @@ class EqualPartitionsGraphFilter(object):
             f.append("node_data.id < %i" % (
                 ((self._this_part + 1) * part_size) << IndexNodeId.NODE_BIT_WIDTH, ))
         return f
+
+
+class GraphRangeFilter(object):
+    """A graph filter that selects all graphs with IDs in ``[first, last[``.
+    
+    The range can be changed with `set_range` in between two queries, which allows
+    the same node searcher to be used for different parts of the corpus.
+    
+    *Parameters*:
+     * `first`: the ID of the first graph in the range
+     * `last`: the ID of the first graph after the range, or `None` for all remaining graphs
+    """
+    def __init__(self, first = 0, last = None):
+        self.set_range(first, last)
         
+    def set_range(self, first, last):
+        """Sets the range of graph IDs returned by the next query."""
+        self._first = first
+        self._last = last
+    
+    def get_graph_range(self, corpus_size):
+        """Returns the range ``[first, last[`` of graph IDs selected by the filter."""
+        return self._first, corpus_size if self._last is None else min(self._last, corpus_size)
         
-class NodeQueryCompiler(AstVisitor):
-    """An AST visitor that takes a node query and compiles it into an SQL query."""
-    class PaddingCursor(object):
-        """A fake node cursor that returns a node for each graph in the corpus.
-        
-        Used to pad queries that only contain set variables.
+    def get_initial_filters(self, corpus_size):
+        """Returns the initial graph filter.
         
-        *Parameters*:
-         * `length`: the size of the corpus
+        In this implementation, returns a filter that will select all graphs
+        in the current range.
         """
-        def __init__(self, length):
-            self._length = length
+        f = []
+        if self._first > 0:
+            f.append("node_data.id >= %i" % (self._first << IndexNodeId.NODE_BIT_WIDTH, ))
+        if self._last is not None and self._last < corpus_size:
+            f.append("node_data.id < %i" % (self._last << IndexNodeId.NODE_BIT_WIDTH, ))
+        return f
+        
+        
+class FeaturePostings(object):
+    """Provides the sets of graphs that contain a given feature value.
+    
+    The posting lists are read from the index and cached, until the cache holds more 
+    than `CACHE_SIZE` graph ids.
+    
+    *Parameters*:
+     * `db`: the database connection
+     * `feature_ids`: a dictionary with `feature_name: feature_id` entries
+    """
+    CACHE_SIZE = 1 << 20
+    
+    def __init__(self, db, feature_ids):
+        self._db = db
+        self._feature_ids = feature_ids
+        self._cache = {}
+        self._cache_size = 0
+        
+    def get_graphs(self, feature_name, value_id):
+        """Returns the set of ids of all graphs with nodes that have the feature value."""
+        key = (feature_name, value_id)
+        try:
+            return self._cache[key]
+        except KeyError:
+            row = self._db.execute(
+                "SELECT graphs FROM feature_postings WHERE feature_id = ? AND value_id = ?",
+                (self._feature_ids[feature_name], value_id)).fetchone()
+            graphs = frozenset(decode_posting_list(row[0])) if row else frozenset()
             
-        def __iter__(self):
-            return ((0, graph_id) for graph_id in xrange(self._length))
+            if self._cache_size + len(graphs) > self.CACHE_SIZE:
+                self._cache.clear()
+                self._cache_size = 0
+            self._cache_size += len(graphs)
+            self._cache[key] = graphs
+            return graphs
         
         
+class NodeQueryCompiler(AstVisitor):
+    """An AST visitor that takes a node query and compiles it into an SQL query."""
     get_temp_table = ("_temp_regex_table_%i_%i" % (os.getpid(), c) for c in count()).next
 
     MATCH = True
     NO_MATCH = False
     SQL_OPERATORS = {MATCH: "=", NO_MATCH: "!="}
+    
+    # node queries are only restricted to the candidate graphs if they
+    # make up less than this fraction of the graphs in the range of the graph filter
+    CANDIDATE_TABLE_RATIO = 0.25
 
     def __init__(self, db, graph_filter):
         super(self.__class__, self).__init__()
@@ -101,10 +176,15 @@ class NodeQueryCompiler(AstVisitor):
             (name, {}) for name in self._featureids)
         
         self._db = db
-        self.corpus_size = self._db.execute("SELECT COUNT(id) FROM graphs").fetchone()[0]
+        # not the number of graphs, graph ids have gaps if graphs have been deleted
+        self.corpus_size = self._db.execute(
+            "SELECT COALESCE(MAX(id) + 1, 0) FROM graphs").fetchone()[0]
         self._temp_tables = {}
         self.current_query = []
         self._graph_filter = graph_filter
+        self._postings = FeaturePostings(db, self._featureids)
+        self._candidate_table = None
+        self.pruned_graphs = 0
         
     @post_child_handler(ast.Disjunction)
     def after_disjunction_subexpr(self, node, child_name):
@@ -172,6 +252,9 @@ class NodeQueryCompiler(AstVisitor):
         for table_name in self._temp_tables.itervalues():
             self._db.execute("DROP TABLE %s" % (table_name, ))
         self._temp_tables = {}
+        if self._candidate_table is not None:
+            self._db.execute("DROP TABLE %s" % (self._candidate_table, ))
+            self._candidate_table = None
         
     def _get_feature_value_id(self, feature_name, feature_value):
         """Returns the value id of `feature_value` from the feature `feature_name`.
@@ -242,6 +325,53 @@ class NodeQueryCompiler(AstVisitor):
             temp_table_name = self._create_new_regex_table(feature_name, match_policy, regex_string)
             return self._temp_tables.setdefault(temp_table_key, temp_table_name)
             
+    def get_candidate_graphs(self, query_ast, inferred_node_type, predicates):
+        """Returns the set of graphs that may contain nodes matching a node description.
+        
+        The candidates are computed by intersecting the posting lists of all feature values
+        in a disjunct of the description, only constraints with string literals are used. 
+        If the description does not restrict the set of graphs, `None` is returned.
+        """
+        self.run(query_ast, inferred_node_type, predicates)
+        candidates = set()
+        for feature_constraints in self.queries:
+            postings = [self._postings.get_graphs(name, self._get_feature_value_id(name, value.string))
+                        for name, match_policy, value in feature_constraints
+                        if match_policy is self.MATCH and value.TYPE is ast.StringLiteral]
+            if not postings:
+                return None
+            postings.sort(key = len)
+            graphs = set(postings[0])
+            for graph_ids in postings[1:]:
+                graphs.intersection_update(graph_ids)
+            candidates.update(graphs)
+        return candidates
+
+    def restrict_graphs(self, candidates):
+        """Restricts all following node queries to the graph ids in `candidates`.
+        
+        If `candidates` is `None`, the node queries are not restricted. The number of graphs
+        in the range of the graph filter that are not in `candidates` is stored in 
+        `pruned_graphs`. If no graphs are left, an `EmptyResultException` is raised.
+        """
+        self.pruned_graphs = 0
+        if candidates is None:
+            return
+        
+        first, last = self._graph_filter.get_graph_range(self.corpus_size)
+        graph_ids = sorted(graph_id for graph_id in candidates if first <= graph_id < last)
+        self.pruned_graphs = (last - first) - len(graph_ids)
+        
+        if not graph_ids:
+            raise EmptyResultException
+        elif len(graph_ids) < (last - first) * self.CANDIDATE_TABLE_RATIO:
+            table_name = self.get_temp_table()
+            self._db.execute("CREATE TEMPORARY TABLE %s (id INTEGER PRIMARY KEY)" % (table_name, ))
+            self._db.executemany("INSERT INTO %s (id) VALUES (?)" % (table_name, ), 
+                                 ((graph_id, ) for graph_id in graph_ids))
+            self._db.commit()
+            self._candidate_table = table_name
+        
     def _create_single_select_stmt(self, feature_constraints, node_type, predicates):
         """Creates an SQL select statement from feature constraints and predicates.
         
@@ -269,12 +399,22 @@ class NodeQueryCompiler(AstVisitor):
         wheres.extend("(%s)" % (f.get_query_fragment(), ) for f in predicates if f.FOR_NODE)
         if not wheres:
             wheres = ["1"]
-        return "SELECT node_data.id, node_data.id >> 12 AS graphid FROM node_data %s WHERE %s" % (
-            " ".join(joins), " AND ".join(wheres))
+        
+        if self._candidate_table is None:
+            source = "node_data"
+        else:
+            # the candidate graphs drive the query, each one selects a range of node ids
+            source = "%s CROSS JOIN node_data ON node_data.id >= %s.id << %i AND node_data.id < (%s.id + 1) << %i" % (
+                self._candidate_table, self._candidate_table, IndexNodeId.NODE_BIT_WIDTH, 
+                self._candidate_table, IndexNodeId.NODE_BIT_WIDTH)
+        return "SELECT node_data.id, node_data.id >> 12 AS graphid FROM %s %s WHERE %s" % (
+            source, " ".join(joins), " AND ".join(wheres))
 
     def result(self, query_ast, inferred_node_type, predicates):
         """Assembles the parts of a query and returns the final query string."""
-        order_clause = " ORDER BY graphid" if len(self.queries) > 1 else ""
+        # without an explicit order, SQLite may drive the query from a (small) regex table
+        # and return the nodes out of graph order
+        order_clause = " ORDER BY graphid" if len(self.queries) > 1 else " ORDER BY node_data.id"
 
         return " UNION ".join(self._create_single_select_stmt(query, node_type, predicates) 
                               for query, node_type in zip(self.queries, self.types)) + order_clause
@@ -291,7 +431,13 @@ class NodeQueryCompiler(AstVisitor):
         return self._db.cursor().execute(expression)
     
     def get_padding_cursor(self):
-        return iter(self.PaddingCursor(self.corpus_size))
+        """Returns a fake node cursor with a node for each graph in the range of the filter.
+        
+        Used to pad queries that only contain set variables.
+        """
+        first, last = self._graph_filter.get_graph_range(self.corpus_size)
+        return self._db.cursor().execute(
+            "SELECT 0, id FROM graphs WHERE id >= ? AND id < ? ORDER BY id", (first, last))
     
 
 class GraphIterator(object):
@@ -338,10 +484,29 @@ class GraphIterator(object):
                 for pred in node_predicates
                 if not pred.FOR_NODE]
     
+    def _restrict_graphs(self):
+        """Restricts the node queries to the graphs that can contain nodes for all variables."""
+        self._query_compiler.pruned_graphs = 0
+        candidates = None
+        for node_variable in self._node_vars:
+            if not node_variable.is_set:
+                graphs = self._query_compiler.get_candidate_graphs(
+                    self._node_descriptions[node_variable], node_variable.var_type, 
+                    self._predicates.get(node_variable, []))
+                if graphs is not None:
+                    candidates = graphs if candidates is None else candidates & graphs
+        self._query_compiler.restrict_graphs(candidates)
+        
+    @property
+    def pruned_graphs(self):
+        """The number of graphs that were excluded using the feature value posting lists."""
+        return self._query_compiler.pruned_graphs
+        
     def _create_node_iters(self):
         self._node_cursors = []
         self._node_tips = {}
         self._set_tips = {}
+        self._restrict_graphs()
         
         # a query compilation might trigger the creation of a temporary table,
         # so we have to compile all queries first before we get the cursors
@@ -392,45 +557,47 @@ class GraphIterator(object):
         return current_tip
     
     def _find_graphs(self):
-        depleted = False
-        max_graphid = max(self._node_tips.values())[1]
+        try:
+            depleted = False
+            max_graphid = max(self._node_tips.values())[1]
         
-        while not depleted:
-            min_graphid = min(self._node_tips.values())[1]
-            if min_graphid == max_graphid:
-                new_result = self._new_empty_result()
+            while not depleted:
+                min_graphid = min(self._node_tips.values())[1]
+                if min_graphid == max_graphid:
+                    new_result = self._new_empty_result()
                     
-                for varname, node_iter, tips in self._node_cursors:
-                    try:
-                        node_list = new_result[varname]
-                    except KeyError:
-                        node_list = []
+                    for varname, node_iter, tips in self._node_cursors:
+                        try:
+                            node_list = new_result[varname]
+                        except KeyError:
+                            node_list = []
                         
-                    try:
-                        current_tip = self._dump_nodes(node_iter, tips[varname], min_graphid)
+                        try:
+                            current_tip = self._dump_nodes(node_iter, tips[varname], min_graphid)
                             
-                        while current_tip[1] == min_graphid:
-                            node_list.append(current_tip[0])
-                            current_tip = node_iter.next()
-                        tips[varname] = current_tip
-                        if not varname.is_set and current_tip[1] > max_graphid:
-                            max_graphid = current_tip[1]
-                    except StopIteration:
-                        depleted = self._remove_iter(varname, node_iter)
+                            while current_tip[1] == min_graphid:
+                                node_list.append(current_tip[0])
+                                current_tip = node_iter.next()
+                            tips[varname] = current_tip
+                            if not varname.is_set and current_tip[1] > max_graphid:
+                                max_graphid = current_tip[1]
+                        except StopIteration:
+                            depleted = self._remove_iter(varname, node_iter)
                 
-                yield min_graphid, new_result
+                    yield min_graphid, new_result
                 
-            else:
-                for varname, node_iter, tips in self._node_cursors:
-                    try:
-                        current_tip = tips[varname] = \
-                                    self._dump_nodes(node_iter, tips[varname], max_graphid)
-                        if not varname.is_set and current_tip[1] > max_graphid:
-                            max_graphid = current_tip[1]
-                    except StopIteration:
-                        depleted = self._remove_iter(varname, node_iter)
-        
-        self._cleanup()
+                else:
+                    for varname, node_iter, tips in self._node_cursors:
+                        try:
+                            current_tip = tips[varname] = \
+                                        self._dump_nodes(node_iter, tips[varname], max_graphid)
+                            if not varname.is_set and current_tip[1] > max_graphid:
+                                max_graphid = current_tip[1]
+                        except StopIteration:
+                            depleted = self._remove_iter(varname, node_iter)
+        finally:
+            # also runs if the consumer stops iterating early
+            self._cleanup()
 
     def _check_set_constraints(self, set_constraints, graph_result):
         for node_variable, constraint in set_constraints:
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Licensed under the GNU GPLv2
+"""This module contains a cache for compiled TIGERSearch queries.
+
+Parsing a query and converting it into its internal representation takes much longer
+than the evaluation of many queries. The `QueryPlanCache` stores the compiled
+representation of a query, keyed on the normalized query string.
+
+Compiled queries contain the ids of feature values and edge labels from the index,
+and are therefore only valid for the index they have been compiled for. When a cache is
+saved to disk, the id of the index is stored with it, and a cache file is only loaded
+for the same index.
+"""
+import cPickle
+import re
+import time
+
+from collections import OrderedDict
+
+__all__ = ["QueryPlanCache", "normalize_query"]
+
+DEFAULT_CACHE_SIZE = 500
+
+_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|/(?:\\.|[^/\\])*/|\s+)')
+
+def normalize_query(query_str):
+    """Returns the normalized form of `query_str`.
+
+    Runs of whitespace are collapsed into a single blank, unless they are part of a
+    string literal or regular expression.
+    """
+    return "".join(" " if token.isspace() else token
+                   for token in _TOKEN_RE.split(query_str.strip()) if token)
+
+
+class QueryPlanCache(object):
+    """A least-recently-used cache of compiled queries.
+
+    *Parameters*:
+     * `max_size`: the maximum number of queries in the cache
+     * `max_age`: the number of seconds after which a cached query is compiled again,
+       or `None` if queries do not expire
+    """
+    def __init__(self, max_size = DEFAULT_CACHE_SIZE, max_age = None):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query_str):
+        """Returns the compiled query for `query_str`, or `None` if it is not cached."""
+        key = normalize_query(query_str)
+        try:
+            created, plan = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if self.max_age is not None and time.time() - created > self.max_age:
+            self.misses += 1
+            return None
+
+        self._entries[key] = (created, plan)
+        self.hits += 1
+        return plan
+
+    def put(self, query_str, plan):
+        """Stores the compiled query `plan` for `query_str`."""
+        self._add(normalize_query(query_str), time.time(), plan)
+
+    def _add(self, key, created, plan):
+        self._entries.pop(key, None)
+        self._entries[key] = (created, plan)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last = False)
+
+    def clear(self):
+        """Removes all queries from the cache."""
+        self._entries.clear()
+
+    def save(self, path, index_id):
+        """Writes the cached queries to the file `path`.
+
+        `index_id` is the id of the index the queries have been compiled for.
+        """
+        f = open(path, "wb")
+        try:
+            cPickle.dump((index_id, self._entries.items()), f, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+
+    def load(self, path, index_id):
+        """Adds the queries in the file `path` to the cache.
+
+        The queries are only loaded if they have been compiled for the index with the
+        id `index_id`. Returns the number of queries loaded.
+        """
+        f = open(path, "rb")
+        try:
+            saved_index_id, entries = cPickle.load(f)
+        finally:
+            f.close()
+
+        if index_id is None or saved_index_id != index_id:
+            return 0
+
+        for key, (created, plan) in entries:
+            self._add(key, created, plan)
+        return len(entries)
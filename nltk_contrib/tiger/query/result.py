@@ -12,8 +12,9 @@ information, see the inline comments.
 """
 import operator
 import multiprocessing
+from Queue import Empty, Full
 from functools import partial
-from itertools import count, izip
+from itertools import count, izip, islice
 from collections import defaultdict
 
 from nltk_contrib.tiger.index import IndexNodeId
@@ -21,10 +22,23 @@ from nltk_contrib.tiger.query.exceptions import MissingFeatureError
 from nltk_contrib.tiger.query.constraints import Direction
 from nltk_contrib.tiger.query.nodesearcher import NodeSearcher, EqualPartitionsGraphFilter
 
-__all__ = ["ResultBuilder", "ParallelResultBuilder"]
+__all__ = ["ResultBuilder", "ParallelResultBuilder", "QueryPlan"]
 
 product = partial(reduce, operator.mul)
 
+def paginate(graph_results, offset = 0, limit = None):
+    """Skips the first `offset` items of `graph_results` and stops after `limit` items.
+    
+    `graph_results` is closed as soon as the returned iterator is closed or exhausted, so
+    that the query evaluation behind it is cancelled.
+    """
+    stop = None if limit is None else offset + limit
+    try:
+        for graph_result in islice(graph_results, offset, stop):
+            yield graph_result
+    finally:
+        graph_results.close()
+
 def named_cross_product(items):
     def _outer_product(depth, combination):
         varname, nodes = items[-depth]
@@ -69,8 +83,20 @@ class ConstraintChecker(object):
     def _get_node_variables(cls, constraints):
         return set(var for var_pair in constraints for var in var_pair)
     
+    @classmethod
+    def _estimate_matches(cls, constraint, sizes):
+        """Returns the estimated number of node pairs for which `constraint` holds."""
+        left_var, right_var, check, exchange, fail_after_success, selectivity = constraint
+        return sizes.get(left_var, 1) * sizes.get(right_var, 1) * selectivity
+    
     @classmethod
     def prepare(cls, constraints, sizes = {}):
+        """Returns a factory for constraint checkers.
+        
+        The constraints are ordered by their estimated number of matching node pairs, 
+        based on the node counts in `sizes` and the selectivity estimates of the constraints, 
+        so that the prefilter applies the most restrictive constraints first.
+        """
         constraints = dict(constraints)
         
         set_weight = sum(sizes.values()) + 1
@@ -91,7 +117,8 @@ class ConstraintChecker(object):
 
                 if direction is Direction.BOTH or direction is Direction.LEFT_TO_RIGHT:
                     fail_after_success = True
-                ordered_constraints.append((var_pair[0], var_pair[1], constraint, False, fail_after_success))
+                ordered_constraints.append((var_pair[0], var_pair[1], constraint, False, 
+                                            fail_after_success, constraints[var_pair].selectivity))
 
             elif var_pair[::-1] in constraints:
                 constraint = constraints[var_pair[::-1]].check
@@ -99,21 +126,27 @@ class ConstraintChecker(object):
 
                 if direction is Direction.BOTH or direction is Direction.RIGHT_TO_LEFT:
                     fail_after_success = True
-                ordered_constraints.append((var_pair[0], var_pair[1], constraint, True, fail_after_success))
-
+                ordered_constraints.append((var_pair[0], var_pair[1], constraint, True, 
+                                            fail_after_success, 
+                                            constraints[var_pair[::-1]].selectivity))
 
+        ordered_constraints.sort(key = lambda c: cls._estimate_matches(c, sizes))
         return partial(ConstraintChecker, ordered_constraints)
         
     def __init__(self, constraints, nodes, query_context):
         self.ordered_constraints = constraints
         self.nodes = nodes
         self.ok = set()
+        self.query_context = query_context
         self.has_results = self.prefilter(query_context)
 
     def prefilter(self, query_context):
-        for (left_var, right_var, constraint, exchange, fail_after_success) in self.ordered_constraints:
+        for (left_var, right_var, constraint, exchange, fail_after_success, 
+             __) in self.ordered_constraints:
             l_success = set()
             r_success = set()
+            checks = query_context.constraint_checks
+            matches = len(self.ok)
             for left in self.nodes[left_var]:
                 ldata = query_context.get_node(left)
                 
@@ -139,7 +172,11 @@ class ConstraintChecker(object):
                     if right_var.is_set:
                         l_success.add(left)
                         r_success.update(self.nodes[right_var])
-                       
+            
+            stats = query_context.constraint_stats[left_var.name, right_var.name]
+            stats[0] += query_context.constraint_checks - checks
+            stats[1] += len(self.ok) - matches
+            
             if not l_success:
                 return False
             if not r_success and not right_var.is_set:
@@ -153,39 +190,108 @@ class ConstraintChecker(object):
             query_result[node_var] = IndexNodeId.from_int(query_result[node_var])
         return query_result
     
+    def _get_join_order(self, variables, pairs):
+        """Returns the order in which the node variables are bound in `extract`.
+        
+        The join starts with the variable with the fewest candidate nodes. In each step, 
+        the variable with the lowest estimated number of partial results is added next, 
+        among the variables that are connected to the variables already bound.
+        """
+        selectivities = defaultdict(dict)
+        for (left_var, right_var), selectivity in pairs.iteritems():
+            selectivities[left_var][right_var] = selectivity
+            selectivities[right_var][left_var] = selectivity
+        
+        join_order = []
+        unbound = set(variables)
+        while unbound:
+            candidates = [var for var in unbound
+                          if any(other in selectivities[var] for other in join_order)]
+            if not candidates:
+                candidates = unbound
+            
+            def _estimate(var):
+                return product((selectivities[var][other] for other in join_order
+                                if other in selectivities[var]), 
+                               float(len(self.nodes[var])))
+            
+            next_var = min(candidates, key = lambda var: (_estimate(var), var.name))
+            join_order.append(next_var)
+            unbound.remove(next_var)
+        return join_order
+    
     def extract(self):
         """Creates the result set.
         
-        The function currently uses a brute-force attempt. Please see the TODOs at the top
-        of the module.
+        The results are created by a backtracking join over the candidate nodes that 
+        survived the prefilter. Node variables are bound one after another (see 
+        `_get_join_order`), and each new binding is checked against the node pairs that
+        satisfied the constraints with the variables bound so far, so partial results that 
+        cannot be extended are discarded as early as possible.
         """
-        if self.has_results:
-            g = [item for item in self.nodes.items() if not item[0].is_set]
-            
-            return [self._nodeids(query_result)
-                    for query_result in named_cross_product(g)
-                    if self._check(query_result)]
-        else:
+        if not self.has_results:
             return []
-
-    def _check(self, result):
-        for (left_variable, right_variable, __, __, __) in self.ordered_constraints:
-            if right_variable.is_set:
-                for right_node in self.nodes[right_variable]:
-                    if (result[left_variable], right_node) not in self.ok:
-                        return False
+        
+        variables = [var for var in self.nodes if not var.is_set]
+        candidates = dict((var, self.nodes[var]) for var in variables)
+        pairs = {}
+        for (left_var, right_var, __, __, __, selectivity) in self.ordered_constraints:
+            if right_var.is_set:
+                candidates[left_var] = [
+                    left for left in candidates[left_var]
+                    if all((left, right) in self.ok for right in self.nodes[right_var])]
             else:
-                if (result[left_variable], result[right_variable]) not in self.ok:
-                    return False
-        return True
+                pairs[left_var, right_var] = selectivity
+        
+        join_order = self._get_join_order(variables, pairs)
+        self.query_context.join_orders[tuple(var.name for var in join_order)] += 1
+        
+        # for each variable, the pair checks against the variables bound before it
+        checks = []
+        for depth, var in enumerate(join_order):
+            bound = join_order[:depth]
+            checks.append(
+                [(left_var, True) for (left_var, right_var) in pairs
+                 if right_var is var and left_var in bound] +
+                [(right_var, False) for (left_var, right_var) in pairs
+                 if left_var is var and right_var in bound])
+        
+        results = []
+        ok = self.ok
+        binding = {}
+        def _join(depth):
+            var = join_order[depth]
+            var_checks = checks[depth]
+            for node in candidates[var]:
+                for other_var, other_is_left in var_checks:
+                    if other_is_left:
+                        pair = (binding[other_var], node)
+                    else:
+                        pair = (node, binding[other_var])
+                    if pair not in ok:
+                        break
+                else:
+                    binding[var] = node
+                    if depth == len(join_order) - 1:
+                        results.append(binding.copy())
+                    else:
+                        _join(depth + 1)
+        
+        if join_order:
+            _join(0)
+        else:
+            results.append({})
+        return [self._nodeids(query_result) for query_result in results]
+
         
 PREPARE_NEW_AFTER = 100
 
 def cct_search(graph_results, query_context):
-    query_context._ncache.clear()
+    if len(query_context._ncache) > query_context.node_cache_limit:
+        query_context._ncache.clear()
     query_context.checked_graphs += 1
     if query_context.checked_graphs == PREPARE_NEW_AFTER:
-        query_context.checker_factory = ConstraintChecker.prepare(query_context.constraints, query_context.node_counts)
+        query_context.prepare_checker(query_context.node_counts)
     elif query_context.checked_graphs < PREPARE_NEW_AFTER:
         for node_var, node_ids in graph_results.iteritems():
             query_context.node_counts[node_var] += len(node_ids)
@@ -217,9 +323,11 @@ class LazyResultSet(object):
         
 
 class QueryContext(object):
-    def __init__(self, db, constraints, nodevars):
+    def __init__(self, db, constraints, nodevars, graph_store = None):
         self.cursor = db.cursor()
+        self._graph_store = graph_store
         self._ncache = {}
+        self.node_cache_limit = 0
         self.constraints = constraints
         self.node_counts = defaultdict(int)
         
@@ -227,7 +335,7 @@ class QueryContext(object):
         if len(variable_partitions) == len(nodevars):
             self.constraint_checker = LazyResultSet
         elif len(variable_partitions) == 1:
-            self.checker_factory = ConstraintChecker.prepare(constraints)
+            self.prepare_checker()
             self.constraint_checker = cct_search
         else:
             raise MissingFeatureError, "Missing feature: disjoint constraint sets. Please file a bug report."
@@ -238,6 +346,26 @@ class QueryContext(object):
         self.node_cache_misses = 0
         self.checked_graphs = 0
         self.constraint_checks = 0
+        self.pruned_graphs = 0
+        self.constraint_stats = defaultdict(lambda: [0, 0])
+        self.join_orders = defaultdict(int)
+    
+    def prepare_checker(self, sizes = {}):
+        """Prepares the constraint checker, using the node counts in `sizes` as cost estimates."""
+        self.checker_factory = ConstraintChecker.prepare(self.constraints, sizes)
+        self.constraint_order = [(left_var, right_var, selectivity)
+                                 for (left_var, right_var, __, __, __, selectivity)
+                                 in self.checker_factory.args[0]]
+        
+    def share_node_cache(self, node_cache, limit):
+        """Uses `node_cache` to cache node data.
+        
+        By default, the node cache is emptied for every graph. A shared cache is only emptied
+        once it holds more than `limit` nodes, and can be kept across queries, since the node 
+        data in the index does not change.
+        """
+        self._ncache = node_cache
+        self.node_cache_limit = limit
         
     def get_node(self, node_id):
         try:
@@ -245,6 +373,9 @@ class QueryContext(object):
             return self._ncache[node_id]
         except KeyError:
             self.node_cache_misses += 1
+            if self._graph_store is not None:
+                rs = self._ncache[node_id] = self._graph_store.get_node_data(node_id)
+                return rs
             self.cursor.execute("""SELECT id, edge_label,  
             continuity, left_corner, right_corner, token_order, gorn_address
             FROM node_data WHERE id = ?""", (node_id, ))
@@ -252,6 +383,50 @@ class QueryContext(object):
             return rs    
     
 
+class QueryPlan(object):
+    """The execution plan of an evaluated query.
+    
+    The plan contains the order in which the constraints are checked, their estimated
+    selectivity, the number of checks and matches for each constraint and the 
+    most frequent order in which the node variables have been joined.
+    
+    *Parameters*:
+     * `query_context`: a `QueryContext` after the query has been evaluated
+    """
+    def __init__(self, query_context):
+        self.checked_graphs = query_context.checked_graphs
+        self.pruned_graphs = query_context.pruned_graphs
+        self.constraint_checks = query_context.constraint_checks
+        self.node_counts = sorted((var.name, count) 
+                                  for var, count in query_context.node_counts.iteritems())
+        self.constraints = []
+        for left_var, right_var, selectivity in getattr(query_context, "constraint_order", []):
+            checks, matches = query_context.constraint_stats.get(
+                (left_var.name, right_var.name), (0, 0))
+            self.constraints.append((left_var.name, right_var.name, selectivity, 
+                                     checks, matches))
+        if query_context.join_orders:
+            self.join_order = max(query_context.join_orders.iteritems(), 
+                                  key = operator.itemgetter(1))[0]
+        else:
+            self.join_order = ()
+    
+    def __str__(self):
+        lines = ["checked graphs: %i, pruned graphs: %i, constraint checks: %i" % (
+            self.checked_graphs, self.pruned_graphs, self.constraint_checks)]
+        if self.node_counts:
+            lines.append("candidate nodes (first %i graphs):" % (PREPARE_NEW_AFTER - 1, ))
+            lines.extend("  %s: %i" % item for item in self.node_counts)
+        if self.constraints:
+            lines.append("constraint order:")
+            for left, right, selectivity, checks, matches in self.constraints:
+                lines.append("  %s, %s: selectivity %.4f, %i checks, %.1f estimated / %i actual matches" % (
+                    left, right, selectivity, checks, checks * selectivity, matches))
+        if self.join_order:
+            lines.append("join order: %s" % (", ".join(self.join_order), ))
+        return "\n".join(lines)
+
+
 class ResultBuilderBase(object):
     def __init__(self, node_descriptions, predicates):
         self._nodes = node_descriptions
@@ -261,10 +436,26 @@ class ResultBuilderBase(object):
         """Returns the set of node variables defined in the query."""
         return frozenset(nv.name for nv in self._nodes)
 
+    def iter_results(self, offset = 0, limit = None):
+        """Evaluates the query lazily.
+        
+        Returns an iterator over the same `(graph_number, results)` tuples as `evaluate`,
+        ordered by graph number. Graphs are only searched when the next result is requested,
+        so only the results for a single graph need to be held in memory. The first `offset`
+        matching graphs are skipped, and at most `limit` graphs are returned.
+        
+        Closing the iterator cancels the evaluation.
+        """
+        return paginate(self._iter_graph_results(), offset, limit)
+        
+    def _iter_graph_results(self):
+        raise NotImplementedError
+
 
 class ResultBuilder(QueryContext, ResultBuilderBase):
     def __init__(self, ev_context, node_descriptions, predicates, constraints):
-        QueryContext.__init__(self, ev_context.db, constraints, node_descriptions.keys())
+        QueryContext.__init__(self, ev_context.db, constraints, node_descriptions.keys(),
+                              ev_context.graph_store)
         ResultBuilderBase.__init__(self, node_descriptions, predicates)
         self._nodesearcher = ev_context.nodesearcher
         
@@ -274,12 +465,18 @@ class ResultBuilder(QueryContext, ResultBuilderBase):
         Returns a list of `(graph_number, results)` tuples, where `results` is a list of 
         dictionaries that contains `variable: node_id` pairs for all defined variable names.
         """
+        return list(self._iter_graph_results())
+        
+    def _iter_graph_results(self):
         self._reset_stats()
         matching_graphs = self._nodesearcher.search_nodes(self._nodes, self._predicates)
-
-        return filter(operator.itemgetter(1),
-                      ((graph_id, self.constraint_checker(nodes, self))
-                       for graph_id, nodes in matching_graphs))
+        graphs = iter(matching_graphs)
+        self.pruned_graphs = matching_graphs.pruned_graphs
+        
+        for graph_id, nodes in graphs:
+            graph_results = self.constraint_checker(nodes, self)
+            if graph_results:
+                yield graph_id, graph_results
 
 
 class ParallelEvaluatorContext(object):
@@ -287,23 +484,56 @@ class ParallelEvaluatorContext(object):
         self.db = db_provider.connect()
         self.nodesearcher = NodeSearcher(self.db, graph_filter)
         self.db_provider = db_provider
+        self.graph_store = db_provider.open_graph_store(self.db)
+
 
+RESULT_QUEUE_SIZE = 256
+POLL_INTERVAL = 0.1
 
-def evaluate_parallel(db_provider, nodes, predicates, constraints, result_queue, graph_filter):
+def _put_unless_cancelled(result_queue, item, cancelled):
+    while not cancelled.is_set():
+        try:
+            result_queue.put(item, True, POLL_INTERVAL)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def evaluate_parallel(db_provider, nodes, predicates, constraints, result_queue, graph_filter, 
+                      cancelled):
     ev_ctx = ParallelEvaluatorContext(db_provider, graph_filter)
     query = ResultBuilder(ev_ctx, nodes, predicates, constraints)
 
-    result_set = query.evaluate()
-    result_queue.put((result_set, (query.checked_graphs, query.constraint_checks, 
-                      query.node_cache_hits, query.node_cache_misses)))
+    for graph_result in query.iter_results():
+        if not _put_unless_cancelled(result_queue, graph_result, cancelled):
+            # nobody will read the remaining items, do not wait for them to be flushed
+            result_queue.cancel_join_thread()
+            return
+    
+    _put_unless_cancelled(result_queue, (None, (query.checked_graphs, query.constraint_checks, 
+                                                query.node_cache_hits, query.node_cache_misses,
+                                                query.pruned_graphs)),
+                          cancelled)
     result_queue.close()
     
 
 class ParallelResultBuilder(ResultBuilderBase):
+    """Evaluates a query in several worker processes.
+    
+    If the evaluator context provides a worker pool, the query is evaluated by the
+    pool workers. If there is no pool, or it is busy with another query, one new worker 
+    process per CPU is started. Each of these workers evaluates the query on an equally 
+    large part of the corpus and sends the results for each graph through a bounded queue, 
+    which is read in the order of the corpus parts. Workers that are too far ahead of the 
+    consumer block until their results have been picked up.
+    """
     def __init__(self, ev_context, node_descriptions, predicates, constraints):
         super(self.__class__, self).__init__(node_descriptions, predicates)
         self._constraints = constraints
         self._db_provider = ev_context.db_provider
+        self._worker_pool = ev_context.worker_pool
+        self._corpus_size = ev_context.corpus_info.graph_id_limit
         self._reset_stats()
         
     def _reset_stats(self):
@@ -311,32 +541,79 @@ class ParallelResultBuilder(ResultBuilderBase):
         self.node_cache_misses = 0
         self.checked_graphs = 0
         self.constraint_checks = 0
+        self.pruned_graphs = 0
+
+    def _add_stats(self, stats):
+        self.checked_graphs += stats[0]
+        self.constraint_checks += stats[1]
+        self.node_cache_hits += stats[2]
+        self.node_cache_misses += stats[3]
+        self.pruned_graphs += stats[4]
         
     def evaluate(self):
+        return list(self._iter_graph_results())
+    
+    @staticmethod
+    def _get_result(worker, result_queue):
+        while True:
+            try:
+                return result_queue.get(True, POLL_INTERVAL)
+            except Empty:
+                if not worker.is_alive():
+                    try:
+                        return result_queue.get_nowait()
+                    except Empty:
+                        raise RuntimeError, "query worker %s died unexpectedly" % (worker.name, )
+    
+    @staticmethod
+    def _shutdown(workers):
+        for worker, result_queue in workers:
+            while worker.is_alive():
+                # unblock workers waiting to flush their queues
+                try:
+                    while True:
+                        result_queue.get_nowait()
+                except Empty:
+                    pass
+                worker.join(POLL_INTERVAL)
+    
+    def _iter_graph_results(self):
         self._reset_stats()
-        result_queue = multiprocessing.Queue()
+        if self._worker_pool is not None and self._worker_pool.is_available():
+            graph_results = self._worker_pool.evaluate(
+                self._nodes, self._predicates, self._constraints, self._corpus_size, 
+                self._add_stats)
+        else:
+            graph_results = self._evaluate_in_new_workers()
+            
+        try:
+            for graph_result in graph_results:
+                yield graph_result
+        finally:
+            graph_results.close()
+
+    def _evaluate_in_new_workers(self):
         num_workers = multiprocessing.cpu_count()
+        cancelled = multiprocessing.Event()
         workers = []
-        for i in range(num_workers):
-            worker = multiprocessing.Process(
-                target = evaluate_parallel,
-                args = (self._db_provider, self._nodes, self._predicates,
-                        self._constraints, result_queue, 
-                        EqualPartitionsGraphFilter(i, num_workers)))
-            worker.start()
-            workers.append(worker)
+        try:
+            for i in range(num_workers):
+                result_queue = multiprocessing.Queue(RESULT_QUEUE_SIZE)
+                worker = multiprocessing.Process(
+                    target = evaluate_parallel,
+                    args = (self._db_provider, self._nodes, self._predicates,
+                            self._constraints, result_queue, 
+                            EqualPartitionsGraphFilter(i, num_workers), cancelled))
+                worker.start()
+                workers.append((worker, result_queue))
         
-        results = []
-        running_workers = num_workers
-        while running_workers > 0:
-            partial_result, stats = result_queue.get()
-            results.extend(partial_result)
-            self.checked_graphs += stats[0]
-            self.constraint_checks += stats[1]
-            self.node_cache_hits += stats[2]
-            self.node_cache_misses += stats[3]
-            
-            running_workers -= 1
-        for worker in workers:
-            worker.join()
-        return results
+            for worker, result_queue in workers:
+                while True:
+                    graph_id, graph_results = self._get_result(worker, result_queue)
+                    if graph_id is None:
+                        self._add_stats(graph_results)
+                        break
+                    yield graph_id, graph_results
+        finally:
+            cancelled.set()
+            self._shutdown(workers)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# Licensed under the GNU GPLv2
+"""This module contains a pool of long-lived worker processes for parallel query evaluation.
+
+Starting a worker process, connecting to the database and setting up a node searcher is
+expensive compared to the evaluation of most queries. The workers in a `QueryWorkerPool` are
+started once per corpus and keep their database connection, node searcher and node cache
+for all queries.
+
+A query is split into chunks of consecutive graphs, which are handed out to the workers
+on demand. A worker that finishes its chunk early simply picks up the next one, so unlike
+a fixed partition of the corpus, no worker stays idle while others still work on a
+part of the corpus with many candidate nodes.
+"""
+import cPickle
+import multiprocessing
+from itertools import count, islice
+from Queue import Empty
+
+from nltk_contrib.tiger.query.nodesearcher import NodeSearcher, GraphRangeFilter
+from nltk_contrib.tiger.query.result import ResultBuilder, POLL_INTERVAL
+
+__all__ = ["QueryWorkerPool"]
+
+CHUNKS_PER_WORKER = 8
+MAX_CHUNK_SIZE = 500
+PENDING_CHUNKS_PER_WORKER = 2
+NODE_CACHE_SIZE = 100000
+SHUTDOWN_TIMEOUT = 5
+NO_QUERY = -1
+
+
+class WorkerContext(object):
+    """The evaluator context of a pool worker."""
+    def __init__(self, db_provider):
+        self.db = db_provider.connect()
+        self.graph_filter = GraphRangeFilter()
+        self.nodesearcher = NodeSearcher(self.db, self.graph_filter)
+        self.graph_store = db_provider.open_graph_store(self.db)
+
+
+def pool_worker(db_provider, tasks, results, active_query):
+    """The main loop of a pool worker.
+
+    Chunks of queries that are not active any more are skipped.
+    """
+    ev_ctx = WorkerContext(db_provider)
+    node_cache = {}
+    query_id = None
+
+    for task_query_id, query_spec, chunk_idx, first, last in iter(tasks.get, None):
+        if task_query_id != active_query.value:
+            continue
+        try:
+            if task_query_id != query_id:
+                query = ResultBuilder(ev_ctx, *cPickle.loads(query_spec))
+                query.share_node_cache(node_cache, NODE_CACHE_SIZE)
+                query_id = task_query_id
+
+            ev_ctx.graph_filter.set_range(first, last)
+            chunk_results = []
+            for graph_result in query.iter_results():
+                if task_query_id != active_query.value:
+                    break
+                chunk_results.append(graph_result)
+            else:
+                results.put((task_query_id, chunk_idx, chunk_results,
+                             (query.checked_graphs, query.constraint_checks,
+                              query.node_cache_hits, query.node_cache_misses,
+                              query.pruned_graphs)))
+        except Exception, e:
+            results.put((task_query_id, chunk_idx, None, "%s: %s" % (e.__class__.__name__, e)))
+
+    # the pool is shut down, nobody reads pending results
+    results.cancel_join_thread()
+
+
+class QueryWorkerPool(object):
+    """A pool of worker processes that evaluate queries in parallel.
+
+    The pool can only evaluate one query at a time, use `is_available` to check if it
+    can take a new query.
+
+    *Parameters*:
+     * `db_provider`: the provider for the database connections of the workers
+     * `num_workers`: the number of worker processes, by default the number of CPUs
+    """
+    def __init__(self, db_provider, num_workers = None):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._active_query = multiprocessing.Value("i", NO_QUERY)
+        self._get_query_id = count().next
+        self._busy = False
+
+        self._workers = []
+        for i in xrange(self.num_workers):
+            worker = multiprocessing.Process(
+                target = pool_worker,
+                args = (db_provider, self._tasks, self._results, self._active_query))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def is_available(self):
+        """Returns `True` if the pool is running and not evaluating a query, `False` otherwise."""
+        return len(self._workers) > 0 and not self._busy
+
+    def _get_chunks(self, corpus_size):
+        """Returns the list of `(first, last)` graph ranges for a corpus."""
+        chunk_size = max(1, min(MAX_CHUNK_SIZE,
+                                corpus_size // (self.num_workers * CHUNKS_PER_WORKER)))
+        return [(first, min(first + chunk_size, corpus_size))
+                for first in xrange(0, corpus_size, chunk_size)]
+
+    def _get_result(self):
+        while True:
+            try:
+                return self._results.get(True, POLL_INTERVAL)
+            except Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError, "query worker died unexpectedly"
+
+    def evaluate(self, nodes, predicates, constraints, corpus_size, add_stats):
+        """Evaluates a query on the pool.
+
+        Returns an iterator over `(graph_number, results)` tuples, ordered by graph number.
+        At most ``PENDING_CHUNKS_PER_WORKER * num_workers`` chunks are evaluated ahead of
+        the consumer. The statistics for each chunk are reported to `add_stats`.
+
+        Closing the iterator cancels the evaluation.
+        """
+        if not self.is_available():
+            raise RuntimeError, "worker pool is shut down or already evaluating a query"
+        self._busy = True
+
+        query_id = self._get_query_id()
+        query_spec = cPickle.dumps((nodes, predicates, constraints), 2)
+        tasks = ((query_id, query_spec, chunk_idx, first, last)
+                 for chunk_idx, (first, last) in enumerate(self._get_chunks(corpus_size)))
+
+        self._active_query.value = query_id
+        try:
+            pending = 0
+            for task in islice(tasks, PENDING_CHUNKS_PER_WORKER * self.num_workers):
+                self._tasks.put(task)
+                pending += 1
+
+            finished = {}
+            next_chunk = 0
+            while pending > 0:
+                while next_chunk not in finished:
+                    result_query_id, chunk_idx, chunk_results, stats = self._get_result()
+                    if result_query_id == query_id:
+                        finished[chunk_idx] = (chunk_results, stats)
+
+                chunk_results, stats = finished.pop(next_chunk)
+                if chunk_results is None:
+                    raise RuntimeError, "query evaluation failed in worker: %s" % (stats, )
+                add_stats(stats)
+                next_chunk += 1
+                pending -= 1
+
+                for task in islice(tasks, 1):
+                    self._tasks.put(task)
+                    pending += 1
+
+                for graph_result in chunk_results:
+                    yield graph_result
+        finally:
+            self._active_query.value = NO_QUERY
+            self._busy = False
+
+    def close(self):
+        """Shuts down all workers.
+
+        After a call to close, the pool cannot be used any more.
+        """
+        self._active_query.value = NO_QUERY
+        for worker in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(SHUTDOWN_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
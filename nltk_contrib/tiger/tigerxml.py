@@ -9,13 +9,23 @@ The `TigerParser` simply reads out metadata information and creates instances of
 
 No checks for completeness or soundness of the graph specification are made, so the
 parser should be able to handle problematic corpora as well. 
+
+Large corpora can be parsed with `parse_tiger_corpus_parallel`, which splits the 
+sentences of the corpus into shards that are parsed in worker processes.
 """
+import re
+import multiprocessing
+from collections import deque, OrderedDict
 from functools import partial
 
-from nltk_contrib.tiger.utils.etree_xml import IterParseHandler, element_handler
+from nltk_contrib.tiger.utils.etree_xml import IterParseHandler, element_handler, ET
 from nltk_contrib.tiger.graph import NonterminalNode, TerminalNode, TigerGraph, NodeType
 
-__all__ = ("parse_tiger_corpus", "TigerParser")
+__all__ = ("parse_tiger_corpus", "parse_tiger_corpus_parallel", "TigerParser")
+
+SHARD_SIZE = 500
+PENDING_SHARDS_PER_WORKER = 2
+READ_BLOCK_SIZE = 1 << 20
 
 class TigerParser(IterParseHandler):
     """A parser for TIGER-XML corpora.
@@ -55,6 +65,7 @@ class TigerParser(IterParseHandler):
     def __init__(self):
         super(TigerParser, self).__init__()
         self._indexer = None
+        self._skip_graphs = 0
         
     @element_handler("meta")
     def handle_meta(self, elem):
@@ -88,24 +99,38 @@ class TigerParser(IterParseHandler):
     @element_handler("s")
     def handle_sentence(self, sentence):
         """Creates a `TigerGraph` for a sentence specification and feeds it to the indexer."""
+        if self._skip_graphs > 0:
+            self._skip_graphs -= 1
+        else:
+            self._indexer.add_graph(self.create_graph(sentence))
+        return self.DELETE_BRANCH
+
+    @classmethod
+    def create_graph(cls, sentence, nodes = None):
+        """Returns the `TigerGraph` for the sentence element `sentence`.
+        
+        If `nodes` is given, it is used as the node dictionary of the graph.
+        """
         graph = TigerGraph(sentence.get("id"))
+        if nodes is not None:
+            graph.nodes = nodes
         
         graph_elem = sentence.find("graph")
         
-        self._read_nodes(graph_elem.getiterator("t"), graph.nodes, TerminalNode, 
-                         self._postproc_terminal)
-        self._read_nodes(graph_elem.getiterator("nt"), graph.nodes, NonterminalNode, 
-                         self._postproc_nonterminal)
+        cls._read_nodes(graph_elem.getiterator("t"), graph.nodes, TerminalNode, 
+                        cls._postproc_terminal)
+        cls._read_nodes(graph_elem.getiterator("nt"), graph.nodes, NonterminalNode, 
+                        cls._postproc_nonterminal)
         
         graph.root_id = graph_elem.get("root")
+        return graph
 
-        self._indexer.add_graph(graph)
-        return self.DELETE_BRANCH
-
-    def _postproc_terminal(self, node, node_elem):
+    @staticmethod
+    def _postproc_terminal(node, node_elem):
         node.order = int(node_elem.get("id").split("_")[-1]) - 1
     
-    def _postproc_nonterminal(self, node, node_elem):
+    @staticmethod
+    def _postproc_nonterminal(node, node_elem):
         node.edges = [
             (edge.get("label"), edge.get("idref"))
             for edge in node_elem.getiterator("edge")]
@@ -134,13 +159,140 @@ class TigerParser(IterParseHandler):
             if secedges:
                 node.secedges = secedges
                 
-    def parse(self, path, indexer):
-        """Parses the TIGER-XML corpus in `path` and sends all data to `indexer`."""
+    def parse(self, path, indexer, skip_graphs = 0):
+        """Parses the TIGER-XML corpus in `path` and sends all data to `indexer`.
+        
+        The first `skip_graphs` sentences are not sent to the indexer.
+        """
         self._indexer = indexer
+        self._skip_graphs = skip_graphs
         self._parse(path)
 
+
+class _EndOfHead(Exception):
+    pass
+
+
+class TigerHeadParser(TigerParser):
+    """A parser that only reads the corpus head and stops at the start of the body."""
+    @element_handler("body", "start")
+    def handle_body(self, elem):
+        raise _EndOfHead
+    
+    def parse(self, path, indexer):
+        try:
+            super(TigerHeadParser, self).parse(path, indexer)
+        except _EndOfHead:
+            pass
+
             
-def parse_tiger_corpus(filename, indexer):
-    """Parses the TIGER-XML corpus in `filename` and sends it to `indexer`."""
+def parse_tiger_corpus(filename, indexer, skip_graphs = 0):
+    """Parses the TIGER-XML corpus in `filename` and sends it to `indexer`.
+    
+    The first `skip_graphs` graphs of the corpus are skipped.
+    """
     t = TigerParser()
-    t.parse(filename, indexer)
+    t.parse(filename, indexer, skip_graphs)
+
+
+_SENTENCE_START = re.compile(r"<s[\s>]")
+_SENTENCE_END = "</s>"
+_XML_DECLARATION = re.compile(r"<\?xml[^>]*\?>")
+
+def _iter_sentences(filename):
+    """Yields the raw XML text of all sentence elements in the TIGER-XML file `filename`."""
+    f = open(filename, "rb")
+    try:
+        buf = ""
+        pos = 0
+        while True:
+            start = _SENTENCE_START.search(buf, pos)
+            end = buf.find(_SENTENCE_END, start.end()) if start is not None else -1
+            if end >= 0:
+                end += len(_SENTENCE_END)
+                yield buf[start.start():end]
+                pos = end
+            else:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    return
+                buf = buf[start.start() if start is not None else pos:] + block
+                pos = 0
+    finally:
+        f.close()
+
+
+def _iter_shards(filename, shard_size, skip_graphs):
+    """Yields lists of at most `shard_size` raw sentence elements."""
+    sentences = _iter_sentences(filename)
+    for __ in xrange(skip_graphs):
+        next(sentences, None)
+    
+    shard = []
+    for sentence in sentences:
+        shard.append(sentence)
+        if len(shard) == shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+    
+
+def parse_shard(xml_declaration, shard):
+    """Parses a list of raw sentence elements.
+    
+    Returns a list of `(graph_id, root_id, nodes)` tuples, where `nodes` is the list of 
+    `(node_id, node)` pairs in the order in which the parser adds them to a graph.
+    """
+    body = ET.fromstring("%s<body>%s</body>" % (xml_declaration, "".join(shard)))
+    graphs = []
+    for sentence in body:
+        graph = TigerParser.create_graph(sentence, OrderedDict())
+        graphs.append((graph.id, graph.root_id, graph.nodes.items()))
+    return graphs
+
+
+def _add_shard(indexer, graphs):
+    for graph_id, root_id, nodes in graphs:
+        graph = TigerGraph(graph_id)
+        graph.root_id = root_id
+        # the node dictionary is filled in the same order as in a sequential parse, 
+        # which makes the node ids in the index independent of the number of workers
+        graph.nodes = dict(nodes)
+        indexer.add_graph(graph)
+
+
+def parse_tiger_corpus_parallel(filename, indexer, skip_graphs = 0, num_workers = None, 
+                                shard_size = SHARD_SIZE):
+    """Parses the TIGER-XML corpus in `filename` in several processes and sends it to `indexer`.
+    
+    The head of the corpus is parsed in the calling process. The sentences in the body are
+    split into shards of `shard_size` sentences, which are parsed in `num_workers` worker 
+    processes (by default one per CPU). The graphs are sent to the indexer in corpus order, 
+    so the indexer assigns the same ids to graphs and open-list feature values as for a
+    sequential parse.
+    
+    The first `skip_graphs` graphs of the corpus are skipped.
+    """
+    TigerHeadParser().parse(filename, indexer)
+    
+    f = open(filename, "rb")
+    try:
+        m = _XML_DECLARATION.match(f.read(1024).lstrip())
+    finally:
+        f.close()
+    xml_declaration = m.group(0) if m is not None else ""
+    
+    num_workers = num_workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        pending = deque()
+        for shard in _iter_shards(filename, shard_size, skip_graphs):
+            pending.append(pool.apply_async(parse_shard, (xml_declaration, shard)))
+            if len(pending) >= PENDING_SHARDS_PER_WORKER * num_workers:
+                _add_shard(indexer, pending.popleft().get())
+        while pending:
+            _add_shard(indexer, pending.popleft().get())
+    finally:
+        pool.terminate()
+        pool.join()
@@ -88,6 +88,10 @@ class Enum(object):
     def __repr__(self):
         return "%s.%s" % (self.__class__.__name__,  self.__name__)
     
+    def __reduce__(self):
+        # enum members are singletons, and are compared by identity
+        return (getattr, (self.__class__, self.__name__))
+    
     def __getstate__(self):
         return self.__name__
     
@@ -37,6 +37,8 @@ def element_handler(tag, event = "end"):
 class IterParseType(type):
     def __new__(mcs, classname, bases, class_dict):
         class_dict["__x_handlers__"] = handlers = {}
+        for base in bases:
+            handlers.update(getattr(base, "__x_handlers__", {}))
         for attr in class_dict.itervalues():
             if callable(attr) and hasattr(attr, HANDLER_ATTRIBUTE_NAME):
                 handlers[getattr(attr, HANDLER_ATTRIBUTE_NAME)] = attr